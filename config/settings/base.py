@@ -92,6 +92,10 @@ LOGGING = {
         'verbose': {
             'format': '%(asctime)s [%(levelname)s] [%(processName)s] %(message)s',
         },
+        # One json object by line, with the event receiver, event name and block of the ingestion logs
+        'structured': {
+            '()': 'tradingdb.chainevents.receiver_logging.StructuredFormatter',
+        },
     },
     'filters': {
         'require_debug_false': {
@@ -101,7 +105,7 @@ LOGGING = {
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'formatter': env('LOG_FORMAT', default='verbose'),
         },
         'mail_admins': {
             'level': 'ERROR',
@@ -215,6 +219,18 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
 }
 
+# `restapi` is the response cache of the list endpoints. The event listener invalidates it, so it must be shared by
+# every process, it's disabled unless a shared backend is configured. Timeout only frees space
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'restapi': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+RESTAPI_CACHE_TIMEOUT = env.int('RESTAPI_CACHE_TIMEOUT', default=60 * 60)
+
 # ------------------------------------------------------------------------------
 # Celery
 # ------------------------------------------------------------------------------
@@ -248,3 +264,18 @@ ETHEREUM_MAX_BATCH_REQUESTS = env.int('ETHEREUM_MAX_BATCH_REQUESTS', default=500
 IPFS_HOST = env('IPFS_HOST', default='ipfs.infura.io')
 IPFS_PORT = env('IPFS_PORT', default=5001)
 IPFS_TIMEOUT = env('IPFS_TIMEOUT', default=120)
+IPFS_MAX_WORKERS = env.int('IPFS_MAX_WORKERS', default=10)
+# IPFS objects are immutable, fetched objects are stored by hash and never fetched again
+IPFS_CACHE_DIR = env('IPFS_CACHE_DIR', default=str(ROOT_DIR('ipfs_cache')))
+
+# ------------------------------------------------------------------------------
+# INGESTION
+# ------------------------------------------------------------------------------
+# Workers saving the logs of different markets concurrently (`catch_up --workers`), see `chainevents.partitioned`
+INGESTION_WORKERS = env.int('INGESTION_WORKERS', default=4)
+# Only the first of every N saved logs of these events is logged, e.g. `Transfer=100,OutcomeTokenPurchase=100`
+EVENT_RECEIVER_LOG_SAMPLING = env.dict('EVENT_RECEIVER_LOG_SAMPLING', cast={'value': int}, default={})
+# Time, database queries and invalid logs of every event receiver, see `chainevents.instrumentation`
+INGESTION_METRICS = env.bool('INGESTION_METRICS', default=False)
+# Every process writes its metrics in Prometheus text format to this directory, not written if not set
+INGESTION_METRICS_DIR = env('INGESTION_METRICS_DIR', default=None)
@@ -5,6 +5,9 @@ set -euo pipefail
 echo "==> Migrating Django models ... "
 python manage.py migrate --noinput
 
+echo "==> Creating cache tables ... "
+python manage.py createcachetable
+
 echo "==> Collecting statics ... "
 DOCKER_SHARED_DIR=/nginx
 rm -rf $DOCKER_SHARED_DIR/*
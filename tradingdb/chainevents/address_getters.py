@@ -1,25 +1,32 @@
 from typing import List
 
-from django.core.exceptions import ObjectDoesNotExist
 from django_eth_events.chainevents import AbstractAddressesGetter
 
+from tradingdb.chainevents.address_index import get_address_index
 from tradingdb.relationaldb.models import (CentralizedOracle, Contract, Event,
                                            Market, OutcomeToken)
 
 
 class ContractAddressGetter(AbstractAddressesGetter):
     """
-    Returns the addresses used by event listener in order to filter logs triggered by Contract Instances
+    Returns the addresses used by event listener in order to filter logs triggered by Contract Instances.
+    Addresses are kept in a process local index (see `address_index.AddressIndex`), so the database is only
+    queried for the recently created contracts
     """
     class Meta:
         model = Contract
+        creation_block_field = 'creation_block'
+
+    @property
+    def address_index(self):
+        return get_address_index(self.Meta.model, getattr(self.Meta, 'creation_block_field', 'creation_block'))
 
     def get_addresses(self) -> List[str]:
         """
         Returns list of ethereum addresses
         :return: [address]
         """
-        return list(self.Meta.model.objects.values_list('address', flat=True))
+        return self.address_index.get_addresses()
 
     def __contains__(self, address):
         """
@@ -27,11 +34,7 @@ class ContractAddressGetter(AbstractAddressesGetter):
         :param address: ethereum address string
         :return: Boolean
         """
-        try:
-            self.Meta.model.objects.get(address=address)
-            return True
-        except ObjectDoesNotExist:
-            return False
+        return address in self.address_index
 
 
 class MarketAddressGetter(ContractAddressGetter):
@@ -47,6 +50,8 @@ class EventAddressGetter(ContractAddressGetter):
 class OutcomeTokenGetter(ContractAddressGetter):
     class Meta:
         model = OutcomeToken
+        # Outcome tokens are created with their event
+        creation_block_field = 'event__creation_block'
 
 
 class CentralizedOracleGetter(ContractAddressGetter):
@@ -0,0 +1,121 @@
+from threading import Lock
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from tradingdb.relationaldb.signals import connect_receiver
+
+# Process local registry, model -> AddressIndex
+_address_indexes = {}
+_address_indexes_lock = Lock()
+
+
+class AddressIndex:
+    """
+    Process local index of the addresses of a Contract model. Addresses are loaded once and then:
+        - Contracts saved or deleted in this process are added/removed using the signals of the model (and its
+          subclasses), connected when the index is created
+        - Contracts saved or deleted by other processes are found on `refresh`, which only queries the contracts
+          created in the last `ETH_BACKUP_BLOCKS` blocks from the highest creation block known (the watermark)
+        - Rollbacks invalidate the index, it's loaded again when needed
+    """
+
+    def __init__(self, model, creation_block_field: str = 'creation_block'):
+        self.model = model
+        self.creation_block_field = creation_block_field
+        self.blocks: Dict[str, Optional[int]] = {}  # address -> creation block
+        self.watermark: Optional[int] = None  # Highest creation block loaded
+        self.loaded = False
+        self.lock = Lock()
+
+    def _query(self, from_block: Optional[int] = None):
+        queryset = self.model.objects.all()
+        if from_block is not None:
+            queryset = queryset.filter(**{self.creation_block_field + '__gte': from_block})
+        return queryset.values_list('address', self.creation_block_field)
+
+    def load(self):
+        with self.lock:
+            self.blocks = dict(self._query())
+            self.watermark = max(filter(lambda block: block is not None, self.blocks.values()), default=None)
+            self.loaded = True
+
+    def refresh(self):
+        """
+        Loads the addresses of the contracts created near the watermark. If the index was not loaded or was
+        invalidated, loads every address
+        """
+        if not self.loaded or self.watermark is None:
+            return self.load()
+
+        from_block = self.watermark - settings.ETH_BACKUP_BLOCKS
+        recent_blocks = dict(self._query(from_block=from_block))
+        with self.lock:
+            # Contracts deleted by other processes (rollbacks)
+            for address, block in list(self.blocks.items()):
+                if (block is None or block >= from_block) and address not in recent_blocks:
+                    del self.blocks[address]
+            self.blocks.update(recent_blocks)
+            self.watermark = max(self.watermark, max(recent_blocks.values(), default=self.watermark))
+
+    def invalidate(self):
+        with self.lock:
+            self.blocks = {}
+            self.watermark = None
+            self.loaded = False
+
+    def add(self, address: str, block: Optional[int] = None):
+        if self.loaded:
+            with self.lock:
+                self.blocks.setdefault(address, self.watermark if block is None else block)
+
+    def discard(self, address: str):
+        if self.loaded:
+            with self.lock:
+                self.blocks.pop(address, None)
+
+    def get_addresses(self) -> List[str]:
+        self.refresh()
+        return list(self.blocks)
+
+    def __contains__(self, address: str) -> bool:
+        if not self.loaded:
+            self.load()
+        return address in self.blocks
+
+
+def get_address_index(model, creation_block_field: str = 'creation_block') -> AddressIndex:
+    """
+    :return: the AddressIndex of the model, created if it doesn't exist
+    """
+    address_index = _address_indexes.get(model)
+    if address_index is None:
+        with _address_indexes_lock:
+            address_index = _address_indexes.get(model)
+            if address_index is None:
+                address_index = _address_indexes[model] = AddressIndex(model, creation_block_field)
+                connect_receiver(post_save, add_to_address_indexes, [model], 'address_index_post_save')
+                connect_receiver(post_delete, remove_from_address_indexes, [model], 'address_index_post_delete')
+    return address_index
+
+
+def invalidate_address_indexes():
+    """
+    Invalidates every address index, must be called when contracts are rolled back
+    """
+    for address_index in list(_address_indexes.values()):
+        address_index.invalidate()
+
+
+def add_to_address_indexes(sender, instance, created, **kwargs):
+    if created:
+        for model, address_index in list(_address_indexes.items()):
+            if isinstance(instance, model):
+                address_index.add(instance.address, getattr(instance, 'creation_block', None))
+
+
+def remove_from_address_indexes(sender, instance, **kwargs):
+    for model, address_index in list(_address_indexes.items()):
+        if isinstance(instance, model):
+            address_index.discard(instance.address)
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from django.db import transaction
+
+# Same module as the serializers, the fetched objects are kept by the `Ipfs` singleton
+from ipfs.ipfs import Ipfs
+from tradingdb.chainevents.address_index import invalidate_address_indexes
+from tradingdb.chainevents.event_receivers import EventReceiverSerializer
+from tradingdb.relationaldb.batch import BlockRollback
+from tradingdb.relationaldb.identity_map import (identity_map,
+                                                 invalidate_identity_map)
+from tradingdb.relationaldb.models import EventDescription
+from tradingdb.restapi.cache import invalidate_response_cache
+
+ReceiverEvent = Tuple[EventReceiverSerializer, Dict, Dict]  # (receiver, decoded_event, block_info)
+
+
+def prefetch_event_descriptions(receiver_events):
+    """
+    Fetches in parallel the IPFS event descriptions referenced by the logs and not saved yet, so the serializers
+    don't wait for IPFS one hash at a time inside the transaction
+    :param receiver_events: list of (event receiver instance, decoded_event, block_info)
+    :return: number of event descriptions fetched
+    """
+    ipfs_hashes = set()
+    for _, decoded_event, _ in receiver_events:
+        for param in decoded_event.get('params', ()):
+            if param.get('name') == 'ipfsHash':
+                # Ipfs hash is returned as bytes
+                value = param['value']
+                ipfs_hashes.add(value.decode() if isinstance(value, bytes) else value)
+    if not ipfs_hashes:
+        return 0
+
+    ipfs_hashes -= set(EventDescription.objects.filter(ipfs_hash__in=ipfs_hashes).exclude(title=None)
+                       .values_list('ipfs_hash', flat=True))
+    return Ipfs().prefetch(ipfs_hashes) if ipfs_hashes else 0
+
+
+def save_events_batch(receiver_events):
+    """
+    Saves all the decoded logs of a block (or a block range) in one transaction. Logs are grouped by event receiver,
+    keeping the order in which receivers first appear (the same order the event listener processes contracts) and
+    the emission order of the logs inside every receiver. IPFS event descriptions are fetched before the transaction,
+    oracles, events and markets are loaded once for the whole batch (`identity_map`)
+    :param receiver_events: iterable of (event receiver instance, decoded_event, block_info)
+    :return: list of saved instances, grouped by event receiver
+    """
+    receiver_events = list(receiver_events)
+    prefetch_event_descriptions(receiver_events)
+
+    events_by_receiver = OrderedDict()
+    for receiver, decoded_event, block_info in receiver_events:
+        events_by_receiver.setdefault(receiver, []).append((decoded_event, block_info))
+
+    instances = []
+    with transaction.atomic(), identity_map():
+        for receiver, decoded_events in events_by_receiver.items():
+            instances.extend(receiver.save_batch(decoded_events))
+    return instances
+
+
+def rollback_events_batch(block_number, receiver_events):
+    """
+    Reverts every decoded log of the blocks after `block_number` (chain reorg) in one transaction. Orders, outcome
+    token balances and created contracts are reverted in bulk by `BlockRollback`, the rest of the events are reverted
+    one by one by their event receiver, from the last emitted to the first. Orders are reverted first, with the funding
+    of their markets
+    :param block_number: last block kept
+    :param receiver_events: iterable of (event receiver instance, decoded_event, block_info) of the reverted blocks,
+    sorted as they were emitted
+    """
+    block_rollback = BlockRollback(block_number)
+    with transaction.atomic():
+        block_rollback.revert_aggregates()
+        for receiver, decoded_event, block_info in reversed(list(receiver_events)):
+            serializer_class = receiver.Meta.events.get(decoded_event.get('name'))
+            if serializer_class and not BlockRollback.supports(serializer_class):
+                receiver.rollback(decoded_event, block_info)
+        block_rollback.delete_contracts()
+        # Contract addresses are loaded again from database
+        invalidate_address_indexes()
+        invalidate_identity_map()
+        invalidate_response_cache()
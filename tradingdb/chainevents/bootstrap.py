@@ -0,0 +1,277 @@
+"""
+Bootstrap of a new database from the logs of the chain, instead of replaying every block through the event listener.
+The logs of the contracts in ETH_EVENTS are fetched with `eth_getLogs` for chunks of thousands of blocks, decoded
+and saved like `save_events_batch` does, one transaction per chunk:
+
+    - Contract creations of the factories (oracles, events, markets), outcome token creations, trades and outcome
+      token events are applied in memory (`CopyIngestionBatch`): they are validated by lightweight decoders
+      (`event_decoders`) instead of their serializers, the referenced contracts and balances are loaded once, and
+      contracts, orders and balance journal deltas are inserted with Postgres COPY.
+    - The rest of the events (fundings, outcome assignments...) are saved by their serializers.
+
+The catch-up (`catch_up`) saves the chunks with the bulk statements of `IngestionBatch`, or with a pool of workers
+(`load_chunk_partitioned`).
+
+Contracts created by the logs of a chunk are found in rounds: the logs of the factories and of the known contracts
+are saved first, then the logs of the contracts they created are fetched, until no new contract is found.
+
+Blocks are not stored (`django_eth_events.models.Block`), so the loaded blocks cannot be reverted by the listener:
+only blocks older than the last ETH_BACKUP_BLOCKS must be loaded, the listener goes on from the last loaded block.
+"""
+import logging
+from typing import (Callable, Dict, Iterator, List, Optional, Sequence,
+                    Tuple, Type)
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from django_eth_events.utils import normalize_address_without_0x
+from eth_abi import decode_abi, decode_single
+from eth_utils import event_abi_to_log_topic, to_bytes, to_checksum_address
+
+from tradingdb.relationaldb.batch import CopyIngestionBatch, IngestionBatch
+from tradingdb.relationaldb.identity_map import identity_map
+
+from .address_index import invalidate_address_indexes
+from .batch import ReceiverEvent, save_events_batch
+from .partitioned import (get_last_recorded_block, revert_recorded_logs,
+                          save_events_partitioned)
+
+logger = logging.getLogger(__name__)
+
+# Max number of addresses of every `eth_getLogs` request
+GET_LOGS_ADDRESSES: int = 500
+
+
+def to_bytes_value(value) -> bytes:
+    return to_bytes(hexstr=value) if isinstance(value, str) else bytes(value)
+
+
+class LogDecoder:
+    """
+    Decodes raw logs to the format of the logs decoded by the event listener: name, address and params of the event
+    (addresses without 0x), transaction hash and log index
+    """
+    def __init__(self, abi: List[Dict]):
+        self.event_abis = {event_abi_to_log_topic(event_abi): event_abi
+                           for event_abi in abi if event_abi.get('type') == 'event'}
+
+    @property
+    def topics(self) -> List[str]:
+        return ['0x' + topic.hex() for topic in self.event_abis]
+
+    @staticmethod
+    def decode_value(abi_type: str, value):
+        if abi_type == 'address':
+            return normalize_address_without_0x(value)
+        if abi_type == 'address[]':
+            return [normalize_address_without_0x(address) for address in value]
+        return value
+
+    def decode(self, log: Dict) -> Optional[Dict]:
+        """
+        :return: decoded log, None if the event is not in the abi
+        """
+        topics = [to_bytes_value(topic) for topic in log['topics']]
+        event_abi = self.event_abis.get(topics[0]) if topics else None
+        if event_abi is None:
+            return None
+
+        indexed_inputs = [event_input for event_input in event_abi['inputs'] if event_input['indexed']]
+        data_inputs = [event_input for event_input in event_abi['inputs'] if not event_input['indexed']]
+        values = {}
+        for event_input, topic in zip(indexed_inputs, topics[1:]):
+            # Dynamic types are indexed by their hash
+            values[event_input['name']] = (topic if event_input['type'] in ('string', 'bytes')
+                                           else decode_single(event_input['type'], topic))
+        data_values = decode_abi([event_input['type'] for event_input in data_inputs], to_bytes_value(log['data']))
+        values.update(zip([event_input['name'] for event_input in data_inputs], data_values))
+
+        transaction_hash = log.get('transactionHash')
+        return {
+            'name': event_abi['name'],
+            'address': normalize_address_without_0x(log['address']),
+            'params': [{'name': event_input['name'],
+                        'value': self.decode_value(event_input['type'], values[event_input['name']])}
+                       for event_input in event_abi['inputs']],
+            'transaction_hash': to_bytes_value(transaction_hash).hex() if transaction_hash is not None else None,
+            'log_index': log.get('logIndex'),
+        }
+
+
+class BootstrapContract:
+    """
+    Contract of ETH_EVENTS: its receiver, fixed addresses or addresses getter and log decoder
+    """
+    def __init__(self, contract: Dict, batch_class: Type[IngestionBatch] = CopyIngestionBatch):
+        self.name = contract.get('NAME')
+        self.receiver = import_string(contract['EVENT_DATA_RECEIVER'])()
+        self.receiver.batch_class = batch_class
+        self.fixed_addresses = [normalize_address_without_0x(address) for address in contract.get('ADDRESSES', ())]
+        addresses_getter = contract.get('ADDRESSES_GETTER')
+        self.addresses_getter = import_string(addresses_getter)() if addresses_getter else None
+        self.decoder = LogDecoder(contract['EVENT_ABI'])
+
+    def get_addresses(self) -> List[str]:
+        if self.addresses_getter is None:
+            return self.fixed_addresses
+        return self.addresses_getter.get_addresses()
+
+
+class BootstrapLoader:
+    def __init__(self, web3, eth_events: List[Dict] = None, chunk_blocks: int = None,
+                 batch_class: Type[IngestionBatch] = CopyIngestionBatch):
+        """
+        :param eth_events: ETH_EVENTS by default
+        :param chunk_blocks: blocks saved in every transaction, ETH_FILTER_PROCESS_BLOCKS by default
+        :param batch_class: batch of the receivers, `IngestionBatch` writes with bulk statements instead of COPY
+        """
+        self.web3 = web3
+        self.contracts = [BootstrapContract(contract, batch_class=batch_class)
+                          for contract in (settings.ETH_EVENTS if eth_events is None else eth_events)]
+        self.chunk_blocks = chunk_blocks or settings.ETH_FILTER_PROCESS_BLOCKS
+        self.block_infos = {}  # block number -> block info, of the current chunk
+        self.invalid_logs = 0
+
+    def get_block_info(self, block_number: int) -> Dict:
+        block_info = self.block_infos.get(block_number)
+        if block_info is None:
+            block = self.web3.eth.getBlock(block_number)
+            block_info = {
+                'number': block['number'],
+                'hash': to_bytes_value(block['hash']).hex(),
+                'timestamp': block['timestamp'],
+            }
+            self.block_infos[block_number] = block_info
+        return block_info
+
+    def get_logs(self, contract: BootstrapContract, addresses: Sequence[str], from_block: int,
+                 to_block: int) -> List[Tuple[int, int, ReceiverEvent]]:
+        """
+        :return: list of (block number, log index, receiver event) of the decoded logs of the contracts
+        """
+        logs = []
+        for i in range(0, len(addresses), GET_LOGS_ADDRESSES):
+            logs.extend(self.web3.eth.getLogs({
+                'fromBlock': from_block,
+                'toBlock': to_block,
+                'address': [to_checksum_address(address) for address in addresses[i:i + GET_LOGS_ADDRESSES]],
+                'topics': [contract.decoder.topics],
+            }))
+
+        receiver_events = []
+        for log in logs:
+            try:
+                decoded_event = contract.decoder.decode(log)
+            except Exception as e:
+                # The listener skips the logs it cannot decode too
+                logger.warning('Cannot decode log %s of %s: %s', log, contract.name, e)
+                continue
+            if decoded_event is not None:
+                receiver_events.append((log['blockNumber'], log['logIndex'],
+                                        (contract.receiver, decoded_event, self.get_block_info(log['blockNumber']))))
+        return receiver_events
+
+    def load_rounds(self, from_block: int, to_block: int,
+                    save_events: Callable[[List[ReceiverEvent]], List]) -> int:
+        """
+        Saves the logs between `from_block` and `to_block` (both included) in rounds, the logs of the contracts
+        created by a round are fetched by the next one
+        :param save_events: saves the logs of a round sorted as they were emitted, returns the saved instances
+        :return: number of logs processed
+        """
+        fetched_addresses = [set() for _ in self.contracts]
+        processed = 0
+        self.block_infos = {}
+        while True:
+            logs = []
+            for contract, fetched in zip(self.contracts, fetched_addresses):
+                addresses = [address for address in contract.get_addresses() if address not in fetched]
+                fetched.update(addresses)
+                if addresses:
+                    logs.extend(self.get_logs(contract, addresses, from_block, to_block))
+            if not logs:
+                break
+
+            # Grouped by receiver in order of appearance, long runs of logs are applied by the same batch
+            logs.sort(key=lambda log: log[:2])
+            instances = save_events([receiver_event for _, _, receiver_event in logs])
+            self.invalid_logs += sum(1 for instance in instances if instance is None)
+            processed += len(logs)
+        return processed
+
+    def load_chunk(self, from_block: int, to_block: int) -> int:
+        """
+        Saves the logs between `from_block` and `to_block` (both included) in one transaction
+        :return: number of logs processed
+        """
+        try:
+            with transaction.atomic(), identity_map():
+                return self.load_rounds(from_block, to_block, save_events_batch)
+        except Exception:
+            # Contracts created by the chunk are not saved
+            invalidate_address_indexes()
+            raise
+
+    def load_chunk_partitioned(self, from_block: int, to_block: int, max_workers: int = None) -> int:
+        """
+        Saves the logs between `from_block` and `to_block` (both included) with `save_events_partitioned`. Every
+        round is committed in several transactions (the barrier and one per worker), so it cannot run inside a
+        transaction: the saved logs are recorded, and reverted if a round fails. If the process is killed, they are
+        reverted by `revert_partitioned_chunk`. The chunk is finished by calling `partitioned.clear_recorded_logs`
+        :param max_workers: INGESTION_WORKERS by default
+        :return: number of logs processed
+        """
+        receiver_events = []  # of the rounds, saved or not
+
+        def save_events(round_events):
+            receiver_events.extend(round_events)
+            return save_events_partitioned(round_events, max_workers=max_workers, record_logs=True)
+
+        try:
+            return self.load_rounds(from_block, to_block, save_events)
+        except Exception:
+            revert_recorded_logs(from_block - 1, receiver_events)
+            invalidate_address_indexes()
+            raise
+
+    def revert_partitioned_chunk(self, block_number: int) -> int:
+        """
+        Reverts the logs recorded by a `load_chunk_partitioned` that was not finished, the process was killed between
+        the transactions of the chunk
+        :param block_number: last block of the previous chunk
+        :return: number of logs reverted
+        """
+        to_block = get_last_recorded_block()
+        if to_block is None:
+            return 0
+
+        # Contracts created by the chunk exist, their logs are fetched with the rest
+        self.block_infos = {}
+        logs = []
+        for contract in self.contracts:
+            addresses = contract.get_addresses()
+            if addresses:
+                logs.extend(self.get_logs(contract, addresses, block_number + 1, to_block))
+        try:
+            return revert_recorded_logs(block_number, [receiver_event for _, _, receiver_event in logs])
+        finally:
+            invalidate_address_indexes()
+
+    def iter_chunks(self, from_block: int, to_block: int) -> Iterator[Tuple[int, int]]:
+        for chunk_from_block in range(from_block, to_block + 1, self.chunk_blocks):
+            yield chunk_from_block, min(chunk_from_block + self.chunk_blocks - 1, to_block)
+
+    def load(self, from_block: int, to_block: int, callback: Callable[[int, int, int], None] = None) -> int:
+        """
+        Saves the logs between `from_block` and `to_block` (both included), one transaction per chunk
+        :param callback: called after every chunk with its first block, last block and number of logs processed
+        :return: number of logs processed
+        """
+        processed = 0
+        for chunk_from_block, chunk_to_block in self.iter_chunks(from_block, to_block):
+            chunk_processed = self.load_chunk(chunk_from_block, chunk_to_block)
+            processed += chunk_processed
+            if callback is not None:
+                callback(chunk_from_block, chunk_to_block, chunk_processed)
+        return processed
@@ -0,0 +1,176 @@
+"""
+Catch-up of the event listener when it's far behind the chain. The logs of ETH_EVENTS are saved by the event receivers
+in chunks of blocks (`BootstrapLoader` with the bulk statements of `IngestionBatch`), and every chunk is committed
+with its checkpoint, the last block saved: if the catch-up stops, it goes on from the block after the checkpoint
+without saving any log twice.
+
+With `workers`, the logs of every chunk are saved by a pool of workers (`partitioned`): the chunk is committed in
+several transactions, which record the logs they save (`PartitionedLog`), and its checkpoint is committed after them
+with the records deleted. A failed chunk is reverted. If the process is killed in the middle of a chunk, the next
+run reverts its recorded logs before going on from the checkpoint, with or without workers.
+
+`CatchUpProgress` reports the blocks and logs per second of every chunk and the remaining time, and the stats of
+every chunk can be written to a CSV file to size ETH_PROCESS_BLOCKS and ETH_FILTER_PROCESS_BLOCKS.
+"""
+import csv
+import logging
+import time
+from collections import deque
+from typing import Callable, List, NamedTuple, Optional
+
+from django.db import transaction
+
+from tradingdb.relationaldb.batch import IngestionBatch
+
+from .address_index import invalidate_address_indexes
+from .bootstrap import BootstrapLoader
+from .partitioned import clear_recorded_logs
+
+logger = logging.getLogger(__name__)
+
+# Chunks used to estimate the current speed
+PROGRESS_WINDOW: int = 10
+
+
+class ChunkStats(NamedTuple):
+    from_block: int
+    to_block: int
+    logs: int
+    seconds: float
+
+    @property
+    def blocks(self) -> int:
+        return self.to_block - self.from_block + 1
+
+
+class Checkpoint:
+    """
+    Last block saved, written in the transaction of every chunk
+    """
+    def get(self) -> int:
+        raise NotImplementedError
+
+    def set(self, block_number: int):
+        raise NotImplementedError
+
+
+class CatchUpProgress:
+    def __init__(self, from_block: int, to_block: int, clock: Callable[[], float] = time.monotonic):
+        self.from_block = from_block
+        self.to_block = to_block
+        self.clock = clock
+        self.start = clock()
+        self.last = self.start
+        self.chunks: List[ChunkStats] = []
+        self.recent_chunks = deque(maxlen=PROGRESS_WINDOW)
+
+    def add_chunk(self, from_block: int, to_block: int, logs: int) -> ChunkStats:
+        now = self.clock()
+        chunk = ChunkStats(from_block, to_block, logs, now - self.last)
+        self.last = now
+        self.chunks.append(chunk)
+        self.recent_chunks.append(chunk)
+        return chunk
+
+    @property
+    def saved_block(self) -> int:
+        return self.chunks[-1].to_block if self.chunks else self.from_block - 1
+
+    @property
+    def remaining_blocks(self) -> int:
+        return self.to_block - self.saved_block
+
+    @property
+    def blocks_per_second(self) -> float:
+        """
+        :return: speed of the last chunks, the density of logs changes along the chain
+        """
+        seconds = sum(chunk.seconds for chunk in self.recent_chunks)
+        return sum(chunk.blocks for chunk in self.recent_chunks) / seconds if seconds else 0.
+
+    @property
+    def logs_per_second(self) -> float:
+        seconds = sum(chunk.seconds for chunk in self.recent_chunks)
+        return sum(chunk.logs for chunk in self.recent_chunks) / seconds if seconds else 0.
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        :return: seconds to save the remaining blocks at the current speed, None if unknown
+        """
+        if not self.remaining_blocks:
+            return 0.
+        blocks_per_second = self.blocks_per_second
+        return self.remaining_blocks / blocks_per_second if blocks_per_second else None
+
+    def get_report(self) -> str:
+        chunk = self.chunks[-1]
+        eta = self.eta
+        return 'Saved {} logs of blocks {}-{} in {:.1f}s | {:.1f} blocks/s, {:.1f} logs/s | {} blocks left, ' \
+               'ETA {}'.format(chunk.logs, chunk.from_block, chunk.to_block, chunk.seconds, self.blocks_per_second,
+                               self.logs_per_second, self.remaining_blocks,
+                               'unknown' if eta is None else '{:.0f}s'.format(eta))
+
+    def write_csv(self, path: str):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('from_block', 'to_block', 'blocks', 'logs', 'seconds', 'blocks_per_second',
+                             'logs_per_second'))
+            for chunk in self.chunks:
+                writer.writerow((chunk.from_block, chunk.to_block, chunk.blocks, chunk.logs,
+                                 '{:.3f}'.format(chunk.seconds),
+                                 '{:.2f}'.format(chunk.blocks / chunk.seconds if chunk.seconds else 0),
+                                 '{:.2f}'.format(chunk.logs / chunk.seconds if chunk.seconds else 0)))
+
+
+class CatchUpRunner:
+    def __init__(self, web3, checkpoint: Checkpoint, chunk_blocks: int = None, eth_events=None,
+                 clock: Callable[[], float] = time.monotonic, workers: int = None):
+        """
+        :param chunk_blocks: blocks committed together, ETH_FILTER_PROCESS_BLOCKS by default
+        :param eth_events: ETH_EVENTS by default
+        :param workers: if set, the logs of every chunk are saved by `workers` workers (`save_events_partitioned`)
+        """
+        self.loader = BootstrapLoader(web3, eth_events=eth_events, chunk_blocks=chunk_blocks,
+                                      batch_class=IngestionBatch)
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.clock = clock
+        self.progress: Optional[CatchUpProgress] = None  # of the last run, also if it failed
+
+    def run(self, to_block: int, callback: Callable[[CatchUpProgress], None] = None) -> CatchUpProgress:
+        """
+        Saves the blocks after the checkpoint until `to_block` (included), one transaction per chunk. The logs of an
+        unfinished partitioned chunk are reverted first
+        :param callback: called after every chunk is committed
+        :return: progress of the catch-up, with the stats of every chunk
+        """
+        reverted = self.loader.revert_partitioned_chunk(self.checkpoint.get())
+        if reverted:
+            logger.warning('Reverted %d logs saved after block %d by an unfinished chunk', reverted,
+                           self.checkpoint.get())
+
+        progress = self.progress = CatchUpProgress(self.checkpoint.get() + 1, to_block, clock=self.clock)
+        for chunk_from_block, chunk_to_block in self.loader.iter_chunks(progress.from_block, to_block):
+            try:
+                if self.workers:
+                    # The loader reverts the chunk if it fails, the workers commit their own transactions
+                    logs = self.loader.load_chunk_partitioned(chunk_from_block, chunk_to_block,
+                                                              max_workers=self.workers)
+                    with transaction.atomic():
+                        self.checkpoint.set(chunk_to_block)
+                        clear_recorded_logs()
+                else:
+                    with transaction.atomic():
+                        logs = self.loader.load_chunk(chunk_from_block, chunk_to_block)
+                        self.checkpoint.set(chunk_to_block)
+            except Exception:
+                logger.error('Cannot save blocks %d-%d, the checkpoint is block %d', chunk_from_block, chunk_to_block,
+                             progress.saved_block)
+                invalidate_address_indexes()
+                raise
+            progress.add_chunk(chunk_from_block, chunk_to_block, logs)
+            logger.info(progress.get_report())
+            if callback is not None:
+                callback(progress)
+        return progress
@@ -0,0 +1,99 @@
+"""
+Resolution of the IPFS event descriptions ahead of the event listener. The logs of the next blocks of the contracts in
+ETH_EVENTS are scanned for `ipfsHash` params (`CentralizedOracleCreation`), and the descriptions not saved yet are
+fetched in parallel by the IPFS fetcher pool and saved as `EventDescription`. When the listener reaches the block the
+oracle serializer finds the description in database instead of waiting for IPFS.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from eth_abi import decode_abi
+from eth_utils import event_abi_to_log_topic, to_bytes, to_checksum_address
+from rest_framework.exceptions import ValidationError
+
+# Same module as the serializers, the fetched objects are kept by the `Ipfs` singleton
+from ipfs.ipfs import Ipfs
+from tradingdb.relationaldb.models import EventDescription
+from tradingdb.relationaldb.serializers import IpfsHashField
+
+logger = get_task_logger(__name__)
+
+IPFS_HASH_PARAM = 'ipfsHash'
+
+# (contract addresses, event abi)
+IpfsHashEvent = Tuple[List[str], Dict]
+
+
+def get_ipfs_hash_events(eth_events: List[Dict] = None) -> List[IpfsHashEvent]:
+    """
+    :param eth_events: ETH_EVENTS setting, only contracts with fixed addresses are used (factories)
+    :return: events with an `ipfsHash` param and the addresses of their contracts
+    """
+    ipfs_hash_events = []
+    for contract in settings.ETH_EVENTS if eth_events is None else eth_events:
+        addresses = contract.get('ADDRESSES')
+        if not addresses:
+            continue
+        for event_abi in contract['EVENT_ABI']:
+            if event_abi.get('type') == 'event' and any(event_input['name'] == IPFS_HASH_PARAM
+                                                        for event_input in event_abi['inputs']):
+                ipfs_hash_events.append((addresses, event_abi))
+    return ipfs_hash_events
+
+
+def decode_ipfs_hash(event_abi: Dict, log: Dict) -> str:
+    # `ipfsHash` is not indexed, it's in the data of the log with the rest of not indexed params
+    data_inputs = [event_input for event_input in event_abi['inputs'] if not event_input['indexed']]
+    data = log['data']
+    values = decode_abi([event_input['type'] for event_input in data_inputs],
+                        to_bytes(hexstr=data) if isinstance(data, str) else bytes(data))
+    ipfs_hash = values[[event_input['name'] for event_input in data_inputs].index(IPFS_HASH_PARAM)]
+    return ipfs_hash.decode() if isinstance(ipfs_hash, bytes) else ipfs_hash
+
+
+def get_ipfs_hashes(web3, from_block: int, to_block: int, ipfs_hash_events: List[IpfsHashEvent] = None) -> List[str]:
+    """
+    :return: ipfs hashes of the logs between `from_block` and `to_block` (both included), sorted as they were emitted
+    """
+    ipfs_hashes = []
+    for addresses, event_abi in get_ipfs_hash_events() if ipfs_hash_events is None else ipfs_hash_events:
+        logs = web3.eth.getLogs({
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'address': [to_checksum_address(address) for address in addresses],
+            'topics': ['0x' + event_abi_to_log_topic(event_abi).hex()],
+        })
+        for log in logs:
+            try:
+                ipfs_hashes.append(decode_ipfs_hash(event_abi, log))
+            except Exception as e:
+                # The listener logs the invalid logs when it reaches them
+                logger.warning('Cannot decode ipfs hash of log %s: %s', log, e)
+    return ipfs_hashes
+
+
+def resolve_event_descriptions(ipfs_hashes: Iterable[str]) -> int:
+    """
+    Saves the event descriptions of `ipfs_hashes` not saved yet. They are fetched in parallel and saved one by one,
+    invalid descriptions are skipped (the oracle serializer rejects them again when the listener reaches them)
+    :return: number of event descriptions saved
+    """
+    ipfs_hashes = set(ipfs_hashes)
+    if not ipfs_hashes:
+        return 0
+    ipfs_hashes -= set(EventDescription.objects.filter(ipfs_hash__in=ipfs_hashes).exclude(title=None)
+                       .values_list('ipfs_hash', flat=True))
+    if not ipfs_hashes:
+        return 0
+
+    Ipfs().prefetch(ipfs_hashes)
+    ipfs_hash_field = IpfsHashField()
+    resolved = 0
+    for ipfs_hash in sorted(ipfs_hashes):
+        try:
+            ipfs_hash_field.to_internal_value(ipfs_hash)
+            resolved += 1
+        except ValidationError as e:
+            logger.warning('Cannot resolve event description %s: %s', ipfs_hash, e.detail)
+    return resolved
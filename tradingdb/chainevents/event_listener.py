@@ -0,0 +1,83 @@
+"""
+Event listener of ETH_EVENTS whose decoded logs keep the index of their raw log (`log_index`): the balance journal
+identifies every balance change by the block number and log index of its event (`BalanceDeltaSerializer`). The
+decoder of `django_eth_events` only keeps the address, name, params and transaction hash of every log.
+
+The listener runs in the `tradingdb.relationaldb.tasks.event_listener` task, instead of
+`django_eth_events.tasks.event_listener` (see migration 0018 of relationaldb). Both tasks, `db_dump` and `catch_up`
+take `listener_lock`, so only one of them runs at a time.
+"""
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from django.db import transaction
+from django_eth_events.event_listener import EventListener
+from django_eth_events.models import Daemon
+
+
+@contextmanager
+def listener_lock() -> Iterator[bool]:
+    """
+    Takes `Daemon.listener_lock`, the lock of the event listener task of `django_eth_events`, until exit
+    :return: True if the lock was acquired, False if it's held by another process
+    """
+    with transaction.atomic():
+        daemon = Daemon.objects.select_for_update().first() or Daemon.get_solo()
+        acquired = not daemon.listener_lock
+        if acquired:
+            daemon.listener_lock = True
+            daemon.save(update_fields=['listener_lock'])
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with transaction.atomic():
+                daemon = Daemon.objects.select_for_update().get(pk=daemon.pk)
+                daemon.listener_lock = False
+                daemon.save(update_fields=['listener_lock'])
+
+
+class LogIndexDecoder:
+    """
+    Decoder of the listener adding the index of the raw log to every decoded log, the rest is done by the decoder of
+    `django_eth_events` (abis, decoding)
+    """
+    def __init__(self, decoder):
+        self.decoder = decoder
+
+    def __getattr__(self, name):
+        return getattr(self.decoder, name)
+
+    def decode_log(self, log: Dict) -> Optional[Dict]:
+        decoded_log = self.decoder.decode_log(log)
+        if decoded_log is not None:
+            decoded_log['log_index'] = log['logIndex']
+        return decoded_log
+
+    def decode_logs(self, logs: List[Dict]) -> List[Dict]:
+        decoded_logs = []
+        for log in logs:
+            try:
+                decoded_log = self.decode_log(log)
+            except LookupError:
+                # Topic not in the abis
+                continue
+            if decoded_log is not None:
+                decoded_logs.append(decoded_log)
+        return decoded_logs
+
+
+class LogIndexEventListener(EventListener):
+    """
+    `EventListener` decoding the logs with `LogIndexDecoder`. The listener creates its decoder in `__init__` and
+    only calls it to decode the logs of every block: the decoder is wrapped when it's set, so fetching, reorgs and
+    the stored blocks stay the ones of `django_eth_events`
+    """
+    @property
+    def decoder(self) -> LogIndexDecoder:
+        return self._decoder
+
+    @decoder.setter
+    def decoder(self, decoder):
+        self._decoder = decoder if isinstance(decoder, LogIndexDecoder) else LogIndexDecoder(decoder)
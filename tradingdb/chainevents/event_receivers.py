@@ -1,9 +1,15 @@
-from json import dumps
-
 from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.db import transaction
 from django_eth_events.chainevents import AbstractEventReceiver
-from django_eth_events.utils import JsonBytesEncoder
 
+from tradingdb.chainevents.address_index import invalidate_address_indexes
+from tradingdb.chainevents.instrumentation import (ingestion_metrics,
+                                                   instrumented)
+from tradingdb.chainevents.receiver_logging import ReceiverLogger
+from tradingdb.relationaldb.batch import IngestionBatch
+from tradingdb.relationaldb.identity_map import (identity_map,
+                                                 invalidate_identity_map)
 from tradingdb.relationaldb.serializers import (CategoricalEventSerializer,
                                                 CentralizedOracleSerializer,
                                                 FeeWithdrawalSerializer,
@@ -26,21 +32,27 @@ from tradingdb.relationaldb.serializers import (CategoricalEventSerializer,
                                                 TournamentTokenTransferSerializer,
                                                 UportTournamentParticipantSerializerEventSerializerTimestamped,
                                                 WinningsRedemptionSerializer)
+from tradingdb.restapi.cache import invalidate_response_cache
 
 logger = get_task_logger(__name__)
+receiver_logger = ReceiverLogger(logger, sampling=settings.EVENT_RECEIVER_LOG_SAMPLING)
 
 
 class EventReceiverSerializer(AbstractEventReceiver):
+    # Applies and writes the events saved by `save_batch`
+    batch_class = IngestionBatch
 
     class Meta:
         events = {}
         primary_key_name = 'address'
 
+    @instrumented('save')
     def save(self, decoded_event, block_info=None):
         # Get serializer based on Event Name and saved serializers in Meta.events dictionary
         event_name = decoded_event.get('name')
         if self.Meta.events.get(event_name):
-            # Block info is optional, only models that inherit from ContractCreatedByFactory need it
+            # Block info is optional, only models that inherit from ContractCreatedByFactory and balance changes
+            # need it
             if block_info:
                 serializer = self.Meta.events.get(event_name)(data=decoded_event, block=block_info)
             else:
@@ -49,21 +61,71 @@ class EventReceiverSerializer(AbstractEventReceiver):
             # Only valid data goes forward, non valid data is logged
             if serializer.is_valid():
                 instance = serializer.save()
-                logger.info('Event Receiver {} added: {}'.format(self.__class__.__name__,
-                                                                 dumps(decoded_event,
-                                                                       sort_keys=True,
-                                                                       indent=4,
-                                                                       cls=JsonBytesEncoder)))
+                invalidate_response_cache()
+                receiver_logger.saved(self, decoded_event, block_info)
                 # serializer model instance is returned in order to django-eth-events know it was a valid event
                 return instance
             else:
-                logger.warning('INVALID Data for Event Receiver {} save: {}'.format(self.__class__.__name__,
-                                                                                    dumps(decoded_event,
-                                                                                          sort_keys=True,
-                                                                                          indent=4,
-                                                                                          cls=JsonBytesEncoder)))
-                logger.warning(serializer.errors)
+                ingestion_metrics.add_invalid(self.__class__.__name__, event_name, 'save')
+                receiver_logger.invalid(self, decoded_event, 'save', serializer.errors, block_info)
+
+    def save_batch(self, decoded_events):
+        """
+        Saves a list of events in one transaction. Consecutive events supported by `batch_class` (`IngestionBatch`)
+        are validated, applied in memory and written with bulk statements, the rest of them are saved one by one
+        using `save`
+        :param decoded_events: list of (decoded_event, block_info) tuples, sorted as they were emitted
+        :return: list of saved instances, None for the invalid events
+        """
+        instances = []
+        pending = []
+        with transaction.atomic(), identity_map():
+            for decoded_event, block_info in decoded_events:
+                serializer_class = self.Meta.events.get(decoded_event.get('name'))
+                if serializer_class and self.batch_class.supports(serializer_class):
+                    pending.append((serializer_class, decoded_event, block_info))
+                else:
+                    # Pending events must be written before, `save` reads the database
+                    instances.extend(self._save_pending(pending))
+                    pending = []
+                    instances.append(self.save(decoded_event, block_info))
+            instances.extend(self._save_pending(pending))
+            invalidate_response_cache()
+        return instances
+
+    def _save_pending(self, pending):
+        if not pending:
+            return []
+
+        with ingestion_metrics.measure(self.__class__.__name__, '*', 'save_batch', events=len(pending)):
+            return self._apply_pending(pending)
+
+    def _apply_pending(self, pending):
+        batch = self.batch_class()
+        entries = []
+        for (serializer_class, decoded_event, block_info), (validated_data, errors) in zip(
+                pending, batch.validate_events(pending)):
+            if errors is None:
+                entries.append((serializer_class, validated_data, decoded_event, block_info))
+            else:
+                entries.append(None)
+                ingestion_metrics.add_invalid(self.__class__.__name__, decoded_event.get('name'), 'save_batch')
+                receiver_logger.invalid(self, decoded_event, 'save', errors, block_info)
+
+        batch.prefetch([(serializer_class, validated_data) for serializer_class, validated_data, _, _ in
+                        filter(None, entries)])
+        instances = []
+        for entry in entries:
+            if entry is None:
+                instances.append(None)
+            else:
+                serializer_class, validated_data, decoded_event, block_info = entry
+                instances.append(batch.apply(serializer_class, validated_data))
+                receiver_logger.saved(self, decoded_event, block_info)
+        batch.flush()
+        return instances
 
+    @instrumented('rollback')
     def rollback(self, decoded_event, block_info=None):
         event_name = decoded_event.get('name')
         serializer_class = self.Meta.events.get(event_name)
@@ -84,17 +146,14 @@ class EventReceiverSerializer(AbstractEventReceiver):
         serializer = serializer_class(instance, data=decoded_event, block=block_info)
         if serializer.is_valid():
             serializer.rollback()
-            logger.info('Event Receiver {} reverted: {}'.format(self.__class__.__name__, dumps(decoded_event,
-                                                                                               sort_keys=True,
-                                                                                               indent=4,
-                                                                                               cls=JsonBytesEncoder)))
+            # Contract addresses are loaded again from database, the rollback transaction could still fail
+            invalidate_address_indexes()
+            invalidate_identity_map()
+            invalidate_response_cache()
+            receiver_logger.reverted(self, decoded_event, block_info)
         else:
-            logger.warning('INVALID Data for Event Receiver {} rollback: {}'.format(self.__class__.__name__,
-                                                                                    dumps(decoded_event,
-                                                                                          sort_keys=True,
-                                                                                          indent=4,
-                                                                                          cls=JsonBytesEncoder)))
-            logger.warning(serializer.errors)
+            ingestion_metrics.add_invalid(self.__class__.__name__, event_name, 'rollback')
+            receiver_logger.invalid(self, decoded_event, 'rollback', serializer.errors, block_info)
 
 
 class CentralizedOracleFactoryReceiver(EventReceiverSerializer):
@@ -142,6 +201,7 @@ class BaseInstanceEventReceiver(EventReceiverSerializer):
         events = {}
         primary_key_name = {}
 
+    @instrumented('rollback')
     def rollback(self, decoded_event, block_info=None):
         event_name = decoded_event.get('name')
         serializer_class = self.Meta.events.get(event_name)
@@ -171,20 +231,12 @@ class BaseInstanceEventReceiver(EventReceiverSerializer):
 
         if serializer.is_valid():
             serializer.rollback()
-            logger.info('Event Receiver {} reverted: {}'.format(self.__class__.__name__,
-                                                                dumps(decoded_event,
-                                                                      sort_keys=True,
-                                                                      indent=4,
-                                                                      cls=JsonBytesEncoder)))
+            invalidate_identity_map()
+            invalidate_response_cache()
+            receiver_logger.reverted(self, decoded_event, block_info)
         else:
-            logger.warning(
-                'INVALID Data for Event Receiver {} rollback: {}'.format(self.__class__.__name__,
-                                                                         dumps(decoded_event,
-                                                                               sort_keys=True,
-                                                                               indent=4,
-                                                                               cls=JsonBytesEncoder))
-            )
-            logger.warning(serializer.errors)
+            ingestion_metrics.add_invalid(self.__class__.__name__, event_name, 'rollback')
+            receiver_logger.invalid(self, decoded_event, 'rollback', serializer.errors, block_info)
 
 
 class MarketInstanceReceiver(BaseInstanceEventReceiver):
@@ -304,6 +356,7 @@ class TournamentTokenReceiver(BaseInstanceEventReceiver):
             }
         }
 
+    @instrumented('rollback')
     def rollback(self, decoded_event, block_info=None):
         event_name = decoded_event.get('name')
         if event_name == 'Issuance':
@@ -324,22 +377,7 @@ class TournamentTokenReceiver(BaseInstanceEventReceiver):
 
                     if serializer.is_valid():
                         serializer.rollback()
-                        logger.info('Event Receiver {} reverted: {}'.format(self.__class__.__name__,
-                                                                            dumps(decoded_event,
-                                                                                  sort_keys=True,
-                                                                                  indent=4,
-                                                                                  cls=JsonBytesEncoder
-                                                                                  )
-                                                                            )
-                                    )
+                        receiver_logger.reverted(self, decoded_event, block_info)
                     else:
-                        logger.warning(
-                            'INVALID Data for Event Receiver {} rollback: {}'.format(
-                                self.__class__.__name__, dumps(decoded_event,
-                                                               sort_keys=True,
-                                                               indent=4,
-                                                               cls=JsonBytesEncoder
-                                                               )
-                            )
-                        )
-                        logger.warning(serializer.errors)
+                        ingestion_metrics.add_invalid(self.__class__.__name__, event_name, 'rollback')
+                        receiver_logger.invalid(self, decoded_event, 'rollback', serializer.errors, block_info)
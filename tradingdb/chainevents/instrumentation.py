@@ -0,0 +1,241 @@
+"""
+Instrumentation of the event receivers. When INGESTION_METRICS is enabled every decoded log saved or reverted by an
+event receiver is measured (wall time, database queries and database time) by receiver, event name and operation,
+and validation failures are counted. Logs saved in bulk by `save_batch` are measured together under the `*` event.
+
+Metrics are kept in the process and rendered in Prometheus text format. If INGESTION_METRICS_DIR is set every process
+writes its metrics to a `.prom` file in that directory (node exporter textfile collector) every few seconds, and the
+`ingestion_metrics` command merges them in a report. When disabled the receivers only check a flag.
+"""
+import atexit
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.db import connection
+
+# Seconds between writes of the metrics file of the process
+WRITE_INTERVAL: int = 10
+
+METRIC_PREFIX = 'tradingdb_receiver_'
+METRICS = OrderedDict([
+    ('events', ('events_total', 'Decoded logs processed by the event receivers')),
+    ('invalid_events', ('invalid_events_total', 'Decoded logs rejected by the serializers of the event receivers')),
+    ('seconds', ('seconds_total', 'Time processing decoded logs')),
+    ('queries', ('db_queries_total', 'Database queries processing decoded logs')),
+    ('query_seconds', ('db_seconds_total', 'Time of the database queries processing decoded logs')),
+])
+METRIC_LINE_REGEX = re.compile(r'^' + METRIC_PREFIX + r'(\w+)\{(.*)\} (\S+)$')
+LABEL_REGEX = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+MetricsKey = Tuple[str, str, str]  # (receiver, event name, operation)
+
+
+class ReceiverMetrics:
+    __slots__ = tuple(METRICS)
+
+    def __init__(self):
+        self.events = 0
+        self.invalid_events = 0
+        self.seconds = 0.
+        self.queries = 0
+        self.query_seconds = 0.
+
+    def add(self, other: 'ReceiverMetrics'):
+        for field in METRICS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+
+class NullMeasurement:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_MEASUREMENT = NullMeasurement()
+
+
+class Measurement:
+    """
+    Measures the time and the database queries of a block of code, it's an execute wrapper of the connection
+    """
+    def __init__(self, ingestion_metrics: 'IngestionMetrics', key: MetricsKey, events: int):
+        self.ingestion_metrics = ingestion_metrics
+        self.key = key
+        self.metrics = ReceiverMetrics()
+        self.metrics.events = events
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.metrics.queries += 1
+            self.metrics.query_seconds += time.perf_counter() - start
+
+    def __enter__(self):
+        self.ingestion_metrics.local.measuring = True
+        self.execute_wrapper = connection.execute_wrapper(self)
+        self.execute_wrapper.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.seconds = time.perf_counter() - self.start
+        self.execute_wrapper.__exit__(*exc_info)
+        self.ingestion_metrics.local.measuring = False
+        self.ingestion_metrics.record(self.key, self.metrics)
+        return False
+
+
+class IngestionMetrics:
+    def __init__(self, enabled: bool = False, metrics_dir: str = None):
+        self.enabled = enabled
+        self.metrics_dir = metrics_dir
+        self.metrics: Dict[MetricsKey, ReceiverMetrics] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.last_write = time.time()
+        self.exit_handler_registered = False
+
+    def measure(self, receiver_name: str, event_name: str, operation: str, events: int = 1):
+        """
+        :return: context manager measuring the code processing `events` decoded logs. Nested measurements are ignored,
+        the outer one measures the inner code
+        """
+        if not self.enabled or getattr(self.local, 'measuring', False):
+            return NULL_MEASUREMENT
+        return Measurement(self, (receiver_name, event_name or '', operation), events)
+
+    def add_invalid(self, receiver_name: str, event_name: str, operation: str):
+        if self.enabled:
+            metrics = ReceiverMetrics()
+            metrics.invalid_events = 1
+            self.record((receiver_name, event_name or '', operation), metrics)
+
+    def record(self, key: MetricsKey, metrics: ReceiverMetrics):
+        with self.lock:
+            self.metrics.setdefault(key, ReceiverMetrics()).add(metrics)
+        if self.metrics_dir and time.time() - self.last_write > WRITE_INTERVAL:
+            self.write()
+
+    def get_metrics(self) -> Dict[MetricsKey, ReceiverMetrics]:
+        with self.lock:
+            metrics = {}
+            for key, receiver_metrics in self.metrics.items():
+                metrics[key] = ReceiverMetrics()
+                metrics[key].add(receiver_metrics)
+            return metrics
+
+    def reset(self):
+        with self.lock:
+            self.metrics.clear()
+
+    def get_metrics_path(self) -> str:
+        return os.path.join(self.metrics_dir, 'ingestion_metrics_{}.prom'.format(os.getpid()))
+
+    def write(self):
+        """
+        Replaces the metrics file of the process, the textfile collector never reads a partially written file
+        """
+        self.last_write = time.time()
+        if not self.exit_handler_registered:
+            self.exit_handler_registered = True
+            atexit.register(self.write)
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.metrics_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(render_prometheus(self.get_metrics(), pid=os.getpid()))
+        os.replace(tmp_path, self.get_metrics_path())
+
+
+ingestion_metrics = IngestionMetrics(enabled=settings.INGESTION_METRICS, metrics_dir=settings.INGESTION_METRICS_DIR)
+
+
+def instrumented(operation: str):
+    """
+    Measures an event receiver method taking the decoded log as first argument
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(receiver, decoded_event, *args, **kwargs):
+            if not ingestion_metrics.enabled:
+                return method(receiver, decoded_event, *args, **kwargs)
+            with ingestion_metrics.measure(receiver.__class__.__name__, decoded_event.get('name'), operation):
+                return method(receiver, decoded_event, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(metrics: Dict[MetricsKey, ReceiverMetrics], pid: int = None) -> str:
+    lines = []
+    for field, (name, description) in METRICS.items():
+        lines.append('# HELP {}{} {}'.format(METRIC_PREFIX, name, description))
+        lines.append('# TYPE {}{} counter'.format(METRIC_PREFIX, name))
+        for (receiver_name, event_name, operation), receiver_metrics in sorted(metrics.items()):
+            labels = [('receiver', receiver_name), ('event', event_name), ('operation', operation)]
+            if pid is not None:
+                labels.insert(0, ('pid', str(pid)))
+            lines.append('{}{}{{{}}} {}'.format(METRIC_PREFIX, name,
+                                                ','.join('{}="{}"'.format(label, _escape_label(value))
+                                                         for label, value in labels),
+                                                getattr(receiver_metrics, field)))
+    return '\n'.join(lines) + '\n'
+
+
+def parse_prometheus(lines: Iterable[str]) -> Dict[MetricsKey, ReceiverMetrics]:
+    """
+    Parses the metrics rendered by `render_prometheus`, metrics of different processes are summed
+    """
+    fields = {name: field for field, (name, _) in METRICS.items()}
+    metrics = {}
+    for line in lines:
+        match = METRIC_LINE_REGEX.match(line.strip())
+        if not match or match.group(1) not in fields:
+            continue
+        labels = {label: re.sub(r'\\(.)', lambda m: '\n' if m.group(1) == 'n' else m.group(1), value)
+                  for label, value in LABEL_REGEX.findall(match.group(2))}
+        field = fields[match.group(1)]
+        receiver_metrics = metrics.setdefault((labels.get('receiver', ''), labels.get('event', ''),
+                                               labels.get('operation', '')), ReceiverMetrics())
+        value = float(match.group(3))
+        setattr(receiver_metrics, field, getattr(receiver_metrics, field) + (value if field.endswith('seconds')
+                                                                            else int(value)))
+    return metrics
+
+
+def read_metrics_dir(metrics_dir: str) -> Dict[MetricsKey, ReceiverMetrics]:
+    lines = []
+    for file_name in sorted(os.listdir(metrics_dir)):
+        if file_name.endswith('.prom'):
+            with open(os.path.join(metrics_dir, file_name)) as f:
+                lines.extend(f.readlines())
+    return parse_prometheus(lines)
+
+
+def get_report_lines(metrics: Dict[MetricsKey, ReceiverMetrics]) -> List[str]:
+    """
+    :return: table of the metrics, the receivers and events taking more time first
+    """
+    lines = ['{:40} {:32} {:10} {:>9} {:>8} {:>11} {:>9} {:>10} {:>11}'.format(
+        'receiver', 'event', 'operation', 'events', 'invalid', 'total ms', 'avg ms', 'queries/ev', 'db ms')]
+    for (receiver_name, event_name, operation), receiver_metrics in sorted(metrics.items(),
+                                                                           key=lambda item: -item[1].seconds):
+        events = receiver_metrics.events or 1
+        lines.append('{:40} {:32} {:10} {:>9} {:>8} {:>11.1f} {:>9.3f} {:>10.2f} {:>11.1f}'.format(
+            receiver_name, event_name, operation, receiver_metrics.events, receiver_metrics.invalid_events,
+            receiver_metrics.seconds * 1e3, receiver_metrics.seconds * 1e3 / events,
+            receiver_metrics.queries / events, receiver_metrics.query_seconds * 1e3))
+    return lines
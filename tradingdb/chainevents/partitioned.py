@@ -0,0 +1,275 @@
+"""
+Partitioned ingestion of the decoded logs of a block range. Logs of different markets don't change the same rows, so
+they are applied concurrently by a pool of workers, every one with its own database connection and transaction:
+
+    1. Barrier: logs of the factories (oracle, event and market creations) and of the receivers that are not
+       partitioned (tournament, identity managers) are saved first, serially, in one transaction.
+    2. Logs of oracles, events, markets and outcome tokens are partitioned by the oracle they depend on (oracle ->
+       events -> markets and outcome tokens), partitions are distributed between the workers and saved.
+    3. Tournament participants whose score changed are touched once, after the workers. Participants trade in markets
+       of different partitions, touching them from the workers would lock their rows until the end of every worker
+       transaction: workers would wait for each other, or deadlock. Workers save their touches in the touch table
+       instead, in their transaction (`defer_touches`), so they are kept if the process stops before this step: the
+       next scoreboard run applies them.
+
+Every partition is saved like `save_events_batch` saves the block range, logs grouped by event receiver and in emission
+order inside every receiver, so every market sees its logs in the same order as in batch mode and the result is the
+same. If a worker fails the saved logs are reverted (`rollback_events_batch`) and the error raised, the block range
+can be saved again. The block range must be the last one saved.
+
+With `record_logs` every log is also recorded in `PartitionedLog` by the transaction saving it, and the saved logs
+are not reverted on errors: the caller reverts the recorded logs (`revert_recorded_logs`), also if the process was
+killed between the transactions of a block range.
+"""
+import logging
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+
+from tradingdb.relationaldb.identity_map import identity_map
+from tradingdb.relationaldb.models import (Event, Market, OutcomeToken,
+                                           PartitionedLog)
+from tradingdb.relationaldb.scoreboard import (apply_deferred_touches,
+                                               collect_touches, defer_touches)
+
+from .batch import (ReceiverEvent, prefetch_event_descriptions,
+                    rollback_events_batch)
+from .event_receivers import (CentralizedOracleInstanceReceiver,
+                              EventInstanceReceiver, MarketInstanceReceiver,
+                              OutcomeTokenInstanceReceiver)
+
+logger = logging.getLogger(__name__)
+
+# Receivers partitioned, with the lookup of the oracle of the contract emitting the log. Other receivers are saved
+# before, with the factories
+PARTITION_LOOKUPS = {
+    CentralizedOracleInstanceReceiver: None,  # The oracle is the contract
+    EventInstanceReceiver: (Event, 'oracle_id'),
+    MarketInstanceReceiver: (Market, 'event__oracle_id'),
+    OutcomeTokenInstanceReceiver: (OutcomeToken, 'event__oracle_id'),
+}
+
+
+def get_partition_keys(receiver_events: Sequence[ReceiverEvent]) -> List[Hashable]:
+    """
+    :return: partition key of every log, the address of the oracle the contract depends on, or the address of the
+    contract if it doesn't exist (the serializer rejects the log). None for the logs saved before the partitions
+    """
+    addresses_by_receiver = defaultdict(set)
+    # Outcome tokens created in the same logs don't exist yet, they depend on the oracle of their event
+    created_outcome_tokens = {}
+    for receiver, decoded_event, _ in receiver_events:
+        if type(receiver) in PARTITION_LOOKUPS:
+            addresses_by_receiver[type(receiver)].add(decoded_event.get('address'))
+        if type(receiver) is EventInstanceReceiver and decoded_event.get('name') == 'OutcomeTokenCreation':
+            outcome_token = next((param.get('value') for param in decoded_event.get('params', ())
+                                  if param.get('name') == 'outcomeToken'), None)
+            created_outcome_tokens[outcome_token] = decoded_event.get('address')
+
+    oracles_by_address = {}
+    for receiver_class, addresses in addresses_by_receiver.items():
+        lookup = PARTITION_LOOKUPS[receiver_class]
+        if lookup is None:
+            oracles_by_address[receiver_class] = {address: address for address in addresses}
+        else:
+            model, oracle_field = lookup
+            oracles_by_address[receiver_class] = dict(model.objects.filter(address__in=addresses)
+                                                      .values_list('address', oracle_field))
+    event_oracles = oracles_by_address.get(EventInstanceReceiver, {})
+    for outcome_token, event in created_outcome_tokens.items():
+        if event in event_oracles:
+            oracles_by_address[OutcomeTokenInstanceReceiver].setdefault(outcome_token, event_oracles[event])
+
+    partition_keys = []
+    for receiver, decoded_event, _ in receiver_events:
+        if type(receiver) in PARTITION_LOOKUPS:
+            address = decoded_event.get('address')
+            partition_keys.append(oracles_by_address[type(receiver)].get(address, address))
+        else:
+            partition_keys.append(None)
+    return partition_keys
+
+
+def save_events_in_order(receiver_events: Sequence[ReceiverEvent]) -> List:
+    """
+    Saves the logs in emission order in one transaction, consecutive logs of the same receiver are saved together
+    with `save_batch`
+    :return: list of saved instances, None for the invalid logs
+    """
+    instances = []
+    with transaction.atomic(), identity_map():
+        start = 0
+        while start < len(receiver_events):
+            receiver = receiver_events[start][0]
+            end = start + 1
+            while end < len(receiver_events) and receiver_events[end][0] is receiver:
+                end += 1
+            instances.extend(receiver.save_batch([(decoded_event, block_info)
+                                                  for _, decoded_event, block_info in receiver_events[start:end]]))
+            start = end
+    return instances
+
+
+def save_events_by_receiver(receiver_events: Sequence[ReceiverEvent]) -> List:
+    """
+    Saves the logs in one transaction grouped by event receiver, keeping the order in which receivers first appear
+    and the emission order of the logs inside every receiver (same order as `save_events_batch`). Every receiver
+    saves its logs with one `save_batch`
+    :return: list of saved instances in the order of `receiver_events`, None for the invalid logs
+    """
+    indexes_by_receiver = OrderedDict()
+    for index, (receiver, _, _) in enumerate(receiver_events):
+        indexes_by_receiver.setdefault(receiver, []).append(index)
+
+    instances = [None] * len(receiver_events)
+    with transaction.atomic(), identity_map():
+        for receiver, indexes in indexes_by_receiver.items():
+            receiver_instances = receiver.save_batch([receiver_events[index][1:] for index in indexes])
+            for index, instance in zip(indexes, receiver_instances):
+                instances[index] = instance
+    return instances
+
+
+def _record_logs(receiver_events: Sequence[ReceiverEvent]):
+    """
+    Records the logs in `PartitionedLog`, must be called in the transaction saving them
+    """
+    PartitionedLog.objects.bulk_create([PartitionedLog(block_number=block_info['number'],
+                                                       log_index=decoded_event['log_index'])
+                                        for _, decoded_event, block_info in receiver_events])
+
+
+def get_last_recorded_block() -> Optional[int]:
+    """
+    :return: last block with recorded logs, None if no log is recorded
+    """
+    return PartitionedLog.objects.aggregate(block_number=Max('block_number'))['block_number']
+
+
+def clear_recorded_logs():
+    """
+    Deletes the records of the logs, must be called in the transaction finishing their block range
+    """
+    PartitionedLog.objects.all().delete()
+
+
+def revert_recorded_logs(block_number: int, receiver_events: Sequence[ReceiverEvent]) -> int:
+    """
+    Reverts the recorded logs (`rollback_events_batch`) and deletes every record in one transaction. The logs that
+    were not saved are not reverted, their changes don't exist
+    :param block_number: last block kept, the recorded logs are after it
+    :param receiver_events: logs of the blocks after `block_number`, saved or not
+    :return: number of logs reverted
+    """
+    with transaction.atomic():
+        recorded = set(PartitionedLog.objects.values_list('block_number', 'log_index'))
+        saved = sorted((receiver_event for receiver_event in receiver_events
+                        if (receiver_event[2]['number'], receiver_event[1].get('log_index')) in recorded),
+                       key=lambda receiver_event: (receiver_event[2]['number'], receiver_event[1]['log_index']))
+        if len(saved) != len(recorded):
+            raise ValueError('Only {} of the {} recorded logs were found'.format(len(saved), len(recorded)))
+        if saved:
+            rollback_events_batch(block_number, saved)
+        clear_recorded_logs()
+    return len(saved)
+
+
+def _save_partitions(partitions: List[List[ReceiverEvent]], record: bool) -> List[List]:
+    try:
+        with collect_touches() as touched, transaction.atomic():
+            instances = [save_events_by_receiver(receiver_events) for receiver_events in partitions]
+            if touched:
+                defer_touches(touched)
+            if record:
+                _record_logs([receiver_event for receiver_events in partitions for receiver_event in receiver_events])
+            return instances
+    finally:
+        # Worker threads are not reused, neither their connections
+        connection.close()
+
+
+def distribute_partitions(partitions: Dict[Hashable, List], n_workers: int) -> List[List[Hashable]]:
+    """
+    :return: partition keys of every worker, the biggest partitions are given first to the least loaded worker. The
+    distribution only depends on the partitions
+    """
+    workers = [[] for _ in range(min(n_workers, len(partitions)))]
+    loads = [0] * len(workers)
+    for key in sorted(partitions, key=lambda key: -len(partitions[key])):  # Stable sort, emission order on ties
+        worker = loads.index(min(loads))
+        workers[worker].append(key)
+        loads[worker] += len(partitions[key])
+    return workers
+
+
+def save_events_partitioned(receiver_events: Sequence[ReceiverEvent], max_workers: int = None,
+                            record_logs: bool = False) -> List:
+    """
+    Saves the logs of a block range, the logs of different oracles (and their events and markets) concurrently.
+    Cannot run inside a transaction, the workers must see the contracts created by the factories
+    :param receiver_events: list of (event receiver instance, decoded_event, block_info), sorted as they were emitted
+    :param max_workers: number of workers, INGESTION_WORKERS by default
+    :param record_logs: if set, the saved logs are recorded in `PartitionedLog` and not reverted on errors
+    :return: list of saved instances in the order of `receiver_events`, None for the invalid logs
+    """
+    if connection.in_atomic_block:
+        raise RuntimeError('Partitioned ingestion cannot run inside a transaction')
+
+    receiver_events = list(receiver_events)
+    if not receiver_events:
+        return []
+    prefetch_event_descriptions(receiver_events)
+
+    barrier_indexes = []
+    partitions = OrderedDict()  # partition key -> indexes of the logs
+    barrier_saved = False
+    try:
+        with transaction.atomic():
+            barrier_indexes = [index for index, (receiver, _, _) in enumerate(receiver_events)
+                               if type(receiver) not in PARTITION_LOOKUPS]
+            barrier_events = [receiver_events[index] for index in barrier_indexes]
+            instances = dict(zip(barrier_indexes, save_events_in_order(barrier_events)))
+            if record_logs:
+                _record_logs(barrier_events)
+        barrier_saved = True
+
+        # Contracts created by the factories exist now
+        for index, key in enumerate(get_partition_keys(receiver_events)):
+            if key is not None:
+                partitions.setdefault(key, []).append(index)
+    except Exception:
+        if barrier_saved and not record_logs:
+            _revert(receiver_events, barrier_indexes)
+        raise
+
+    workers = distribute_partitions(partitions, max_workers or settings.INGESTION_WORKERS)
+    with ThreadPoolExecutor(max_workers=max(len(workers), 1)) as executor:
+        futures = [executor.submit(_save_partitions, [[receiver_events[index] for index in partitions[key]]
+                                                      for key in keys], record_logs)
+                   for keys in workers]
+
+    saved_indexes = list(barrier_indexes)
+    error = None
+    for keys, future in zip(workers, futures):
+        if future.exception() is None:
+            for key, partition_instances in zip(keys, future.result()):
+                saved_indexes.extend(partitions[key])
+                instances.update(zip(partitions[key], partition_instances))
+        else:
+            logger.error('Cannot save partitions %s: %s', keys, future.exception())
+            error = error or future.exception()
+    if error is not None:
+        if not record_logs:
+            _revert(receiver_events, saved_indexes)
+        raise error
+    apply_deferred_touches()
+    return [instances.get(index) for index in range(len(receiver_events))]
+
+
+def _revert(receiver_events: List[ReceiverEvent], saved_indexes: List[int]):
+    first_block = min(block_info['number'] for _, _, block_info in receiver_events)
+    rollback_events_batch(first_block - 1, [receiver_events[index] for index in sorted(saved_indexes)])
@@ -0,0 +1,93 @@
+"""
+Logging of the decoded logs saved and reverted by the event receivers. Payloads are encoded as compact json only when
+the record is emitted (the level is enabled), and every record carries the receiver, event name, contract address and
+block number as `extra` attributes for structured handlers.
+
+High volume events (Transfer, OutcomeTokenPurchase...) can be sampled with EVENT_RECEIVER_LOG_SAMPLING, a dictionary
+of event name -> N: only the first of every N saved logs of that event is logged. Reverted and invalid logs are always
+logged.
+
+`StructuredFormatter` (LOG_FORMAT=structured) writes every record as a json line with those attributes.
+"""
+import itertools
+import logging
+from json import dumps
+from typing import Dict
+
+from django_eth_events.utils import JsonBytesEncoder
+
+EXTRA_FIELDS = ('receiver', 'event_name', 'event_address', 'block_number', 'operation', 'sample_rate')
+
+
+class EventPayload:
+    """
+    Decoded log encoded as json when it's formatted
+    """
+    __slots__ = ('decoded_event',)
+
+    def __init__(self, decoded_event: Dict):
+        self.decoded_event = decoded_event
+
+    def __str__(self):
+        return dumps(self.decoded_event, sort_keys=True, separators=(',', ':'), cls=JsonBytesEncoder)
+
+
+class ReceiverLogger:
+    def __init__(self, logger: logging.Logger, sampling: Dict[str, int] = None):
+        self.logger = logger
+        self.sampling = {event_name: int(rate) for event_name, rate in (sampling or {}).items() if int(rate) > 1}
+        self.counters = {event_name: itertools.count() for event_name in self.sampling}
+
+    def is_sampled(self, event_name: str) -> bool:
+        counter = self.counters.get(event_name)
+        # `next` on `itertools.count` is atomic, threads don't need a lock
+        return counter is None or next(counter) % self.sampling[event_name] == 0
+
+    def get_extra(self, receiver, decoded_event: Dict, block_info: Dict = None, operation: str = None) -> Dict:
+        return {
+            'receiver': receiver.__class__.__name__,
+            'event_name': decoded_event.get('name'),
+            'event_address': decoded_event.get('address'),
+            'block_number': block_info.get('number') if block_info else None,
+            'operation': operation,
+            'sample_rate': self.sampling.get(decoded_event.get('name'), 1) if operation == 'save' else 1,
+        }
+
+    def saved(self, receiver, decoded_event: Dict, block_info: Dict = None):
+        if self.logger.isEnabledFor(logging.INFO) and self.is_sampled(decoded_event.get('name')):
+            self.logger.info('Event Receiver %s added: %s', receiver.__class__.__name__, EventPayload(decoded_event),
+                             extra=self.get_extra(receiver, decoded_event, block_info, 'save'))
+
+    def reverted(self, receiver, decoded_event: Dict, block_info: Dict = None):
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info('Event Receiver %s reverted: %s', receiver.__class__.__name__,
+                             EventPayload(decoded_event),
+                             extra=self.get_extra(receiver, decoded_event, block_info, 'rollback'))
+
+    def invalid(self, receiver, decoded_event: Dict, operation: str, errors, block_info: Dict = None):
+        if self.logger.isEnabledFor(logging.WARNING):
+            extra = self.get_extra(receiver, decoded_event, block_info, operation)
+            self.logger.warning('INVALID Data for Event Receiver %s %s: %s', receiver.__class__.__name__, operation,
+                                EventPayload(decoded_event), extra=extra)
+            if errors is not None:
+                self.logger.warning(errors, extra=extra)
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats every record as a json object in one line, with the event receiver attributes if present
+    """
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.processName,
+            'message': record.getMessage(),
+        }
+        for field in EXTRA_FIELDS:
+            if hasattr(record, field):
+                data[field] = getattr(record, field)
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return dumps(data, cls=JsonBytesEncoder)
@@ -0,0 +1,388 @@
+"""
+Synthetic chain of decoded logs to benchmark the ingestion. The first block creates `markets` categorical markets
+(oracle, event, outcome tokens, market and funding) and issues outcome tokens to `traders` accounts, the next blocks
+have `logs_per_block` purchases, sales and transfers, and the last block sets the outcomes and redeems the winnings.
+
+Logs have the format of the logs decoded by the event listener and are paired with the receiver the listener would
+send them to. Addresses are deterministic and trades are drawn from a generator seeded with `seed`: the same
+arguments build the same chain. `SyntheticNode` serves the logs encoded with the contract abis, as a node would.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from django.conf import settings
+from django.utils import timezone
+from django_eth_events.utils import normalize_address_without_0x
+from eth_abi import encode_abi, encode_single
+from eth_utils import (event_abi_to_log_topic, to_bytes, to_checksum_address,
+                       to_normalized_address)
+
+from tradingdb.relationaldb.models import (CategoricalEventDescription,
+                                           CentralizedOracle, Event, Market,
+                                           Order, OutcomeToken,
+                                           OutcomeTokenBalance)
+
+from .abis import abi_file_path, load_json_file
+from .batch import ReceiverEvent, rollback_events_batch
+from .event_receivers import (CentralizedOracleFactoryReceiver,
+                              CentralizedOracleInstanceReceiver,
+                              EventFactoryReceiver, EventInstanceReceiver,
+                              MarketFactoryReceiver, MarketInstanceReceiver,
+                              OutcomeTokenInstanceReceiver)
+
+# Every kind of address is in its own range
+ADDRESS_KINDS = ('factory', 'creator', 'collateral_token', 'oracle', 'event', 'outcome_token', 'market', 'trader')
+
+BLOCK_TIME: int = 15
+OUTCOME_COUNT: int = 2
+ISSUED_AMOUNT: int = 10 ** 22
+
+# Contracts of every receiver, in the order of ETH_EVENTS: receiver, abi file, address getter (instances)
+CONTRACTS = (
+    ('oracle_factory', 'CentralizedOracleFactory.json', None),
+    ('event_factory', 'EventFactory.json', None),
+    ('market_factory', 'StandardMarketFactory.json', None),
+    ('market', 'StandardMarket.json', 'MarketAddressGetter'),
+    ('event', 'AbstractEvent.json', 'EventAddressGetter'),
+    ('outcome_token', 'OutcomeToken.json', 'OutcomeTokenGetter'),
+    ('oracle', 'CentralizedOracle.json', 'CentralizedOracleGetter'),
+)
+
+
+class SyntheticChain:
+    def __init__(self, markets: int = 10, traders: int = 50, blocks: int = 100, logs_per_block: int = 50,
+                 first_block: int = 1, seed: int = 0):
+        if blocks < 3:
+            raise ValueError('A synthetic chain needs at least 3 blocks')
+        if logs_per_block > markets * traders:
+            # Orders are found by market, sender and block on rollback, they must be unique
+            raise ValueError('Every block can have at most one trade by market and trader')
+        self.n_markets = markets
+        self.n_traders = traders
+        self.n_blocks = blocks
+        self.logs_per_block = logs_per_block
+        self.first_block = first_block
+        self.seed = seed
+        self.start_timestamp = int(time.time()) - blocks * BLOCK_TIME
+
+        self.receivers = {
+            'oracle_factory': CentralizedOracleFactoryReceiver(),
+            'event_factory': EventFactoryReceiver(),
+            'market_factory': MarketFactoryReceiver(),
+            'oracle': CentralizedOracleInstanceReceiver(),
+            'event': EventInstanceReceiver(),
+            'market': MarketInstanceReceiver(),
+            'outcome_token': OutcomeTokenInstanceReceiver(),
+        }
+        self.market_maker = normalize_address_without_0x(settings.LMSR_MARKET_MAKER.split(',')[0])
+
+    def get_address(self, kind: str, index: int = 0) -> str:
+        return '{:040x}'.format((ADDRESS_KINDS.index(kind) + 1) * 10 ** 12 + index)
+
+    def get_outcome_token_address(self, market: int, outcome: int) -> str:
+        return self.get_address('outcome_token', market * OUTCOME_COUNT + outcome)
+
+    def get_transaction_hash(self, block_info: Dict, log_index: int) -> str:
+        return '{:064x}'.format(block_info['number'] * 10 ** 6 + log_index)
+
+    def get_ipfs_hash(self, market: int) -> str:
+        return 'Qm{:044d}'.format(market)
+
+    def create_event_descriptions(self):
+        """
+        Saves the event descriptions of the markets, as if they were resolved ahead of the listener, so IPFS is not
+        needed to replay the chain
+        """
+        # Same dates in every replay, markets duplicate them
+        resolution_date = datetime.fromtimestamp(self.start_timestamp, timezone.utc) + timedelta(days=30)
+        for market in range(self.n_markets):
+            CategoricalEventDescription.objects.create(
+                ipfs_hash=self.get_ipfs_hash(market), title='Synthetic market {}'.format(market),
+                description='Synthetic market {}'.format(market), resolution_date=resolution_date,
+                outcomes=['Outcome {}'.format(outcome) for outcome in range(OUTCOME_COUNT)])
+
+    def revert(self):
+        """
+        Reverts every log of the chain saved in database and deletes the event descriptions
+        """
+        rollback_events_batch(self.first_block - 1, [receiver_event for receiver_events in self.get_blocks()
+                                                     for receiver_event in receiver_events])
+        CategoricalEventDescription.objects.filter(
+            ipfs_hash__in=[self.get_ipfs_hash(market) for market in range(self.n_markets)]
+        ).delete()
+
+    @staticmethod
+    def get_state():
+        """
+        :return: contents of the tables changed by the chain, without surrogate keys, to compare replays
+        """
+        contract_fields = ('address', 'factory', 'creator', 'creation_block', 'creation_date_time')
+        return (
+            list(CentralizedOracle.objects.order_by('address').values_list(*contract_fields, 'oracle_type', 'owner',
+                                                                           'old_owner',
+                                                                           'event_description__ipfs_hash',
+                                                                           'is_outcome_set', 'outcome')),
+            list(Event.objects.order_by('address').values_list(*contract_fields, 'event_type', 'oracle',
+                                                               'collateral_token', 'is_winning_outcome_set',
+                                                               'outcome', 'redeemed_winnings')),
+            list(Market.objects.order_by('address').values_list(*contract_fields, 'event', 'event_type',
+                                                                'resolution_date', 'market_maker', 'fee', 'stage',
+                                                                'funding', 'net_outcome_tokens_sold',
+                                                                'marginal_prices', 'revenue', 'collected_fees',
+                                                                'withdrawn_fees', 'trading_volume')),
+            list(Order.objects.order_by('transaction_hash').values_list('transaction_hash', 'order_type', 'market',
+                                                                        'sender', 'outcome_token',
+                                                                        'outcome_token_count',
+                                                                        'net_outcome_tokens_sold',
+                                                                        'marginal_prices', 'cost', 'profit')),
+            list(OutcomeToken.objects.order_by('address').values_list('address', 'event', 'index', 'total_supply')),
+            list(OutcomeTokenBalance.objects.order_by('owner', 'outcome_token').values_list('owner', 'outcome_token',
+                                                                                            'balance')),
+        )
+
+    def get_block_info(self, block_index: int) -> Dict:
+        return {
+            'number': self.first_block + block_index,
+            'timestamp': self.start_timestamp + block_index * BLOCK_TIME,
+        }
+
+    def get_creation_logs(self, block_info: Dict) -> List[ReceiverEvent]:
+        receivers = self.receivers
+        logs = []
+        for market in range(self.n_markets):
+            oracle_address = self.get_address('oracle', market)
+            event_address = self.get_address('event', market)
+            market_address = self.get_address('market', market)
+            logs.append((receivers['oracle_factory'], {
+                'name': 'CentralizedOracleCreation',
+                'address': self.get_address('factory', 0),
+                'params': [
+                    {'name': 'creator', 'value': self.get_address('creator')},
+                    {'name': 'centralizedOracle', 'value': oracle_address},
+                    {'name': 'ipfsHash', 'value': self.get_ipfs_hash(market).encode()},
+                ]
+            }, block_info))
+            logs.append((receivers['event_factory'], {
+                'name': 'CategoricalEventCreation',
+                'address': self.get_address('factory', 1),
+                'params': [
+                    {'name': 'creator', 'value': self.get_address('creator')},
+                    {'name': 'collateralToken', 'value': self.get_address('collateral_token')},
+                    {'name': 'oracle', 'value': oracle_address},
+                    {'name': 'outcomeCount', 'value': OUTCOME_COUNT},
+                    {'name': 'categoricalEvent', 'value': event_address},
+                ]
+            }, block_info))
+            for outcome in range(OUTCOME_COUNT):
+                logs.append((receivers['event'], {
+                    'name': 'OutcomeTokenCreation',
+                    'address': event_address,
+                    'params': [
+                        {'name': 'outcomeToken', 'value': self.get_outcome_token_address(market, outcome)},
+                        {'name': 'index', 'value': outcome},
+                    ]
+                }, block_info))
+            logs.append((receivers['market_factory'], {
+                'name': 'StandardMarketCreation',
+                'address': self.get_address('factory', 2),
+                'params': [
+                    {'name': 'creator', 'value': self.get_address('creator')},
+                    {'name': 'centralizedOracle', 'value': oracle_address},
+                    {'name': 'marketMaker', 'value': self.market_maker},
+                    {'name': 'fee', 'value': 0},
+                    {'name': 'market', 'value': market_address},
+                    {'name': 'eventContract', 'value': event_address},
+                ]
+            }, block_info))
+            logs.append((receivers['market'], {
+                'name': 'MarketFunding',
+                'address': market_address,
+                'params': [{'name': 'funding', 'value': 10 ** 20}]
+            }, block_info))
+            for trader in range(self.n_traders):
+                for outcome in range(OUTCOME_COUNT):
+                    logs.append((receivers['outcome_token'], {
+                        'name': 'Issuance',
+                        'address': self.get_outcome_token_address(market, outcome),
+                        'params': [
+                            {'name': 'owner', 'value': self.get_address('trader', trader)},
+                            {'name': 'amount', 'value': ISSUED_AMOUNT},
+                        ]
+                    }, block_info))
+        return logs
+
+    def get_trading_logs(self, rng: random.Random, block_info: Dict) -> List[ReceiverEvent]:
+        receivers = self.receivers
+        logs = []
+        for trade in rng.sample(range(self.n_markets * self.n_traders), self.logs_per_block):
+            market, trader = divmod(trade, self.n_traders)
+            market_address = self.get_address('market', market)
+            trader_address = self.get_address('trader', trader)
+            outcome = rng.randrange(OUTCOME_COUNT)
+            count = rng.randint(1, 100) * 10 ** 15
+            kind = rng.random()
+            if kind < 0.5:
+                logs.append((receivers['market'], {
+                    'name': 'OutcomeTokenPurchase',
+                    'address': market_address,
+                    'transaction_hash': self.get_transaction_hash(block_info, len(logs)),
+                    'params': [
+                        {'name': 'buyer', 'value': trader_address},
+                        {'name': 'outcomeTokenIndex', 'value': outcome},
+                        {'name': 'outcomeTokenCount', 'value': count},
+                        {'name': 'outcomeTokenCost', 'value': count // 2},
+                        {'name': 'marketFees', 'value': count // 200},
+                    ]
+                }, block_info))
+            elif kind < 0.7:
+                logs.append((receivers['market'], {
+                    'name': 'OutcomeTokenSale',
+                    'address': market_address,
+                    'transaction_hash': self.get_transaction_hash(block_info, len(logs)),
+                    'params': [
+                        {'name': 'seller', 'value': trader_address},
+                        {'name': 'outcomeTokenIndex', 'value': outcome},
+                        {'name': 'outcomeTokenCount', 'value': count // 4},
+                        {'name': 'outcomeTokenProfit', 'value': count // 10},
+                        {'name': 'marketFees', 'value': count // 1000},
+                    ]
+                }, block_info))
+            else:
+                logs.append((receivers['outcome_token'], {
+                    'name': 'Transfer',
+                    'address': self.get_outcome_token_address(market, outcome),
+                    'params': [
+                        {'name': 'from', 'value': trader_address},
+                        {'name': 'to', 'value': self.get_address('trader', rng.randrange(self.n_traders))},
+                        {'name': 'value', 'value': count // 100},
+                    ]
+                }, block_info))
+        return logs
+
+    def get_resolution_logs(self, rng: random.Random, block_info: Dict) -> List[ReceiverEvent]:
+        receivers = self.receivers
+        logs = []
+        for market in range(self.n_markets):
+            outcome = rng.randrange(OUTCOME_COUNT)
+            logs.append((receivers['oracle'], {
+                'name': 'OutcomeAssignment',
+                'address': self.get_address('oracle', market),
+                'params': [{'name': 'outcome', 'value': outcome}]
+            }, block_info))
+            logs.append((receivers['event'], {
+                'name': 'OutcomeAssignment',
+                'address': self.get_address('event', market),
+                'params': [{'name': 'outcome', 'value': outcome}]
+            }, block_info))
+            for trader in rng.sample(range(self.n_traders), min(self.n_traders, 5)):
+                logs.append((receivers['event'], {
+                    'name': 'WinningsRedemption',
+                    'address': self.get_address('event', market),
+                    'params': [
+                        {'name': 'receiver', 'value': self.get_address('trader', trader)},
+                        {'name': 'winnings', 'value': rng.randint(1, 100) * 10 ** 15},
+                    ]
+                }, block_info))
+        return logs
+
+    def get_eth_events(self) -> List[Dict]:
+        """
+        :return: ETH_EVENTS setting of the contracts of the chain
+        """
+        eth_events = []
+        factories = 0
+        for name, abi_file, addresses_getter in CONTRACTS:
+            contract = {
+                'EVENT_ABI': load_json_file(abi_file_path(abi_file)),
+                'EVENT_DATA_RECEIVER': '{}.{}'.format(self.receivers[name].__module__,
+                                                      self.receivers[name].__class__.__name__),
+                'NAME': name,
+            }
+            if addresses_getter is None:
+                contract['ADDRESSES'] = [self.get_address('factory', factories)]
+                factories += 1
+            else:
+                contract['ADDRESSES_GETTER'] = 'tradingdb.chainevents.address_getters.' + addresses_getter
+            eth_events.append(contract)
+        return eth_events
+
+    def get_blocks(self) -> List[List[ReceiverEvent]]:
+        """
+        :return: list with the logs of every block, sorted as they were emitted
+        """
+        rng = random.Random(self.seed)
+        blocks = [self.get_creation_logs(self.get_block_info(0))]
+        for block_index in range(1, self.n_blocks - 1):
+            blocks.append(self.get_trading_logs(rng, self.get_block_info(block_index)))
+        blocks.append(self.get_resolution_logs(rng, self.get_block_info(self.n_blocks - 1)))
+        # Decoded logs keep the index of the raw logs in their block, like the ones of the listener
+        for receiver_events in blocks:
+            for log_index, (_, decoded_event, _) in enumerate(receiver_events):
+                decoded_event['log_index'] = log_index
+        return blocks
+
+
+class SyntheticNode:
+    """
+    Stand-in of a node (`web3`) serving the raw logs of a synthetic chain: `eth.getLogs` filtered by block range,
+    addresses and topics, `eth.getBlock` and `eth.blockNumber`
+    """
+    def __init__(self, chain: SyntheticChain):
+        self.chain = chain
+        self.blocks = chain.get_blocks()
+        self.event_abis = {}  # (receiver, event name) -> event abi
+        for name, abi_file, _ in CONTRACTS:
+            for event_abi in load_json_file(abi_file_path(abi_file)):
+                if event_abi.get('type') == 'event':
+                    self.event_abis[(chain.receivers[name], event_abi['name'])] = event_abi
+        self.logs = [self.encode_log(receiver, decoded_event, block_info, log_index)
+                     for receiver_events in self.blocks
+                     for log_index, (receiver, decoded_event, block_info) in enumerate(receiver_events)]
+
+    @property
+    def eth(self):
+        return self
+
+    @property
+    def blockNumber(self) -> int:
+        return self.chain.first_block + len(self.blocks) - 1
+
+    @staticmethod
+    def encode_value(abi_type: str, value):
+        if abi_type == 'address':
+            return to_checksum_address(value)
+        return value
+
+    def encode_log(self, receiver, decoded_event: Dict, block_info: Dict, log_index: int) -> Dict:
+        event_abi = self.event_abis[(receiver, decoded_event['name'])]
+        values = {param['name']: param['value'] for param in decoded_event['params']}
+        indexed_inputs = [event_input for event_input in event_abi['inputs'] if event_input['indexed']]
+        data_inputs = [event_input for event_input in event_abi['inputs'] if not event_input['indexed']]
+        return {
+            'address': to_checksum_address(decoded_event['address']),
+            'topics': [event_abi_to_log_topic(event_abi)] + [
+                encode_single(event_input['type'], self.encode_value(event_input['type'],
+                                                                     values[event_input['name']]))
+                for event_input in indexed_inputs
+            ],
+            'data': '0x' + encode_abi([event_input['type'] for event_input in data_inputs],
+                                      [self.encode_value(event_input['type'], values[event_input['name']])
+                                       for event_input in data_inputs]).hex(),
+            'blockNumber': block_info['number'],
+            'logIndex': log_index,
+            'transactionHash': to_bytes(hexstr=decoded_event.get('transaction_hash') or
+                                        self.chain.get_transaction_hash(block_info, log_index)),
+        }
+
+    def getBlock(self, block_number: int) -> Dict:
+        block_info = self.chain.get_block_info(block_number - self.chain.first_block)
+        return {**block_info, 'hash': '0x{:064x}'.format(block_number)}
+
+    def getLogs(self, filter_params: Dict) -> List[Dict]:
+        addresses = {to_normalized_address(address) for address in filter_params['address']}
+        topics = {to_bytes(hexstr=topic) for topic in filter_params['topics'][0]}
+        return [log for log in self.logs
+                if filter_params['fromBlock'] <= log['blockNumber'] <= filter_params['toBlock'] and
+                to_normalized_address(log['address']) in addresses and log['topics'][0] in topics]
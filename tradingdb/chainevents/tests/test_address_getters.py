@@ -1,11 +1,22 @@
+from django.db import connection
 from django.test import TestCase
 
-from tradingdb.relationaldb.tests.factories import EventFactory, MarketFactory
+from tradingdb.chainevents.address_index import invalidate_address_indexes
+from tradingdb.relationaldb.models import Market
+from tradingdb.relationaldb.tests.factories import (CategoricalEventFactory,
+                                                    EventFactory,
+                                                    MarketFactory,
+                                                    OutcomeTokenFactory)
 
-from ..address_getters import EventAddressGetter, MarketAddressGetter
+from ..address_getters import (EventAddressGetter, MarketAddressGetter,
+                               OutcomeTokenGetter)
 
 
 class TestAddressGetters(TestCase):
+    def setUp(self):
+        # Indexes are process wide, test database is rolled back without sending signals
+        invalidate_address_indexes()
+
     def test_market_address_getter(self):
         getter = MarketAddressGetter()
         self.assertListEqual([], getter.get_addresses())
@@ -25,3 +36,50 @@ class TestAddressGetters(TestCase):
         self.assertListEqual([event.address], getter.get_addresses())
         event2 = EventFactory.create()
         self.assertListEqual([event.address, event2.address], getter.get_addresses())
+
+    def test_outcome_token_getter(self):
+        getter = OutcomeTokenGetter()
+        self.assertListEqual([], getter.get_addresses())
+        outcome_token = OutcomeTokenFactory.create()
+        self.assertTrue(getter.__contains__(outcome_token.address))
+        self.assertListEqual([outcome_token.address], getter.get_addresses())
+
+    def test_address_getter_queries(self):
+        getter = MarketAddressGetter()
+        market = MarketFactory.create()
+        self.assertListEqual([market.address], getter.get_addresses())
+        # Membership is answered from memory once loaded
+        with self.assertNumQueries(0):
+            self.assertTrue(getter.__contains__(market.address))
+            self.assertFalse(getter.__contains__(market.event.address))
+        # Only recent contracts are queried
+        with self.assertNumQueries(1):
+            self.assertListEqual([market.address], getter.get_addresses())
+
+    def test_address_getter_subclasses(self):
+        getter = EventAddressGetter()
+        self.assertListEqual([], getter.get_addresses())
+        # Saved subclasses send their own signals, they are added to the index of the parent model
+        event = CategoricalEventFactory.create()
+        with self.assertNumQueries(0):
+            self.assertTrue(getter.__contains__(event.address))
+
+    def test_address_getter_delete(self):
+        getter = MarketAddressGetter()
+        market = MarketFactory.create()
+        market2 = MarketFactory.create()
+        self.assertListEqual([market.address, market2.address], getter.get_addresses())
+        market.delete()
+        self.assertFalse(getter.__contains__(market.address))
+        self.assertListEqual([market2.address], getter.get_addresses())
+
+    def test_address_getter_refresh(self):
+        getter = MarketAddressGetter()
+        market = MarketFactory.create()
+        self.assertListEqual([market.address], getter.get_addresses())
+        # Changes done by other processes don't send signals to this one, they are found on refresh
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE address = %s'.format(Market._meta.db_table), [market.address])
+        self.assertTrue(getter.__contains__(market.address))
+        self.assertListEqual([], getter.get_addresses())
+        self.assertFalse(getter.__contains__(market.address))
@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+from time import mktime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ipfs.ipfs import Ipfs
+from tradingdb.ipfs.fetcher import IpfsFetcher
+from tradingdb.ipfs.tests.stub import IpfsStubServer
+from tradingdb.relationaldb.models import (BuyOrder, CentralizedOracle,
+                                           Event, Market, OutcomeToken,
+                                           OutcomeTokenBalance, SellOrder)
+from tradingdb.relationaldb.tests.factories import (CategoricalEventFactory,
+                                                    CentralizedOracleFactory,
+                                                    MarketFactory,
+                                                    OutcomeTokenBalanceFactory,
+                                                    OutcomeTokenFactory,
+                                                    generate_eth_account,
+                                                    generate_transaction_hash)
+
+from ..batch import rollback_events_batch, save_events_batch
+from ..event_receivers import (CentralizedOracleFactoryReceiver,
+                               MarketInstanceReceiver,
+                               OutcomeTokenInstanceReceiver)
+
+
+class TestBatch(TestCase):
+
+    def to_timestamp(self, datetime_instance):
+        return mktime(datetime_instance.timetuple())
+
+    def create_market(self):
+        categorical_event = CategoricalEventFactory()
+        OutcomeTokenFactory(event=categorical_event, index=0)
+        OutcomeTokenFactory(event=categorical_event, index=1)
+        return MarketFactory(event=categorical_event, funding=1e18, net_outcome_tokens_sold=[0, 0])
+
+    def get_trade_events(self, market_address, sender_address, purchases=20):
+        return [
+            {
+                'name': 'OutcomeTokenPurchase',
+                'address': market_address,
+                'transaction_hash': generate_transaction_hash(),
+                'params': [
+                    {'name': 'outcomeTokenCost', 'value': 100},
+                    {'name': 'marketFees', 'value': 10},
+                    {'name': 'buyer', 'value': sender_address},
+                    {'name': 'outcomeTokenIndex', 'value': index % 2},
+                    {'name': 'outcomeTokenCount', 'value': 1000000000000000000},
+                ]
+            } for index in range(0, purchases)
+        ] + [
+            {
+                'name': 'OutcomeTokenSale',
+                'address': market_address,
+                'transaction_hash': generate_transaction_hash(),
+                'params': [
+                    {'name': 'outcomeTokenProfit', 'value': 100},
+                    {'name': 'marketFees', 'value': 10},
+                    {'name': 'seller', 'value': sender_address},
+                    {'name': 'outcomeTokenIndex', 'value': 0},
+                    {'name': 'outcomeTokenCount', 'value': 500000000000000000},
+                ]
+            }
+        ]
+
+    def test_save_batch_trades(self):
+        block = {
+            'number': 1,
+            'timestamp': self.to_timestamp(timezone.now())
+        }
+        sender_address = generate_eth_account(only_address=True)
+        serial_market = self.create_market()
+        batch_market = self.create_market()
+        serial_events = self.get_trade_events(serial_market.address, sender_address)
+        batch_events = self.get_trade_events(batch_market.address, sender_address)
+
+        for event in serial_events:
+            MarketInstanceReceiver().save(event, block)
+
+        with CaptureQueriesContext(connection) as context:
+            instances = MarketInstanceReceiver().save_batch([(event, block) for event in batch_events])
+        self.assertEqual(len(instances), len(batch_events))
+        self.assertTrue(all(instance.pk for instance in instances))
+
+        # The queries don't depend on the number of trades
+        double_market = self.create_market()
+        double_events = self.get_trade_events(double_market.address, sender_address, purchases=40)
+        with CaptureQueriesContext(connection) as double_context:
+            MarketInstanceReceiver().save_batch([(event, block) for event in double_events])
+        self.assertEqual(len(double_context.captured_queries), len(context.captured_queries))
+
+        serial_market = Market.objects.get(address=serial_market.address)
+        batch_market = Market.objects.get(address=batch_market.address)
+        self.assertListEqual(serial_market.net_outcome_tokens_sold, batch_market.net_outcome_tokens_sold)
+        self.assertListEqual(serial_market.marginal_prices, batch_market.marginal_prices)
+        self.assertEqual(serial_market.collected_fees, batch_market.collected_fees)
+        self.assertEqual(serial_market.trading_volume, batch_market.trading_volume)
+
+        self.assertEqual(BuyOrder.objects.filter(market=batch_market).count(), 20)
+        self.assertEqual(SellOrder.objects.filter(market=batch_market).count(), 1)
+        serial_orders = BuyOrder.objects.filter(market=serial_market).order_by('id')
+        batch_orders = BuyOrder.objects.filter(market=batch_market).order_by('id')
+        for serial_order, batch_order in zip(serial_orders, batch_orders):
+            self.assertListEqual(serial_order.net_outcome_tokens_sold, batch_order.net_outcome_tokens_sold)
+            self.assertListEqual(serial_order.marginal_prices, batch_order.marginal_prices)
+            self.assertEqual(serial_order.cost, batch_order.cost)
+            self.assertEqual(serial_order.outcome_token.index, batch_order.outcome_token.index)
+
+    def test_save_batch_outcome_token_events(self):
+        outcome_token_balance = OutcomeTokenBalanceFactory(balance=100)
+        outcome_token = outcome_token_balance.outcome_token
+        owner = outcome_token_balance.owner
+        receiver_address = generate_eth_account(only_address=True)
+        block = {
+            'number': 1,
+            'timestamp': self.to_timestamp(timezone.now())
+        }
+
+        issuance_event = {
+            'name': 'Issuance',
+            'address': outcome_token.address,
+            'params': [
+                {'name': 'owner', 'value': owner},
+                {'name': 'amount', 'value': 50},
+            ]
+        }
+        transfer_events = [
+            {
+                'name': 'Transfer',
+                'address': outcome_token.address,
+                'params': [
+                    {'name': 'from', 'value': owner},
+                    {'name': 'to', 'value': receiver_address},
+                    {'name': 'value', 'value': 20},
+                ]
+            } for _ in range(0, 3)
+        ]
+        revocation_event = {
+            'name': 'Revocation',
+            'address': outcome_token.address,
+            'params': [
+                {'name': 'owner', 'value': receiver_address},
+                {'name': 'amount', 'value': 10},
+            ]
+        }
+
+        # Revocation is not batched, it must see the previous transfers
+        events = [issuance_event] + transfer_events + [revocation_event]
+        instances = OutcomeTokenInstanceReceiver().save_batch([(event, block) for event in events])
+        self.assertEqual(len(instances), len(events))
+        self.assertTrue(all(instances))
+
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=owner, outcome_token=outcome_token).balance,
+                         100 + 50 - 60)
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=receiver_address,
+                                                         outcome_token=outcome_token).balance, 60 - 10)
+        self.assertEqual(OutcomeToken.objects.get(address=outcome_token.address).total_supply,
+                         outcome_token.total_supply + 50 - 10)
+
+    def test_save_events_batch(self):
+        block = {
+            'number': 1,
+            'timestamp': self.to_timestamp(timezone.now())
+        }
+        market = self.create_market()
+        outcome_token_balance = OutcomeTokenBalanceFactory(balance=100)
+        sender_address = generate_eth_account(only_address=True)
+        market_receiver = MarketInstanceReceiver()
+        outcome_token_receiver = OutcomeTokenInstanceReceiver()
+
+        invalid_transfer_event = {
+            'name': 'Transfer',
+            'address': outcome_token_balance.outcome_token.address,
+            'params': [
+                {'name': 'from', 'value': outcome_token_balance.owner},
+                {'name': 'to', 'value': sender_address},
+                {'name': 'value', 'value': -1},
+            ]
+        }
+        receiver_events = [(market_receiver, event, block)
+                           for event in self.get_trade_events(market.address, sender_address)]
+        receiver_events.insert(2, (outcome_token_receiver, invalid_transfer_event, block))
+
+        instances = save_events_batch(receiver_events)
+        self.assertEqual(len(instances), len(receiver_events))
+        # Invalid events are skipped, grouped by receiver
+        self.assertIsNone(instances[-1])
+        self.assertEqual(BuyOrder.objects.filter(market=market).count(), 20)
+        self.assertEqual(OutcomeTokenBalance.objects.get(pk=outcome_token_balance.pk).balance, 100)
+
+    def test_save_events_batch_prefetches_event_descriptions(self):
+        block = {
+            'number': 1,
+            'timestamp': self.to_timestamp(timezone.now())
+        }
+        descriptions = {
+            'Qm{:044d}'.format(i): {
+                'title': 'Event {}'.format(i),
+                'description': 'Description {}'.format(i),
+                'resolutionDate': timezone.now().isoformat(),
+                'outcomes': ['Yes', 'No'],
+            } for i in range(3)
+        }
+        receiver = CentralizedOracleFactoryReceiver()
+        oracle_events = [(receiver, {
+            'name': 'CentralizedOracleCreation',
+            'address': generate_eth_account(only_address=True),
+            'params': [
+                {'name': 'creator', 'value': generate_eth_account(only_address=True)},
+                {'name': 'centralizedOracle', 'value': generate_eth_account(only_address=True)},
+                {'name': 'ipfsHash', 'value': ipfs_hash.encode()},
+            ]
+        }, block) for ipfs_hash in descriptions]
+
+        delay = 0.2
+        ipfs = Ipfs()
+        fetcher = ipfs.fetcher
+        with IpfsStubServer(descriptions, delay=delay) as server:
+            try:
+                ipfs.fetcher = IpfsFetcher(server.host, server.port, timeout=5, max_workers=4)
+                save_events_batch(oracle_events)
+            finally:
+                ipfs.fetcher = fetcher
+        self.assertEqual(sorted(server.requests), sorted(descriptions))
+        # Fetched in parallel before the serializers run
+        self.assertEqual(server.max_running, len(descriptions))
+        self.assertEqual(CentralizedOracle.objects.filter(event_description__ipfs_hash__in=descriptions).count(),
+                         len(descriptions))
+
+    def get_rollback_state(self, market, outcome_token):
+        market = Market.objects.get(address=market.address)
+        return {
+            'net_outcome_tokens_sold': market.net_outcome_tokens_sold,
+            'marginal_prices': market.marginal_prices,
+            'collected_fees': market.collected_fees,
+            'trading_volume': market.trading_volume,
+            'withdrawn_fees': market.withdrawn_fees,
+            'orders': list(BuyOrder.objects.filter(market=market).values_list('id', flat=True)),
+            'total_supply': OutcomeToken.objects.get(address=outcome_token.address).total_supply,
+            'balances': list(OutcomeTokenBalance.objects.filter(outcome_token=outcome_token).order_by(
+                'owner').values_list('owner', 'balance')),
+        }
+
+    def get_reverted_events(self, market, outcome_token, owner, block, transfers=20):
+        """
+        :return: fee withdrawal, issuance and transfers of the owner to save and revert in a block
+        """
+        market_receiver = MarketInstanceReceiver()
+        outcome_token_receiver = OutcomeTokenInstanceReceiver()
+        receiver_address = generate_eth_account(only_address=True)
+        receiver_events = [(market_receiver, {
+            'name': 'FeeWithdrawal',
+            'address': market.address,
+            'params': [{'name': 'fees', 'value': 10}]
+        }, block), (outcome_token_receiver, {
+            'name': 'Issuance',
+            'address': outcome_token.address,
+            'params': [{'name': 'owner', 'value': owner}, {'name': 'amount', 'value': 50}]
+        }, block)]
+        receiver_events.extend((outcome_token_receiver, {
+            'name': 'Transfer',
+            'address': outcome_token.address,
+            'params': [{'name': 'from', 'value': owner}, {'name': 'to', 'value': receiver_address},
+                       {'name': 'value', 'value': 5}]
+        }, block) for _ in range(0, transfers))
+        return receiver_events
+
+    def test_rollback_events_batch(self):
+        block_number = 10 ** 6
+        blocks = [{'number': block_number + index, 'timestamp': self.to_timestamp(timezone.now())}
+                  for index in range(0, 3)]
+        market = self.create_market()
+        outcome_token_balance = OutcomeTokenBalanceFactory(balance=100)
+        outcome_token = outcome_token_balance.outcome_token
+        owner = outcome_token_balance.owner
+        sender_address = generate_eth_account(only_address=True)
+        market_receiver = MarketInstanceReceiver()
+
+        # Kept block
+        trade_events = self.get_trade_events(market.address, sender_address)
+        save_events_batch([(market_receiver, trade_events[0], blocks[0])])
+        state = self.get_rollback_state(market, outcome_token)
+
+        # Reverted blocks
+        receiver_events = [(market_receiver, event, blocks[1]) for event in trade_events[1:]]
+        receiver_events.extend(self.get_reverted_events(market, outcome_token, owner, blocks[2]))
+        self.assertTrue(all(save_events_batch(receiver_events)))
+        oracle = CentralizedOracleFactory(creation_block=blocks[1]['number'])
+        event = CategoricalEventFactory(oracle=oracle, creation_block=blocks[1]['number'])
+        new_market = MarketFactory(event=event, creation_block=blocks[2]['number'])
+        self.assertNotEqual(self.get_rollback_state(market, outcome_token), state)
+
+        rollback_events_batch(block_number, receiver_events)
+
+        self.assertEqual(self.get_rollback_state(market, outcome_token), state)
+        self.assertFalse(Market.objects.filter(address=new_market.address).exists())
+        self.assertFalse(Event.objects.filter(address=event.address).exists())
+        self.assertFalse(CentralizedOracle.objects.filter(address=oracle.address).exists())
+        self.assertFalse(SellOrder.objects.filter(market=market).exists())
+
+    def test_rollback_events_batch_queries(self):
+        """
+        The queries of a rollback don't depend on the number of trades and transfers
+        """
+        block = {'number': 10 ** 6 + 1, 'timestamp': self.to_timestamp(timezone.now())}
+        sender_address = generate_eth_account(only_address=True)
+        market_receiver = MarketInstanceReceiver()
+        queries = []
+        for count in (10, 20):
+            market = self.create_market()
+            outcome_token_balance = OutcomeTokenBalanceFactory(balance=200)
+            receiver_events = [(market_receiver, event, block)
+                               for event in self.get_trade_events(market.address, sender_address, purchases=count)]
+            receiver_events.extend(self.get_reverted_events(market, outcome_token_balance.outcome_token,
+                                                            outcome_token_balance.owner, block, transfers=count))
+            self.assertTrue(all(save_events_batch(receiver_events)))
+            with CaptureQueriesContext(connection) as context:
+                rollback_events_batch(block['number'] - 1, receiver_events)
+            queries.append(len(context.captured_queries))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_rollback_events_batch_market_funding(self):
+        block_number = 10 ** 6
+        blocks = [{'number': block_number + index, 'timestamp': self.to_timestamp(timezone.now())}
+                  for index in range(1, 5)]
+        market_receiver = MarketInstanceReceiver()
+        sender_address = generate_eth_account(only_address=True)
+
+        def get_market_state(market):
+            market.refresh_from_db()
+            return market.funding, market.stage, market.net_outcome_tokens_sold, market.marginal_prices
+
+        # The orders are reverted with the funding of their markets, before the funding is reverted
+        rolled_back_states = []
+        for rollback_one_by_one in (False, True):
+            market = self.create_market()
+            market.funding = None
+            market.save()
+            state = get_market_state(market)
+            receiver_events = [(market_receiver, {
+                'name': 'MarketFunding',
+                'address': market.address,
+                'params': [{'name': 'funding', 'value': 10 ** 18}]
+            }, blocks[0])]
+            receiver_events.extend((market_receiver, event, block) for event, block in zip(
+                self.get_trade_events(market.address, sender_address)[:3], blocks[1:]))
+            self.assertTrue(all(save_events_batch(receiver_events)))
+            self.assertNotEqual(get_market_state(market), state)
+
+            if rollback_one_by_one:
+                for receiver, event, block_info in reversed(receiver_events):
+                    receiver.rollback(event, block_info)
+            else:
+                rollback_events_batch(block_number, receiver_events)
+            self.assertEqual(get_market_state(market), state)
+            rolled_back_states.append(state)
+        self.assertEqual(rolled_back_states[0], rolled_back_states[1])
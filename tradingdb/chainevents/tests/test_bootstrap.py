@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+from decimal import Decimal
+
+from django.db import transaction
+from django.test import TestCase
+
+from tradingdb.relationaldb.batch import CopyIngestionBatch
+from tradingdb.relationaldb.copy_load import format_copy_value
+from tradingdb.relationaldb.event_decoders import EVENT_DECODERS
+from tradingdb.relationaldb.models import (OutcomeTokenBalance,
+                                           OutcomeTokenBalanceDelta)
+from tradingdb.relationaldb.serializers import (ADDRESS_LENGTH,
+                                                TRANSACTION_LENGTH,
+                                                BalanceDeltaSerializer,
+                                                CategoricalEventSerializer,
+                                                OutcomeTokenInstanceSerializer,
+                                                ScalarEventSerializer)
+
+from ..bootstrap import BootstrapLoader, LogDecoder
+from ..synthetic_chain import SyntheticChain, SyntheticNode
+
+
+class TestBootstrap(TestCase):
+
+    def setUp(self):
+        self.chain = SyntheticChain(markets=3, traders=4, blocks=6, logs_per_block=8, first_block=100)
+        self.node = SyntheticNode(self.chain)
+
+    def test_log_decoder(self):
+        receiver, decoded_event, block_info = self.chain.get_blocks()[0][0]
+        decoder = LogDecoder(self.chain.get_eth_events()[0]['EVENT_ABI'])
+        decoded_log = decoder.decode(self.node.logs[0])
+        self.assertEqual(decoded_log['name'], decoded_event['name'])
+        self.assertEqual(decoded_log['address'], decoded_event['address'])
+        self.assertEqual(decoded_log['params'], decoded_event['params'])
+        self.assertEqual(decoded_log['log_index'], 0)
+        self.assertEqual(decoded_log['transaction_hash'], self.chain.get_transaction_hash(block_info, 0))
+
+        # Events not in the abi are skipped
+        self.assertIsNone(decoder.decode({**self.node.logs[0], 'topics': [b'\x00' * 32]}))
+
+    def test_format_copy_value(self):
+        self.assertEqual(format_copy_value(None), '\\N')
+        self.assertEqual(format_copy_value(True), 't')
+        self.assertEqual(format_copy_value('a\tb\\c\n'), 'a\\tb\\\\c\\n')
+        self.assertEqual(format_copy_value([Decimal(1), None, Decimal('0.5000')]), '{1,NULL,0.5000}')
+        self.assertEqual(format_copy_value(['a"b']), '{"a\\\\"b"}')
+
+    def test_bootstrap_loader(self):
+        self.chain.create_event_descriptions()
+        with transaction.atomic():
+            for receiver_events in self.chain.get_blocks():
+                for receiver, decoded_event, block_info in receiver_events:
+                    self.assertIsNotNone(receiver.save(decoded_event, block_info))
+            serial_state = self.chain.get_state()
+            transaction.set_rollback(True)
+        self.assertEqual(OutcomeTokenBalance.objects.count(), 0)
+
+        chunks = []
+        loader = BootstrapLoader(self.node, eth_events=self.chain.get_eth_events(), chunk_blocks=4)
+        processed = loader.load(100, self.node.eth.blockNumber, callback=lambda *chunk: chunks.append(chunk))
+        self.assertEqual(processed, len(self.node.logs))
+        self.assertEqual(loader.invalid_logs, 0)
+        self.assertEqual([chunk[:2] for chunk in chunks], [(100, 103), (104, 105)])
+        self.assertEqual(self.chain.get_state(), serial_state)
+
+        # Balance journal deltas were loaded with their block and log index
+        self.assertEqual(OutcomeTokenBalanceDelta.objects.filter(log_index=None).count(), 0)
+        self.assertEqual(OutcomeTokenBalanceDelta.objects.filter(block_number=100).count(),
+                         self.chain.n_markets * self.chain.n_traders * 2)
+
+    def test_copy_batch_validation(self):
+        self.chain.create_event_descriptions()
+        validated = 0
+        for receiver_events in self.chain.get_blocks():
+            for receiver, decoded_event, block_info in receiver_events:
+                serializer_class = receiver.Meta.events[decoded_event['name']]
+                if serializer_class in EVENT_DECODERS:
+                    # Same validated data as the serializer, with the same instances of the referenced models
+                    serializer = serializer_class(data=decoded_event, block=block_info)
+                    self.assertTrue(serializer.is_valid())
+                    batch = CopyIngestionBatch()
+                    [(validated_data, errors)] = batch.validate_events([(serializer_class, decoded_event, block_info)])
+                    self.assertIsNone(errors)
+                    self.assertEqual(validated_data, dict(serializer.validated_data))
+                    validated += 1
+                self.assertIsNotNone(receiver.save(decoded_event, block_info))
+        # Every log but the fundings, outcome assignments and redemptions
+        self.assertEqual(validated, len(self.node.logs) - self.chain.n_markets * (3 + min(self.chain.n_traders, 5)))
+
+    def get_invalid_events(self, serializer_class, decoded_event, block_info):
+        """
+        :return: list of (decoded_event, block_info) with one invalid value each, or rejected by the references
+        """
+        def with_params(**params):
+            return {**decoded_event, 'params': [{'name': name, 'value': value} for name, value in params.items()
+                                                if value is not None]}
+
+        params = {param['name']: param['value'] for param in decoded_event['params']}
+        unknown_address = '0' * ADDRESS_LENGTH
+        invalid_events = []
+        for name in params:
+            # The serializer of transfers can't be built without `from`, and IPFS is not queried
+            if name != 'from':
+                invalid_events.append(with_params(**{**params, name: None}))
+            if name != 'ipfsHash':
+                invalid_events.append(with_params(**{**params, name: 'a' * (ADDRESS_LENGTH + 1)}))
+        invalid_events.append({**decoded_event, 'transaction_hash': 'a' * (TRANSACTION_LENGTH + 1)})
+        if 'oracle' in params:
+            invalid_events.append(with_params(**{**params, 'oracle': unknown_address}))
+        if 'outcomeCount' in params:
+            invalid_events.append(with_params(**{**params, 'outcomeCount': params['outcomeCount'] + 1}))
+        if 'eventContract' in params:
+            invalid_events.append(with_params(**{**params, 'eventContract': unknown_address}))
+        if 'marketMaker' in params:
+            invalid_events.append(with_params(**{**params, 'marketMaker': '1' * ADDRESS_LENGTH}))
+        if serializer_class is OutcomeTokenInstanceSerializer:
+            invalid_events.append({**decoded_event, 'address': unknown_address})
+        results = [(invalid_event, block_info) for invalid_event in invalid_events]
+
+        # Timestamped serializers can't be built without block, balance changes require the block number
+        if issubclass(serializer_class, BalanceDeltaSerializer):
+            results.extend([(decoded_event, None), ({**decoded_event, 'log_index': -1}, block_info)])
+        return results
+
+    def get_scalar_event(self, categorical_event):
+        """
+        :return: scalar event of the oracle of a categorical event, its event description is categorical
+        """
+        params = {param['name']: param['value'] for param in categorical_event['params']}
+        return {**categorical_event, 'name': 'ScalarEventCreation', 'params': [
+            {'name': 'creator', 'value': params['creator']},
+            {'name': 'collateralToken', 'value': params['collateralToken']},
+            {'name': 'oracle', 'value': params['oracle']},
+            {'name': 'lowerBound', 'value': 0},
+            {'name': 'upperBound', 'value': 100},
+            {'name': 'scalarEvent', 'value': '5' * ADDRESS_LENGTH},
+        ]}
+
+    def get_messages(self, errors):
+        return {field: [str(error) for error in field_errors] for field, field_errors in errors.items()}
+
+    def test_copy_batch_invalid_events(self):
+        """
+        The decoders of the bootstrap batch return the same errors as the serializers
+        """
+        self.chain.create_event_descriptions()
+        checked = set()
+        for receiver_events in self.chain.get_blocks():
+            for receiver, decoded_event, block_info in receiver_events:
+                serializer_class = receiver.Meta.events[decoded_event['name']]
+                events = []
+                if serializer_class in EVENT_DECODERS and serializer_class not in checked:
+                    events = [(serializer_class, decoded_event, block_info)]
+                    if serializer_class is CategoricalEventSerializer:
+                        events.append((ScalarEventSerializer, self.get_scalar_event(decoded_event), block_info))
+                for serializer_class, valid_event, valid_block_info in events:
+                    checked.add(serializer_class)
+                    for invalid_event, invalid_block_info in self.get_invalid_events(serializer_class, valid_event,
+                                                                                     valid_block_info):
+                        if invalid_block_info:
+                            serializer = serializer_class(data=invalid_event, block=invalid_block_info)
+                        else:
+                            serializer = serializer_class(data=invalid_event)
+                        [(validated_data, errors)] = CopyIngestionBatch().validate_events([
+                            (serializer_class, invalid_event, invalid_block_info)])
+                        if serializer.is_valid():
+                            self.assertIsNone(errors, invalid_event)
+                            self.assertEqual(validated_data, dict(serializer.validated_data))
+                        else:
+                            self.assertIsNone(validated_data, invalid_event)
+                            self.assertEqual(self.get_messages(errors), self.get_messages(serializer.errors),
+                                             invalid_event)
+                self.assertIsNotNone(receiver.save(decoded_event, block_info))
+        self.assertEqual(checked, set(EVENT_DECODERS))
+
+        # Serializers of contract creations can't be built without block, the bootstrap batch rejects them
+        receiver, decoded_event, _ = self.chain.get_blocks()[0][0]
+        [(validated_data, errors)] = CopyIngestionBatch().validate_events([
+            (receiver.Meta.events[decoded_event['name']], decoded_event, None)])
+        self.assertIsNone(validated_data)
+        self.assertEqual(self.get_messages(errors), {'creation_block': ['This field is required.']})
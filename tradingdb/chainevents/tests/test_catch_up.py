@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+import itertools
+import os
+import tempfile
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from tradingdb.relationaldb.models import (CentralizedOracle, Market, Order,
+                                           PartitionedLog)
+
+from ..address_index import invalidate_address_indexes
+from ..catch_up import CatchUpProgress, CatchUpRunner, Checkpoint
+from ..synthetic_chain import SyntheticChain, SyntheticNode
+
+
+class MemoryCheckpoint(Checkpoint):
+    def __init__(self, block_number):
+        self.block_number = block_number
+
+    def get(self):
+        return self.block_number
+
+    def set(self, block_number):
+        self.block_number = block_number
+
+
+class ProcessKilled(BaseException):
+    """
+    Stops the catch-up like a killed process, without running its error handling
+    """
+
+
+class KilledCheckpoint(MemoryCheckpoint):
+    def __init__(self, block_number, killed_block):
+        super().__init__(block_number)
+        self.killed_block = killed_block
+
+    def set(self, block_number):
+        if block_number == self.killed_block:
+            raise ProcessKilled
+        super().set(block_number)
+
+
+class FailingNode(SyntheticNode):
+    def __init__(self, chain, failing_block):
+        super().__init__(chain)
+        self.failing_block = failing_block
+
+    def getLogs(self, filter_params):
+        logs = super().getLogs(filter_params)
+        if any(log['blockNumber'] == self.failing_block for log in logs):
+            raise ConnectionError('Node stopped')
+        return logs
+
+
+class FailingAddressNode(SyntheticNode):
+    def __init__(self, chain, failing_address):
+        super().__init__(chain)
+        self.failing_address = failing_address
+
+    def getLogs(self, filter_params):
+        if any(self.failing_address in address.lower() for address in filter_params['address']):
+            raise ConnectionError('Node stopped')
+        return super().getLogs(filter_params)
+
+
+class TestCatchUp(TestCase):
+
+    def setUp(self):
+        self.chain = SyntheticChain(markets=3, traders=4, blocks=7, logs_per_block=8, first_block=100)
+        self.chain.create_event_descriptions()
+
+    def test_catch_up_resume(self):
+        with transaction.atomic():
+            for receiver_events in self.chain.get_blocks():
+                for receiver, decoded_event, block_info in receiver_events:
+                    self.assertIsNotNone(receiver.save(decoded_event, block_info))
+            serial_state = self.chain.get_state()
+            transaction.set_rollback(True)
+
+        # The node fails in the second chunk, only the first one is committed
+        checkpoint = MemoryCheckpoint(99)
+        runner = CatchUpRunner(FailingNode(self.chain, failing_block=104), checkpoint, chunk_blocks=3,
+                               eth_events=self.chain.get_eth_events())
+        with self.assertRaises(ConnectionError):
+            runner.run(106)
+        self.assertEqual(checkpoint.get(), 102)
+        self.assertEqual([(chunk.from_block, chunk.to_block) for chunk in runner.progress.chunks], [(100, 102)])
+        self.assertFalse(Order.objects.filter(creation_block__gt=102).exists())
+        self.assertTrue(Order.objects.filter(creation_block=102).exists())
+
+        # Goes on from the checkpoint
+        runner = CatchUpRunner(SyntheticNode(self.chain), checkpoint, chunk_blocks=3,
+                               eth_events=self.chain.get_eth_events())
+        progress = runner.run(106)
+        self.assertEqual(checkpoint.get(), 106)
+        self.assertEqual([(chunk.from_block, chunk.to_block) for chunk in progress.chunks], [(103, 105), (106, 106)])
+        self.assertEqual(self.chain.get_state(), serial_state)
+
+        # Nothing left
+        self.assertEqual(runner.run(106).chunks, [])
+
+    def test_catch_up_progress(self):
+        progress = CatchUpProgress(100, 199, clock=itertools.count(0, 2).__next__)
+        self.assertIsNone(progress.eta)
+        progress.add_chunk(100, 109, 50)
+        self.assertEqual(progress.blocks_per_second, 5)
+        self.assertEqual(progress.logs_per_second, 25)
+        self.assertEqual(progress.remaining_blocks, 90)
+        self.assertEqual(progress.eta, 18)
+        self.assertEqual(progress.get_report(), 'Saved 50 logs of blocks 100-109 in 2.0s | 5.0 blocks/s, 25.0 logs/s '
+                                                '| 90 blocks left, ETA 18s')
+        progress.add_chunk(110, 199, 10)
+        self.assertEqual(progress.eta, 0)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'stats.csv')
+            progress.write_csv(path)
+            with open(path) as f:
+                lines = f.read().splitlines()
+        self.assertEqual(lines[1:], ['100,109,10,50,2.000,5.00,25.00', '110,199,90,10,2.000,45.00,5.00'])
+
+
+class TestCatchUpPartitioned(TransactionTestCase):
+
+    def setUp(self):
+        self.chain = SyntheticChain(markets=3, traders=4, blocks=7, logs_per_block=8, first_block=100)
+        self.chain.create_event_descriptions()
+
+    def get_serial_state(self):
+        with transaction.atomic():
+            for receiver_events in self.chain.get_blocks():
+                for receiver, decoded_event, block_info in receiver_events:
+                    self.assertIsNotNone(receiver.save(decoded_event, block_info))
+            serial_state = self.chain.get_state()
+            transaction.set_rollback(True)
+        invalidate_address_indexes()
+        return serial_state
+
+    def test_catch_up_partitioned(self):
+        serial_state = self.get_serial_state()
+
+        # The node fails fetching the logs of the created markets, the factory logs saved before are reverted
+        checkpoint = MemoryCheckpoint(99)
+        runner = CatchUpRunner(FailingAddressNode(self.chain, self.chain.get_address('market')), checkpoint,
+                               chunk_blocks=3, eth_events=self.chain.get_eth_events(), workers=2)
+        with self.assertRaises(ConnectionError):
+            runner.run(106)
+        self.assertEqual(checkpoint.get(), 99)
+        self.assertFalse(CentralizedOracle.objects.exists())
+        self.assertFalse(Market.objects.exists())
+
+        runner = CatchUpRunner(SyntheticNode(self.chain), checkpoint, chunk_blocks=3,
+                               eth_events=self.chain.get_eth_events(), workers=2)
+        progress = runner.run(106)
+        self.assertEqual(checkpoint.get(), 106)
+        self.assertEqual([(chunk.from_block, chunk.to_block) for chunk in progress.chunks],
+                         [(100, 102), (103, 105), (106, 106)])
+        self.assertEqual(runner.loader.invalid_logs, 0)
+        self.assertEqual(self.chain.get_state(), serial_state)
+        self.assertFalse(PartitionedLog.objects.exists())
+
+    def test_catch_up_partitioned_killed(self):
+        serial_state = self.get_serial_state()
+
+        # Killed after the workers saved the second chunk, before its checkpoint
+        checkpoint = KilledCheckpoint(99, killed_block=105)
+        runner = CatchUpRunner(SyntheticNode(self.chain), checkpoint, chunk_blocks=3,
+                               eth_events=self.chain.get_eth_events(), workers=2)
+        with self.assertRaises(ProcessKilled):
+            runner.run(106)
+        self.assertEqual(checkpoint.get(), 102)
+        self.assertTrue(Order.objects.filter(creation_block__gt=102).exists())
+        self.assertTrue(PartitionedLog.objects.filter(block_number__gt=102).exists())
+        self.assertFalse(PartitionedLog.objects.filter(block_number__lte=102).exists())
+
+        # The next run reverts the chunk before going on from the checkpoint, also without workers
+        runner = CatchUpRunner(SyntheticNode(self.chain), MemoryCheckpoint(checkpoint.get()), chunk_blocks=3,
+                               eth_events=self.chain.get_eth_events())
+        progress = runner.run(106)
+        self.assertEqual([(chunk.from_block, chunk.to_block) for chunk in progress.chunks], [(103, 105), (106, 106)])
+        self.assertFalse(PartitionedLog.objects.exists())
+        self.assertEqual(self.chain.get_state(), serial_state)
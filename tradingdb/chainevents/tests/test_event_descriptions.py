@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+from time import mktime
+
+from django.test import TestCase
+from django.utils import timezone
+from eth_abi import encode_abi
+from eth_utils import to_checksum_address
+
+from ipfs.ipfs import Ipfs
+from tradingdb.ipfs.fetcher import IpfsFetcher
+from tradingdb.ipfs.tests.stub import IpfsStubServer
+from tradingdb.relationaldb.models import (CategoricalEventDescription,
+                                           CentralizedOracle,
+                                           EventDescription)
+from tradingdb.relationaldb.tests.factories import (
+    CategoricalEventDescriptionFactory, generate_eth_account)
+
+from ..abis import abi_file_path, load_json_file
+from ..event_descriptions import (get_ipfs_hash_events, get_ipfs_hashes,
+                                  resolve_event_descriptions)
+from ..event_receivers import CentralizedOracleFactoryReceiver
+
+
+class FakeEth:
+    def __init__(self, logs):
+        self.logs = logs
+        self.filters = []
+
+    def getLogs(self, filter_params):
+        self.filters.append(filter_params)
+        return self.logs
+
+
+class FakeWeb3:
+    def __init__(self, logs):
+        self.eth = FakeEth(logs)
+
+
+class TestEventDescriptions(TestCase):
+
+    def setUp(self):
+        self.ipfs = Ipfs()
+        self.fetcher = self.ipfs.fetcher
+
+    def tearDown(self):
+        self.ipfs.fetcher = self.fetcher
+
+    def get_description_json(self, i):
+        return {
+            'title': 'Event {}'.format(i),
+            'description': 'Description {}'.format(i),
+            'resolutionDate': timezone.now().isoformat(),
+            'outcomes': ['Yes', 'No'],
+        }
+
+    def test_get_ipfs_hashes(self):
+        factory_address = generate_eth_account(only_address=True)
+        eth_events = [
+            {
+                'ADDRESSES': [factory_address],
+                'EVENT_ABI': load_json_file(abi_file_path('CentralizedOracleFactory.json')),
+            },
+            {
+                'ADDRESSES': [generate_eth_account(only_address=True)],
+                'EVENT_ABI': load_json_file(abi_file_path('EventFactory.json')),
+            },
+            {
+                'ADDRESSES_GETTER': 'chainevents.address_getters.MarketAddressGetter',
+                'EVENT_ABI': load_json_file(abi_file_path('StandardMarket.json')),
+            },
+        ]
+        ipfs_hash_events = get_ipfs_hash_events(eth_events)
+        self.assertEqual(len(ipfs_hash_events), 1)
+        self.assertEqual(ipfs_hash_events[0][1]['name'], 'CentralizedOracleCreation')
+
+        ipfs_hashes = ['Qm{:044d}'.format(i) for i in range(3)]
+        logs = [{'data': '0x' + encode_abi(['address', 'bytes'], [to_checksum_address('0x' + factory_address),
+                                                                   ipfs_hash.encode()]).hex()}
+                for ipfs_hash in ipfs_hashes]
+        logs.append({'data': '0x00'})
+        web3 = FakeWeb3(logs)
+        # Invalid logs are skipped
+        self.assertEqual(get_ipfs_hashes(web3, 10, 20, ipfs_hash_events), ipfs_hashes)
+        self.assertEqual(len(web3.eth.filters), 1)
+        self.assertEqual(web3.eth.filters[0]['fromBlock'], 10)
+        self.assertEqual(web3.eth.filters[0]['toBlock'], 20)
+        self.assertEqual(web3.eth.filters[0]['address'], [to_checksum_address('0x' + factory_address)])
+
+    def test_resolve_event_descriptions(self):
+        saved_description = CategoricalEventDescriptionFactory()
+        descriptions = {'Qm{:044d}'.format(i): self.get_description_json(i) for i in range(3)}
+        invalid_hash = 'Qm{:044d}'.format(3)
+        descriptions[invalid_hash] = {'title': 'Missing fields'}
+
+        with IpfsStubServer(descriptions) as server:
+            self.ipfs.fetcher = IpfsFetcher(server.host, server.port, timeout=5, max_workers=4)
+            ipfs_hashes = list(descriptions) + [saved_description.ipfs_hash]
+            self.assertEqual(resolve_event_descriptions(ipfs_hashes), 3)
+            self.assertEqual(sorted(server.requests), sorted(descriptions))
+            for ipfs_hash, description_json in descriptions.items():
+                if ipfs_hash != invalid_hash:
+                    description = CategoricalEventDescription.objects.get(ipfs_hash=ipfs_hash)
+                    self.assertEqual(description.title, description_json['title'])
+                    self.assertEqual(description.outcomes, description_json['outcomes'])
+            self.assertFalse(EventDescription.objects.filter(ipfs_hash=invalid_hash).exists())
+
+            # Saved descriptions are not fetched again
+            self.assertEqual(resolve_event_descriptions(ipfs_hashes), 0)
+            self.assertEqual(len(server.requests), len(descriptions))
+
+            # The oracle serializer finds the description in database
+            self.ipfs.fetcher = IpfsFetcher(server.host, server.port, timeout=5, max_workers=4)
+            oracle_address = generate_eth_account(only_address=True)
+            ipfs_hash = next(iter(descriptions))
+            CentralizedOracleFactoryReceiver().save({
+                'name': 'CentralizedOracleCreation',
+                'address': generate_eth_account(only_address=True),
+                'params': [
+                    {'name': 'creator', 'value': generate_eth_account(only_address=True)},
+                    {'name': 'centralizedOracle', 'value': oracle_address},
+                    {'name': 'ipfsHash', 'value': ipfs_hash.encode()},
+                ]
+            }, {'number': 1, 'timestamp': mktime(timezone.now().timetuple())})
+            self.assertEqual(CentralizedOracle.objects.get(address=oracle_address).event_description.ipfs_hash,
+                             ipfs_hash)
+            self.assertEqual(len(server.requests), len(descriptions))
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from django.test import SimpleTestCase
+
+from ..event_listener import LogIndexDecoder, LogIndexEventListener
+
+
+class StubDecoder:
+    """
+    Decoder of `django_eth_events`, without the log index
+    """
+    abis = ['abi']
+
+    def decode_log(self, log):
+        if log['topics'][0] != 'known':
+            raise LookupError('Unknown log topic.')
+        return {'name': 'Transfer', 'address': log['address'], 'params': []}
+
+
+class TestEventListener(SimpleTestCase):
+
+    def test_log_index_decoder(self):
+        decoder = LogIndexDecoder(StubDecoder())
+        logs = [{'address': 'a', 'topics': ['known'], 'logIndex': 3},
+                {'address': 'b', 'topics': ['unknown'], 'logIndex': 4},
+                {'address': 'c', 'topics': ['known'], 'logIndex': 5}]
+        self.assertEqual(decoder.decode_log(logs[0]), {'name': 'Transfer', 'address': 'a', 'params': [],
+                                                       'log_index': 3})
+        self.assertEqual([(decoded_log['address'], decoded_log['log_index'])
+                          for decoded_log in decoder.decode_logs(logs)], [('a', 3), ('c', 5)])
+        # The rest is done by the decoder of django_eth_events
+        self.assertEqual(decoder.abis, ['abi'])
+
+    def test_log_index_event_listener(self):
+        listener = LogIndexEventListener.__new__(LogIndexEventListener)
+        listener.decoder = StubDecoder()
+        self.assertIsInstance(listener.decoder, LogIndexDecoder)
+        listener.decoder = listener.decoder
+        self.assertIsInstance(listener.decoder.decoder, StubDecoder)
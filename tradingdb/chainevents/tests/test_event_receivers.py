@@ -323,6 +323,10 @@ class TestEventReceiver(TestCase):
 
     def test_event_instance_issuance_receiver(self):
         outcome_token = OutcomeTokenFactory()
+        block = {
+            'number': 1,
+            'timestamp': self.to_timestamp(timezone.now())
+        }
         event = {
             'name': 'Issuance',
             'address': outcome_token.address,
@@ -338,7 +342,7 @@ class TestEventReceiver(TestCase):
             ]
         }
 
-        OutcomeTokenInstanceReceiver().save(event)
+        OutcomeTokenInstanceReceiver().save(event, block)
         outcome_token_saved = OutcomeToken.objects.get(address=outcome_token.address)
         self.assertIsNotNone(outcome_token_saved.pk)
         self.assertEqual(outcome_token.total_supply + 1000, outcome_token_saved.total_supply)
@@ -348,6 +352,10 @@ class TestEventReceiver(TestCase):
 
     def test_event_instance_revocation_receiver(self):
         outcome_token = OutcomeTokenFactory()
+        block = {
+            'number': 1,
+            'timestamp': self.to_timestamp(timezone.now())
+        }
         revocation_event = {
             'name': 'Revocation',
             'address': outcome_token.address,
@@ -367,9 +375,9 @@ class TestEventReceiver(TestCase):
         issuance_event.update({'name': 'Issuance'})
 
         # do issuance
-        OutcomeTokenInstanceReceiver().save(issuance_event)
+        OutcomeTokenInstanceReceiver().save(issuance_event, block)
         # do revocation
-        OutcomeTokenInstanceReceiver().save(revocation_event)
+        OutcomeTokenInstanceReceiver().save(revocation_event, block)
         outcome_token_saved = OutcomeToken.objects.get(address= outcome_token.address)
         self.assertIsNotNone(outcome_token_saved.pk)
         self.assertEqual(outcome_token.total_supply, outcome_token_saved.total_supply)
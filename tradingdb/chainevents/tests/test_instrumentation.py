@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from tradingdb.relationaldb.tests.factories import OutcomeTokenFactory
+
+from ..event_receivers import OutcomeTokenInstanceReceiver
+from ..instrumentation import (IngestionMetrics, ingestion_metrics,
+                               parse_prometheus, read_metrics_dir,
+                               render_prometheus)
+
+
+class TestInstrumentation(TestCase):
+    block = {'number': 1, 'timestamp': 0}
+
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        ingestion_metrics.reset()
+
+    def tearDown(self):
+        ingestion_metrics.enabled = False
+        ingestion_metrics.reset()
+        shutil.rmtree(self.metrics_dir)
+
+    def get_issuance_event(self, outcome_token):
+        return {
+            'name': 'Issuance',
+            'address': outcome_token.address,
+            'params': [
+                {'name': 'owner', 'value': outcome_token.event.creator},
+                {'name': 'amount', 'value': 1000},
+            ]
+        }
+
+    def test_receiver_metrics(self):
+        outcome_token = OutcomeTokenFactory()
+        receiver = OutcomeTokenInstanceReceiver()
+        invalid_event = self.get_issuance_event(outcome_token)
+        invalid_event['params'] = invalid_event['params'][:1]
+
+        # Disabled by default
+        receiver.save(self.get_issuance_event(outcome_token), self.block)
+        self.assertEqual(ingestion_metrics.get_metrics(), {})
+
+        ingestion_metrics.enabled = True
+        receiver.save(self.get_issuance_event(outcome_token), self.block)
+        receiver.save(self.get_issuance_event(outcome_token), self.block)
+        self.assertIsNone(receiver.save(invalid_event, self.block))
+        receiver.rollback(self.get_issuance_event(outcome_token), self.block)
+
+        metrics = ingestion_metrics.get_metrics()
+        self.assertEqual(set(metrics), {('OutcomeTokenInstanceReceiver', 'Issuance', 'save'),
+                                        ('OutcomeTokenInstanceReceiver', 'Issuance', 'rollback')})
+        save_metrics = metrics[('OutcomeTokenInstanceReceiver', 'Issuance', 'save')]
+        self.assertEqual(save_metrics.events, 3)
+        self.assertEqual(save_metrics.invalid_events, 1)
+        self.assertGreater(save_metrics.queries, 0)
+        self.assertGreater(save_metrics.seconds, save_metrics.query_seconds)
+        self.assertEqual(metrics[('OutcomeTokenInstanceReceiver', 'Issuance', 'rollback')].events, 1)
+
+        # Logs saved in bulk are measured together
+        receiver.save_batch([(self.get_issuance_event(outcome_token), self.block) for _ in range(3)])
+        batch_metrics = ingestion_metrics.get_metrics()[('OutcomeTokenInstanceReceiver', '*', 'save_batch')]
+        self.assertEqual(batch_metrics.events, 3)
+
+        # Nested measurements are ignored
+        with ingestion_metrics.measure('Receiver', 'Event', 'save'):
+            with ingestion_metrics.measure('Receiver', 'Nested', 'save'):
+                pass
+        self.assertNotIn(('Receiver', 'Nested', 'save'), ingestion_metrics.get_metrics())
+
+    def test_prometheus(self):
+        metrics = IngestionMetrics(enabled=True, metrics_dir=self.metrics_dir)
+        with metrics.measure('Receiver', 'Event "quoted"', 'save'):
+            pass
+        metrics.add_invalid('Receiver', 'Event "quoted"', 'save')
+        text = render_prometheus(metrics.get_metrics(), pid=1)
+        self.assertIn('# TYPE tradingdb_receiver_events_total counter', text)
+        self.assertIn('tradingdb_receiver_invalid_events_total{pid="1",receiver="Receiver",'
+                      'event="Event \\"quoted\\"",operation="save"} 1', text)
+
+        parsed = parse_prometheus(text.splitlines())
+        self.assertEqual(list(parsed), [('Receiver', 'Event "quoted"', 'save')])
+        self.assertEqual(parsed[('Receiver', 'Event "quoted"', 'save')].events, 1)
+
+        # Metrics of every process are summed
+        metrics.exit_handler_registered = True  # The directory is removed before exiting
+        metrics.write()
+        with open('{}/ingestion_metrics_0.prom'.format(self.metrics_dir), 'w') as f:
+            f.write(text)
+        self.assertEqual(read_metrics_dir(self.metrics_dir)[('Receiver', 'Event "quoted"', 'save')].invalid_events, 2)
+
+        with override_settings(INGESTION_METRICS_DIR=self.metrics_dir):
+            out = StringIO()
+            call_command('ingestion_metrics', stdout=out)
+            self.assertIn('Receiver', out.getvalue())
+            out = StringIO()
+            call_command('ingestion_metrics', prometheus=True, reset=True, stdout=out)
+            self.assertIn('tradingdb_receiver_events_total{receiver="Receiver"', out.getvalue())
+            out = StringIO()
+            call_command('ingestion_metrics', stdout=out)
+            self.assertEqual(len(out.getvalue().splitlines()), 1)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from tradingdb.relationaldb.models import (Market, Order, OutcomeToken,
+                                           OutcomeTokenBalance, ScoreboardTouch,
+                                           TournamentParticipant)
+from tradingdb.relationaldb.tests.factories import \
+    TournamentParticipantFactory
+
+from ..event_receivers import OutcomeTokenInstanceReceiver
+from ..partitioned import (distribute_partitions, get_partition_keys,
+                           save_events_partitioned)
+from ..synthetic_chain import SyntheticChain
+
+
+class TestPartitioned(TransactionTestCase):
+
+    def setUp(self):
+        self.chain = SyntheticChain(markets=3, traders=4, blocks=5, logs_per_block=8)
+        self.receiver_events = [receiver_event for receiver_events in self.chain.get_blocks()
+                                for receiver_event in receiver_events]
+
+    def test_save_events_partitioned(self):
+        self.chain.create_event_descriptions()
+        with transaction.atomic():
+            for receiver, decoded_event, block_info in self.receiver_events:
+                self.assertIsNotNone(receiver.save(decoded_event, block_info))
+        serial_state = self.chain.get_state()
+        self.chain.revert()
+        self.assertEqual(Market.objects.count(), 0)
+
+        self.chain.create_event_descriptions()
+        instances = save_events_partitioned(self.receiver_events, max_workers=2)
+        self.assertEqual(len(instances), len(self.receiver_events))
+        self.assertNotIn(None, instances)
+        self.assertEqual(self.chain.get_state(), serial_state)
+
+        # Every log depends on the oracle of its market
+        keys = get_partition_keys(self.receiver_events)
+        self.assertEqual(len(set(keys) - {None}), 3)
+        for (receiver, decoded_event, _), key in zip(self.receiver_events, keys):
+            if decoded_event['name'] in ('OutcomeTokenPurchase', 'OutcomeTokenSale'):
+                self.assertEqual(Market.objects.get(address=decoded_event['address']).event.oracle_id, key)
+
+        with transaction.atomic():
+            with self.assertRaises(RuntimeError):
+                save_events_partitioned(self.receiver_events)
+
+    def test_save_events_partitioned_touches(self):
+        self.chain.create_event_descriptions()
+        addresses = [self.chain.get_address('trader', trader) for trader in range(4)]
+        for address in addresses:
+            TournamentParticipantFactory(address=address, scoreboard_touched=None)
+
+        with CaptureQueriesContext(connection) as context:
+            save_events_partitioned(self.receiver_events, max_workers=2)
+
+        # Participants trade in markets of different partitions, workers defer the touches and they are applied once
+        # after the workers
+        self.assertTrue(any(Order.objects.filter(sender=address).values('market').distinct().count() > 1
+                            for address in addresses))
+        self.assertEqual(len([query for query in context.captured_queries
+                              if query['sql'].startswith('UPDATE "relationaldb_tournamentparticipant"')]), 1)
+        self.assertEqual(set(TournamentParticipant.objects.filter(scoreboard_touched__isnull=False)
+                             .values_list('address', flat=True)), set(addresses))
+        self.assertFalse(ScoreboardTouch.objects.exists())
+
+    def test_save_events_partitioned_error(self):
+        self.chain.create_event_descriptions()
+        missing_outcome_token = self.chain.get_address('outcome_token', 10 ** 6)
+        receiver_events = self.receiver_events + [(OutcomeTokenInstanceReceiver(), {
+            'name': 'Issuance',
+            'address': missing_outcome_token,
+            'params': [{'name': 'owner', 'value': self.chain.get_address('trader')}, {'name': 'amount', 'value': 1}]
+        }, self.chain.get_block_info(4))]
+
+        # Saved partitions are reverted
+        with self.assertRaises(OutcomeToken.DoesNotExist):
+            save_events_partitioned(receiver_events, max_workers=2)
+        self.assertEqual(Market.objects.count(), 0)
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(OutcomeTokenBalance.objects.count(), 0)
+
+    def test_distribute_partitions(self):
+        partitions = {'a': [0, 1, 2, 3], 'b': [4], 'c': [5, 6], 'd': [7, 8]}
+        self.assertEqual(distribute_partitions(partitions, 2), [['a', 'b'], ['c', 'd']])
+        self.assertEqual(distribute_partitions(partitions, 10), [['a'], ['c'], ['d'], ['b']])
+        self.assertEqual(distribute_partitions({}, 2), [])
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+
+from django.test import SimpleTestCase
+
+from ..event_receivers import (MarketInstanceReceiver,
+                               OutcomeTokenInstanceReceiver)
+from ..receiver_logging import ReceiverLogger, StructuredFormatter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+        self.messages = []
+
+    def emit(self, record):
+        self.records.append(record)
+        self.messages.append(self.format(record))
+
+
+class Unencodable:
+    pass
+
+
+class TestReceiverLogging(SimpleTestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger('test_receiver_logging')
+        self.logger.propagate = False
+        self.handler = ListHandler()
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def get_transfer_event(self):
+        return {
+            'name': 'Transfer',
+            'address': 'a' * 40,
+            'params': [
+                {'name': 'from', 'value': 'b' * 40},
+                {'name': 'to', 'value': 'c' * 40},
+                {'name': 'value', 'value': 10},
+                {'name': 'data', 'value': b'\x01'},
+            ]
+        }
+
+    def test_lazy_payload(self):
+        receiver_logger = ReceiverLogger(self.logger)
+        receiver = OutcomeTokenInstanceReceiver()
+        unencodable_event = self.get_transfer_event()
+        unencodable_event['params'].append({'name': 'unencodable', 'value': Unencodable()})
+
+        # Payloads are not encoded if the level is disabled
+        self.logger.setLevel(logging.WARNING)
+        receiver_logger.saved(receiver, unencodable_event, {'number': 1})
+        receiver_logger.reverted(receiver, unencodable_event, {'number': 1})
+        self.assertEqual(self.handler.records, [])
+
+        self.logger.setLevel(logging.INFO)
+        receiver_logger.saved(receiver, self.get_transfer_event(), {'number': 1})
+        self.assertEqual(len(self.handler.messages), 1)
+        message = self.handler.messages[0]
+        self.assertTrue(message.startswith('Event Receiver OutcomeTokenInstanceReceiver added: {'))
+        self.assertNotIn('\n', message)
+        self.assertEqual(json.loads(message.split(': ', 1)[1])['params'][3]['value'], '01')
+        record = self.handler.records[0]
+        self.assertEqual((record.receiver, record.event_name, record.block_number, record.operation),
+                         ('OutcomeTokenInstanceReceiver', 'Transfer', 1, 'save'))
+
+        receiver_logger.invalid(receiver, self.get_transfer_event(), 'rollback', {'value': ['Invalid']})
+        self.assertEqual([record.levelno for record in self.handler.records[1:]], [logging.WARNING] * 2)
+        self.assertTrue(self.handler.messages[1].startswith('INVALID Data for Event Receiver '
+                                                            'OutcomeTokenInstanceReceiver rollback: {'))
+
+    def test_sampling(self):
+        self.logger.setLevel(logging.INFO)
+        receiver_logger = ReceiverLogger(self.logger, sampling={'Transfer': 5, 'OutcomeTokenPurchase': 1})
+        receiver = OutcomeTokenInstanceReceiver()
+        for _ in range(11):
+            receiver_logger.saved(receiver, self.get_transfer_event())
+        self.assertEqual(len(self.handler.records), 3)
+        self.assertEqual(self.handler.records[0].sample_rate, 5)
+
+        purchase_event = {'name': 'OutcomeTokenPurchase', 'address': 'd' * 40, 'params': []}
+        for _ in range(3):
+            receiver_logger.saved(MarketInstanceReceiver(), purchase_event)
+        # Reverted logs are not sampled
+        for _ in range(3):
+            receiver_logger.reverted(receiver, self.get_transfer_event())
+        self.assertEqual(len(self.handler.records), 9)
+
+    def test_structured_formatter(self):
+        self.logger.setLevel(logging.INFO)
+        self.handler.setFormatter(StructuredFormatter())
+        ReceiverLogger(self.logger).saved(OutcomeTokenInstanceReceiver(), self.get_transfer_event(), {'number': 7})
+        self.logger.info('Not an event receiver record')
+
+        record, plain_record = [json.loads(message) for message in self.handler.messages]
+        self.assertEqual(record['level'], 'INFO')
+        self.assertEqual(record['receiver'], 'OutcomeTokenInstanceReceiver')
+        self.assertEqual(record['event_name'], 'Transfer')
+        self.assertEqual(record['event_address'], 'a' * 40)
+        self.assertEqual(record['block_number'], 7)
+        self.assertIn('"name":"Transfer"', record['message'])
+        self.assertEqual(plain_record['message'], 'Not an event receiver record')
+        self.assertNotIn('receiver', plain_record)
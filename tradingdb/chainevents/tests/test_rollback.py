@@ -9,8 +9,10 @@ from django_eth_events.utils import normalize_address_without_0x
 from ipfs.ipfs import Ipfs
 from tradingdb.relationaldb.models import (BuyOrder, CategoricalEvent,
                                            CentralizedOracle, Market,
-                                           OutcomeTokenBalance, ScalarEvent,
-                                           SellOrder, TournamentParticipant,
+                                           OutcomeTokenBalance,
+                                           OutcomeTokenBalanceDelta,
+                                           ScalarEvent, SellOrder,
+                                           TournamentParticipant,
                                            TournamentParticipantBalance)
 from tradingdb.relationaldb.tests.factories import (CategoricalEventFactory,
                                                     CentralizedOracleFactory,
@@ -513,8 +515,8 @@ class TestRollback(TestCase):
             ]
         }
 
-        OutcomeTokenInstanceReceiver().save(issuance_event)
-        OutcomeTokenInstanceReceiver().save(transfer_event)
+        OutcomeTokenInstanceReceiver().save(issuance_event, block)
+        OutcomeTokenInstanceReceiver().save(transfer_event, block)
         outcome_token_balance_before_rollback = OutcomeTokenBalance.objects.get(owner=owner_two)
         self.assertEqual(outcome_token_balance_before_rollback.balance, 10)
 
@@ -524,15 +526,59 @@ class TestRollback(TestCase):
             OutcomeTokenBalance.objects.get(owner=owner_two)
 
         # Test with funds on owner2
-        OutcomeTokenInstanceReceiver().save(issuance_event)
+        OutcomeTokenInstanceReceiver().save(issuance_event, block)
         isuance_event_owner_two = issuance_event.copy()
         isuance_event_owner_two.get('params')[0]['value'] = owner_two
-        OutcomeTokenInstanceReceiver().save(isuance_event_owner_two)
-        OutcomeTokenInstanceReceiver().save(transfer_event)
+        OutcomeTokenInstanceReceiver().save(isuance_event_owner_two, block)
+        OutcomeTokenInstanceReceiver().save(transfer_event, block)
         OutcomeTokenInstanceReceiver().rollback(transfer_event, block)
         owner_two_token_balance = OutcomeTokenBalance.objects.get(owner=owner_two)
         self.assertEqual(owner_two_token_balance.balance, 1000)
 
+    def test_outcome_token_same_block_transfers_rollback(self):
+        outcome_token = OutcomeTokenFactory()
+        owner = generate_eth_account(only_address=True)
+        receiver = generate_eth_account(only_address=True)
+        block = {
+            'number': 1,
+            'timestamp': self.to_timestamp(timezone.now())
+        }
+
+        def get_event(name, log_index, params):
+            event = {
+                'name': name,
+                'address': outcome_token.address,
+                'params': [{'name': key, 'value': value} for key, value in params.items()]
+            }
+            if log_index is not None:
+                event['log_index'] = log_index
+            return event
+
+        # Identical transfers in the same block, and a transfer to the sender
+        transfer_events = [get_event('Transfer', log_index, {'from': owner, 'to': receiver, 'value': 10})
+                           for log_index in (1, 2)]
+        self_transfer_event = get_event('Transfer', 3, {'from': owner, 'to': owner, 'value': 10})
+        # Logs decoded before the log index was kept
+        legacy_transfer_events = [get_event('Transfer', None, {'from': owner, 'to': receiver, 'value': 5})
+                                  for _ in range(2)]
+        for event in [get_event('Issuance', 0, {'owner': owner, 'amount': 100})] + transfer_events + \
+                [self_transfer_event] + legacy_transfer_events:
+            self.assertIsNotNone(OutcomeTokenInstanceReceiver().save(event, block))
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=owner).balance, 70)
+
+        # Only the deltas of the reverted logs are deleted, legacy logs revert one of their identical deltas
+        OutcomeTokenInstanceReceiver().rollback(self_transfer_event, block)
+        OutcomeTokenInstanceReceiver().rollback(transfer_events[0], block)
+        OutcomeTokenInstanceReceiver().rollback(legacy_transfer_events[1], block)
+        self.assertListEqual(
+            list(OutcomeTokenBalanceDelta.objects.order_by('log_index', 'delta').values_list(
+                'owner', 'delta', 'block_number', 'log_index')),
+            [(owner, 100, 1, 0), (owner, -10, 1, 2), (receiver, 10, 1, 2), (owner, -5, 1, None),
+             (receiver, 5, 1, None)]
+        )
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=owner).balance, 85)
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=receiver).balance, 15)
+
     def test_tournament_participant_rollback(self):
         identity = 'ebe4dd7a4a9e712e742862719aa04709cc6d80a6'
         participant_event = {
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+
+from tradingdb.relationaldb.models import (CategoricalEvent, Market, Order,
+                                           OutcomeTokenBalance)
+
+from ..batch import save_events_batch
+from ..synthetic_chain import SyntheticChain
+
+
+class TestSyntheticChain(TestCase):
+
+    def test_synthetic_chain(self):
+        chain = SyntheticChain(markets=2, traders=3, blocks=4, logs_per_block=5)
+        blocks = chain.get_blocks()
+        self.assertEqual(len(blocks), 4)
+        self.assertEqual([len(receiver_events) for receiver_events in blocks[1:-1]], [5, 5])
+        # Same arguments, same chain
+        self.assertEqual([[decoded_event for _, decoded_event, _ in receiver_events] for receiver_events in blocks],
+                         [[decoded_event for _, decoded_event, _ in receiver_events]
+                          for receiver_events in SyntheticChain(markets=2, traders=3, blocks=4,
+                                                                logs_per_block=5).get_blocks()])
+
+        chain.create_event_descriptions()
+        for receiver_events in blocks:
+            self.assertNotIn(None, save_events_batch(receiver_events))
+
+        self.assertEqual(Market.objects.filter(stage=1).count(), 2)
+        self.assertEqual(CategoricalEvent.objects.exclude(outcome=None).count(), 2)
+        trades = sum(1 for receiver_events in blocks for _, decoded_event, _ in receiver_events
+                     if decoded_event['name'] in ('OutcomeTokenPurchase', 'OutcomeTokenSale'))
+        self.assertEqual(Order.objects.count(), trades)
+        self.assertEqual(OutcomeTokenBalance.objects.count(), 2 * 3 * 2)
+
+        with self.assertRaises(ValueError):
+            SyntheticChain(markets=1, traders=2, logs_per_block=3)
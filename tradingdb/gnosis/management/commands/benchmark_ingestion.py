@@ -0,0 +1,213 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
+
+from tradingdb.chainevents.batch import (rollback_events_batch,
+                                         save_events_batch)
+from tradingdb.chainevents.bootstrap import BootstrapLoader
+from tradingdb.chainevents.instrumentation import (get_report_lines,
+                                                   ingestion_metrics)
+from tradingdb.chainevents.partitioned import save_events_partitioned
+from tradingdb.chainevents.synthetic_chain import (SyntheticChain,
+                                                   SyntheticNode)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[int(round(q * (len(values) - 1)))] if values else 0
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.queries += 1
+        return execute(sql, params, many, context)
+
+    def connection_created(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    help = 'Replays a synthetic chain (market creations, trades, transfers, outcome assignments and reorgs) through ' \
+           'the event receivers and reports logs/s, queries per log and latency percentiles. `event` mode saves ' \
+           'log by log like the event listener, `batch` mode saves every block with `save_events_batch`, ' \
+           '`partitioned` mode saves ranges of blocks with `save_events_partitioned`, `bootstrap` mode loads ' \
+           'ranges of blocks from a stand-in node with `BootstrapLoader` (without reorgs). Everything is saved in a ' \
+           'transaction rolled back at the end, except in `partitioned` mode (workers need the changes committed), ' \
+           'where the chain is reverted at the end'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--markets', type=int, default=10, help='Markets created')
+        parser.add_argument('--traders', type=int, default=50, help='Accounts trading in every market')
+        parser.add_argument('--blocks', type=int, default=100, help='Blocks of the chain')
+        parser.add_argument('--logs', type=int, default=50, help='Purchases, sales and transfers in every block')
+        parser.add_argument('--reorg-interval', type=int, default=20,
+                            help='Blocks between chain reorgs, 0 to disable them')
+        parser.add_argument('--reorg-depth', type=int, default=3, help='Blocks reverted by every chain reorg')
+        parser.add_argument('--modes', nargs='+', choices=('event', 'batch', 'partitioned', 'bootstrap'),
+                            default=['event', 'batch'])
+        parser.add_argument('--range-blocks', type=int, default=10,
+                            help='Blocks saved together in partitioned and bootstrap modes')
+        parser.add_argument('--workers', type=int, default=settings.INGESTION_WORKERS,
+                            help='Workers of partitioned mode')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--metrics', action='store_true',
+                            help='Report time, queries and invalid logs of every event receiver')
+
+    def replay_event(self, blocks, reorg_blocks, reorg_depth):
+        """
+        :return: list of latencies (one by log saved), number of logs saved, number of invalid logs
+        """
+        latencies = []
+        invalid = 0
+        for block_index, receiver_events in enumerate(blocks):
+            for receiver, decoded_event, block_info in receiver_events:
+                start = time.perf_counter()
+                if receiver.save(decoded_event, block_info) is None:
+                    invalid += 1
+                latencies.append(time.perf_counter() - start)
+
+            if block_index in reorg_blocks:
+                reverted_blocks = blocks[block_index - reorg_depth + 1:block_index + 1]
+                for receiver_events in reversed(reverted_blocks):
+                    for receiver, decoded_event, block_info in reversed(receiver_events):
+                        receiver.rollback(decoded_event, block_info)
+                for receiver_events in reverted_blocks:
+                    for receiver, decoded_event, block_info in receiver_events:
+                        start = time.perf_counter()
+                        if receiver.save(decoded_event, block_info) is None:
+                            invalid += 1
+                        latencies.append(time.perf_counter() - start)
+        return latencies, len(latencies), invalid
+
+    def replay_ranges(self, blocks, reorg_blocks, reorg_depth, range_blocks, save):
+        """
+        Saves the blocks in ranges of `range_blocks` blocks with `save`. After a range with a chain reorg the blocks
+        from the reverted ones to the end of the range are reverted and saved again
+        :return: list of latencies (one by range saved), number of logs saved, number of invalid logs
+        """
+        latencies = []
+        logs = 0
+        invalid = 0
+
+        def save_range(saved_blocks):
+            nonlocal logs, invalid
+            receiver_events = [receiver_event for receiver_events in saved_blocks for receiver_event in receiver_events]
+            start = time.perf_counter()
+            invalid += sum(1 for instance in save(receiver_events) if instance is None)
+            latencies.append(time.perf_counter() - start)
+            logs += len(receiver_events)
+
+        for first_index in range(0, len(blocks), range_blocks):
+            last_index = min(first_index + range_blocks, len(blocks))
+            save_range(blocks[first_index:last_index])
+            range_reorg_blocks = [block_index for block_index in reorg_blocks
+                                  if first_index <= block_index < last_index]
+            if range_reorg_blocks:
+                first_reverted = min(range_reorg_blocks) - reorg_depth + 1
+                rollback_events_batch(self.chain.get_block_info(first_reverted)['number'] - 1,
+                                      [receiver_event for receiver_events in blocks[first_reverted:last_index]
+                                       for receiver_event in receiver_events])
+                save_range(blocks[first_reverted:last_index])
+        return latencies, logs, invalid
+
+    def replay_bootstrap(self, range_blocks):
+        """
+        Loads the raw logs of the chain, served by a stand-in node, in chunks of `range_blocks` blocks. Blocks loaded
+        by the bootstrap cannot be reverted, there are no chain reorgs
+        :return: list of latencies (one by chunk loaded), number of logs saved, number of invalid logs
+        """
+        latencies = []
+        loader = BootstrapLoader(self.node, eth_events=self.chain.get_eth_events(), chunk_blocks=range_blocks)
+        last = time.perf_counter()
+
+        def chunk_loaded(*chunk):
+            nonlocal last
+            now = time.perf_counter()
+            latencies.append(now - last)
+            last = now
+
+        n_logs = loader.load(self.chain.first_block, self.node.eth.blockNumber, callback=chunk_loaded)
+        return latencies, n_logs, loader.invalid_logs
+
+    def replay(self, mode, blocks, reorg_blocks, reorg_depth, range_blocks, workers):
+        if mode == 'event':
+            return self.replay_event(blocks, reorg_blocks, reorg_depth)
+        elif mode == 'batch':
+            return self.replay_ranges(blocks, reorg_blocks, reorg_depth, 1, save_events_batch)
+        elif mode == 'bootstrap':
+            return self.replay_bootstrap(range_blocks)
+        else:
+            return self.replay_ranges(blocks, reorg_blocks, reorg_depth, range_blocks,
+                                      lambda receiver_events: save_events_partitioned(receiver_events, workers))
+
+    def handle(self, *args, markets, traders, blocks, logs, reorg_interval, reorg_depth, modes, range_blocks, workers,
+               seed, metrics, **options):
+        self.chain = SyntheticChain(markets=markets, traders=traders, blocks=blocks, logs_per_block=logs,
+                                    first_block=10 ** 8, seed=seed)
+        chain_blocks = self.chain.get_blocks()
+        if 'bootstrap' in modes:
+            # Logs are encoded before measuring
+            self.node = SyntheticNode(self.chain)
+        # Only trading blocks are reverted, the first one creates the markets and the last one resolves them
+        reorg_blocks = set()
+        if reorg_interval:
+            reorg_blocks = {block_index for block_index in range(reorg_interval, blocks - 1, reorg_interval)
+                            if block_index - reorg_depth + 1 > 0}
+
+        metrics_enabled = ingestion_metrics.enabled
+        first_state = None
+        for mode in modes:
+            query_counter = QueryCounter()
+            if metrics:
+                ingestion_metrics.enabled = True
+                ingestion_metrics.reset()
+            # Workers of partitioned mode use their own connections
+            connection_created.connect(query_counter.connection_created)
+            try:
+                with transaction.atomic():
+                    if mode != 'partitioned':
+                        self.chain.create_event_descriptions()
+                        start = time.perf_counter()
+                        with connection.execute_wrapper(query_counter):
+                            latencies, n_logs, invalid = self.replay(mode, chain_blocks, reorg_blocks, reorg_depth,
+                                                                     range_blocks, workers)
+                        elapsed = time.perf_counter() - start
+                        state = self.chain.get_state()
+                        transaction.set_rollback(True)
+
+                if mode == 'partitioned':
+                    self.chain.create_event_descriptions()
+                    try:
+                        start = time.perf_counter()
+                        with connection.execute_wrapper(query_counter):
+                            latencies, n_logs, invalid = self.replay(mode, chain_blocks, reorg_blocks, reorg_depth,
+                                                                     range_blocks, workers)
+                        elapsed = time.perf_counter() - start
+                        state = self.chain.get_state()
+                    finally:
+                        self.chain.revert()
+            finally:
+                connection_created.disconnect(query_counter.connection_created)
+                ingestion_metrics.enabled = metrics_enabled
+
+            first_state = first_state or state
+            self.stdout.write(self.style.SUCCESS(
+                '{:11} | {} logs in {} blocks | {:8.1f} logs/s | {:5.2f} queries/log | per {}: p50 {:7.2f} ms, '
+                'p99 {:7.2f} ms | {} reorgs of {} blocks | invalid logs: {} | identical state: {}'.format(
+                    mode, n_logs, blocks, n_logs / elapsed, query_counter.queries / n_logs,
+                    {'event': 'log', 'batch': 'block', 'partitioned': 'range', 'bootstrap': 'range'}[mode],
+                    percentile(latencies, 0.5) * 1e3, percentile(latencies, 0.99) * 1e3,
+                    0 if mode == 'bootstrap' else len(reorg_blocks), reorg_depth, invalid, state == first_state)
+            ))
+            if metrics:
+                for line in get_report_lines(ingestion_metrics.get_metrics()):
+                    self.stdout.write(line)
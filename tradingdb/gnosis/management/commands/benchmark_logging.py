@@ -0,0 +1,77 @@
+import logging
+import os
+import time
+from json import dumps
+
+from django.core.management.base import BaseCommand
+from django_eth_events.utils import JsonBytesEncoder
+
+from tradingdb.chainevents.receiver_logging import (ReceiverLogger,
+                                                    StructuredFormatter)
+from tradingdb.chainevents.synthetic_chain import SyntheticChain
+
+
+class Command(BaseCommand):
+    help = 'Measures the CPU time the event receivers spend logging saved logs, for every 10k logs of a synthetic ' \
+           'chain: eager pretty printed json (previous logging) against lazy compact json, with INFO disabled and ' \
+           'enabled, and with sampling of the high volume events. Records are written to /dev/null'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=10000, help='Logs saved')
+        parser.add_argument('--sample-rate', type=int, default=100,
+                            help='Only 1 of every N Transfer, OutcomeTokenPurchase and OutcomeTokenSale is logged')
+
+    def get_receiver_events(self, n_events):
+        chain = SyntheticChain(markets=10, traders=100, blocks=n_events // 100 + 2, logs_per_block=100)
+        return [receiver_event for receiver_events in chain.get_blocks()[1:-1]
+                for receiver_event in receiver_events][:n_events]
+
+    @staticmethod
+    def log_eager(logger, receiver, decoded_event, block_info):
+        logger.info('Event Receiver {} added: {}'.format(receiver.__class__.__name__,
+                                                         dumps(decoded_event,
+                                                               sort_keys=True,
+                                                               indent=4,
+                                                               cls=JsonBytesEncoder)))
+
+    def measure(self, receiver_events, log):
+        start = time.process_time()
+        for receiver, decoded_event, block_info in receiver_events:
+            log(receiver, decoded_event, block_info)
+        return time.process_time() - start
+
+    def handle(self, *args, events, sample_rate, **options):
+        receiver_events = self.get_receiver_events(events)
+        scale = 10000 / len(receiver_events)
+
+        logger = logging.getLogger('benchmark_logging')
+        logger.propagate = False
+        with open(os.devnull, 'w') as devnull:
+            handler = logging.StreamHandler(devnull)
+            logger.addHandler(handler)
+            try:
+                sampling = {event_name: sample_rate
+                            for event_name in ('Transfer', 'OutcomeTokenPurchase', 'OutcomeTokenSale')}
+                cases = []
+                for level, level_name in ((logging.WARNING, 'INFO disabled'), (logging.INFO, 'INFO enabled')):
+                    logger.setLevel(level)
+                    handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] [%(processName)s] '
+                                                           '%(message)s'))
+                    eager = self.measure(receiver_events, lambda *args: self.log_eager(logger, *args))
+                    lazy = self.measure(receiver_events, ReceiverLogger(logger).saved)
+                    cases.append((level_name, 'lazy compact', eager, lazy))
+                    if level == logging.INFO:
+                        sampled = self.measure(receiver_events, ReceiverLogger(logger, sampling=sampling).saved)
+                        cases.append((level_name, 'sampled 1/{}'.format(sample_rate), eager, sampled))
+                        handler.setFormatter(StructuredFormatter())
+                        structured = self.measure(receiver_events, ReceiverLogger(logger).saved)
+                        cases.append((level_name, 'structured', eager, structured))
+            finally:
+                logger.removeHandler(handler)
+
+        for level_name, mode, eager, measured in cases:
+            self.stdout.write(self.style.SUCCESS(
+                '{:13} | {:13} | eager: {:8.1f} ms/10k logs | {:8.1f} ms/10k logs | saved: {:8.1f} ms/10k logs '
+                '({:5.1f}%)'.format(level_name, mode, eager * scale * 1e3, measured * scale * 1e3,
+                                    (eager - measured) * scale * 1e3, (eager - measured) / eager * 100)
+            ))
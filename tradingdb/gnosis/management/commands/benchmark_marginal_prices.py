@@ -0,0 +1,38 @@
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+from mpmath import workdps
+
+from tradingdb.gnosis.utils import (calc_lmsr_marginal_price,
+                                    calc_lmsr_marginal_prices)
+
+
+class Command(BaseCommand):
+    help = 'Compares the time needed to calculate the LMSR marginal prices of a market, one index at a time ' \
+           'against all of them in one pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--outcomes', type=int, nargs='+', default=[2, 4, 8, 16, 32, 64])
+        parser.add_argument('--number', type=int, default=200, help='Executions of every calculation')
+        parser.add_argument('--dps', type=int, default=100, help='mpmath precision, the one set by serializers')
+
+    def handle(self, *args, outcomes, number, dps, **options):
+        funding = 10 ** 18
+        with workdps(dps):
+            for n_outcomes in outcomes:
+                net_outcome_tokens_sold = [random.randint(0, 10 * funding) for _ in range(n_outcomes)]
+
+                def per_index():
+                    return [calc_lmsr_marginal_price(index, net_outcome_tokens_sold, funding)
+                            for index in range(n_outcomes)]
+
+                def one_pass():
+                    return calc_lmsr_marginal_prices(net_outcome_tokens_sold, funding)
+
+                per_index_time = timeit.timeit(per_index, number=number) / number
+                one_pass_time = timeit.timeit(one_pass, number=number) / number
+                self.stdout.write(self.style.SUCCESS(
+                    '{:>3} outcomes | per index: {:10.2f} us | one pass: {:8.2f} us | speedup: {:8.1f}x'.format(
+                        n_outcomes, per_index_time * 1e6, one_pass_time * 1e6, per_index_time / one_pass_time)
+                ))
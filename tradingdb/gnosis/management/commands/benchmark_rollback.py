@@ -0,0 +1,148 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from tradingdb.chainevents.batch import (rollback_events_batch,
+                                         save_events_batch)
+from tradingdb.chainevents.event_receivers import (
+    MarketInstanceReceiver, OutcomeTokenInstanceReceiver)
+from tradingdb.relationaldb.models import (CategoricalEvent,
+                                           CategoricalEventDescription,
+                                           CentralizedOracle, Market, Order,
+                                           OutcomeToken, OutcomeTokenBalance)
+
+
+class Command(BaseCommand):
+    help = 'Compares the time needed to revert a chain reorg event by event against the block range rollback. ' \
+           'Test markets and events are created in a transaction rolled back at the end'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--markets', type=int, default=10, help='Markets traded')
+        parser.add_argument('--blocks', type=int, default=settings.ETH_BACKUP_BLOCKS, help='Reverted blocks')
+        parser.add_argument('--trades', type=int, default=5, help='Trades of every market in every block')
+        parser.add_argument('--transfers', type=int, default=5,
+                            help='Outcome token transfers of every market in every block')
+
+    def create_markets(self, n_markets, block_number):
+        now = timezone.now()
+        contract = {'factory': '{:040x}'.format(1), 'creator': '{:040x}'.format(2), 'creation_block': block_number,
+                    'creation_date_time': now}
+        markets = []
+        for i in range(n_markets):
+            description = CategoricalEventDescription.objects.create(
+                title='Market {}'.format(i), description='Benchmark', resolution_date=now + timedelta(days=1),
+                ipfs_hash='benchmark{}'.format(i), outcomes=['Yes', 'No'])
+            oracle = CentralizedOracle.objects.create(address='{:040x}'.format(3 * i + 10), owner=contract['creator'],
+                                                      event_description=description, **contract)
+            event = CategoricalEvent.objects.create(address='{:040x}'.format(3 * i + 11), oracle=oracle,
+                                                    collateral_token='{:040x}'.format(3), **contract)
+            for index in range(2):
+                OutcomeToken.objects.create(address='{:040x}'.format(10 ** 6 + 2 * i + index), event=event,
+                                            index=index)
+            markets.append(Market.objects.create(address='{:040x}'.format(3 * i + 12), event=event,
+                                                 market_maker='{:040x}'.format(4), fee=0, funding=10 ** 18,
+                                                 net_outcome_tokens_sold=[0, 0], revenue=0, collected_fees=0,
+                                                 trading_volume=0, marginal_prices=['0.5000', '0.5000'], stage=1,
+                                                 **Market.get_event_fields(event), **contract))
+        return markets
+
+    def get_events(self, markets, block_number, blocks, trades, transfers):
+        """
+        :return: list of (event receiver, decoded_event, block_info) of the kept block and the reverted ones
+        """
+        market_receiver = MarketInstanceReceiver()
+        outcome_token_receiver = OutcomeTokenInstanceReceiver()
+        holder = '{:040x}'.format(5)
+        receiver_events = []
+        for number in range(block_number, block_number + blocks + 1):
+            block = {'number': number, 'timestamp': time.time()}
+            for i, market in enumerate(markets):
+                outcome_token = '{:040x}'.format(10 ** 6 + 2 * i)
+                if number == block_number:
+                    receiver_events.append((outcome_token_receiver, {
+                        'name': 'Issuance',
+                        'address': outcome_token,
+                        'params': [{'name': 'owner', 'value': holder}, {'name': 'amount', 'value': 10 ** 20}],
+                    }, block))
+                    continue
+                for trade in range(trades):
+                    # Event by event rollback finds the orders by market, sender and block
+                    sender = '{:040x}'.format(10 ** 7 + trade)
+                    if trade % 3 == 2:
+                        receiver_events.append((market_receiver, {
+                            'name': 'OutcomeTokenSale',
+                            'address': market.address,
+                            'transaction_hash': '{:064x}'.format(len(receiver_events)),
+                            'params': [{'name': 'outcomeTokenProfit', 'value': 10 ** 15},
+                                       {'name': 'marketFees', 'value': 10 ** 13},
+                                       {'name': 'seller', 'value': sender},
+                                       {'name': 'outcomeTokenIndex', 'value': 0},
+                                       {'name': 'outcomeTokenCount', 'value': 10 ** 16}],
+                        }, block))
+                    else:
+                        receiver_events.append((market_receiver, {
+                            'name': 'OutcomeTokenPurchase',
+                            'address': market.address,
+                            'transaction_hash': '{:064x}'.format(len(receiver_events)),
+                            'params': [{'name': 'outcomeTokenCost', 'value': 10 ** 16},
+                                       {'name': 'marketFees', 'value': 10 ** 14},
+                                       {'name': 'buyer', 'value': sender},
+                                       {'name': 'outcomeTokenIndex', 'value': trade % 2},
+                                       {'name': 'outcomeTokenCount', 'value': 2 * 10 ** 16}],
+                        }, block))
+                for transfer in range(transfers):
+                    receiver_events.append((outcome_token_receiver, {
+                        'name': 'Transfer',
+                        'address': outcome_token,
+                        'params': [{'name': 'from', 'value': holder},
+                                   {'name': 'to', 'value': '{:040x}'.format(10 ** 8 + transfer)},
+                                   {'name': 'value', 'value': 10 ** 15}],
+                    }, block))
+        return receiver_events
+
+    @staticmethod
+    def get_state():
+        return (
+            list(Market.objects.order_by('address').values_list('address', 'net_outcome_tokens_sold',
+                                                                'marginal_prices', 'collected_fees',
+                                                                'trading_volume')),
+            Order.objects.count(),
+            list(OutcomeTokenBalance.objects.order_by('owner', 'outcome_token').values_list('owner', 'outcome_token',
+                                                                                            'balance')),
+            list(OutcomeToken.objects.order_by('address').values_list('address', 'total_supply')),
+        )
+
+    def handle(self, *args, markets, blocks, trades, transfers, **options):
+        block_number = 10 ** 8
+        with transaction.atomic():
+            receiver_events = self.get_events(self.create_markets(markets, block_number), block_number, blocks,
+                                              trades, transfers)
+            kept_events = [receiver_event for receiver_event in receiver_events
+                           if receiver_event[2]['number'] == block_number]
+            reverted_events = receiver_events[len(kept_events):]
+            save_events_batch(kept_events)
+            save_events_batch(reverted_events)
+
+            savepoint = transaction.savepoint()
+            start = time.time()
+            for receiver, decoded_event, block_info in reversed(reverted_events):
+                receiver.rollback(decoded_event, block_info)
+            per_event_time = time.time() - start
+            per_event_state = self.get_state()
+            transaction.savepoint_rollback(savepoint)
+
+            start = time.time()
+            rollback_events_batch(block_number, reverted_events)
+            block_range_time = time.time() - start
+
+            self.stdout.write(self.style.SUCCESS(
+                '{} events in {} blocks | per event: {:8.2f} ms | block range: {:8.2f} ms | speedup: {:5.1f}x | '
+                'identical state: {}'.format(len(reverted_events), blocks, per_event_time * 1e3,
+                                             block_range_time * 1e3, per_event_time / block_range_time,
+                                             per_event_state == self.get_state())
+            ))
+            transaction.set_rollback(True)
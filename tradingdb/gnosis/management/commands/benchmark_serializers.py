@@ -0,0 +1,88 @@
+import timeit
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from tradingdb.relationaldb.models import (CategoricalEvent,
+                                           CategoricalEventDescription,
+                                           CentralizedOracle, Market,
+                                           ScalarEvent, ScalarEventDescription)
+from tradingdb.restapi.flat_serializers import (
+    FlatCentralizedOracleSerializer, FlatEventSerializer, FlatMarketSerializer)
+from tradingdb.restapi.serializers import (CentralizedOracleSerializer,
+                                           EventSerializer, MarketSerializer)
+from tradingdb.restapi.views import (CentralizedOracleListView,
+                                     EventListView, MarketListView)
+
+
+class Command(BaseCommand):
+    help = 'Compares the time needed to fetch and serialize a page of the market, event and centralized oracle ' \
+           'lists with the nested serializers against the flat ones. Test markets are created in a transaction ' \
+           'rolled back at the end'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, nargs='+', default=[100, 200], help='Items of every page')
+        parser.add_argument('--number', type=int, default=20, help='Executions of every serialization')
+
+    def create_markets(self, n_markets):
+        now = timezone.now()
+        contract = {'factory': '{:040x}'.format(1), 'creator': '{:040x}'.format(2), 'creation_block': 1,
+                    'creation_date_time': now}
+        for i in range(n_markets):
+            if i % 2:
+                description = CategoricalEventDescription.objects.create(
+                    title='Market {}'.format(i), description='Benchmark', resolution_date=now + timedelta(days=i),
+                    ipfs_hash='benchmark{}'.format(i), outcomes=['Yes', 'No', 'Maybe'])
+            else:
+                description = ScalarEventDescription.objects.create(
+                    title='Market {}'.format(i), description='Benchmark', resolution_date=now + timedelta(days=i),
+                    ipfs_hash='benchmark{}'.format(i), unit='ETH', decimals=18)
+            oracle = CentralizedOracle.objects.create(address='{:040x}'.format(3 * i + 10), owner=contract['creator'],
+                                                      event_description=description, **contract)
+            event_fields = dict(address='{:040x}'.format(3 * i + 11), oracle=oracle,
+                                collateral_token='{:040x}'.format(3), **contract)
+            if i % 2:
+                event = CategoricalEvent.objects.create(**event_fields)
+            else:
+                event = ScalarEvent.objects.create(lower_bound=0, upper_bound=10 ** 20, **event_fields)
+            n_outcomes = 3 if i % 2 else 2
+            Market.objects.create(address='{:040x}'.format(3 * i + 12), event=event,
+                                  market_maker='{:040x}'.format(4), fee=0, funding=10 ** 18,
+                                  net_outcome_tokens_sold=[10 ** 18 * index for index in range(n_outcomes)],
+                                  revenue=0, collected_fees=0, trading_volume=10 ** 19,
+                                  marginal_prices=['{:.4f}'.format(1 / n_outcomes)] * n_outcomes,
+                                  **Market.get_event_fields(event), **contract)
+
+    def handle(self, *args, items, number, **options):
+        renderer = JSONRenderer()
+        lists = (
+            ('markets', MarketListView, MarketSerializer, FlatMarketSerializer),
+            ('events', EventListView, EventSerializer, FlatEventSerializer),
+            ('oracles', CentralizedOracleListView, CentralizedOracleSerializer, FlatCentralizedOracleSerializer),
+        )
+
+        with transaction.atomic():
+            self.create_markets(max(items))
+            for name, view_class, serializer_class, flat_serializer_class in lists:
+                queryset = view_class().get_queryset().order_by('address')
+                for n_items in items:
+                    def nested():
+                        return serializer_class(queryset[:n_items], many=True).data
+
+                    def flat():
+                        flat_serializer = flat_serializer_class()
+                        rows = queryset.values(*flat_serializer.get_fields())[:n_items]
+                        return flat_serializer.to_representation_many(rows)
+
+                    identical = renderer.render(nested()) == renderer.render(flat())
+                    nested_time = timeit.timeit(nested, number=number) / number
+                    flat_time = timeit.timeit(flat, number=number) / number
+                    self.stdout.write(self.style.SUCCESS(
+                        '{:>7} | {:>3} items | nested: {:8.2f} ms | flat: {:8.2f} ms | speedup: {:5.1f}x | '
+                        'identical JSON: {}'.format(name, n_items, nested_time * 1e3, flat_time * 1e3,
+                                                    nested_time / flat_time, identical)
+                    ))
+            transaction.set_rollback(True)
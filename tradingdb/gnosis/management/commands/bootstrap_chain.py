@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django_eth_events.models import Block, Daemon
+from django_eth_events.web3_service import Web3ServiceProvider
+
+from tradingdb.chainevents.bootstrap import BootstrapLoader
+
+
+class Command(BaseCommand):
+    help = 'Loads the logs of ETH_EVENTS of a block range in a new database with bulk COPY statements, then the ' \
+           'event listener goes on from the last loaded block. The event listener must be stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-block', type=int, required=False,
+                            help='First block loaded, by default the next block of the event listener')
+        parser.add_argument('--to-block', type=int, required=False,
+                            help='Last block loaded, by default the last block older than ETH_BACKUP_BLOCKS. '
+                                 'Loaded blocks cannot be reverted by the event listener')
+        parser.add_argument('--chunk-blocks', type=int, default=settings.ETH_FILTER_PROCESS_BLOCKS,
+                            help='Blocks loaded in every transaction')
+
+    def handle(self, *args, from_block, to_block, chunk_blocks, **options):
+        web3 = Web3ServiceProvider().web3
+        daemon = Daemon.get_solo()
+        if from_block is None:
+            from_block = daemon.block_number + 1
+        elif from_block <= daemon.block_number:
+            raise CommandError('Blocks until {} were already processed by the event listener'.format(
+                daemon.block_number))
+        if to_block is None:
+            to_block = web3.eth.blockNumber - settings.ETH_BACKUP_BLOCKS
+        if to_block < from_block:
+            self.stdout.write(self.style.SUCCESS('No blocks to load after block {}'.format(from_block - 1)))
+            return
+
+        start = time.time()
+
+        def report(chunk_from_block, chunk_to_block, processed):
+            elapsed = time.time() - start
+            self.stdout.write('Loaded {} logs of blocks {}-{} ({:.1f} blocks/s)'.format(
+                processed, chunk_from_block, chunk_to_block, (chunk_to_block - from_block + 1) / elapsed))
+
+        processed = BootstrapLoader(web3, chunk_blocks=chunk_blocks).load(from_block, to_block, callback=report)
+
+        with transaction.atomic():
+            # Blocks before the loaded ones cannot be reverted either
+            Block.objects.all().delete()
+            daemon = Daemon.get_solo()
+            daemon.block_number = to_block
+            daemon.save()
+
+        self.stdout.write(self.style.SUCCESS('Loaded {} logs between blocks {} and {} in {:.1f}s, the event listener '
+                                             'goes on at block {}'.format(processed, from_block, to_block,
+                                                                          time.time() - start, to_block + 1)))
@@ -1,20 +1,161 @@
+import heapq
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from cProfile import Profile
 from datetime import timedelta
-from decimal import Decimal
-from operator import itemgetter
+from decimal import ROUND_HALF_EVEN, Decimal, localcontext
+from itertools import chain
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.db.models import Count, F
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
 from django.utils import timezone
 from django_eth_events.utils import normalize_address_without_0x
 
 from tradingdb.relationaldb.models import (Event, Market, Order,
-                                           OutcomeTokenBalance,
+                                           OutcomeToken, OutcomeTokenBalance,
                                            TournamentParticipant,
                                            TournamentWhitelistedCreator)
+from tradingdb.relationaldb.scoreboard import apply_deferred_touches
 
 OUTCOME_RANGE = 1000000
+# Precision of the decimal operations done to calculate the predicted profits
+DECIMAL_PRECISION = 100
+# Max number of users updated by every UPDATE statement, Postgres supports up to 65535 parameters per query
+STORE_BATCH_SIZE = 5000
+
+# Values are joined with the participants table, old `current_rank` is used to set `past_rank` and `diff_rank`
+STORE_SCOREBOARD_QUERY = """
+UPDATE {table} AS participant SET
+    past_rank = participant.current_rank,
+    current_rank = scoreboard.current_rank::integer,
+    diff_rank = participant.current_rank - scoreboard.current_rank::integer,
+    score = scoreboard.score::numeric,
+    predicted_profit = scoreboard.predicted_profit::numeric,
+    predictions = scoreboard.predictions::integer
+FROM (VALUES {values}) AS scoreboard(address, current_rank, score, predicted_profit, predictions)
+WHERE participant.address = scoreboard.address
+"""
+
+# Database engine, calculates and stores the whole scoreboard with one statement. Same logic as
+# `calculate_users_predicted_values`, decimals are rounded half to even as Django does when saving them and users
+# are ranked by their rounded scores
+CALCULATE_SCOREBOARD_QUERY = """
+WITH whitelisted_events AS (
+    SELECT event.address,
+           event.is_winning_outcome_set,
+           event.outcome,
+           categorical_event.event_ptr_id IS NOT NULL AS is_categorical,
+           scalar_event.event_ptr_id IS NOT NULL AS is_scalar,
+           scalar_event.lower_bound,
+           scalar_event.upper_bound,
+           (SELECT COUNT(*) FROM relationaldb_outcometoken AS outcome_token
+            WHERE outcome_token.event_address = event.address) AS outcome_count,
+           (SELECT MIN(market.address) FROM relationaldb_market AS market
+            WHERE market.event_address = event.address) AS market_address
+    FROM relationaldb_event AS event
+    LEFT JOIN relationaldb_categoricalevent AS categorical_event ON categorical_event.event_ptr_id = event.address
+    LEFT JOIN relationaldb_scalarevent AS scalar_event ON scalar_event.event_ptr_id = event.address
+    WHERE event.creator IN (SELECT address FROM relationaldb_tournamentwhitelistedcreator WHERE enabled)
+), participants AS (
+    SELECT participant.address, participant.current_rank, participant_balance.balance
+    FROM relationaldb_tournamentparticipant AS participant
+    JOIN relationaldb_tournamentparticipantbalance AS participant_balance
+        ON participant_balance.participant_address = participant.address
+    WHERE participant.created <= %(created)s
+), whitelisted_orders AS (
+    SELECT "order".*
+    FROM relationaldb_order AS "order"
+    JOIN relationaldb_market AS market ON market.address = "order".market_address
+    JOIN whitelisted_events AS event ON event.address = market.event_address
+    WHERE "order".sender IN (SELECT address FROM participants)
+), latest_orders AS (
+    SELECT DISTINCT ON ("order".market_address, "order".sender)
+           "order".market_address, "order".sender, "order".marginal_prices, outcome_token.index AS outcome_token_index
+    FROM whitelisted_orders AS "order"
+    LEFT JOIN relationaldb_outcometoken AS outcome_token ON outcome_token.address = "order".outcome_token_address
+    ORDER BY "order".market_address, "order".sender, "order".creation_date_time DESC
+), participations AS (
+    SELECT sender, COUNT(DISTINCT market_address) AS predictions
+    FROM whitelisted_orders
+    GROUP BY sender
+), outcome_token_values AS (
+    SELECT outcome_token_balance.owner,
+           -- Balances are casted to a big scale so divisions keep, at least, the precision of Python decimals
+           CASE
+               WHEN event.is_winning_outcome_set THEN
+                   CASE
+                       WHEN event.is_categorical AND outcome_token.index = event.outcome
+                           THEN outcome_token_balance.balance
+                       WHEN event.is_scalar AND outcome_token.index = 0
+                           THEN outcome_token_balance.balance::numeric(120, 40)
+                                * (%(outcome_range)s - scalar_outcome.converted) / %(outcome_range)s
+                       WHEN event.is_scalar AND outcome_token.index = 1
+                           THEN outcome_token_balance.balance::numeric(120, 40)
+                                * scalar_outcome.converted / %(outcome_range)s
+                       ELSE 0
+                   END
+               WHEN latest_order.sender IS NOT NULL
+                   THEN outcome_token_balance.balance::numeric(120, 40)
+                        * latest_order.marginal_prices[latest_order.outcome_token_index + 1]
+               -- Bought all outcomes
+               WHEN event.is_categorical
+                   THEN outcome_token_balance.balance::numeric(120, 40) / event.outcome_count
+               WHEN event.is_scalar
+                   THEN outcome_token_balance.balance::numeric(120, 40) * 0.5
+           END AS value
+    FROM relationaldb_outcometokenbalance AS outcome_token_balance
+    JOIN relationaldb_outcometoken AS outcome_token
+        ON outcome_token.address = outcome_token_balance.outcome_token_address
+    JOIN whitelisted_events AS event ON event.address = outcome_token.event_address
+    CROSS JOIN LATERAL (
+        SELECT CASE
+                   WHEN event.outcome < 0 THEN 0
+                   WHEN event.outcome > event.upper_bound THEN %(outcome_range)s
+                   ELSE %(outcome_range)s::numeric(120, 40) * (event.outcome - event.lower_bound)
+                        / (event.upper_bound - event.lower_bound)
+               END AS converted
+    ) AS scalar_outcome
+    LEFT JOIN latest_orders AS latest_order
+        ON latest_order.sender = outcome_token_balance.owner AND latest_order.market_address = event.market_address
+    WHERE outcome_token_balance.balance > 0
+      AND outcome_token_balance.owner IN (SELECT address FROM participants)
+), scores AS (
+    SELECT participant.address,
+           participant.current_rank,
+           COALESCE(participation.predictions, 0) AS predictions,
+           COALESCE(SUM(outcome_token_value.value), 0) AS predicted_profit,
+           participant.balance + COALESCE(SUM(outcome_token_value.value), 0) AS score
+    FROM participants AS participant
+    LEFT JOIN outcome_token_values AS outcome_token_value ON outcome_token_value.owner = participant.address
+    LEFT JOIN participations AS participation ON participation.sender = participant.address
+    GROUP BY participant.address, participant.current_rank, participant.balance, participation.predictions
+), rounded_scores AS (
+    -- ROUND rounds halves away from zero, halves are rounded to the even neighbour (also negative values)
+    SELECT address,
+           current_rank,
+           predictions,
+           CASE WHEN ABS(predicted_profit - TRUNC(predicted_profit)) = 0.5 THEN 2 * ROUND(predicted_profit / 2)
+                ELSE ROUND(predicted_profit) END AS predicted_profit,
+           CASE WHEN ABS(score - TRUNC(score)) = 0.5 THEN 2 * ROUND(score / 2)
+                ELSE ROUND(score) END AS score
+    FROM scores
+), scoreboard AS (
+    -- Ties keep the previous ranking order, then the address order, as in the Python engine: ranks are sequential
+    SELECT rounded_scores.*, ROW_NUMBER() OVER (ORDER BY score DESC, current_rank, address) AS rank
+    FROM rounded_scores
+)
+UPDATE relationaldb_tournamentparticipant AS participant SET
+    past_rank = participant.current_rank,
+    current_rank = scoreboard.rank,
+    diff_rank = participant.current_rank - scoreboard.rank,
+    score = scoreboard.score,
+    predicted_profit = scoreboard.predicted_profit,
+    predictions = scoreboard.predictions
+FROM scoreboard
+WHERE participant.address = scoreboard.address
+"""
 
 
 class Command(BaseCommand):
@@ -27,6 +168,21 @@ class Command(BaseCommand):
             dest='profile',
             help='Show cProfile information',
         )
+        parser.add_argument(
+            '--engine',
+            choices=('python', 'database'),
+            default='python',
+            dest='engine',
+            help='python loads balances and orders and calculates the scores in Python, database calculates and '
+                 'stores the whole scoreboard with one query',
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            dest='incremental',
+            help='Only recalculate the participants touched since the last run, see relationaldb/scoreboard.py. '
+                 'Not supported by the database engine, which always recalculates everyone',
+        )
 
     def __init__(self, *args, **kwargs):
         super().__init__(args, kwargs)
@@ -42,45 +198,69 @@ class Command(BaseCommand):
         )
         self.stdout.write(self.style.SUCCESS('Reset TournamentParticipant data'))
 
+    @contextmanager
+    def timing(self, name):
+        """Adds the time spent in the block to the timing breakdown"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - start
+
+    @contextmanager
+    def count_queries(self):
+        """Counts the queries executed in the block"""
+        counter = {'count': 0}
+
+        def count_query(execute, sql, params, many, context):
+            counter['count'] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            yield counter
+
     def store_scoreboard(self, users_predicted_values):
-        """Updates the all the users values and calculates the scoreboard (rankings)"""
+        """Updates the users values and rankings, one `UPDATE ... FROM (VALUES ...)` per `STORE_BATCH_SIZE` users"""
         self.stdout.write(self.style.SUCCESS('Starting updating users values {}'.format(timezone.now().strftime("%Y-%m-%d %H:%M:%S"))))
-        with transaction.atomic():
-            for index, user_predicted_value in enumerate(users_predicted_values):
-                try:
-                    current_rank = index + 1
-                    TournamentParticipant.objects.filter(address=user_predicted_value['address']).update(
-                        past_rank=F('current_rank'),
-                        predicted_profit=user_predicted_value['predicted_profit'],
-                        predictions=user_predicted_value['predictions'],
-                        score=user_predicted_value['score'],
-                        current_rank=current_rank,
-                        diff_rank=F('current_rank') - current_rank,
-                    )
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR('Scoreboard Error: Was not possible updating user {} due to: {}'.format(user_predicted_value['address'],
-                                                                                                                               e)))
-        self.stdout.write(self.style.SUCCESS('Users updated successfully'))
+        # Values are prepared by the model fields, so decimals are rounded as in `Model.save()`
+        fields = [TournamentParticipant._meta.get_field(field_name)
+                  for field_name in ('current_rank', 'score', 'predicted_profit', 'predictions')]
+        rows = [
+            [user_predicted_value['address']] + [
+                field.get_db_prep_save(user_predicted_value['rank' if field.name == 'current_rank' else field.name],
+                                       connection)
+                for field in fields
+            ] for user_predicted_value in users_predicted_values
+        ]
+
+        table = connection.ops.quote_name(TournamentParticipant._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            for i in range(0, len(rows), STORE_BATCH_SIZE):
+                batch = rows[i:i + STORE_BATCH_SIZE]
+                cursor.execute(STORE_SCOREBOARD_QUERY.format(table=table,
+                                                             values=', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))),
+                               list(chain.from_iterable(batch)))
+        self.stdout.write(self.style.SUCCESS('{} users updated successfully'.format(len(rows))))
 
     @staticmethod
-    def calculate_scalar_event_value(event, outcome_token_balance):
-        lower_bound = event.scalarevent.lower_bound
-        upper_bound = event.scalarevent.upper_bound
-        if event.outcome < 0:
+    def calculate_scalar_event_value(event_info, outcome_token_index, balance):
+        lower_bound = event_info['lower_bound']
+        upper_bound = event_info['upper_bound']
+        outcome = event_info['outcome']
+        if outcome < 0:
             converted_winning_outcome = 0
-        elif event.outcome > upper_bound:
+        elif outcome > upper_bound:
             converted_winning_outcome = OUTCOME_RANGE
         else:
-            converted_winning_outcome = OUTCOME_RANGE * (event.outcome - lower_bound) / (upper_bound - lower_bound)
+            converted_winning_outcome = OUTCOME_RANGE * (outcome - lower_bound) / (upper_bound - lower_bound)
 
         factor_short = OUTCOME_RANGE - converted_winning_outcome
         factor_long = OUTCOME_RANGE - factor_short
 
-        outcome_token_index = outcome_token_balance.outcome_token.index
         if outcome_token_index == 0:
-            return outcome_token_balance.balance * factor_short / OUTCOME_RANGE
+            return balance * factor_short / OUTCOME_RANGE
         elif outcome_token_index == 1:
-            return outcome_token_balance.balance * factor_long / OUTCOME_RANGE
+            return balance * factor_long / OUTCOME_RANGE
         else:
             return 0
 
@@ -91,62 +271,235 @@ class Command(BaseCommand):
             profiler = Profile()
             profiler.runcall(self._handle, *args, **options)
             profiler.print_stats()
+            self.stdout.write(self.style.SUCCESS('Queries done inside the predicted values loop: {}'.format(
+                self.queries_in_loop)))
         else:
             self._handle(*args, **options)
 
     def _handle(self, *args, **options):
+        if options.get('engine') == 'database' and options.get('incremental'):
+            raise CommandError('--incremental is not supported by the database engine')
+
         start_time = timezone.now()
+        self.timings = OrderedDict()
+        self.queries_in_loop = 0
         self.stdout.write(self.style.SUCCESS('Starting Scoreboard process, {}'.format(start_time.strftime("%Y-%m-%d %H:%M:%S"))))
 
         try:
-            # Get the whitelisted markets creators
-            whitelisted_creators = TournamentWhitelistedCreator.objects.filter(enabled=True).values_list('address',
-                                                                                                         flat=True)
-            # Get the whitelisted event addresses
-            event_addresses = Event.objects.filter(creator__in=whitelisted_creators).values_list('address', flat=True)
-
-            # Get the market addresses for the whitelisted events
-            market_addresses = Market.objects.filter(event__in=event_addresses).values_list('address', flat=True)
-
             # Get users created until the last minute (to prevent reorgs)
+            created_until = timezone.now() - timedelta(minutes=1)
             users = TournamentParticipant.objects.filter(
-                created__lte=timezone.now() - timedelta(minutes=1)
+                created__lte=created_until
             ).select_related('tournament_balance')
 
-            users_addresses = users.values_list('address', flat=True)
+            # Touches deferred by the partitioned ingestion, also if it stopped before applying them. Touches done
+            # after this point are processed by the next run
+            apply_deferred_touches()
+            touches = dict(users.filter(scoreboard_touched__isnull=False).values_list('address', 'scoreboard_touched'))
+
+            if options.get('engine') == 'database':
+                with transaction.atomic():
+                    with self.timing('calculate and store'):
+                        self.calculate_scoreboard_in_database(created_until)
+                    with self.timing('clear touches'):
+                        self.clear_touches(touches)
+                return
+
+            if options.get('incremental'):
+                touched_users = users.filter(address__in=list(touches))
+                self.stdout.write(self.style.SUCCESS('Recalculating {} touched users'.format(len(touches))))
+                with self.timing('calculate'):
+                    users_predicted_values = self.calculate_users_predicted_values(touched_users)
+                with self.timing('rank'):
+                    ranked_scoreboard = self.rank_incremental_scoreboard(users, users_predicted_values)
+            else:
+                with self.timing('calculate'):
+                    users_predicted_values = self.calculate_users_predicted_values(users)
+                with self.timing('rank'):
+                    ranked_scoreboard = self.rank_scoreboard(users_predicted_values)
 
-            all_outcome_token_balances = OutcomeTokenBalance.objects.filter(
-                owner__in=users_addresses,
-                outcome_token__event__address__in=event_addresses,
-                balance__gt=0
-            ).select_related(
-                'outcome_token__event__categoricalevent',
-                'outcome_token__event__scalarevent',
-            ).prefetch_related('outcome_token__event__markets')
+            # Store scoreboard
+            with transaction.atomic():
+                with self.timing('store'):
+                    self.store_scoreboard(ranked_scoreboard)
+                with self.timing('clear touches'):
+                    self.clear_touches(touches)
+        except Exception as e:
+            self.stdout.write(self.style.ERROR("Scoreboard Error: {}".format(e)))
+            raise e
+        finally:
+            end_time = timezone.now()
+            delta = end_time - start_time
+            total_seconds = delta.total_seconds()
+            benchmark = divmod(total_seconds, 60)
+            self.stdout.write(self.style.SUCCESS('Scoreboard calculation took {} minutes and {} seconds'.format(benchmark[0],
+                                                                                                                benchmark[1])))
+            self.stdout.write(self.style.SUCCESS('Timing breakdown: {}'.format(
+                ' | '.join('{} {:.3f}s'.format(name, seconds) for name, seconds in self.timings.items())
+            )))
+
+    def calculate_scoreboard_in_database(self, created_until):
+        """
+        Calculates and stores the values and rankings of the users with `CALCULATE_SCOREBOARD_QUERY`
+        :param created_until: only users created before are ranked
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(CALCULATE_SCOREBOARD_QUERY, {'created': created_until, 'outcome_range': OUTCOME_RANGE})
+            self.stdout.write(self.style.SUCCESS('{} users updated successfully'.format(cursor.rowcount)))
 
-            all_outcome_token_balances_dict = {}
-            for outcome_token_balance in all_outcome_token_balances:
-                all_outcome_token_balances_dict.setdefault(outcome_token_balance.owner, []).append(outcome_token_balance)
+    @staticmethod
+    def round_stored_value(value) -> Decimal:
+        """
+        :return: value rounded half to even to units, as Django saves the score and predicted profit
+        """
+        return Decimal(value).quantize(Decimal(1), rounding=ROUND_HALF_EVEN)
 
-            all_orders = Order.objects.filter(
-                sender__in=users_addresses,
-                market__in=market_addresses,
-            ).prefetch_related('market')
+    @staticmethod
+    def get_sort_key(user_predicted_value):
+        # Ties keep the previous ranking order, then the address order
+        return -user_predicted_value['score'], user_predicted_value['previous_rank'], user_predicted_value['address']
+
+    def rank_scoreboard(self, users_predicted_values):
+        """Sorts every user by score and sets the rank"""
+        sorted_scoreboard = sorted(users_predicted_values, key=self.get_sort_key)
+        for index, user_predicted_value in enumerate(sorted_scoreboard):
+            user_predicted_value['rank'] = index + 1
+        return sorted_scoreboard
+
+    def rank_incremental_scoreboard(self, users, users_predicted_values):
+        """
+        Merges the recalculated users into the ranking of the untouched ones, already sorted by the database
+        :return: users whose values or rank change
+        """
+        touched_addresses = [user_predicted_value['address'] for user_predicted_value in users_predicted_values]
+        untouched_users = users.exclude(address__in=touched_addresses).order_by(
+            '-score', 'current_rank', 'address'
+        ).values_list('address', 'score', 'predicted_profit', 'predictions', 'current_rank', 'past_rank')
+        untouched_predicted_values = (
+            {
+                'address': address,
+                'predicted_profit': predicted_profit,
+                'predictions': predictions,
+                'score': score,
+                'previous_rank': current_rank,
+                'past_rank': past_rank,
+            } for address, score, predicted_profit, predictions, current_rank, past_rank in untouched_users.iterator()
+        )
 
-            # Participations of user in different markets
-            distinct_participations = all_orders.values('sender').annotate(number_predictions=Count('market',
-                                                                                                    distinct=True))
-            # Get orders for every user, if there's more than one for a market just the latest one
-            latest_orders = all_orders.distinct('market', 'sender').order_by('market', 'sender', '-creation_date_time')
+        changed_scoreboard = []
+        for index, user_predicted_value in enumerate(heapq.merge(sorted(users_predicted_values, key=self.get_sort_key),
+                                                                 untouched_predicted_values,
+                                                                 key=self.get_sort_key)):
+            user_predicted_value['rank'] = index + 1
+            # Untouched users are only updated if their rank changes or the last rank difference must be cleared
+            if 'past_rank' not in user_predicted_value or \
+                    user_predicted_value['previous_rank'] != user_predicted_value['rank'] or \
+                    user_predicted_value['past_rank'] != user_predicted_value['previous_rank']:
+                changed_scoreboard.append(user_predicted_value)
+        return changed_scoreboard
 
-            latest_orders_dict = {}
-            for latest_order in latest_orders:
-                latest_orders_dict.setdefault(latest_order.sender, []).append(latest_order)
+    @staticmethod
+    def clear_touches(touches):
+        """
+        Clears the touches processed. Participants touched again during the run keep a different touch time
+        :param touches: dictionary of address -> touch time
+        """
+        addresses_by_touch = {}
+        for address, touched in touches.items():
+            addresses_by_touch.setdefault(touched, []).append(address)
+        for touched, addresses in addresses_by_touch.items():
+            TournamentParticipant.objects.filter(address__in=addresses,
+                                                 scoreboard_touched=touched).update(scoreboard_touched=None)
 
-            user_with_participations = {}
-            for participation in distinct_participations:
-                user_with_participations[participation['sender']] = participation['number_predictions']
+    @staticmethod
+    def get_events_info(event_addresses):
+        """
+        :param event_addresses: queryset of event addresses
+        :return: dictionary of event address -> type, outcome, scalar bounds, number of outcomes and first market
+        """
+        events_info = {}
+        for address, is_winning_outcome_set, outcome, categorical_event, scalar_event, lower_bound, upper_bound in \
+                Event.objects.filter(address__in=event_addresses).values_list('address', 'is_winning_outcome_set',
+                                                                              'outcome', 'categoricalevent',
+                                                                              'scalarevent', 'scalarevent__lower_bound',
+                                                                              'scalarevent__upper_bound'):
+            events_info[address] = {
+                'is_categorical': categorical_event is not None,
+                'is_scalar': scalar_event is not None,
+                'is_winning_outcome_set': is_winning_outcome_set,
+                'outcome': outcome,
+                'lower_bound': lower_bound,
+                'upper_bound': upper_bound,
+                'outcome_count': 0,
+                'market': None,
+            }
+
+        for event_address, outcome_count in OutcomeToken.objects.filter(
+                event__in=event_addresses).values('event').annotate(count=Count('address')).values_list('event',
+                                                                                                        'count'):
+            events_info[event_address]['outcome_count'] = outcome_count
+
+        # Same market as `event.markets.first()`, lowest primary key
+        for event_address, market_address in Market.objects.filter(event__in=event_addresses).order_by(
+                'event', 'address').distinct('event').values_list('event', 'address'):
+            events_info[event_address]['market'] = market_address
+
+        return events_info
+
+    def calculate_users_predicted_values(self, users):
+        """
+        Calculates the predicted profit and score of the users. Everything is loaded before iterating the users, so
+        no query is done inside the loop
+        :param users: queryset of TournamentParticipant
+        :return: list of dictionaries
+        """
+        # Get the whitelisted markets creators
+        whitelisted_creators = TournamentWhitelistedCreator.objects.filter(enabled=True).values_list('address',
+                                                                                                     flat=True)
+        # Get the whitelisted event addresses
+        event_addresses = Event.objects.filter(creator__in=whitelisted_creators).values_list('address', flat=True)
+
+        # Get the market addresses for the whitelisted events
+        market_addresses = Market.objects.filter(event__in=event_addresses).values_list('address', flat=True)
+
+        users_addresses = users.values_list('address', flat=True)
+
+        events_info = self.get_events_info(event_addresses)
+
+        # owner -> [(event address, outcome token index, balance)]
+        all_outcome_token_balances_dict = {}
+        for owner, event_address, outcome_token_index, balance in OutcomeTokenBalance.objects.filter(
+            owner__in=users_addresses,
+            outcome_token__event__address__in=event_addresses,
+            balance__gt=0
+        ).values_list('owner', 'outcome_token__event', 'outcome_token__index', 'balance'):
+            all_outcome_token_balances_dict.setdefault(owner, []).append((event_address, outcome_token_index, balance))
+
+        all_orders = Order.objects.filter(
+            sender__in=users_addresses,
+            market__in=market_addresses,
+        )
 
+        # Participations of user in different markets
+        distinct_participations = all_orders.values('sender').annotate(number_predictions=Count('market',
+                                                                                                distinct=True))
+        # Get orders for every user, if there's more than one for a market just the latest one
+        latest_orders = all_orders.distinct('market', 'sender').order_by('market', 'sender', '-creation_date_time')
+
+        # (sender, market address) -> (outcome token index, marginal prices)
+        latest_orders_dict = {}
+        for sender, market_address, outcome_token_index, marginal_prices in latest_orders.values_list(
+                'sender', 'market', 'outcome_token__index', 'marginal_prices'):
+            latest_orders_dict[(sender, market_address)] = (outcome_token_index, marginal_prices)
+
+        user_with_participations = {}
+        for participation in distinct_participations:
+            user_with_participations[participation['sender']] = participation['number_predictions']
+
+        users = list(users)
+        # Default precision (28 digits) loses units when big balances are multiplied by the scalar factors
+        with self.count_queries() as loop_queries, localcontext() as context:
+            context.prec = DECIMAL_PRECISION
             users_predicted_values = []
             for user in users:
                 # Get balance
@@ -159,51 +512,40 @@ class Command(BaseCommand):
                 user_outcome_token_balances = all_outcome_token_balances_dict.get(user_address, [])
 
                 predicted_value = 0
-                for outcome_token_balance in user_outcome_token_balances:
-                    market = outcome_token_balance.outcome_token.event.markets.first()
-                    event = outcome_token_balance.outcome_token.event
-                    if event.is_winning_outcome_set:
-                        outcome_token_index = outcome_token_balance.outcome_token.index
-                        if event.is_categorical() and outcome_token_index == event.outcome:
-                            predicted_value += outcome_token_balance.balance
-                        elif event.is_scalar():
-                            predicted_value += self.calculate_scalar_event_value(event, outcome_token_balance)
+                for event_address, outcome_token_index, outcome_token_balance in user_outcome_token_balances:
+                    event_info = events_info[event_address]
+                    if event_info['is_winning_outcome_set']:
+                        if event_info['is_categorical'] and outcome_token_index == event_info['outcome']:
+                            predicted_value += outcome_token_balance
+                        elif event_info['is_scalar']:
+                            predicted_value += self.calculate_scalar_event_value(event_info, outcome_token_index,
+                                                                                 outcome_token_balance)
 
                     else:
-                        try:
-                            order = next(user_market_order for user_market_order in latest_orders_dict.get(user_address)
-                                         if user_market_order.market_id == market.address)
-                            outcome_token_index = order.outcome_token.index
-                            marginal_price = order.marginal_prices[outcome_token_index]
-                            predicted_value += (outcome_token_balance.balance * marginal_price)
-                        except StopIteration:
+                        latest_order = latest_orders_dict.get((user_address, event_info['market']))
+                        if latest_order:
+                            order_outcome_token_index, marginal_prices = latest_order
+                            marginal_price = marginal_prices[order_outcome_token_index]
+                            predicted_value += (outcome_token_balance * marginal_price)
+                        else:
                             # Bought all outcomes
-                            if event.is_categorical():
-                                marginal_price = Decimal(1 / event.outcome_tokens.count())
-                            elif event.is_scalar():
+                            if event_info['is_categorical']:
+                                marginal_price = Decimal(1) / event_info['outcome_count']
+                            elif event_info['is_scalar']:
                                 marginal_price = Decimal(0.5)
                             else:
                                 raise ValueError('Event is neither categorical nor scalar')
-                            predicted_value += outcome_token_balance.balance * marginal_price
+                            predicted_value += outcome_token_balance * marginal_price
 
+                # Rounded as stored, so recalculated users are ranked like the stored ones by the incremental mode
                 users_predicted_values.append({
                     'balance': balance,
-                    'predicted_profit': predicted_value,
+                    'predicted_profit': self.round_stored_value(predicted_value),
                     'predictions': predictions,
-                    'score': predicted_value + balance,
-                    'address': user.address
+                    'score': self.round_stored_value(predicted_value + balance),
+                    'address': user.address,
+                    'previous_rank': user.current_rank,
                 })
 
-            sorted_scoreboard = sorted(users_predicted_values, key=itemgetter('score'), reverse=True)
-            # Store scoreboard
-            self.store_scoreboard(sorted_scoreboard)
-        except Exception as e:
-            self.stdout.write(self.style.ERROR("Scoreboard Error: {}".format(e)))
-            raise e
-        finally:
-            end_time = timezone.now()
-            delta = end_time - start_time
-            total_seconds = delta.total_seconds()
-            benchmark = divmod(total_seconds, 60)
-            self.stdout.write(self.style.SUCCESS('Scoreboard calculation took {} minutes and {} seconds'.format(benchmark[0],
-                                                                                                                benchmark[1])))
+        self.queries_in_loop = self.queries_in_loop + loop_queries['count']
+        return users_predicted_values
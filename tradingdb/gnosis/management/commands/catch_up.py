@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django_eth_events.models import Block, Daemon
+from django_eth_events.web3_service import Web3ServiceProvider
+
+from tradingdb.chainevents.catch_up import CatchUpRunner, Checkpoint
+from tradingdb.chainevents.event_listener import listener_lock
+
+
+class DaemonCheckpoint(Checkpoint):
+    """
+    The block of the event listener, it goes on from the last block saved by the catch-up. Set in the transaction of
+    every chunk, with the blocks stored by the event listener: they are older than the saved blocks and cannot be
+    reverted anymore. Until the first chunk is committed the event listener can still revert them
+    """
+    def get(self) -> int:
+        return Daemon.get_solo().block_number
+
+    def set(self, block_number: int):
+        Block.objects.all().delete()
+        daemon = Daemon.get_solo()
+        daemon.block_number = block_number
+        # Other fields of the daemon are owned by the event listener
+        daemon.save(update_fields=['block_number'])
+
+
+class Command(BaseCommand):
+    help = 'Saves the blocks after the last block processed by the event listener in chunks, committing every chunk ' \
+           'with the block of the event listener, and reports blocks/s, logs/s and ETA. If stopped it goes on from ' \
+           'the last chunk committed. It takes the lock of the event listener, and stops if the listener is running'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to-block', type=int, required=False,
+                            help='Last block saved, by default the last block older than ETH_BACKUP_BLOCKS. Saved '
+                                 'blocks cannot be reverted by the event listener')
+        parser.add_argument('--chunk-blocks', type=int, default=settings.ETH_FILTER_PROCESS_BLOCKS,
+                            help='Blocks committed together')
+        parser.add_argument('--stats-file', required=False,
+                            help='CSV file with the blocks, logs and seconds of every chunk')
+        parser.add_argument('--workers', type=int, nargs='?', const=settings.INGESTION_WORKERS, required=False,
+                            help='Saves every chunk with a pool of workers (INGESTION_WORKERS if no number is '
+                                 'given), partitioned by oracle. A chunk is committed in several transactions, if '
+                                 'stopped in the middle of one it is reverted by the next run')
+
+    def handle(self, *args, **options):
+        # The checkpoint deletes the blocks of the listener and moves its block, they can't run together
+        with listener_lock() as acquired:
+            if not acquired:
+                raise CommandError('The event listener lock is held, stop the event listener (or db_dump) first')
+            self.catch_up(**options)
+
+    def catch_up(self, to_block, chunk_blocks, stats_file, workers, **options):
+        web3 = Web3ServiceProvider().web3
+        checkpoint = DaemonCheckpoint()
+        if to_block is None:
+            to_block = web3.eth.blockNumber - settings.ETH_BACKUP_BLOCKS
+        if to_block <= checkpoint.get():
+            self.stdout.write(self.style.SUCCESS('Blocks until {} were already processed'.format(checkpoint.get())))
+            return
+
+        runner = CatchUpRunner(web3, checkpoint, chunk_blocks=chunk_blocks, workers=workers)
+        try:
+            progress = runner.run(to_block, callback=lambda progress: self.stdout.write(progress.get_report()))
+        finally:
+            if stats_file and runner.progress is not None:
+                runner.progress.write_csv(stats_file)
+
+        seconds = sum(chunk.seconds for chunk in progress.chunks)
+        self.stdout.write(self.style.SUCCESS(
+            'Saved {} logs of blocks {}-{} in {:.1f}s ({:.1f} blocks/s), the event listener goes on at block {}'.format(
+                sum(chunk.logs for chunk in progress.chunks), progress.from_block, to_block, seconds,
+                (to_block - progress.from_block + 1) / seconds if seconds else 0, to_block + 1)))
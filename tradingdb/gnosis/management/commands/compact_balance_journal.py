@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django_eth_events.models import Daemon
+
+from tradingdb.relationaldb.balance_journal import compact_balance_journal
+
+
+class Command(BaseCommand):
+    help = 'Compacts the outcome token balance journal, the deltas of every balance in blocks that cannot be ' \
+           'reverted anymore are replaced by their sum'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--block-number', type=int, required=False,
+                            help='Compact the deltas before this block, by default the last processed block minus '
+                                 'ETH_BACKUP_BLOCKS')
+
+    def handle(self, *args, block_number, **options):
+        if block_number is None:
+            block_number = Daemon.get_solo().block_number - settings.ETH_BACKUP_BLOCKS
+
+        with transaction.atomic():
+            compacted_balances = compact_balance_journal(block_number)
+        self.stdout.write(self.style.SUCCESS('Compacted {} balances before block {}'.format(compacted_balances,
+                                                                                        block_number)))
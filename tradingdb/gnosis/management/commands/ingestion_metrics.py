@@ -0,0 +1,36 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tradingdb.chainevents.instrumentation import (get_report_lines,
+                                                   read_metrics_dir,
+                                                   render_prometheus)
+
+
+class Command(BaseCommand):
+    help = 'Reports the time, database queries and invalid logs of every event receiver, merging the metrics ' \
+           'written by every process to INGESTION_METRICS_DIR (INGESTION_METRICS must be enabled)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prometheus', action='store_true', help='Print metrics in Prometheus text format')
+        parser.add_argument('--reset', action='store_true', help='Remove the metrics files after the report')
+
+    def handle(self, *args, prometheus, reset, **options):
+        metrics_dir = settings.INGESTION_METRICS_DIR
+        if not metrics_dir:
+            raise CommandError('INGESTION_METRICS_DIR is not configured')
+        if not os.path.isdir(metrics_dir):
+            raise CommandError('No metrics found in {}'.format(metrics_dir))
+
+        metrics = read_metrics_dir(metrics_dir)
+        if prometheus:
+            self.stdout.write(render_prometheus(metrics), ending='')
+        else:
+            for line in get_report_lines(metrics):
+                self.stdout.write(line)
+
+        if reset:
+            for file_name in os.listdir(metrics_dir):
+                if file_name.endswith('.prom'):
+                    os.remove(os.path.join(metrics_dir, file_name))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django_eth_events.models import Daemon
+from django_eth_events.web3_service import Web3ServiceProvider
+
+from tradingdb.chainevents.event_descriptions import (
+    get_ipfs_hashes, resolve_event_descriptions)
+
+
+class Command(BaseCommand):
+    help = 'Saves the IPFS event descriptions referenced by the logs of the next blocks, before the event listener ' \
+           'processes them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-block', type=int, required=False,
+                            help='First block scanned, by default the next block of the event listener')
+        parser.add_argument('--blocks', type=int, default=settings.ETH_FILTER_PROCESS_BLOCKS,
+                            help='Max number of blocks scanned')
+
+    def handle(self, *args, from_block, blocks, **options):
+        web3 = Web3ServiceProvider().web3
+        if from_block is None:
+            from_block = Daemon.get_solo().block_number + 1
+        to_block = min(web3.eth.blockNumber, from_block + blocks - 1)
+        if to_block < from_block:
+            self.stdout.write(self.style.SUCCESS('No blocks to scan after block {}'.format(from_block - 1)))
+            return
+
+        ipfs_hashes = get_ipfs_hashes(web3, from_block, to_block)
+        resolved = resolve_event_descriptions(ipfs_hashes)
+        self.stdout.write(self.style.SUCCESS('Resolved {} of {} event descriptions between blocks {} and {}'.format(
+            resolved, len(ipfs_hashes), from_block, to_block)))
@@ -13,7 +13,12 @@ class Command(BaseCommand):
         parser.add_argument('--start-block-number', type=int, required=False)
 
     def handle(self, *args, start_block_number, **options):
-        PeriodicTask.objects.filter(task='django_eth_events.tasks.event_listener').delete()
+        PeriodicTask.objects.filter(task__in=[
+            'django_eth_events.tasks.event_listener',
+            'tradingdb.relationaldb.tasks.event_listener',
+            'tradingdb.relationaldb.tasks.compact_balance_journal',
+            'tradingdb.relationaldb.tasks.resolve_event_descriptions',
+        ]).delete()
         time.sleep(5)
         call_command('cleandatabase')
         call_command('resync_daemon')
@@ -34,10 +39,26 @@ class Command(BaseCommand):
         # auto-create celery task
         interval = IntervalSchedule(every=5, period='seconds')
         interval.save()
-        if not PeriodicTask.objects.filter(task='django_eth_events.tasks.event_listener').count():
+        if not PeriodicTask.objects.filter(task='tradingdb.relationaldb.tasks.event_listener').count():
             PeriodicTask.objects.create(
                 name='Event Listener',
-                task='django_eth_events.tasks.event_listener',
+                task='tradingdb.relationaldb.tasks.event_listener',
                 interval=interval
             )
             self.stdout.write(self.style.SUCCESS('Created Periodic Task for Event Listener every 5s'))
+
+        PeriodicTask.objects.create(
+            name='Event description resolution',
+            task='tradingdb.relationaldb.tasks.resolve_event_descriptions',
+            interval=interval
+        )
+        self.stdout.write(self.style.SUCCESS('Created Periodic Task for Event description resolution every 5s'))
+
+        one_hour_interval = IntervalSchedule(every=1, period='hours')
+        one_hour_interval.save()
+        PeriodicTask.objects.create(
+            name='Balance journal compaction',
+            task='tradingdb.relationaldb.tasks.compact_balance_journal',
+            interval=one_hour_interval
+        )
+        self.stdout.write(self.style.SUCCESS('Created Periodic Task for Balance journal compaction every hour'))
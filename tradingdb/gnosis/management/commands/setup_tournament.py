@@ -19,9 +19,12 @@ class Command(BaseCommand):
     def handle(self, *args, start_block_number, **options):
         PeriodicTask.objects.filter(task__in=[
             'django_eth_events.tasks.event_listener',
+            'tradingdb.relationaldb.tasks.event_listener',
             'tradingdb.relationaldb.tasks.calculate_scoreboard',
             'tradingdb.relationaldb.tasks.issue_tokens',
             'tradingdb.relationaldb.tasks.clear_issued_tokens_flag',
+            'tradingdb.relationaldb.tasks.compact_balance_journal',
+            'tradingdb.relationaldb.tasks.resolve_event_descriptions',
         ]).delete()
         time.sleep(5)
         call_command('cleandatabase')
@@ -51,16 +54,26 @@ class Command(BaseCommand):
         one_minute_interval = IntervalSchedule(every=1, period='minutes')
         one_minute_interval.save()
 
+        one_hour_interval = IntervalSchedule(every=1, period='hours')
+        one_hour_interval.save()
+
         one_day_interval = IntervalSchedule(every=1, period='days')
         one_day_interval.save()
 
         PeriodicTask.objects.create(
             name='Event Listener',
-            task='django_eth_events.tasks.event_listener',
+            task='tradingdb.relationaldb.tasks.event_listener',
             interval=five_seconds_interval,
         )
         self.stdout.write(self.style.SUCCESS('Created Periodic Task for Event Listener every 5 seconds'))
 
+        PeriodicTask.objects.create(
+            name='Event description resolution',
+            task='tradingdb.relationaldb.tasks.resolve_event_descriptions',
+            interval=five_seconds_interval,
+        )
+        self.stdout.write(self.style.SUCCESS('Created Periodic Task for Event description resolution every 5 seconds'))
+
         PeriodicTask.objects.create(
             name='Scoreboard Calculation',
             task='tradingdb.relationaldb.tasks.calculate_scoreboard',
@@ -82,6 +95,13 @@ class Command(BaseCommand):
         )
         self.stdout.write(self.style.SUCCESS('Created Periodic Task for Token Issuance flag clear every day'))
 
+        PeriodicTask.objects.create(
+            name='Balance journal compaction',
+            task='tradingdb.relationaldb.tasks.compact_balance_journal',
+            interval=one_hour_interval,
+        )
+        self.stdout.write(self.style.SUCCESS('Created Periodic Task for Balance journal compaction every hour'))
+
         TournamentWhitelistedCreator.objects.create(
             address=normalize_address_without_0x(settings.ETHEREUM_DEFAULT_ACCOUNT),
             enabled=True
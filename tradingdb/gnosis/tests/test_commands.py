@@ -0,0 +1,269 @@
+from datetime import timedelta
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_eth_events.models import Daemon
+
+from tradingdb.gnosis.management.commands.calculate_scoreboard import \
+    Command as CalculateScoreboardCommand
+from tradingdb.relationaldb.models import (OutcomeTokenBalance,
+                                           ScoreboardTouch,
+                                           TournamentParticipant,
+                                           TournamentParticipantBalance,
+                                           TournamentWhitelistedCreator)
+from tradingdb.relationaldb.scoreboard import defer_touches
+from tradingdb.relationaldb.serializers import OutcomeAssignmentEventSerializer
+from tradingdb.relationaldb.tests.factories import (
+    BuyOrderFactory, CategoricalEventFactory, MarketFactory,
+    OutcomeTokenBalanceFactory, OutcomeTokenFactory, ScalarEventFactory,
+    TournamentParticipantBalanceFactory)
+
+
+class TestCommands(TestCase):
+
+    def get_scoreboard(self):
+        return list(TournamentParticipant.objects.order_by('address').values_list('address', 'current_rank',
+                                                                                 'past_rank', 'diff_rank', 'score'))
+
+    def test_calculate_scoreboard_incremental(self):
+        balances = [TournamentParticipantBalanceFactory(balance=balance * 100) for balance in (5, 1, 3, 4, 2)]
+        TournamentParticipant.objects.update(created=timezone.now() - timedelta(minutes=5))
+
+        call_command('calculate_scoreboard')
+        self.assertListEqual([balance.participant.address for balance in sorted(balances, key=lambda x: -x.balance)],
+                             list(TournamentParticipant.objects.order_by('current_rank').values_list('address',
+                                                                                                     flat=True)))
+        self.assertFalse(TournamentParticipant.objects.filter(scoreboard_touched__isnull=False).exists())
+
+        # Nothing touched, ranks didn't change since the last run
+        call_command('calculate_scoreboard')
+        scoreboard = self.get_scoreboard()
+        call_command('calculate_scoreboard', incremental=True)
+        self.assertListEqual(scoreboard, self.get_scoreboard())
+
+        # Lowest balance becomes the highest one
+        balances[1].balance = 1000
+        balances[1].save()
+        self.assertListEqual([balances[1].participant.address],
+                             list(TournamentParticipant.objects.filter(
+                                 scoreboard_touched__isnull=False).values_list('address', flat=True)))
+
+        call_command('calculate_scoreboard', incremental=True)
+        incremental_scoreboard = self.get_scoreboard()
+        participant = TournamentParticipant.objects.get(address=balances[1].participant.address)
+        self.assertEqual(participant.current_rank, 1)
+        self.assertEqual(participant.diff_rank, 4)
+        self.assertEqual(participant.score, 1000)
+
+        # Same ranking as recalculating everyone
+        call_command('calculate_scoreboard')
+        self.assertListEqual([(address, rank, score) for address, rank, _, _, score in incremental_scoreboard],
+                             [(address, rank, score) for address, rank, _, _, score in self.get_scoreboard()])
+
+    def test_calculate_scoreboard_deferred_touches(self):
+        balances = [TournamentParticipantBalanceFactory(balance=balance * 100) for balance in (5, 1, 3, 4, 2)]
+        TournamentParticipant.objects.update(created=timezone.now() - timedelta(minutes=5))
+        call_command('calculate_scoreboard')
+
+        # Deferred touches don't touch the participants, they are kept if the ingestion stops before applying them
+        address = balances[1].participant.address
+        TournamentParticipantBalance.objects.filter(pk=balances[1].pk).update(balance=1000)
+        defer_touches([address, '{:040x}'.format(1)])
+        self.assertEqual(list(ScoreboardTouch.objects.values_list('address', flat=True)), [address])
+        self.assertFalse(TournamentParticipant.objects.filter(scoreboard_touched__isnull=False).exists())
+
+        # The incremental run applies them
+        call_command('calculate_scoreboard', incremental=True)
+        participant = TournamentParticipant.objects.get(address=address)
+        self.assertEqual(participant.current_rank, 1)
+        self.assertEqual(participant.score, 1000)
+        self.assertFalse(ScoreboardTouch.objects.exists())
+        self.assertFalse(TournamentParticipant.objects.filter(scoreboard_touched__isnull=False).exists())
+
+    def test_calculate_scoreboard_incremental_rounding(self):
+        creator = TournamentWhitelistedCreator.objects.create(address='{:040x}'.format(1)).address
+        market = MarketFactory(event=CategoricalEventFactory(creator=creator), creator=creator)
+        outcome_token = OutcomeTokenFactory(event=market.event, index=0)
+        participants = [TournamentParticipantBalanceFactory(balance=100).participant for _ in range(2)]
+        # Scores 100.4 and 100.2, both stored as 100
+        for participant, marginal_price in zip(participants, ('0.4', '0.2')):
+            OutcomeTokenBalanceFactory(owner=participant.address, outcome_token=outcome_token, balance=1)
+            BuyOrderFactory(market=market, sender=participant.address, outcome_token=outcome_token,
+                            marginal_prices=[marginal_price, '0.6'])
+        TournamentParticipant.objects.update(created=timezone.now() - timedelta(minutes=5))
+        call_command('calculate_scoreboard')
+
+        # Second participant's score becomes 100.3, still stored as 100 and below the first one unrounded
+        BuyOrderFactory(market=market, sender=participants[1].address, outcome_token=outcome_token,
+                        marginal_prices=['0.3', '0.7'], creation_date_time=timezone.now() + timedelta(minutes=1))
+        call_command('calculate_scoreboard', incremental=True)
+        incremental_scoreboard = self.get_scoreboard()
+        call_command('calculate_scoreboard')
+        self.assertListEqual([(address, rank, score) for address, rank, _, _, score in incremental_scoreboard],
+                             [(address, rank, score) for address, rank, _, _, score in self.get_scoreboard()])
+        self.assertListEqual([score for _, _, _, _, score in incremental_scoreboard], [100, 100])
+
+    def test_calculate_scoreboard_store(self):
+        balances = [TournamentParticipantBalanceFactory(balance=balance * 100) for balance in range(0, 20)]
+        TournamentParticipant.objects.update(created=timezone.now() - timedelta(minutes=5))
+
+        with CaptureQueriesContext(connection) as context:
+            call_command('calculate_scoreboard')
+        # Every rank is stored with one statement
+        rank_updates = [query for query in context.captured_queries
+                        if query['sql'].lstrip().startswith('UPDATE') and 'current_rank' in query['sql']]
+        self.assertEqual(len(rank_updates), 1)
+
+        for rank, balance in enumerate(reversed(balances), start=1):
+            participant = TournamentParticipant.objects.get(address=balance.participant.address)
+            self.assertEqual(participant.current_rank, rank)
+            self.assertEqual(participant.score, balance.balance)
+            self.assertEqual(participant.predicted_profit, 0)
+            self.assertEqual(participant.predictions, 0)
+            self.assertEqual(participant.diff_rank, participant.past_rank - rank)
+
+    def create_scoreboard_fixture(self):
+        """
+        Creates three participants with balances of whitelisted events, one for every way of calculating the value
+        of the outcome tokens
+        :return: list of participants
+        """
+        creator = TournamentWhitelistedCreator.objects.create(address='{:040x}'.format(1)).address
+        categorical_event = CategoricalEventFactory(creator=creator)
+        categorical_market = MarketFactory(event=categorical_event, creator=creator)
+        categorical_outcome_tokens = [OutcomeTokenFactory(event=categorical_event, index=index) for index in range(3)]
+        scalar_event = ScalarEventFactory(creator=creator, lower_bound=0, upper_bound=100, is_winning_outcome_set=True,
+                                          outcome=25)
+        MarketFactory(event=scalar_event, creator=creator)
+        scalar_outcome_tokens = [OutcomeTokenFactory(event=scalar_event, index=index) for index in range(2)]
+
+        balances = [TournamentParticipantBalanceFactory(balance=0) for _ in range(3)]
+        participants = [balance.participant for balance in balances]
+        # Latest order marginal price
+        BuyOrderFactory(market=categorical_market, sender=participants[0].address,
+                        outcome_token=categorical_outcome_tokens[1], marginal_prices=['0.2', '0.3', '0.5'])
+        OutcomeTokenBalanceFactory(owner=participants[0].address, outcome_token=categorical_outcome_tokens[1],
+                                   balance=100)
+        # Scalar event resolved
+        OutcomeTokenBalanceFactory(owner=participants[1].address, outcome_token=scalar_outcome_tokens[0],
+                                   balance=100)
+        OutcomeTokenBalanceFactory(owner=participants[1].address, outcome_token=scalar_outcome_tokens[1],
+                                   balance=100)
+        # No order in the market, outcome tokens have the same price
+        BuyOrderFactory(market=MarketFactory(event=scalar_event, creator=creator), sender=participants[2].address,
+                        outcome_token=scalar_outcome_tokens[0])
+        OutcomeTokenBalanceFactory(owner=participants[2].address, outcome_token=categorical_outcome_tokens[0],
+                                   balance=300)
+        TournamentParticipant.objects.update(created=timezone.now() - timedelta(minutes=5))
+        return participants
+
+    def get_touched_participants(self):
+        return set(TournamentParticipant.objects.filter(scoreboard_touched__isnull=False).values_list('address',
+                                                                                                    flat=True))
+
+    def test_scoreboard_touches(self):
+        participants = self.create_scoreboard_fixture()
+        event = OutcomeTokenBalance.objects.get(owner=participants[0].address).outcome_token.event
+        TournamentParticipant.objects.update(scoreboard_touched=None)
+
+        # Saving other event fields doesn't change the score of its holders
+        event.redeemed_winnings = 10
+        event.save(update_fields=['redeemed_winnings'])
+        MarketFactory(event=event)
+        self.assertSetEqual(self.get_touched_participants(), set())
+
+        s = OutcomeAssignmentEventSerializer(data={'address': event.address, 'params': [{'name': 'outcome',
+                                                                                         'value': 1}]})
+        self.assertTrue(s.is_valid(), s.errors)
+        s.save()
+        self.assertSetEqual(self.get_touched_participants(), {participants[0].address, participants[2].address})
+
+        TournamentParticipant.objects.update(scoreboard_touched=None)
+        s.rollback()
+        self.assertSetEqual(self.get_touched_participants(), {participants[0].address, participants[2].address})
+
+    def test_calculate_scoreboard_queries(self):
+        participants = self.create_scoreboard_fixture()
+
+        command = CalculateScoreboardCommand()
+        call_command(command)
+        self.assertEqual(command.queries_in_loop, 0)
+        self.assertEqual(TournamentParticipant.objects.get(address=participants[0].address).predicted_profit, 30)
+        self.assertEqual(TournamentParticipant.objects.get(address=participants[1].address).predicted_profit, 100)
+        self.assertEqual(TournamentParticipant.objects.get(address=participants[2].address).predicted_profit, 100)
+        self.assertEqual(TournamentParticipant.objects.get(address=participants[2].address).predictions, 1)
+
+    def test_calculate_scoreboard_database_engine(self):
+        participants = self.create_scoreboard_fixture()
+        # Big balances, values are not rounded to units
+        for participant in participants:
+            OutcomeTokenBalance.objects.filter(owner=participant.address).update(balance=F('balance') * 10 ** 20 + 1)
+            TournamentParticipantBalance.objects.filter(participant=participant).update(balance=10 ** 22)
+        TournamentParticipantBalanceFactory(balance=10 ** 18)
+        TournamentParticipant.objects.update(created=timezone.now() - timedelta(minutes=5))
+
+        fields = ('address', 'current_rank', 'score', 'predicted_profit', 'predictions')
+        call_command('calculate_scoreboard')
+        python_scoreboard = list(TournamentParticipant.objects.order_by('address').values_list(*fields))
+        call_command('calculate_scoreboard', engine='database')
+        database_scoreboard = list(TournamentParticipant.objects.order_by('address').values_list(*fields))
+        self.assertListEqual(python_scoreboard, database_scoreboard)
+        # Scalar value 75 * 10 ** 20 + 0.75 + 25 * 10 ** 20 + 0.25
+        self.assertEqual(TournamentParticipant.objects.get(address=participants[1].address).predicted_profit,
+                         10 ** 22 + 1)
+
+    def test_calculate_scoreboard_database_engine_rounding(self):
+        creator = TournamentWhitelistedCreator.objects.create(address='{:040x}'.format(1)).address
+        # Outcome below the lower bound, long outcome tokens are worth -0.5 each
+        scalar_event = ScalarEventFactory(creator=creator, lower_bound=10, upper_bound=20, is_winning_outcome_set=True,
+                                          outcome=5)
+        MarketFactory(event=scalar_event, creator=creator)
+        outcome_token = OutcomeTokenFactory(event=scalar_event, index=1)
+        participants = []
+        for balance in (5, 7, 1, 3, 9):
+            participant = TournamentParticipantBalanceFactory(balance=0).participant
+            OutcomeTokenBalanceFactory(owner=participant.address, outcome_token=outcome_token, balance=balance)
+            participants.append(participant)
+        TournamentParticipant.objects.update(created=timezone.now() - timedelta(minutes=5))
+
+        fields = ('address', 'current_rank', 'score', 'predicted_profit', 'predictions')
+        call_command('calculate_scoreboard')
+        python_scoreboard = list(TournamentParticipant.objects.order_by('address').values_list(*fields))
+        call_command('calculate_scoreboard', engine='database')
+        database_scoreboard = list(TournamentParticipant.objects.order_by('address').values_list(*fields))
+        self.assertListEqual(python_scoreboard, database_scoreboard)
+        # -2.5, -3.5, -0.5, -1.5 and -4.5 rounded half to even
+        self.assertListEqual([TournamentParticipant.objects.get(address=participant.address).predicted_profit
+                              for participant in participants], [-2, -4, 0, -2, -4])
+
+        with self.assertRaises(CommandError):
+            call_command('calculate_scoreboard', engine='database', incremental=True)
+
+    def test_calculate_scoreboard_engines_ties(self):
+        # Fresh participants with the same score and rank are ranked by address by both engines
+        participants = [TournamentParticipantBalanceFactory(balance=10).participant for _ in range(4)]
+        TournamentParticipant.objects.update(created=timezone.now() - timedelta(minutes=5), current_rank=1)
+        addresses = sorted(participant.address for participant in participants)
+
+        for engine in ('database', 'python'):
+            TournamentParticipant.objects.update(current_rank=1)
+            call_command('calculate_scoreboard', engine=engine)
+            self.assertListEqual(list(TournamentParticipant.objects.order_by('address').values_list(
+                'address', 'current_rank')), [(address, rank) for rank, address in enumerate(addresses, 1)])
+
+    def test_catch_up_listener_lock(self):
+        # The event listener is running, its blocks are not touched
+        daemon = Daemon.get_solo()
+        daemon.block_number = 10
+        daemon.listener_lock = True
+        daemon.save()
+
+        with self.assertRaises(CommandError):
+            call_command('catch_up', to_block=100)
+        daemon.refresh_from_db()
+        self.assertEqual(daemon.block_number, 10)
+        self.assertTrue(daemon.listener_lock)
@@ -1,9 +1,11 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
 from tradingdb.relationaldb.tests.factories import (MarketFactory,
                                                     OutcomeTokenFactory)
 
-from ..utils import calc_lmsr_marginal_price
+from ..utils import calc_lmsr_marginal_price, calc_lmsr_marginal_prices
 
 
 class TestUtils(TestCase):
@@ -20,3 +22,26 @@ class TestUtils(TestCase):
         result = calc_lmsr_marginal_price(1, net_outcome_tokens_sold, market.funding)
         self.assertIsNotNone(result)
         self.assertTrue(result > 0)
+
+    def test_calc_lmsr_marginal_prices(self):
+        funding = 10 ** 18
+        for net_outcome_tokens_sold in ([0, 0], [0, 1], [0, funding], [3 * funding, -funding, 0, 5],
+                                        [10 ** 25, 10 ** 25 + 1, 0], list(range(0, 64 * funding, funding))):
+            expected = [calc_lmsr_marginal_price(index, net_outcome_tokens_sold, funding)
+                        for index in range(len(net_outcome_tokens_sold))]
+            result = calc_lmsr_marginal_prices(net_outcome_tokens_sold, funding)
+            self.assertEqual(len(result), len(expected))
+            for marginal_price, expected_marginal_price in zip(result, expected):
+                self.assertAlmostEqual(marginal_price, expected_marginal_price, places=12)
+            self.assertAlmostEqual(sum(result), 1.0, places=12)
+
+        self.assertListEqual(calc_lmsr_marginal_prices([0, 0], funding), [0.5, 0.5])
+        # Decimals are stored in the database
+        self.assertListEqual(calc_lmsr_marginal_prices([Decimal(0), Decimal(funding)], Decimal(funding)),
+                             calc_lmsr_marginal_prices([0, funding], funding))
+
+    def test_calc_lmsr_marginal_prices_mpmath(self):
+        # Share counts too big for floats
+        self.assertListEqual(calc_lmsr_marginal_prices([0, 10 ** 400], 10 ** 18), [0.0, 1.0])
+        with self.assertRaises(ZeroDivisionError):
+            calc_lmsr_marginal_prices([0], 10 ** 18)
@@ -1,3 +1,5 @@
+import math
+
 from mpmath import mp, mpf
 
 
@@ -49,28 +51,54 @@ def calc_lmsr_marginal_price(token_index, net_outcome_tokens_sold, funding):
                  for share_count in net_outcome_tokens_sold))
 
 
+def calc_lmsr_marginal_prices(net_outcome_tokens_sold, funding):
+    """
+    Calculates the LMSR marginal price of every outcome in one pass. Prices are the softmax of
+    `net_outcome_tokens_sold / b`, computed with the log-sum-exp trick using floats: every exponent is shifted
+    by the max, so they are <= 0 and the sum can't overflow. Uses mpmath if values can't be represented as floats
+    :param net_outcome_tokens_sold: list of int
+    :param funding: int
+    :return: list of float, same results as `calc_lmsr_marginal_price` for every index
+    """
+    net_outcome_tokens_sold = [int(x) for x in net_outcome_tokens_sold]
+    funding = int(funding)
+    if funding > 0 and len(net_outcome_tokens_sold) > 1:
+        try:
+            return _calc_lmsr_marginal_prices_float(net_outcome_tokens_sold, funding)
+        except OverflowError:
+            pass
+    return _calc_lmsr_marginal_prices_mpmath(net_outcome_tokens_sold, funding)
+
+
+def _calc_lmsr_marginal_prices_float(net_outcome_tokens_sold, funding):
+    inverse_b = math.log(len(net_outcome_tokens_sold)) / float(funding)
+    max_share_count = max(net_outcome_tokens_sold)
+    # Differences are calculated with ints, so they are exact even for big share counts
+    exps = [math.exp(float(share_count - max_share_count) * inverse_b) for share_count in net_outcome_tokens_sold]
+    denominator = math.fsum(exps)
+    return [exp / denominator for exp in exps]
+
+
+def _calc_lmsr_marginal_prices_mpmath(net_outcome_tokens_sold, funding):
+    b = mpf(funding) / mp.log(len(net_outcome_tokens_sold))
+    exps = [mp.exp(share_count / b) for share_count in net_outcome_tokens_sold]
+    denominator = mp.fsum(exps)
+    return [float(exp / denominator) for exp in exps]
+
+
 def get_order_type(order):
     """
     Returns the order type (Sell, Short Sell, Buy)
     :param order: See models.Order
     :return: String
     """
-    if hasattr(order, 'sellorder'):
-        return 'SELL'
-    elif hasattr(order, 'shortsellorder'):
-        return 'SHORT SELL'
-    elif hasattr(order, 'buyorder'):
-        return 'BUY'
-    else:
-        return 'UNKNOWN'
+    return order.get_subclass_type() or 'UNKNOWN'
 
 
 def get_order_cost(order):
     order_type = get_order_type(order)
-    if order_type == 'BUY':
-        return order.buyorder.cost
-    elif order_type == 'SHORT SELL':
-        return order.shortsellorder.cost
+    if order_type in ('BUY', 'SHORT SELL'):
+        return order.cost
     else:
         return None
 
@@ -78,6 +106,6 @@ def get_order_cost(order):
 def get_order_profit(order):
     order_type = get_order_type(order)
     if order_type == 'SELL':
-        return order.sellorder.profit
+        return order.profit
     else:
         return None
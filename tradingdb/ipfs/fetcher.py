@@ -0,0 +1,144 @@
+"""
+Pooled and cached reads of IPFS objects. Objects are fetched with the `cat` command of the IPFS HTTP API through a
+session sharing a pool of keep-alive connections, in a pool of `max_workers` threads, so at most `max_workers`
+requests are sent at the same time.
+
+An IPFS hash is the hash of the content of the object, so the content fetched for a hash never changes: it's stored
+on disk in `cache_dir`, named after its hash, and never fetched again. Requests of the same hash are also shared
+while they are pending, so hashes can be prefetched in parallel and read later without waiting again.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Iterable, Optional
+
+import requests
+from celery.utils.log import get_task_logger
+from ipfsapi.exceptions import ErrorResponse
+
+logger = get_task_logger(__name__)
+
+# Hashes are used as file names
+IPFS_HASH_REGEX = re.compile(r'^[a-zA-Z0-9]+$')
+
+# Max number of fetched objects kept in memory
+DEFAULT_MEMORY_CACHE_SIZE: int = 1000
+
+
+class IpfsFetcher:
+    def __init__(self, host: str, port: int, timeout: float, max_workers: int, cache_dir: Optional[str] = None,
+                 memory_cache_size: int = DEFAULT_MEMORY_CACHE_SIZE):
+        # Same url as `ipfsapi.connect`
+        if not re.match('^https?://', host.lower()):
+            host = 'http://' + host
+        self.url = '{}:{}/api/v0/cat'.format(host, port)
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.memory_cache_size = memory_cache_size
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        # Hash -> Future with the content of the object, pending or done
+        self._futures = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get_cache_path(self, ipfs_hash: str) -> str:
+        # Hashes of the same version start with the same characters, the last ones are spread
+        return os.path.join(self.cache_dir, ipfs_hash[-2:], ipfs_hash)
+
+    def read_cache(self, ipfs_hash: str) -> Optional[bytes]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self.get_cache_path(ipfs_hash), 'rb') as cache_file:
+                return cache_file.read()
+        except FileNotFoundError:
+            return None
+
+    def write_cache(self, ipfs_hash: str, content: bytes):
+        if not self.cache_dir:
+            return
+        path = self.get_cache_path(ipfs_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written in a temporary file and renamed, readers never see a partial object
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as cache_file:
+            cache_file.write(content)
+        os.replace(cache_file.name, path)
+
+    def fetch(self, ipfs_hash: str) -> bytes:
+        """
+        Returns the content of the object from the disk cache or, if it's missing, from IPFS
+        :raise ErrorResponse: the IPFS node returned an error
+        :raise requests.RequestException: IPFS node not reachable or timeout
+        """
+        content = self.read_cache(ipfs_hash)
+        if content is not None:
+            return content
+
+        logger.debug('Fetching IPFS HASH %s', ipfs_hash)
+        response = self.session.post(self.url, params={'arg': ipfs_hash}, timeout=self.timeout)
+        if response.status_code != 200:
+            try:
+                message = response.json()['Message']
+            except (ValueError, KeyError, TypeError):
+                message = response.text
+            raise ErrorResponse(message, None)
+
+        self.write_cache(ipfs_hash, response.content)
+        return response.content
+
+    def forget(self, ipfs_hash: str, future: Future):
+        """
+        Failed fetches are not kept, the next read of the hash fetches it again
+        """
+        if future.cancelled() or future.exception() is not None:
+            with self._lock:
+                if self._futures.get(ipfs_hash) is future:
+                    del self._futures[ipfs_hash]
+
+    def get_future(self, ipfs_hash: str) -> Future:
+        if not IPFS_HASH_REGEX.match(ipfs_hash):
+            raise ErrorResponse('invalid IPFS hash {}'.format(ipfs_hash), None)
+
+        with self._lock:
+            future = self._futures.get(ipfs_hash)
+            if future is None:
+                future = self.executor.submit(self.fetch, ipfs_hash)
+                self._futures[ipfs_hash] = future
+                future.add_done_callback(lambda done_future: self.forget(ipfs_hash, done_future))
+                while len(self._futures) > self.memory_cache_size:
+                    self._futures.popitem(last=False)
+            else:
+                self._futures.move_to_end(ipfs_hash)
+        return future
+
+    def get(self, ipfs_hash: str):
+        """
+        :return: json object of the IPFS object, a new one on every call
+        :raise ErrorResponse: the IPFS node returned an error or the object is not json
+        :raise requests.RequestException: IPFS node not reachable or timeout
+        """
+        content = self.get_future(ipfs_hash).result()
+        try:
+            return json.loads(content.decode())
+        except ValueError as e:
+            raise ErrorResponse('IPFS object {} is not json: {}'.format(ipfs_hash, e), None)
+
+    def prefetch(self, ipfs_hashes: Iterable[str], timeout: Optional[float] = None) -> int:
+        """
+        Fetches the objects in parallel and waits for them. Errors are not raised, they are raised again when the
+        hash is read with `get`
+        :param timeout: max seconds to wait, by default every request is waited for (requests have their own timeout)
+        :return: number of objects fetched
+        """
+        futures = [self.get_future(ipfs_hash) for ipfs_hash in set(ipfs_hashes) if IPFS_HASH_REGEX.match(ipfs_hash)]
+        done, _ = wait(futures, timeout=timeout)
+        return sum(1 for future in done if not future.cancelled() and future.exception() is None)
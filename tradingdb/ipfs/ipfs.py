@@ -6,6 +6,8 @@ from json import dumps
 
 from gnosis.utils import singleton
 
+from .fetcher import IpfsFetcher
+
 
 logger = get_task_logger(__name__)
 
@@ -20,20 +22,36 @@ class Ipfs:
             **kwargs
         }
 
-        self.api = connect(settings.IPFS_HOST, settings.IPFS_PORT)
-        logger.debug('Connection to IPFS (%s : %s) established.' % (settings.IPFS_HOST, settings.IPFS_PORT))
+        self._api = None
+        self.fetcher = IpfsFetcher(settings.IPFS_HOST, settings.IPFS_PORT, float(self._defaults['timeout']),
+                                   settings.IPFS_MAX_WORKERS, cache_dir=settings.IPFS_CACHE_DIR)
+
+    @property
+    def api(self):
+        # Only needed to post objects, reads don't wait for the version check of `connect`
+        if self._api is None:
+            self._api = connect(settings.IPFS_HOST, settings.IPFS_PORT)
+            logger.debug('Connection to IPFS (%s : %s) established.' % (settings.IPFS_HOST, settings.IPFS_PORT))
+        return self._api
 
     def get(self, ipfs_hash):
         """Returns ipfs_hash's json related object
         :param ipfs_hash:
         :return: json object
-        :raise AttributeError
+        :raise ErrorResponse
         """
         logger.debug('Get JSON for IPFS HASH %s' % ipfs_hash)
-        json = self.api.get_json(ipfs_hash, **self._defaults)
+        json = self.fetcher.get(ipfs_hash)
         logger.debug('Got JSON from IPFS: {}'.format(dumps(json, indent=4)))
         return json
 
+    def prefetch(self, ipfs_hashes):
+        """Fetches ipfs_hashes in parallel, so next calls to `get` don't wait for IPFS
+        :param ipfs_hashes: iterable of ipfs hashes
+        :return: number of objects fetched
+        """
+        return self.fetcher.prefetch(ipfs_hashes)
+
     def post(self, python_object):
         """Creates an ipfs object
         :param python_object
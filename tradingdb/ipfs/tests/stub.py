@@ -0,0 +1,72 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class IpfsStubServer:
+    """
+    Local server answering the `cat` command of the IPFS HTTP API with the objects of `objects` (hash -> json
+    object). Every request waits `delay` seconds, requests and max concurrent requests are counted
+    """
+
+    def __init__(self, objects=None, delay=0):
+        self.objects = dict(objects or {})
+        self.delay = delay
+        self.requests = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.get_handler_class())
+
+    @property
+    def host(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def get_handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                url = urlparse(self.path)
+                ipfs_hash = parse_qs(url.query).get('arg', [''])[0]
+                with stub._lock:
+                    stub.requests.append(ipfs_hash)
+                    stub.running += 1
+                    stub.max_running = max(stub.max_running, stub.running)
+                try:
+                    time.sleep(stub.delay)
+                    if url.path == '/api/v0/cat' and ipfs_hash in stub.objects:
+                        status, body = 200, json.dumps(stub.objects[ipfs_hash]).encode()
+                    else:
+                        status, body = 500, json.dumps({'Message': 'invalid path', 'Code': 0}).encode()
+                    self.send_response(status)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with stub._lock:
+                        stub.running -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import time
+
+from django.test import TestCase
+from ipfsapi.exceptions import ErrorResponse
+
+from ..fetcher import IpfsFetcher
+from .stub import IpfsStubServer
+
+
+class TestIpfsFetcher(TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.objects = {'Qm{:044d}'.format(i): {'title': 'Event {}'.format(i), 'outcomes': ['Yes', 'No']}
+                        for i in range(12)}
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def get_fetcher(self, server, max_workers=4):
+        return IpfsFetcher(server.host, server.port, timeout=5, max_workers=max_workers,
+                           cache_dir=self.cache_dir.name)
+
+    def test_cache(self):
+        ipfs_hash = next(iter(self.objects))
+        with IpfsStubServer(self.objects) as server:
+            fetcher = self.get_fetcher(server)
+            json_data = fetcher.get(ipfs_hash)
+            self.assertEqual(json_data, self.objects[ipfs_hash])
+            # Every call returns a new object
+            json_data['title'] = 'Changed'
+            self.assertEqual(fetcher.get(ipfs_hash), self.objects[ipfs_hash])
+            self.assertEqual(server.requests, [ipfs_hash])
+            self.assertTrue(os.path.exists(fetcher.get_cache_path(ipfs_hash)))
+
+            # A new fetcher reads the object from disk
+            self.assertEqual(self.get_fetcher(server).get(ipfs_hash), self.objects[ipfs_hash])
+            self.assertEqual(server.requests, [ipfs_hash])
+
+    def test_errors(self):
+        ipfs_hash = 'Qm{:044d}'.format(100)
+        with IpfsStubServer(self.objects) as server:
+            fetcher = self.get_fetcher(server)
+            with self.assertRaises(ErrorResponse):
+                fetcher.get(ipfs_hash)
+            self.assertFalse(os.path.exists(fetcher.get_cache_path(ipfs_hash)))
+
+            # Failed fetches are retried
+            server.objects[ipfs_hash] = {'title': 'Published later'}
+            self.assertEqual(fetcher.get(ipfs_hash), {'title': 'Published later'})
+            self.assertEqual(server.requests, [ipfs_hash, ipfs_hash])
+
+            # Hashes are file names
+            with self.assertRaises(ErrorResponse):
+                fetcher.get('../{}'.format(ipfs_hash))
+            self.assertEqual(len(server.requests), 2)
+
+    def test_prefetch(self):
+        delay = 0.2
+        with IpfsStubServer(self.objects, delay=delay) as server:
+            fetcher = self.get_fetcher(server, max_workers=4)
+            start = time.time()
+            self.assertEqual(fetcher.prefetch(list(self.objects) + ['Qm{:044d}'.format(100)]), len(self.objects))
+            # 13 requests in 4 parallel batches
+            self.assertLess(time.time() - start, delay * len(self.objects) / 2)
+            self.assertEqual(server.max_running, 4)
+
+            start = time.time()
+            for ipfs_hash, json_data in self.objects.items():
+                self.assertEqual(fetcher.get(ipfs_hash), json_data)
+            self.assertLess(time.time() - start, delay)
+            self.assertEqual(len(server.requests), len(self.objects) + 1)
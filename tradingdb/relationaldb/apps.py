@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class RelationalDbConfig(AppConfig):
     name = 'tradingdb.relationaldb'
+
+    def ready(self):
+        # Register signal receivers
+        from . import identity_map, market_event_fields, scoreboard  # noqa: F401
@@ -0,0 +1,287 @@
+"""
+Append-only journal of the outcome token balances. Issuance, Revocation and Transfer events insert their balance
+changes in `OutcomeTokenBalanceDelta`, keyed by block number and log index, and `OutcomeTokenBalance` keeps the
+current balances materialized: the deltas are added to the balances they touch with one upsert statement, without
+reading and saving the balances.
+
+Every log changes a balance once at most, so a delta is identified by its block number, log index and balance (the
+unique key of the journal). Deltas of logs decoded without their log index are identified by their block number,
+balance and amount. Only compacted deltas have no block number. Reverting is deleting deltas (the deltas of an event or every delta above a block) and
+subtracting them from the materialized balances, balances left at zero without any delta are deleted. Deltas of the
+blocks that can't be reverted anymore are periodically compacted into one delta per balance.
+
+Transfers don't change the supply of an outcome token, so the sum of the deltas of an outcome token is its issued
+minus its revoked supply: reverting every delta above a block also reverts the total supplies.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import connection
+
+from .copy_load import copy_instances, copy_rows
+from .models import OutcomeTokenBalance, OutcomeTokenBalanceDelta
+from .scoreboard import touch_participants
+
+BalanceKey = Tuple[str, str]  # (owner, outcome token address)
+
+# Max number of rows sent in every statement
+JOURNAL_BATCH_SIZE: int = 500
+
+UPSERT_BALANCES = """
+INSERT INTO relationaldb_outcometokenbalance (owner, outcome_token_address, balance)
+VALUES {values}
+ON CONFLICT (owner, outcome_token_address) DO UPDATE
+SET balance = relationaldb_outcometokenbalance.balance + EXCLUDED.balance
+RETURNING id, owner, outcome_token_address, balance
+"""
+
+# Staging table of the balance totals copied by `copy_balance_deltas`, emptied at the end of the transaction
+CREATE_BALANCE_TOTALS = """
+CREATE TEMPORARY TABLE IF NOT EXISTS balance_delta_totals (
+    owner varchar(40) NOT NULL,
+    outcome_token_address varchar(40) NOT NULL,
+    delta numeric(80, 0) NOT NULL
+) ON COMMIT DELETE ROWS
+"""
+
+UPSERT_BALANCE_TOTALS = """
+INSERT INTO relationaldb_outcometokenbalance (owner, outcome_token_address, balance)
+SELECT owner, outcome_token_address, delta
+FROM balance_delta_totals
+ON CONFLICT (owner, outcome_token_address) DO UPDATE
+SET balance = relationaldb_outcometokenbalance.balance + EXCLUDED.balance
+RETURNING id, owner, outcome_token_address, balance
+"""
+
+SUBTRACT_BALANCES = """
+UPDATE relationaldb_outcometokenbalance AS balance
+SET balance = balance.balance - reverted.delta
+FROM (VALUES {values}) AS reverted (owner, outcome_token_address, delta)
+WHERE balance.owner = reverted.owner AND balance.outcome_token_address = reverted.outcome_token_address
+"""
+
+SUBTRACT_TOTAL_SUPPLIES = """
+UPDATE relationaldb_outcometoken AS outcome_token
+SET total_supply = outcome_token.total_supply - reverted.delta
+FROM (VALUES {values}) AS reverted (address, delta)
+WHERE outcome_token.address = reverted.address
+"""
+
+DELETE_EMPTY_BALANCES = """
+DELETE FROM relationaldb_outcometokenbalance AS balance
+WHERE (balance.owner, balance.outcome_token_address) IN ({values})
+  AND balance.balance = 0
+  AND NOT EXISTS (SELECT 1 FROM relationaldb_outcometokenbalancedelta AS delta
+                  WHERE delta.owner = balance.owner AND delta.outcome_token_address = balance.outcome_token_address)
+"""
+
+DELETE_DELTAS = """
+DELETE FROM relationaldb_outcometokenbalancedelta
+WHERE NOT compacted AND (block_number, log_index, owner, outcome_token_address) IN ({values})
+RETURNING owner, outcome_token_address, delta
+"""
+
+# Deltas without log index are matched with the newest journal deltas without log index of the same balance, amount
+# and block number, as many as reverted deltas of the key
+DELETE_LEGACY_DELTAS = """
+WITH reverted (owner, outcome_token_address, delta, block_number, matches) AS (VALUES {values})
+DELETE FROM relationaldb_outcometokenbalancedelta AS journal_delta
+USING (
+    SELECT journal_delta.id, reverted.matches,
+           ROW_NUMBER() OVER (PARTITION BY journal_delta.owner, journal_delta.outcome_token_address,
+                                           journal_delta.delta, journal_delta.block_number
+                              ORDER BY journal_delta.id DESC) AS position
+    FROM relationaldb_outcometokenbalancedelta AS journal_delta
+    JOIN reverted ON journal_delta.owner = reverted.owner
+                 AND journal_delta.outcome_token_address = reverted.outcome_token_address
+                 AND journal_delta.delta = reverted.delta AND journal_delta.block_number = reverted.block_number
+    WHERE NOT journal_delta.compacted AND journal_delta.log_index IS NULL
+) AS matched
+WHERE journal_delta.id = matched.id AND matched.position <= matched.matches
+RETURNING journal_delta.owner, journal_delta.outcome_token_address, journal_delta.delta
+"""
+
+ROLLBACK_DELTAS = """
+WITH deleted_deltas AS (
+    DELETE FROM relationaldb_outcometokenbalancedelta
+    WHERE block_number > %(block_number)s AND NOT compacted
+    RETURNING owner, outcome_token_address, delta
+)
+SELECT owner, outcome_token_address, SUM(delta)
+FROM deleted_deltas
+GROUP BY owner, outcome_token_address
+"""
+
+COMPACT_DELTAS = """
+WITH compacted_deltas AS (
+    DELETE FROM relationaldb_outcometokenbalancedelta
+    WHERE (compacted OR block_number < %(block_number)s)
+      AND (owner, outcome_token_address) IN (
+          SELECT owner, outcome_token_address
+          FROM relationaldb_outcometokenbalancedelta
+          WHERE compacted OR block_number < %(block_number)s
+          GROUP BY owner, outcome_token_address
+          HAVING COUNT(*) > 1
+      )
+    RETURNING owner, outcome_token_address, delta, block_number
+)
+INSERT INTO relationaldb_outcometokenbalancedelta (owner, outcome_token_address, delta, block_number, log_index,
+                                                   compacted)
+SELECT owner, outcome_token_address, SUM(delta), MAX(block_number), NULL, TRUE
+FROM compacted_deltas
+GROUP BY owner, outcome_token_address
+"""
+
+
+def sum_deltas(deltas: Iterable[OutcomeTokenBalanceDelta]) -> Dict[BalanceKey, Decimal]:
+    totals = OrderedDict()
+    for delta in deltas:
+        key = (delta.owner, delta.outcome_token_id)
+        totals[key] = totals.get(key, 0) + delta.delta
+    return totals
+
+
+def _chunks(items: List, size: int = JOURNAL_BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def add_balance_deltas(deltas: List[OutcomeTokenBalanceDelta]) -> Dict[BalanceKey, OutcomeTokenBalance]:
+    """
+    Inserts the deltas in the journal and adds them to the materialized balances, creating the missing ones
+    :param deltas: unsaved deltas, sorted as they were emitted
+    :return: dictionary of (owner, outcome token address) -> updated OutcomeTokenBalance
+    """
+    if not deltas:
+        return {}
+
+    OutcomeTokenBalanceDelta.objects.bulk_create(deltas, batch_size=JOURNAL_BATCH_SIZE)
+
+    balances = {}
+    with connection.cursor() as cursor:
+        for totals in _chunks(list(sum_deltas(deltas).items())):
+            params = [param for (owner, outcome_token), total in totals for param in (owner, outcome_token, total)]
+            cursor.execute(UPSERT_BALANCES.format(values=', '.join(['(%s, %s, %s)'] * len(totals))), params)
+            for balance_id, owner, outcome_token, balance in cursor.fetchall():
+                balances[(owner, outcome_token)] = OutcomeTokenBalance(id=balance_id, owner=owner,
+                                                                       outcome_token_id=outcome_token, balance=balance)
+    # Upserts don't send model signals
+    touch_participants({owner for owner, _ in balances})
+    return balances
+
+
+def copy_balance_deltas(deltas: List[OutcomeTokenBalanceDelta]) -> Dict[BalanceKey, OutcomeTokenBalance]:
+    """
+    Same as `add_balance_deltas` for thousands of deltas: the deltas and the totals of every balance are loaded
+    with COPY, and the totals are added to the materialized balances with one upsert. Must be run inside a
+    transaction
+    :param deltas: unsaved deltas, sorted as they were emitted
+    :return: dictionary of (owner, outcome token address) -> updated OutcomeTokenBalance
+    """
+    if not deltas:
+        return {}
+
+    copy_instances(OutcomeTokenBalanceDelta, deltas)
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_BALANCE_TOTALS)
+        cursor.execute('TRUNCATE balance_delta_totals')
+        copy_rows('balance_delta_totals', ('owner', 'outcome_token_address', 'delta'),
+                  ((owner, outcome_token, total) for (owner, outcome_token), total in sum_deltas(deltas).items()))
+        cursor.execute(UPSERT_BALANCE_TOTALS)
+        balances = {(owner, outcome_token): OutcomeTokenBalance(id=balance_id, owner=owner,
+                                                                outcome_token_id=outcome_token, balance=balance)
+                    for balance_id, owner, outcome_token, balance in cursor.fetchall()}
+    # Upserts don't send model signals
+    touch_participants({owner for owner, _ in balances})
+    return balances
+
+
+def subtract_balance_deltas(totals: Dict[BalanceKey, Decimal]):
+    """
+    Subtracts the reverted deltas from the materialized balances. Balances left at zero without deltas didn't exist
+    before the reverted events and are deleted
+    :param totals: dictionary of (owner, outcome token address) -> sum of the deleted deltas
+    """
+    if not totals:
+        return
+
+    with connection.cursor() as cursor:
+        for chunk in _chunks(list(totals.items())):
+            params = [param for (owner, outcome_token), total in chunk for param in (owner, outcome_token, total)]
+            cursor.execute(SUBTRACT_BALANCES.format(values=', '.join(['(%s, %s, %s::numeric)'] * len(chunk))), params)
+            cursor.execute(DELETE_EMPTY_BALANCES.format(values=', '.join(['(%s, %s)'] * len(chunk))),
+                           [param for key, _ in chunk for param in key])
+    touch_participants({owner for owner, _ in totals})
+
+
+def revert_balance_deltas(deltas: List[OutcomeTokenBalanceDelta]) -> int:
+    """
+    Reverts the deltas of an event rollback, deleting the journal deltas with their block number, log index and
+    balance. Deltas without log index (logs decoded before the listener kept it) are matched with the newest journal
+    deltas without log index of the same balance, amount and block number (`DELETE_LEGACY_DELTAS`)
+    :param deltas: unsaved deltas equal to the ones saved by the event
+    :return: number of deltas reverted
+    """
+    totals = OrderedDict()
+    reverted = 0
+    keyed_deltas = [delta for delta in deltas if delta.log_index is not None]
+    legacy_matches = OrderedDict()
+    for delta in deltas:
+        if delta.log_index is None:
+            key = (delta.owner, delta.outcome_token_id, delta.delta, delta.block_number)
+            legacy_matches[key] = legacy_matches.get(key, 0) + 1
+
+    with connection.cursor() as cursor:
+        for chunk in _chunks(keyed_deltas):
+            cursor.execute(DELETE_DELTAS.format(values=', '.join(['(%s, %s, %s, %s)'] * len(chunk))),
+                           [param for delta in chunk for param in (delta.block_number, delta.log_index, delta.owner,
+                                                                   delta.outcome_token_id)])
+            for owner, outcome_token, delta in cursor.fetchall():
+                totals[(owner, outcome_token)] = totals.get((owner, outcome_token), 0) + delta
+                reverted += 1
+        for chunk in _chunks(list(legacy_matches.items())):
+            cursor.execute(DELETE_LEGACY_DELTAS.format(values=', '.join(
+                ['(%s, %s, %s::numeric, %s::integer, %s::integer)'] * len(chunk))),
+                [param for key, matches in chunk for param in (*key, matches)])
+            for owner, outcome_token, delta in cursor.fetchall():
+                totals[(owner, outcome_token)] = totals.get((owner, outcome_token), 0) + delta
+                reverted += 1
+
+    subtract_balance_deltas(totals)
+    return reverted
+
+
+def rollback_balance_journal(block_number: int) -> int:
+    """
+    Reverts every delta of the blocks after `block_number` (chain reorg) and the total supplies of their outcome
+    tokens. Compacted deltas are older than any block that can be reverted and are kept
+    :return: number of balances changed
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(ROLLBACK_DELTAS, {'block_number': block_number})
+        totals = {(owner, outcome_token): total for owner, outcome_token, total in cursor.fetchall()}
+
+    supply_totals = OrderedDict()
+    for (_, outcome_token), total in totals.items():
+        supply_totals[outcome_token] = supply_totals.get(outcome_token, 0) + total
+    supply_totals = [(outcome_token, total) for outcome_token, total in supply_totals.items() if total]
+    if supply_totals:
+        with connection.cursor() as cursor:
+            for chunk in _chunks(supply_totals):
+                cursor.execute(SUBTRACT_TOTAL_SUPPLIES.format(values=', '.join(['(%s, %s::numeric)'] * len(chunk))),
+                               [param for item in chunk for param in item])
+
+    subtract_balance_deltas(totals)
+    return len(totals)
+
+
+def compact_balance_journal(block_number: int) -> int:
+    """
+    Replaces the deltas of every balance before `block_number` by their sum. The balances don't change, so
+    `block_number` must be older than any block that can be reverted
+    :return: number of balances compacted
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(COMPACT_DELTAS, {'block_number': block_number})
+        return cursor.rowcount
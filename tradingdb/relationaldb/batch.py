@@ -0,0 +1,596 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_save
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from gnosis.utils import calc_lmsr_marginal_prices
+
+from . import models
+from .balance_journal import (add_balance_deltas, copy_balance_deltas,
+                              rollback_balance_journal)
+from .copy_load import copy_instances
+from .event_decoders import decode_event
+from .identity_map import get_identity_map
+from .scoreboard import touch_participants
+from .serializers import (CategoricalEventSerializer,
+                          CentralizedOracleSerializer,
+                          GenericTournamentParticipantEventSerializerTimestamped,
+                          IpfsHashField, MarketSerializerTimestamped,
+                          OutcomeTokenInstanceSerializer,
+                          OutcomeTokenIssuanceSerializer,
+                          OutcomeTokenPurchaseSerializerTimestamped,
+                          OutcomeTokenRevocationSerializer,
+                          OutcomeTokenSaleSerializerTimestamped,
+                          OutcomeTokenShortSaleOrderSerializerTimestamped,
+                          OutcomeTokenTransferSerializer,
+                          ScalarEventSerializer,
+                          UportTournamentParticipantSerializerEventSerializerTimestamped)
+
+# Max number of rows sent in every bulk statement
+BULK_BATCH_SIZE: int = 500
+
+# Deletes the orders of the reverted blocks, returns what they added to their markets by market, type and outcome
+DELETE_ORDERS = """
+WITH deleted_orders AS (
+    DELETE FROM relationaldb_order
+    WHERE creation_block > %(block_number)s
+    RETURNING market_address, sender, order_type, outcome_token_address, outcome_token_count, cost, fees
+)
+SELECT deleted_order.market_address,
+       deleted_order.order_type,
+       outcome_token.index,
+       SUM(deleted_order.outcome_token_count),
+       COALESCE(SUM(deleted_order.cost), 0),
+       COALESCE(SUM(deleted_order.fees), 0),
+       ARRAY_AGG(DISTINCT deleted_order.sender)
+FROM deleted_orders AS deleted_order
+LEFT JOIN relationaldb_outcometoken AS outcome_token
+    ON outcome_token.address = deleted_order.outcome_token_address
+GROUP BY deleted_order.market_address, deleted_order.order_type, outcome_token.index
+"""
+
+
+def bulk_create_orders(orders):
+    """
+    Inserts orders of any type (BuyOrder/SellOrder/ShortSellOrder proxies) in the order table with bulk statements.
+    `save` is not called, so the type of every order is set here
+    :param orders: list of unsaved BuyOrder/SellOrder/ShortSellOrder instances
+    :return: orders
+    """
+    for order in orders:
+        order.set_subclass_type()
+    return models.Order.objects.bulk_create(orders, batch_size=BULK_BATCH_SIZE)
+
+
+class IngestionBatch:
+    """
+    Applies a sequence of validated trade and outcome token events in memory and writes the result with a few bulk
+    statements. Every referenced Market, OutcomeToken and OutcomeTokenBalance is loaded once by `prefetch`, events
+    are applied in order by `apply` (same logic as the serializers `create`) and `flush` persists the changes.
+    Must be run inside a transaction.
+    """
+    market_fields = ('net_outcome_tokens_sold', 'collected_fees', 'trading_volume', 'marginal_prices')
+    # Serializers whose `create` can be replaced by an in memory applier
+    appliers = {
+        OutcomeTokenPurchaseSerializerTimestamped: 'apply_purchase',
+        OutcomeTokenSaleSerializerTimestamped: 'apply_sale',
+        OutcomeTokenTransferSerializer: 'apply_transfer',
+        OutcomeTokenIssuanceSerializer: 'apply_issuance',
+    }
+
+    def __init__(self):
+        self.markets = {}  # market address -> Market
+        self.outcome_tokens = {}  # outcome token address -> OutcomeToken
+        self.outcome_tokens_by_index = {}  # (event address, index) -> OutcomeToken
+        self.balances = {}  # (owner, outcome token address) -> OutcomeTokenBalance
+        self.orders = []
+        self.balance_deltas = []
+        self.updated_markets = {}
+        self.updated_outcome_tokens = {}
+
+    @classmethod
+    def supports(cls, serializer_class):
+        return serializer_class in cls.appliers
+
+    def validate_events(self, events):
+        """
+        Validates the decoded events with their serializers
+        :param events: list of (serializer_class, decoded_event, block_info)
+        :return: list of (validated_data, errors) of the events, validated_data is None for the invalid ones
+        """
+        results = []
+        for serializer_class, decoded_event, block_info in events:
+            if block_info:
+                serializer = serializer_class(data=decoded_event, block=block_info)
+            else:
+                serializer = serializer_class(data=decoded_event)
+
+            if serializer.is_valid():
+                results.append((serializer.validated_data, None))
+            else:
+                results.append((None, serializer.errors))
+        return results
+
+    def prefetch(self, entries):
+        """
+        Loads every model referenced by the entries
+        :param entries: list of (serializer_class, validated_data)
+        """
+        market_addresses = set()
+        outcome_token_addresses = set()
+        owners = set()
+        for serializer_class, validated_data in entries:
+            if serializer_class in (OutcomeTokenPurchaseSerializerTimestamped, OutcomeTokenSaleSerializerTimestamped):
+                market_addresses.add(validated_data.get('address'))
+            elif serializer_class is OutcomeTokenTransferSerializer:
+                outcome_token_addresses.add(validated_data.get('outcome_token'))
+                owners.update((validated_data.get('from_address'), validated_data.get('to')))
+            elif serializer_class is OutcomeTokenIssuanceSerializer:
+                outcome_token_addresses.add(validated_data.get('outcome_token'))
+                owners.add(validated_data.get('owner'))
+
+        identity_map = get_identity_map()
+        if identity_map is None:
+            self.markets.update(models.Market.objects.in_bulk(list(market_addresses)))
+        else:
+            # Same instances as the serializers, they see the changes written by `flush`
+            self.markets.update(identity_map.get_many(models.Market, market_addresses))
+
+        event_addresses = {market.event_id for market in self.markets.values()}
+        if event_addresses or outcome_token_addresses:
+            for outcome_token in models.OutcomeToken.objects.filter(Q(event__in=event_addresses) |
+                                                                   Q(address__in=outcome_token_addresses)):
+                self.outcome_tokens[outcome_token.address] = outcome_token
+                self.outcome_tokens_by_index[(outcome_token.event_id, outcome_token.index)] = outcome_token
+
+        if owners:
+            for balance in models.OutcomeTokenBalance.objects.filter(outcome_token__in=outcome_token_addresses,
+                                                                     owner__in=owners):
+                self.balances[(balance.owner, balance.outcome_token_id)] = balance
+
+    def apply(self, serializer_class, validated_data):
+        """
+        Applies an event over the in memory models
+        :return: the instance the serializer `create` would return
+        """
+        return getattr(self, self.appliers[serializer_class])(validated_data)
+
+    def get_market(self, address):
+        try:
+            return self.markets[address]
+        except KeyError:
+            raise serializers.ValidationError('Market with address {} does not exist.'.format(address))
+
+    def get_outcome_token_by_index(self, market, index):
+        try:
+            return self.outcome_tokens_by_index[(market.event_id, index)]
+        except KeyError:
+            raise models.OutcomeToken.DoesNotExist('OutcomeToken with index {} does not exist.'.format(index))
+
+    def add_balance_delta(self, validated_data, owner, outcome_token_address, delta):
+        """
+        Adds the delta to the in memory balance, the delta is written to the balance journal by `flush`
+        :return: the balance
+        """
+        key = (owner, outcome_token_address)
+        balance = self.balances.get(key)
+        if balance is None:
+            balance = models.OutcomeTokenBalance(owner=owner, outcome_token_id=outcome_token_address, balance=0)
+            self.balances[key] = balance
+        balance.balance += delta
+        self.balance_deltas.append(models.OutcomeTokenBalanceDelta(
+            owner=owner,
+            outcome_token_id=outcome_token_address,
+            delta=delta,
+            block_number=validated_data.get('block_number'),
+            log_index=validated_data.get('log_index'),
+        ))
+        return balance
+
+    @staticmethod
+    def calc_marginal_prices(market):
+        return [Decimal(marginal_price)
+                for marginal_price in calc_lmsr_marginal_prices(market.net_outcome_tokens_sold, market.funding)]
+
+    def apply_purchase(self, validated_data):
+        market = self.get_market(validated_data.get('address'))
+        token_index = validated_data.get('outcomeTokenIndex')
+        token_count = validated_data.get('outcomeTokenCount')
+        market.net_outcome_tokens_sold[token_index] += token_count
+        market.collected_fees += validated_data.get('marketFees')
+
+        order = models.BuyOrder(
+            creation_date_time=validated_data.get('creation_date_time'),
+            creation_block=validated_data.get('creation_block'),
+            market=market,
+            sender=validated_data.get('buyer'),
+            outcome_token=self.get_outcome_token_by_index(market, token_index),
+            outcome_token_count=token_count,
+            cost=validated_data.get('outcomeTokenCost') + validated_data.get('marketFees'),
+            outcome_token_cost=validated_data.get('outcomeTokenCost'),
+            fees=validated_data.get('marketFees'),
+            # Copy, next events of the batch keep modifying the market list
+            net_outcome_tokens_sold=list(market.net_outcome_tokens_sold),
+            transaction_hash=validated_data.get('transaction_hash'),
+            marginal_prices=self.calc_marginal_prices(market),
+        )
+
+        market.trading_volume += order.cost
+        market.marginal_prices = order.marginal_prices
+        self.orders.append(order)
+        self.updated_markets[market.address] = market
+        return order
+
+    def apply_sale(self, validated_data):
+        market = self.get_market(validated_data.get('address'))
+        token_index = validated_data.get('outcomeTokenIndex')
+        token_count = validated_data.get('outcomeTokenCount')
+        market.net_outcome_tokens_sold[token_index] -= token_count
+        market.collected_fees += validated_data.get('marketFees')
+
+        order = models.SellOrder(
+            creation_date_time=validated_data.get('creation_date_time'),
+            creation_block=validated_data.get('creation_block'),
+            market=market,
+            sender=validated_data.get('seller'),
+            outcome_token=self.get_outcome_token_by_index(market, token_index),
+            outcome_token_count=token_count,
+            profit=validated_data.get('outcomeTokenProfit') - validated_data.get('marketFees'),
+            outcome_token_profit=validated_data.get('outcomeTokenProfit'),
+            fees=validated_data.get('marketFees'),
+            net_outcome_tokens_sold=list(market.net_outcome_tokens_sold),
+            transaction_hash=validated_data.get('transaction_hash'),
+            marginal_prices=self.calc_marginal_prices(market),
+        )
+
+        market.marginal_prices = order.marginal_prices
+        self.orders.append(order)
+        self.updated_markets[market.address] = market
+        return order
+
+    def apply_transfer(self, validated_data):
+        outcome_token_address = validated_data.get('outcome_token')
+        from_key = (validated_data.get('from_address'), outcome_token_address)
+        if from_key not in self.balances:
+            raise models.OutcomeTokenBalance.DoesNotExist('OutcomeTokenBalance {} for owner {} doesn\'t exist'.format(
+                outcome_token_address, validated_data.get('from_address')))
+
+        # A transfer to the sender doesn't change the balance, a log has one journal delta per balance
+        if validated_data.get('to') == validated_data.get('from_address'):
+            return self.balances[from_key]
+
+        self.add_balance_delta(validated_data, *from_key, -validated_data.get('value'))
+        return self.add_balance_delta(validated_data, validated_data.get('to'), outcome_token_address,
+                                      validated_data.get('value'))
+
+    def apply_issuance(self, validated_data):
+        outcome_token_address = validated_data.get('outcome_token')
+        try:
+            outcome_token = self.outcome_tokens[outcome_token_address]
+        except KeyError:
+            raise models.OutcomeToken.DoesNotExist('OutcomeToken {} does not exist'.format(outcome_token_address))
+
+        outcome_token.total_supply += validated_data.get('amount')
+        self.updated_outcome_tokens[outcome_token_address] = outcome_token
+
+        self.add_balance_delta(validated_data, validated_data.get('owner'), outcome_token_address,
+                               validated_data.get('amount'))
+        return outcome_token
+
+    def flush(self):
+        """
+        Writes every pending change. Bulk statements don't send model signals, so scoreboard participants are
+        touched here (balance owners by the balance journal)
+        """
+        touched_participants = {order.sender for order in self.orders}
+        if self.orders:
+            self.write_orders(self.orders)
+        if self.updated_markets:
+            models.Market.objects.bulk_update(self.updated_markets.values(), self.market_fields,
+                                              batch_size=BULK_BATCH_SIZE)
+        if self.updated_outcome_tokens:
+            models.OutcomeToken.objects.bulk_update(self.updated_outcome_tokens.values(), ['total_supply'],
+                                                    batch_size=BULK_BATCH_SIZE)
+        if self.balance_deltas:
+            # Balances returned by `apply` get the primary key of their rows
+            for key, balance in self.write_balance_deltas(self.balance_deltas).items():
+                self.balances[key].pk = balance.pk
+        if touched_participants:
+            touch_participants(touched_participants)
+
+        self.orders = []
+        self.balance_deltas = []
+        self.updated_markets = {}
+        self.updated_outcome_tokens = {}
+
+    def write_orders(self, orders):
+        bulk_create_orders(orders)
+
+    def write_balance_deltas(self, balance_deltas):
+        return add_balance_deltas(balance_deltas)
+
+
+class CopyIngestionBatch(IngestionBatch):
+    """
+    IngestionBatch of the bootstrap of a new database, for batches of thousands of logs:
+        - Events are validated by the decoders of `event_decoders` instead of their serializers
+        - Contracts created by the factories (oracles, events, outcome tokens and markets) are applied in memory too,
+          the contracts they reference are loaded once by `validate_events`
+        - Contracts, orders and balance journal deltas are inserted with COPY. Primary keys of the orders are not set
+    """
+    appliers = {
+        **IngestionBatch.appliers,
+        CentralizedOracleSerializer: 'apply_centralized_oracle',
+        CategoricalEventSerializer: 'apply_categorical_event',
+        ScalarEventSerializer: 'apply_scalar_event',
+        OutcomeTokenInstanceSerializer: 'apply_outcome_token',
+        MarketSerializerTimestamped: 'apply_market',
+    }
+    # Written in this order by `flush`, before the rest of rows: every model references the previous ones
+    contract_models = (models.CentralizedOracle, models.CategoricalEvent, models.ScalarEvent, models.OutcomeToken,
+                       models.Market)
+
+    def __init__(self):
+        super().__init__()
+        self.event_descriptions = {}  # ipfs hash -> EventDescription
+        self.oracles = {}  # oracle address -> Oracle, with its event description
+        self.events = {}  # event address -> Event, with the event description of its oracle
+        self.contracts = {}  # model -> list of unsaved contracts
+
+    def validate_events(self, events):
+        """
+        Validates the decoded events with `event_decoders`, then replaces the event descriptions, oracles and events
+        referenced by the validated data with their instances, like the fields of the serializers do
+        """
+        decoded_events = []  # (serializer_class, validated_data, errors)
+        for serializer_class, decoded_event, block_info in events:
+            try:
+                decoded_events.append((serializer_class, decode_event(serializer_class, decoded_event, block_info),
+                                       None))
+            except serializers.ValidationError as e:
+                decoded_events.append((serializer_class, None, e.detail))
+        self.load_references([(serializer_class, validated_data) for serializer_class, validated_data, errors
+                              in decoded_events if errors is None])
+
+        results = []
+        for serializer_class, validated_data, errors in decoded_events:
+            if errors is None:
+                try:
+                    validated_data = self.resolve_references(serializer_class, validated_data)
+                except serializers.ValidationError as e:
+                    # Errors of `validate` are not bound to a field, like `serializer.errors`
+                    validated_data, errors = None, (e.detail if isinstance(e.detail, dict)
+                                                    else {api_settings.NON_FIELD_ERRORS_KEY: e.detail})
+            results.append((validated_data, errors))
+        return results
+
+    def load_references(self, entries):
+        """
+        Loads every event description, oracle and event referenced by the entries
+        :param entries: list of (serializer_class, decoded validated_data)
+        """
+        ipfs_hashes = set()
+        oracle_addresses = set()
+        event_addresses = set()
+        for serializer_class, validated_data in entries:
+            if serializer_class is CentralizedOracleSerializer:
+                ipfs_hashes.add(validated_data['event_description'])
+            elif serializer_class in (CategoricalEventSerializer, ScalarEventSerializer):
+                oracle_addresses.add(validated_data['oracle'])
+            elif serializer_class in (MarketSerializerTimestamped, OutcomeTokenInstanceSerializer):
+                event_addresses.add(validated_data['event'])
+
+        if ipfs_hashes:
+            # Descriptions without title are resolved again by `IpfsHashField`
+            event_descriptions = models.EventDescription.objects.filter(ipfs_hash__in=ipfs_hashes).exclude(title=None)
+            self.event_descriptions.update((event_description.ipfs_hash, event_description)
+                                           for event_description in event_descriptions)
+        if oracle_addresses:
+            self.oracles.update(models.Oracle.objects.select_related(
+                'centralizedoracle__event_description__categoricaleventdescription',
+                'centralizedoracle__event_description__scalareventdescription',
+            ).in_bulk(list(oracle_addresses)))
+        if event_addresses:
+            self.events.update(models.Event.objects.select_related(
+                'oracle__centralizedoracle__event_description__categoricaleventdescription',
+            ).in_bulk(list(event_addresses)))
+
+    def resolve_references(self, serializer_class, validated_data):
+        """
+        Same validation as the custom fields and `validate` of the serializers
+        :return: validated_data with the instances of the event description, oracle or event
+        :raise serializers.ValidationError
+        """
+        if serializer_class is CentralizedOracleSerializer:
+            ipfs_hash = validated_data['event_description']
+            event_description = self.event_descriptions.get(ipfs_hash)
+            if event_description is None:
+                try:
+                    event_description = IpfsHashField().to_internal_value(ipfs_hash)
+                except serializers.ValidationError as e:
+                    raise serializers.ValidationError({'ipfsHash': e.detail})
+            validated_data['event_description'] = event_description
+        elif serializer_class in (CategoricalEventSerializer, ScalarEventSerializer):
+            oracle = self.oracles.get(validated_data['oracle'])
+            if oracle is None:
+                raise serializers.ValidationError({'oracle': ['Unknown Oracle address']})
+            self.validate_event_description(serializer_class, oracle, validated_data)
+            validated_data['oracle'] = oracle
+        elif serializer_class in (MarketSerializerTimestamped, OutcomeTokenInstanceSerializer):
+            event = self.events.get(validated_data['event'])
+            if event is None:
+                raise serializers.ValidationError({'eventContract' if serializer_class is MarketSerializerTimestamped
+                                                   else 'address': ['eventContract address must exist']})
+            validated_data['event'] = event
+        return validated_data
+
+    @staticmethod
+    def validate_event_description(serializer_class, oracle, validated_data):
+        """
+        The event description of a centralized oracle must be of the type of the event, with the same number of
+        outcomes for categorical events
+        """
+        try:
+            event_description = oracle.centralizedoracle.event_description
+        except models.CentralizedOracle.DoesNotExist:
+            return
+
+        try:
+            if serializer_class is ScalarEventSerializer:
+                event_description.scalareventdescription
+            else:
+                outcomes = event_description.categoricaleventdescription.outcomes
+                if len(outcomes) != validated_data['outcomeCount']:
+                    raise serializers.ValidationError('Field outcomeCount does not match number of outcomes specified '
+                                                      'in the event description.')
+        except (AttributeError, models.EventDescription.DoesNotExist):
+            raise serializers.ValidationError('Not existing {} with oracle {}'.format(
+                'ScalarEventDescription' if serializer_class is ScalarEventSerializer
+                else 'CategoricalEventDescription', oracle.address))
+
+    def add_contract(self, contract):
+        self.contracts.setdefault(type(contract), []).append(contract)
+        return contract
+
+    def apply_centralized_oracle(self, validated_data):
+        oracle = models.CentralizedOracle(owner=validated_data['creator'], old_owner=validated_data['creator'],
+                                          **validated_data)
+        oracle.set_subclass_type()
+        return self.add_contract(oracle)
+
+    def apply_categorical_event(self, validated_data):
+        event = models.CategoricalEvent(**{field: value for field, value in validated_data.items()
+                                           if field != 'outcomeCount'})
+        event.set_subclass_type()
+        return self.add_contract(event)
+
+    def apply_scalar_event(self, validated_data):
+        event = models.ScalarEvent(**validated_data)
+        event.set_subclass_type()
+        return self.add_contract(event)
+
+    def apply_outcome_token(self, validated_data):
+        return self.add_contract(models.OutcomeToken(**validated_data))
+
+    def apply_market(self, validated_data):
+        # Same initial state as `MarketSerializerTimestamped.create`
+        event = validated_data['event']
+        if event.is_categorical():
+            event_description = event.oracle.centralizedoracle.event_description
+            n_outcome_tokens = len(event_description.categoricaleventdescription.outcomes)
+            net_outcome_tokens_sold = [0] * n_outcome_tokens
+            marginal_prices = [str(1.0 / n_outcome_tokens) for _ in range(0, n_outcome_tokens)]
+        else:
+            net_outcome_tokens_sold = [0, 0]
+            marginal_prices = ['0.5', '0.5']
+
+        return self.add_contract(models.Market(net_outcome_tokens_sold=net_outcome_tokens_sold,
+                                               marginal_prices=marginal_prices, trading_volume=0,
+                                               **models.Market.get_event_fields(event), **validated_data))
+
+    def flush(self):
+        """
+        Writes the created contracts, then the rest of changes. The contracts are announced with `post_save`, as if
+        they were saved one by one: address indexes, identity map and response cache see them
+        """
+        for model in self.contract_models:
+            contracts = self.contracts.get(model)
+            if contracts:
+                copy_instances(model, contracts)
+                for contract in contracts:
+                    post_save.send(sender=model, instance=contract, created=True, update_fields=None, raw=False,
+                                   using=connection.alias)
+        self.contracts = {}
+        super().flush()
+
+    def write_orders(self, orders):
+        for order in orders:
+            order.set_subclass_type()
+        copy_instances(models.Order, orders)
+
+    def write_balance_deltas(self, balance_deltas):
+        return copy_balance_deltas(balance_deltas)
+
+
+class BlockRollback:
+    """
+    Reverts the changes of every event of the blocks after `block_number` (chain reorg) with a few bulk statements,
+    instead of finding and reverting every event one by one. Only the events whose changes are stored with their
+    block are supported:
+        - Orders are deleted and their trades subtracted from the markets (`revert_aggregates`)
+        - Outcome token balances and total supplies are reverted from the balance journal (`revert_aggregates`)
+        - Contracts created by factories and tournament participants are deleted (`delete_contracts`)
+    The rest of the events must be reverted one by one between both calls, when every contract still exists. Must be
+    run inside a transaction
+    """
+    serializer_classes = (
+        CentralizedOracleSerializer,
+        ScalarEventSerializer,
+        CategoricalEventSerializer,
+        MarketSerializerTimestamped,
+        OutcomeTokenPurchaseSerializerTimestamped,
+        OutcomeTokenSaleSerializerTimestamped,
+        OutcomeTokenShortSaleOrderSerializerTimestamped,
+        OutcomeTokenIssuanceSerializer,
+        OutcomeTokenRevocationSerializer,
+        OutcomeTokenTransferSerializer,
+        UportTournamentParticipantSerializerEventSerializerTimestamped,
+        GenericTournamentParticipantEventSerializerTimestamped,
+    )
+    # Deleted in this order, the models created by factories cascade to their children
+    contract_models = (models.Market, models.Event, models.Oracle, models.TournamentParticipant)
+
+    def __init__(self, block_number: int):
+        """
+        :param block_number: last block kept
+        """
+        self.block_number = block_number
+
+    @classmethod
+    def supports(cls, serializer_class):
+        return serializer_class in cls.serializer_classes
+
+    def revert_orders(self):
+        """
+        Deletes the orders of the reverted blocks and subtracts them from their markets, same logic as the serializers
+        `rollback`. Marginal prices are calculated with the current funding of the markets, so it must be called before
+        the `MarketFunding` events are reverted one by one, as the orders emitted after a funding would be. A funding
+        doesn't change the prices, they are the same after both rollbacks
+        :return: number of markets reverted
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(DELETE_ORDERS, {'block_number': self.block_number})
+            rows = cursor.fetchall()
+        if not rows:
+            return 0
+
+        markets = models.Market.objects.in_bulk(list({row[0] for row in rows}))
+        senders = set()
+        for market_address, order_type, token_index, token_count, cost, fees, order_senders in rows:
+            senders.update(order_senders)
+            market = markets[market_address]
+            if order_type == models.BuyOrder.subclass_type:
+                market.net_outcome_tokens_sold[token_index] -= token_count
+                market.collected_fees -= fees
+                market.trading_volume -= cost
+            elif order_type == models.SellOrder.subclass_type:
+                market.net_outcome_tokens_sold[token_index] += token_count
+                market.collected_fees -= fees
+
+        for market in markets.values():
+            market.marginal_prices = IngestionBatch.calc_marginal_prices(market)
+        models.Market.objects.bulk_update(markets.values(), IngestionBatch.market_fields, batch_size=BULK_BATCH_SIZE)
+        # Deleted with SQL, no model signals
+        touch_participants(senders)
+        return len(markets)
+
+    def revert_aggregates(self):
+        self.revert_orders()
+        rollback_balance_journal(self.block_number)
+
+    def delete_contracts(self):
+        for model in self.contract_models:
+            model.objects.filter(creation_block__gt=self.block_number).delete()
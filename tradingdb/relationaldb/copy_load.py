@@ -0,0 +1,94 @@
+"""
+Loading of rows with Postgres `COPY ... FROM STDIN`, used by the bootstrap loader to insert the contracts, orders and
+balance journal deltas of thousands of logs with one statement per table. Rows are written in the text format: columns
+separated by tabs, `\\N` for null and arrays as `{...}` literals. Like `bulk_create`, no model signals are sent and
+the auto primary keys are not set on the instances.
+"""
+import io
+from datetime import date, datetime
+from typing import Iterable, List, Sequence, Type
+
+from django.db import connection
+from django.db.models import AutoField, Field, Model
+
+# Characters escaped in the text format of COPY
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def format_array_item(value) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (list, tuple)):
+        return format_array(value)
+    if isinstance(value, str):
+        return '"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+    return str(value)
+
+
+def format_array(values: Sequence) -> str:
+    return '{' + ','.join(format_array_item(value) for value in values) + '}'
+
+
+def format_copy_value(value) -> str:
+    """
+    :return: `value` (already prepared for the database) in the text format of COPY
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (list, tuple)):
+        value = format_array(value)
+    elif isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    return str(value).translate(COPY_ESCAPES)
+
+
+def copy_rows(table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+    """
+    Inserts the rows in `table` with one COPY statement
+    :param rows: tuples of values prepared for the database, in the order of `columns`
+    :return: number of rows copied
+    """
+    buffer = io.StringIO()
+    copied = 0
+    for row in rows:
+        buffer.write('\t'.join(format_copy_value(value) for value in row))
+        buffer.write('\n')
+        copied += 1
+    if not copied:
+        return 0
+
+    buffer.seek(0)
+    quote_name = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.copy_expert('COPY {} ({}) FROM STDIN'.format(quote_name(table),
+                                                            ', '.join(quote_name(column) for column in columns)),
+                           buffer)
+    return copied
+
+
+def get_copy_value(field: Field, instance: Model):
+    if field.remote_field is not None and field.remote_field.parent_link:
+        # Set by `save`, the row of the parent has the same primary key
+        return getattr(instance, field.target_field.attname)
+    return field.get_db_prep_save(field.pre_save(instance, True), connection)
+
+
+def copy_instances(model: Type[Model], instances: List[Model]) -> int:
+    """
+    Inserts unsaved instances of `model` with one COPY statement per table, the instances of a multi-table inheritance
+    child are copied to the tables of its parents first. Every concrete field but the auto primary key is copied,
+    values are prepared as `bulk_create` does (`pre_save` and `get_db_prep_save` of every field)
+    :return: number of rows copied
+    """
+    concrete_model = model._meta.concrete_model
+    copied = 0
+    for table_model in reversed([concrete_model] + concrete_model._meta.get_parent_list()):
+        fields = [field for field in table_model._meta.local_concrete_fields if not isinstance(field, AutoField)]
+        copied = copy_rows(table_model._meta.db_table, [field.column for field in fields],
+                           ([get_copy_value(field, instance) for field in fields] for instance in instances))
+    for instance in instances:
+        instance._state.adding = False
+        instance._state.db = connection.alias
+    return copied
@@ -0,0 +1,256 @@
+"""
+Lightweight validation of the decoded logs applied by the bootstrap batch (`batch.CopyIngestionBatch`), instead of
+`is_valid` of their serializers: DRF builds the fields of a serializer for every log, which costs more than applying
+the log. Every decoder returns the `validated_data` of the serializer of the event and raises `ValidationError` with
+the error of the field. Contracts and event descriptions are returned by address (ipfs hash), the batch loads them
+in bulk and replaces them with their instances.
+"""
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django_eth_events.utils import normalize_address_without_0x
+from rest_framework import serializers
+
+from .serializers import (ADDRESS_LENGTH, TRANSACTION_LENGTH,
+                          CategoricalEventSerializer,
+                          CentralizedOracleSerializer,
+                          MarketSerializerTimestamped,
+                          OutcomeTokenInstanceSerializer,
+                          OutcomeTokenIssuanceSerializer,
+                          OutcomeTokenPurchaseSerializerTimestamped,
+                          OutcomeTokenSaleSerializerTimestamped,
+                          OutcomeTokenTransferSerializer,
+                          ScalarEventSerializer)
+
+# Converts the block timestamps like `BlockTimestampedSerializer` (timezone)
+creation_date_time_field = serializers.DateTimeField()
+
+
+def get_value(data: Dict, name: str):
+    try:
+        value = data[name]
+    except KeyError:
+        raise serializers.ValidationError({name: ['This field is required.']})
+    if value is None:
+        raise serializers.ValidationError({name: ['This field may not be null.']})
+    return value
+
+
+def decode_string(data: Dict, name: str, max_length: Optional[int] = ADDRESS_LENGTH) -> str:
+    """
+    Same conversion as `serializers.CharField`, without length validation if `max_length` is None
+    """
+    value = get_value(data, name)
+    if value == '' or str(value).strip() == '':
+        raise serializers.ValidationError({name: ['This field may not be blank.']})
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise serializers.ValidationError({name: ['Not a valid string.']})
+    value = str(value).strip()
+    if max_length is not None and len(value) > max_length:
+        raise serializers.ValidationError({name: ['Ensure this field has no more than {} characters.'.format(
+            max_length)]})
+    return value
+
+
+def decode_integer(data: Dict, name: str, min_value: Optional[int] = None, allow_null: bool = False) -> Optional[int]:
+    """
+    Same conversion as `serializers.IntegerField`, missing values are null if `allow_null`
+    """
+    if allow_null and data.get(name) is None:
+        return None
+    value = get_value(data, name)
+    if isinstance(value, bool) or not isinstance(value, int):
+        try:
+            value = int(serializers.IntegerField.re_decimal.sub('', str(value)))
+        except ValueError:
+            raise serializers.ValidationError({name: ['A valid integer is required.']})
+    if min_value is not None and value < min_value:
+        raise serializers.ValidationError({name: ['Ensure this value is greater than or equal to {}.'.format(
+            min_value)]})
+    return value
+
+
+def get_params(decoded_event: Dict) -> Dict:
+    return {param['name']: param['value'] for param in decoded_event.get('params')}
+
+
+def decode_block(block_info: Optional[Dict]) -> Dict:
+    if not block_info:
+        raise serializers.ValidationError({'creation_block': ['This field is required.']})
+    return {
+        'creation_date_time': creation_date_time_field.enforce_timezone(
+            datetime.fromtimestamp(block_info.get('timestamp'))),
+        'creation_block': block_info.get('number'),
+    }
+
+
+def decode_log_position(decoded_event: Dict, block_info: Optional[Dict]) -> Dict:
+    return {
+        'block_number': decode_integer({'block_number': block_info.get('number') if block_info else None},
+                                       'block_number', min_value=0),
+        'log_index': decode_integer(decoded_event, 'log_index', min_value=0, allow_null=True),
+    }
+
+
+def decode_contract_creation(decoded_event: Dict, block_info: Optional[Dict], params: Dict,
+                             contract_param: str) -> Dict:
+    return {
+        'address': decode_string(params, contract_param),
+        **decode_block(block_info),
+        'factory': decode_string(decoded_event, 'address'),
+        'creator': decode_string(params, 'creator'),
+    }
+
+
+def decode_purchase(decoded_event: Dict, block_info: Optional[Dict]) -> Dict:
+    params = get_params(decoded_event)
+    return {
+        'address': decode_string(decoded_event, 'address'),
+        **decode_block(block_info),
+        'buyer': decode_string(params, 'buyer'),
+        'outcomeTokenIndex': decode_integer(params, 'outcomeTokenIndex'),
+        'outcomeTokenCount': decode_integer(params, 'outcomeTokenCount'),
+        'outcomeTokenCost': decode_integer(params, 'outcomeTokenCost'),
+        'marketFees': decode_integer(params, 'marketFees'),
+        'transaction_hash': decode_string(decoded_event, 'transaction_hash', max_length=TRANSACTION_LENGTH),
+    }
+
+
+def decode_sale(decoded_event: Dict, block_info: Optional[Dict]) -> Dict:
+    params = get_params(decoded_event)
+    return {
+        'address': decode_string(decoded_event, 'address'),
+        **decode_block(block_info),
+        'seller': decode_string(params, 'seller'),
+        'outcomeTokenIndex': decode_integer(params, 'outcomeTokenIndex'),
+        'outcomeTokenCount': decode_integer(params, 'outcomeTokenCount'),
+        'outcomeTokenProfit': decode_integer(params, 'outcomeTokenProfit'),
+        'marketFees': decode_integer(params, 'marketFees'),
+        'transaction_hash': decode_string(decoded_event, 'transaction_hash', max_length=TRANSACTION_LENGTH),
+    }
+
+
+def decode_transfer(decoded_event: Dict, block_info: Optional[Dict]) -> Dict:
+    params = get_params(decoded_event)
+    # Renamed like `OutcomeTokenTransferSerializer`
+    if 'from' in params:
+        params['from_address'] = params.pop('from')
+    return {
+        'outcome_token': decode_string(decoded_event, 'address'),
+        **decode_log_position(decoded_event, block_info),
+        'from_address': decode_string(params, 'from_address'),
+        'to': decode_string(params, 'to'),
+        'value': decode_integer(params, 'value', min_value=0),
+    }
+
+
+def decode_issuance(decoded_event: Dict, block_info: Optional[Dict]) -> Dict:
+    params = get_params(decoded_event)
+    return {
+        'outcome_token': decode_string(decoded_event, 'address'),
+        **decode_log_position(decoded_event, block_info),
+        'owner': decode_string(params, 'owner'),
+        'amount': decode_integer(params, 'amount'),
+    }
+
+
+def decode_centralized_oracle(decoded_event: Dict, block_info: Optional[Dict]) -> Dict:
+    """
+    :return: validated data, with the ipfs hash as `event_description`
+    """
+    params = get_params(decoded_event)
+    ipfs_hash = get_value(params, 'ipfsHash')
+    return {
+        **decode_contract_creation(decoded_event, block_info, params, 'centralizedOracle'),
+        # Ipfs hash is returned as bytes
+        'event_description': ipfs_hash.decode() if isinstance(ipfs_hash, bytes) else ipfs_hash,
+    }
+
+
+def decode_event_creation(decoded_event: Dict, block_info: Optional[Dict], params: Dict, event_param: str) -> Dict:
+    """
+    :return: validated data, with the address of the oracle as `oracle`
+    """
+    # Validated like `OracleField`
+    oracle = decode_string(params, 'oracle', max_length=None)
+    if len(oracle) != ADDRESS_LENGTH:
+        raise serializers.ValidationError({'oracle': ['Maximum address length of {} chars, it has {}'.format(
+            ADDRESS_LENGTH, len(oracle))]})
+    return {
+        **decode_contract_creation(decoded_event, block_info, params, event_param),
+        'collateral_token': decode_string(params, 'collateralToken'),
+        'oracle': oracle,
+    }
+
+
+def decode_categorical_event(decoded_event: Dict, block_info: Optional[Dict]) -> Dict:
+    params = get_params(decoded_event)
+    return {
+        **decode_event_creation(decoded_event, block_info, params, 'categoricalEvent'),
+        'outcomeCount': decode_integer(params, 'outcomeCount'),
+    }
+
+
+def decode_scalar_event(decoded_event: Dict, block_info: Optional[Dict]) -> Dict:
+    params = get_params(decoded_event)
+    return {
+        **decode_event_creation(decoded_event, block_info, params, 'scalarEvent'),
+        'lower_bound': decode_integer(params, 'lowerBound'),
+        'upper_bound': decode_integer(params, 'upperBound'),
+    }
+
+
+def decode_market(decoded_event: Dict, block_info: Optional[Dict]) -> Dict:
+    """
+    :return: validated data, with the address of the event as `event`
+    """
+    params = get_params(decoded_event)
+    market_maker = decode_string(params, 'marketMaker')
+    lmsr_addresses = {normalize_address_without_0x(address) for address in settings.LMSR_MARKET_MAKER.split(',')
+                      if address}
+    if normalize_address_without_0x(market_maker) not in lmsr_addresses:
+        raise serializers.ValidationError({'marketMaker': ['Market Maker {} does not exist'.format(market_maker)]})
+    return {
+        **decode_contract_creation(decoded_event, block_info, params, 'market'),
+        # Length not validated by `EventField`, unknown addresses are rejected by the batch
+        'event': decode_string(params, 'eventContract', max_length=None),
+        'market_maker': market_maker,
+        'fee': decode_integer(params, 'fee'),
+        'revenue': 0,
+        'collected_fees': 0,
+    }
+
+
+def decode_outcome_token(decoded_event: Dict, block_info: Optional[Dict]) -> Dict:
+    """
+    :return: validated data, with the address of the event as `event`
+    """
+    params = get_params(decoded_event)
+    return {
+        'event': decode_string(decoded_event, 'address', max_length=None),
+        'address': decode_string(params, 'outcomeToken'),
+        'index': decode_integer(params, 'index', min_value=0),
+    }
+
+
+# Serializer class -> decoder of its events
+EVENT_DECODERS: Dict[type, Callable[[Dict, Optional[Dict]], Dict]] = {
+    OutcomeTokenPurchaseSerializerTimestamped: decode_purchase,
+    OutcomeTokenSaleSerializerTimestamped: decode_sale,
+    OutcomeTokenTransferSerializer: decode_transfer,
+    OutcomeTokenIssuanceSerializer: decode_issuance,
+    CentralizedOracleSerializer: decode_centralized_oracle,
+    CategoricalEventSerializer: decode_categorical_event,
+    ScalarEventSerializer: decode_scalar_event,
+    MarketSerializerTimestamped: decode_market,
+    OutcomeTokenInstanceSerializer: decode_outcome_token,
+}
+
+
+def decode_event(serializer_class, decoded_event: Dict, block_info: Optional[Dict] = None) -> Dict:
+    """
+    :return: validated data of the event, like `serializer_class` would return
+    :raise serializers.ValidationError: if the event is not valid
+    """
+    return EVENT_DECODERS[serializer_class](decoded_event, block_info)
@@ -0,0 +1,144 @@
+"""
+Identity map of the contracts (oracles, events, markets) looked up by address by the ingestion serializers. While a
+batch of logs is saved (`identity_map()` context) every contract is loaded once and the same instance is returned to
+every serializer referencing it, so the changes saved by a serializer are seen by the next ones. Outside of a batch
+`get_contract` queries the database as usual.
+
+A cached instance is dropped when another instance of the same contract is saved or deleted, and the whole map is
+cleared on rollback: the database doesn't match the cached instances anymore.
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Set, Tuple, Type
+
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+
+from .models import Contract
+from .signals import model_receiver
+
+# Max number of instances kept, the least recently used are dropped
+IDENTITY_MAP_SIZE: int = 10000
+
+IdentityKey = Tuple[Type[Model], str, Tuple[str, ...]]  # (model, address, select_related lookups)
+
+_local = threading.local()
+
+
+class IdentityMap:
+    def __init__(self, max_size: int = IDENTITY_MAP_SIZE):
+        self.max_size = max_size
+        self.instances = OrderedDict()  # IdentityKey -> instance
+        self.keys_by_address: Dict[str, Set[IdentityKey]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model: Type[Model], address: str, select_related: Tuple[str, ...] = ()):
+        """
+        :raise model.DoesNotExist: missing contracts are not cached
+        """
+        key = (model, address, select_related)
+        instance = self.instances.get(key)
+        if instance is None:
+            self.misses += 1
+            instance = model.objects.select_related(*select_related).get(address=address)
+            self.add(instance, model=model, select_related=select_related)
+        else:
+            self.hits += 1
+            self.instances.move_to_end(key)
+        return instance
+
+    def get_many(self, model: Type[Model], addresses: Iterable[str]) -> Dict[str, Model]:
+        """
+        :return: dictionary of address -> instance of the existing contracts, the missing ones are loaded with one query
+        """
+        instances = {}
+        missing = []
+        for address in set(addresses):
+            instance = self.instances.get((model, address, ()))
+            if instance is None:
+                missing.append(address)
+            else:
+                self.hits += 1
+                instances[address] = instance
+        if missing:
+            self.misses += len(missing)
+            for address, instance in model.objects.in_bulk(missing).items():
+                self.add(instance, model=model)
+                instances[address] = instance
+        return instances
+
+    def add(self, instance: Model, model: Type[Model] = None, select_related: Tuple[str, ...] = ()):
+        key = (model or type(instance), instance.address, select_related)
+        self.instances[key] = instance
+        self.instances.move_to_end(key)
+        self.keys_by_address.setdefault(instance.address, set()).add(key)
+        while len(self.instances) > self.max_size:
+            self._remove(next(iter(self.instances)))
+
+    def _remove(self, key: IdentityKey):
+        del self.instances[key]
+        keys = self.keys_by_address[key[1]]
+        keys.discard(key)
+        if not keys:
+            del self.keys_by_address[key[1]]
+
+    def evict(self, address: str, keep: Optional[Model] = None):
+        """
+        Drops the cached instances of a contract, except `keep`
+        """
+        for key in list(self.keys_by_address.get(address, ())):
+            if self.instances[key] is not keep:
+                self._remove(key)
+
+    def clear(self):
+        self.instances.clear()
+        self.keys_by_address.clear()
+
+
+def get_identity_map() -> Optional[IdentityMap]:
+    return getattr(_local, 'identity_map', None)
+
+
+@contextmanager
+def identity_map():
+    """
+    Activates an identity map for the current thread, nested contexts share the outermost map
+    """
+    current = get_identity_map()
+    if current is not None:
+        yield current
+        return
+
+    _local.identity_map = IdentityMap()
+    try:
+        yield _local.identity_map
+    finally:
+        _local.identity_map = None
+
+
+def get_contract(model: Type[Model], address: str, select_related: Tuple[str, ...] = ()):
+    """
+    :return: contract of `model` with `address`, from the active identity map if any
+    :raise model.DoesNotExist
+    """
+    current = get_identity_map()
+    if current is None:
+        return model.objects.select_related(*select_related).get(address=address)
+    return current.get(model, address, select_related=select_related)
+
+
+def invalidate_identity_map():
+    current = get_identity_map()
+    if current is not None:
+        current.clear()
+
+
+@model_receiver(post_save, (Contract,), dispatch_uid='identity_map_post_save')
+@model_receiver(post_delete, (Contract,), dispatch_uid='identity_map_post_delete')
+def evict_contract(sender, instance, **kwargs):
+    current = get_identity_map()
+    if current is not None:
+        # The saved instance is up to date, the rest of instances of the contract are not
+        current.evict(instance.address, keep=instance if kwargs.get('signal') is post_save else None)
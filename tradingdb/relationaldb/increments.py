@@ -0,0 +1,71 @@
+"""
+Atomic increments of the aggregate columns of the contracts: redeemed winnings of events, total supplies of outcome
+tokens and fees, volumes and outcome tokens sold of markets. Instead of loading the row, adding in Python and saving
+every column, the deltas are added by Postgres with one `UPDATE ... SET column = column + %s` statement: only the
+changed columns are written, and concurrent increments of the same row (parallel ingestion) wait for the row lock
+instead of overwriting each other.
+
+The new values are returned by the statement and set on the instance, which can be shared by an identity map. Model
+signals are not sent, so the other cached instances of the contract are evicted here.
+"""
+from typing import Sequence
+
+from django.db import connection
+from django.db.models import Model
+
+from .identity_map import get_identity_map
+
+INCREMENT_FIELDS = """
+UPDATE {table}
+SET {assignments}
+WHERE {pk_column} = %s
+RETURNING {returning}
+"""
+
+
+def increment_fields(instance: Model, returning: Sequence[str] = (), **deltas):
+    """
+    Adds the deltas to the fields of `instance` with one statement and sets their new values on `instance`. Fields
+    of a multi-table inheritance must be stored in the same table
+    :param returning: names of other fields set on `instance` with their current values, e.g. to calculate fields
+    derived from the incremented ones
+    :param deltas: field name -> delta, for array fields a dictionary of index -> delta
+    :raise instance.DoesNotExist: the row doesn't exist
+    """
+    fields = [instance._meta.get_field(name) for name in list(deltas) + [name for name in returning
+                                                                         if name not in deltas]]
+    model = fields[0].model
+    if any(field.model is not model for field in fields):
+        raise ValueError('Fields {} are not stored in the same table'.format(', '.join(field.name
+                                                                                        for field in fields)))
+
+    quote_name = connection.ops.quote_name
+    assignments = []
+    params = []
+    for field, delta in zip(fields, deltas.values()):
+        column = quote_name(field.column)
+        if isinstance(delta, dict):
+            for index, element_delta in delta.items():
+                # Postgres arrays are 1-based
+                assignments.append('{column}[%s] = {column}[%s] + %s'.format(column=column))
+                params.extend((index + 1, index + 1, element_delta))
+        else:
+            assignments.append('{column} = {column} + %s'.format(column=column))
+            params.append(delta)
+    params.append(instance.pk)
+
+    with connection.cursor() as cursor:
+        cursor.execute(INCREMENT_FIELDS.format(table=quote_name(model._meta.db_table),
+                                               assignments=', '.join(assignments),
+                                               pk_column=quote_name(model._meta.pk.column),
+                                               returning=', '.join(quote_name(field.column) for field in fields)),
+                       params)
+        row = cursor.fetchone()
+    if row is None:
+        raise instance.DoesNotExist('{} {} does not exist'.format(type(instance).__name__, instance.pk))
+
+    for field, value in zip(fields, row):
+        setattr(instance, field.attname, value)
+    current = get_identity_map()
+    if current is not None:
+        current.evict(instance.address, keep=instance)
@@ -0,0 +1,29 @@
+"""
+Keeps the event fields duplicated in `Market` (`event_type` and `resolution_date`) in sync. They are set when the
+market is created, this module updates them when the description of an existing oracle changes (admin changes).
+New oracles and descriptions don't have markets yet, and saves restricted to other fields (`update_fields`, e.g. owner
+replacements and outcome assignments of oracles) don't change them.
+"""
+from django.db.models.signals import post_save
+
+from .models import CentralizedOracle, EventDescription, Market
+from .signals import model_receiver
+
+
+@model_receiver(post_save, (EventDescription, CentralizedOracle), dispatch_uid='market_event_fields_post_save')
+def update_market_event_fields(sender, instance, created=False, update_fields=None, **kwargs):
+    if created:
+        return
+
+    if isinstance(instance, EventDescription):
+        if update_fields is None or 'resolution_date' in update_fields:
+            Market.objects.filter(
+                event__oracle__centralizedoracle__event_description=instance
+            ).exclude(
+                resolution_date=instance.resolution_date
+            ).update(resolution_date=instance.resolution_date)
+    elif update_fields is None or 'event_description' in update_fields:
+        event_description = instance.event_description
+        Market.objects.filter(
+            event__oracle=instance
+        ).update(resolution_date=event_description.resolution_date if event_description else None)
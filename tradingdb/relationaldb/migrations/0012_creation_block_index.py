@@ -0,0 +1,38 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0011_order_transaction_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='creation_block',
+            field=models.PositiveIntegerField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='market',
+            name='creation_block',
+            field=models.PositiveIntegerField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='oracle',
+            name='creation_block',
+            field=models.PositiveIntegerField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='creation_block',
+            field=models.PositiveIntegerField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='tournamentparticipant',
+            name='creation_block',
+            field=models.PositiveIntegerField(db_index=True),
+        ),
+    ]
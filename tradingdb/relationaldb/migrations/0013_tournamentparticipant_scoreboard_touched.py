@@ -0,0 +1,19 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:14
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0012_creation_block_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournamentparticipant',
+            name='scoreboard_touched',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, null=True),
+        ),
+    ]
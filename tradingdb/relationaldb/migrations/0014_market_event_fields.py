@@ -0,0 +1,50 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+BACKFILL_MARKET_EVENT_FIELDS = """
+UPDATE relationaldb_market AS market
+SET event_type = CASE
+        WHEN EXISTS (SELECT 1 FROM relationaldb_categoricalevent WHERE event_ptr_id = market.event_address)
+            THEN 'CATEGORICAL'
+        WHEN EXISTS (SELECT 1 FROM relationaldb_scalarevent WHERE event_ptr_id = market.event_address)
+            THEN 'SCALAR'
+    END,
+    resolution_date = (
+        SELECT description.resolution_date
+        FROM relationaldb_event AS event
+        JOIN relationaldb_centralizedoracle AS oracle ON oracle.oracle_ptr_id = event.oracle_address
+        JOIN relationaldb_eventdescription AS description ON description.id = oracle.event_description_id
+        WHERE event.address = market.event_address
+    )
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0013_tournamentparticipant_scoreboard_touched'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='market',
+            name='event_type',
+            field=models.CharField(choices=[('CATEGORICAL', 'Categorical'), ('SCALAR', 'Scalar')], max_length=11, null=True),
+        ),
+        migrations.AddField(
+            model_name='market',
+            name='resolution_date',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunSQL(BACKFILL_MARKET_EVENT_FIELDS, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='market',
+            index=models.Index(fields=['resolution_date', 'creation_date_time'], name='relationald_resolut_ec642e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='market',
+            index=models.Index(fields=['event_type', 'resolution_date'], name='relationald_event_t_282940_idx'),
+        ),
+    ]
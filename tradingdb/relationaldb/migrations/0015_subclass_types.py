@@ -0,0 +1,54 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+BACKFILL_SUBCLASS_TYPES = """
+UPDATE relationaldb_event SET event_type = 'CATEGORICAL'
+WHERE address IN (SELECT event_ptr_id FROM relationaldb_categoricalevent);
+UPDATE relationaldb_event SET event_type = 'SCALAR'
+WHERE address IN (SELECT event_ptr_id FROM relationaldb_scalarevent);
+UPDATE relationaldb_eventdescription SET description_type = 'CATEGORICAL'
+WHERE id IN (SELECT eventdescription_ptr_id FROM relationaldb_categoricaleventdescription);
+UPDATE relationaldb_eventdescription SET description_type = 'SCALAR'
+WHERE id IN (SELECT eventdescription_ptr_id FROM relationaldb_scalareventdescription);
+UPDATE relationaldb_oracle SET oracle_type = 'CENTRALIZED'
+WHERE address IN (SELECT oracle_ptr_id FROM relationaldb_centralizedoracle);
+UPDATE relationaldb_order SET order_type = 'BUY'
+WHERE id IN (SELECT order_ptr_id FROM relationaldb_buyorder);
+UPDATE relationaldb_order SET order_type = 'SELL'
+WHERE id IN (SELECT order_ptr_id FROM relationaldb_sellorder);
+UPDATE relationaldb_order SET order_type = 'SHORT SELL'
+WHERE id IN (SELECT order_ptr_id FROM relationaldb_shortsellorder);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0014_market_event_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='event_type',
+            field=models.CharField(choices=[('CATEGORICAL', 'Categorical'), ('SCALAR', 'Scalar')], max_length=11, null=True),
+        ),
+        migrations.AddField(
+            model_name='eventdescription',
+            name='description_type',
+            field=models.CharField(choices=[('CATEGORICAL', 'Categorical'), ('SCALAR', 'Scalar')], max_length=11, null=True),
+        ),
+        migrations.AddField(
+            model_name='oracle',
+            name='oracle_type',
+            field=models.CharField(choices=[('CENTRALIZED', 'Centralized')], max_length=11, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='order_type',
+            field=models.CharField(choices=[('BUY', 'Buy'), ('SELL', 'Sell'), ('SHORT SELL', 'Short sell')], max_length=10, null=True),
+        ),
+        migrations.RunSQL(BACKFILL_SUBCLASS_TYPES, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,181 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+MOVE_ORDERS = """
+UPDATE relationaldb_order AS "order"
+SET cost = buy_order.old_cost, outcome_token_cost = buy_order.old_outcome_token_cost, fees = buy_order.old_fees
+FROM relationaldb_buyorder AS buy_order
+WHERE buy_order.order_ptr_id = "order".id;
+UPDATE relationaldb_order AS "order"
+SET profit = sell_order.old_profit, outcome_token_profit = sell_order.old_outcome_token_profit,
+    fees = sell_order.old_fees
+FROM relationaldb_sellorder AS sell_order
+WHERE sell_order.order_ptr_id = "order".id;
+UPDATE relationaldb_order AS "order"
+SET cost = short_sell_order.old_cost
+FROM relationaldb_shortsellorder AS short_sell_order
+WHERE short_sell_order.order_ptr_id = "order".id;
+"""
+
+MOVE_ORDERS_BACK = """
+INSERT INTO relationaldb_buyorder (order_ptr_id, old_cost, old_outcome_token_cost, old_fees)
+SELECT id, cost, outcome_token_cost, fees FROM relationaldb_order WHERE order_type = 'BUY';
+INSERT INTO relationaldb_sellorder (order_ptr_id, old_profit, old_outcome_token_profit, old_fees)
+SELECT id, profit, outcome_token_profit, fees FROM relationaldb_order WHERE order_type = 'SELL';
+INSERT INTO relationaldb_shortsellorder (order_ptr_id, old_cost)
+SELECT id, cost FROM relationaldb_order WHERE order_type = 'SHORT SELL';
+"""
+
+
+def check_order_types(apps, schema_editor):
+    """
+    The type of an order is set from its buy, sell or short sell order row (0015_subclass_types), orders without row
+    have no type and no fields to move. They must be deleted or fixed before the type is required
+    """
+    Order = apps.get_model('relationaldb', 'Order')
+    order_ids = list(Order.objects.filter(order_type=None).order_by('id').values_list('id', flat=True))
+    if order_ids:
+        raise ValueError('{} orders have no buy, sell or short sell order row, delete or fix them before migrating: '
+                         'ids {}{}'.format(len(order_ids), ', '.join(map(str, order_ids[:20])),
+                                           ', ...' if len(order_ids) > 20 else ''))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0015_subclass_types'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_order_types, migrations.RunPython.noop),
+        # Fields of the orders tables clash with the new fields of Order until the tables are deleted
+        migrations.RenameField(
+            model_name='buyorder',
+            old_name='cost',
+            new_name='old_cost',
+        ),
+        migrations.RenameField(
+            model_name='buyorder',
+            old_name='outcome_token_cost',
+            new_name='old_outcome_token_cost',
+        ),
+        migrations.RenameField(
+            model_name='buyorder',
+            old_name='fees',
+            new_name='old_fees',
+        ),
+        migrations.RenameField(
+            model_name='sellorder',
+            old_name='profit',
+            new_name='old_profit',
+        ),
+        migrations.RenameField(
+            model_name='sellorder',
+            old_name='outcome_token_profit',
+            new_name='old_outcome_token_profit',
+        ),
+        migrations.RenameField(
+            model_name='sellorder',
+            old_name='fees',
+            new_name='old_fees',
+        ),
+        migrations.RenameField(
+            model_name='shortsellorder',
+            old_name='cost',
+            new_name='old_cost',
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='cost',
+            field=models.DecimalField(decimal_places=0, max_digits=80, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='fees',
+            field=models.DecimalField(decimal_places=0, max_digits=80, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='outcome_token_cost',
+            field=models.DecimalField(decimal_places=0, max_digits=80, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='outcome_token_profit',
+            field=models.DecimalField(decimal_places=0, max_digits=80, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='profit',
+            field=models.DecimalField(decimal_places=0, max_digits=80, null=True),
+        ),
+        migrations.RunSQL(MOVE_ORDERS, MOVE_ORDERS_BACK),
+        migrations.DeleteModel(
+            name='BuyOrder',
+        ),
+        migrations.DeleteModel(
+            name='SellOrder',
+        ),
+        migrations.DeleteModel(
+            name='ShortSellOrder',
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='market',
+            field=models.ForeignKey(db_column='market_address', db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='relationaldb.Market'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_type',
+            field=models.CharField(choices=[('BUY', 'Buy'), ('SELL', 'Sell'), ('SHORT SELL', 'Short sell')], max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='sender',
+            field=models.CharField(max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['market', 'creation_block'], name='relationald_market__b9631d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['sender', 'creation_block'], name='relationald_sender_971ca1_idx'),
+        ),
+        migrations.CreateModel(
+            name='BuyOrder',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('relationaldb.order',),
+        ),
+        migrations.CreateModel(
+            name='SellOrder',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('relationaldb.order',),
+        ),
+        migrations.CreateModel(
+            name='ShortSellOrder',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('relationaldb.order',),
+        ),
+    ]
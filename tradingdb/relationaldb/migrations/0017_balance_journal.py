@@ -0,0 +1,66 @@
+# Generated by Django 2.2.13 on 2026-10-18 13:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Duplicated balances of an owner are merged into the oldest one before adding the unique constraint
+MERGE_DUPLICATED_BALANCES = """
+UPDATE relationaldb_outcometokenbalance AS balance
+SET balance = duplicated.total
+FROM (
+    SELECT MIN(id) AS id, SUM(balance) AS total
+    FROM relationaldb_outcometokenbalance
+    GROUP BY owner, outcome_token_address
+    HAVING COUNT(*) > 1
+) AS duplicated
+WHERE balance.id = duplicated.id;
+DELETE FROM relationaldb_outcometokenbalance AS balance
+USING relationaldb_outcometokenbalance AS oldest
+WHERE balance.owner = oldest.owner AND balance.outcome_token_address = oldest.outcome_token_address
+  AND balance.id > oldest.id;
+"""
+
+# Current balances are the first (compacted) deltas of the journal
+CREATE_JOURNAL = """
+INSERT INTO relationaldb_outcometokenbalancedelta (owner, outcome_token_address, delta, block_number, log_index,
+                                                   compacted)
+SELECT owner, outcome_token_address, balance, NULL, NULL, TRUE
+FROM relationaldb_outcometokenbalance
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0016_order_ledger'),
+    ]
+
+    operations = [
+        migrations.RunSQL(MERGE_DUPLICATED_BALANCES, migrations.RunSQL.noop),
+        migrations.AlterUniqueTogether(
+            name='outcometokenbalance',
+            unique_together={('owner', 'outcome_token')},
+        ),
+        migrations.CreateModel(
+            name='OutcomeTokenBalanceDelta',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(max_length=40)),
+                ('delta', models.DecimalField(decimal_places=0, max_digits=80)),
+                ('block_number', models.PositiveIntegerField(null=True)),
+                ('log_index', models.PositiveIntegerField(null=True)),
+                ('compacted', models.BooleanField(default=False)),
+                ('outcome_token', models.ForeignKey(db_column='outcome_token_address', db_index=False, on_delete=django.db.models.deletion.CASCADE, to='relationaldb.OutcomeToken')),
+            ],
+        ),
+        migrations.RunSQL(CREATE_JOURNAL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='outcometokenbalancedelta',
+            index=models.Index(fields=['outcome_token', 'owner'], name='relationald_outcome_1e5aef_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='outcometokenbalancedelta',
+            constraint=models.UniqueConstraint(condition=models.Q(compacted=False), fields=('block_number', 'log_index', 'owner', 'outcome_token'), name='balance_delta_log_unique'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.13 on 2026-10-18 16:10
+
+from django.db import migrations
+from django.utils import timezone
+
+DJANGO_ETH_EVENTS_TASK = 'django_eth_events.tasks.event_listener'
+EVENT_LISTENER_TASK = 'tradingdb.relationaldb.tasks.event_listener'
+
+
+def rename_event_listener_task(from_task, to_task):
+    """
+    The scheduled event listener runs the task keeping the log index of every log. Beat reloads the periodic tasks
+    when `PeriodicTasks.last_update` changes, `update` doesn't send the signals setting it
+    """
+    def rename(apps, schema_editor):
+        PeriodicTask = apps.get_model('django_celery_beat', 'PeriodicTask')
+        PeriodicTasks = apps.get_model('django_celery_beat', 'PeriodicTasks')
+        if PeriodicTask.objects.filter(task=from_task).update(task=to_task):
+            PeriodicTasks.objects.update_or_create(ident=1, defaults={'last_update': timezone.now()})
+    return rename
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_celery_beat', '0001_initial'),
+        ('relationaldb', '0017_balance_journal'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_event_listener_task(DJANGO_ETH_EVENTS_TASK, EVENT_LISTENER_TASK),
+                             rename_event_listener_task(EVENT_LISTENER_TASK, DJANGO_ETH_EVENTS_TASK)),
+    ]
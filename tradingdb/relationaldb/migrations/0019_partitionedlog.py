@@ -0,0 +1,24 @@
+# Generated by Django 2.2.13 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0018_event_listener_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartitionedLog',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_number', models.PositiveIntegerField()),
+                ('log_index', models.PositiveIntegerField()),
+            ],
+            options={
+                'unique_together': {('block_number', 'log_index')},
+            },
+        ),
+    ]
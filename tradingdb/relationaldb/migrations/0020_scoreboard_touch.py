@@ -0,0 +1,20 @@
+# Generated by Django 2.2.13 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0019_partitionedlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreboardTouch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=40)),
+            ],
+        ),
+    ]
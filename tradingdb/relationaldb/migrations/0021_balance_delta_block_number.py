@@ -0,0 +1,26 @@
+# Generated by Django 2.2.13 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+# Deltas saved without block can't be reverted by a reorg, they are kept as compacted deltas (older than any block
+# that can be reverted) before requiring the block number of the other deltas
+COMPACT_DELTAS_WITHOUT_BLOCK = """
+UPDATE relationaldb_outcometokenbalancedelta
+SET compacted = TRUE, log_index = NULL
+WHERE block_number IS NULL AND NOT compacted
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationaldb', '0020_scoreboard_touch'),
+    ]
+
+    operations = [
+        migrations.RunSQL(COMPACT_DELTAS_WITHOUT_BLOCK, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='outcometokenbalancedelta',
+            constraint=models.CheckConstraint(check=models.Q(('compacted', True), ('block_number__isnull', False), _connector='OR'), name='balance_delta_block_number'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.postgres.fields import ArrayField
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.utils import timezone
 from model_utils.models import TimeStampedModel
 
 
@@ -16,7 +18,7 @@ TRANSACTION_LENGTH: int = 64
 class BlockTimeStamped(models.Model):
     """Model created in a specific Ethereum block"""
     creation_date_time = models.DateTimeField()
-    creation_block = models.PositiveIntegerField()
+    creation_block = models.PositiveIntegerField(db_index=True)
 
     class Meta:
         abstract = True
@@ -39,19 +41,71 @@ class ContractCreatedByFactory(Contract, BlockTimeStamped):
         abstract = True
 
 
+class SubclassTypeMixin:
+    """
+    Parent model of a multi-table inheritance storing the subclass of every row in `subclass_type_field`, so the
+    subclass is known without querying every child table. Subclasses set `subclass_type`, stored when they are saved
+    """
+    subclass_type_field: str = None
+    subclass_type: str = None
+
+    def save(self, *args, **kwargs):
+        self.set_subclass_type()
+        super().save(*args, **kwargs)
+
+    def set_subclass_type(self):
+        if self.subclass_type is not None:
+            setattr(self, self.subclass_type_field, self.subclass_type)
+
+    def get_subclass_type(self) -> str:
+        subclass_type = self.subclass_type or getattr(self, self.subclass_type_field)
+        if subclass_type is None:
+            subclass_type = self.get_subclass_instance().subclass_type
+        return subclass_type
+
+    def get_subclass_instance(self):
+        """
+        :return: the instance of the subclass of the row. Only the table of that subclass is queried, if it wasn't
+        loaded with `select_related`
+        """
+        if self.subclass_type is not None:
+            return self
+
+        subclass_type = getattr(self, self.subclass_type_field)
+        for subclass in self.__class__.__subclasses__():
+            if subclass.subclass_type is None:
+                continue
+            if subclass_type is None:
+                # Row saved without type, look for it in every table
+                try:
+                    return getattr(self, subclass._meta.model_name)
+                except ObjectDoesNotExist:
+                    continue
+            elif subclass.subclass_type == subclass_type:
+                return getattr(self, subclass._meta.model_name)
+        return self
+
+
 # ==================================
 #       Concrete classes
 # ==================================
 
 
-class Oracle(ContractCreatedByFactory):
+class Oracle(SubclassTypeMixin, ContractCreatedByFactory):
     """Parent class of the Oracle contract"""
+    oracle_types = (
+        ('CENTRALIZED', 'Centralized'),
+    )
+
+    oracle_type = models.CharField(max_length=11, choices=oracle_types, null=True)  # see SubclassTypeMixin
     is_outcome_set = models.BooleanField(default=False)
     outcome = models.DecimalField(max_digits=80,
                                   decimal_places=0,
                                   blank=True,
                                   null=True)
 
+    subclass_type_field = 'oracle_type'
+
     def __str__(self):
         if self.is_outcome_set:
             return "Outcome {}".format(self.outcome)
@@ -60,8 +114,14 @@ class Oracle(ContractCreatedByFactory):
 
 
 # Events
-class Event(ContractCreatedByFactory):
+class Event(SubclassTypeMixin, ContractCreatedByFactory):
     """Parent class of the event's classes."""
+    event_types = (
+        ('CATEGORICAL', 'Categorical'),
+        ('SCALAR', 'Scalar'),
+    )
+
+    event_type = models.CharField(max_length=11, choices=event_types, null=True)  # see SubclassTypeMixin
     oracle = models.ForeignKey(Oracle,
                                related_name='event_oracle',
                                db_column='oracle_address',
@@ -71,6 +131,8 @@ class Event(ContractCreatedByFactory):
     outcome = models.DecimalField(max_digits=80, decimal_places=0, null=True)
     redeemed_winnings = models.DecimalField(max_digits=80, decimal_places=0, default=0)  # Amount (in collateral token) of redeemed winnings once the event gets resolved
 
+    subclass_type_field = 'event_type'
+
     def __str__(self):
         base = "Event with collateral_token {}".format(self.collateral_token)
         if self.is_winning_outcome_set:
@@ -79,15 +141,17 @@ class Event(ContractCreatedByFactory):
             return base
 
     def is_categorical(self):
-        return hasattr(self, 'categoricalevent')
+        return self.get_subclass_type() == 'CATEGORICAL'
 
     def is_scalar(self):
-        return hasattr(self, 'scalarevent')
+        return self.get_subclass_type() == 'SCALAR'
 
 
 class ScalarEvent(Event):
     """Events with continuous domain of possible outcomes
     between two boundaries: lower and upper bound"""
+    subclass_type = 'SCALAR'
+
     lower_bound = models.DecimalField(max_digits=80, decimal_places=0)
     upper_bound = models.DecimalField(max_digits=80, decimal_places=0)
 
@@ -98,7 +162,7 @@ class ScalarEvent(Event):
 
 class CategoricalEvent(Event):
     """Events with discrete domain of possible outcomes"""
-    pass
+    subclass_type = 'CATEGORICAL'
 
 
 # Tokens
@@ -125,26 +189,72 @@ class OutcomeToken(Contract):
 
 
 class OutcomeTokenBalance(models.Model):
-    """Outcome token balance owned by an ethereum address owner"""
+    """
+    Outcome token balance owned by an ethereum address owner. Materialized sum of the `OutcomeTokenBalanceDelta`
+    journal, see balance_journal
+    """
     owner = models.CharField(max_length=ADDRESS_LENGTH)
     outcome_token = models.ForeignKey(OutcomeToken,
                                       db_column='outcome_token_address',
                                       on_delete=models.CASCADE)
     balance = models.DecimalField(max_digits=80, decimal_places=0, default=0)
 
+    class Meta:
+        unique_together = ('owner', 'outcome_token')
+
     def __str__(self):
         return 'Owner {} with balance {}'.format(self.owner,
                                                  self.balance)
 
 
+class OutcomeTokenBalanceDelta(models.Model):
+    """
+    Change of an outcome token balance made by an Issuance, Revocation or Transfer event, identified by the block
+    number and the log index of the event, and the balance. Rows are only inserted and deleted, see balance_journal
+    """
+    owner = models.CharField(max_length=ADDRESS_LENGTH)
+    outcome_token = models.ForeignKey(OutcomeToken,
+                                      db_column='outcome_token_address',
+                                      db_index=False,  # see Meta.indexes
+                                      on_delete=models.CASCADE)
+    delta = models.DecimalField(max_digits=80, decimal_places=0)
+    # null for the deltas compacted by the creation of the journal, see Meta.constraints
+    block_number = models.PositiveIntegerField(null=True)
+    # null for deltas compacted, and deltas of logs decoded without log index
+    log_index = models.PositiveIntegerField(null=True)
+    # sum of the deltas of the older blocks, replaced by the compaction
+    compacted = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['outcome_token', 'owner']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['block_number', 'log_index', 'owner', 'outcome_token'],
+                                    condition=models.Q(compacted=False),
+                                    name='balance_delta_log_unique'),
+            # Reorgs revert the deltas by block number
+            models.CheckConstraint(check=models.Q(compacted=True) | models.Q(block_number__isnull=False),
+                                   name='balance_delta_block_number'),
+        ]
+
+    def __str__(self):
+        return 'Owner {} with delta {} at block {}'.format(self.owner,
+                                                           self.delta,
+                                                           self.block_number)
+
+
 # Event Descriptions
-class EventDescription(models.Model):
+class EventDescription(SubclassTypeMixin, models.Model):
     """Meta information of the event taken from IPFS"""
+    description_type = models.CharField(max_length=11, choices=Event.event_types, null=True)  # see SubclassTypeMixin
     title = models.TextField()
     description = models.TextField()
     resolution_date = models.DateTimeField()
     ipfs_hash = models.CharField(max_length=46, unique=True)
 
+    subclass_type_field = 'description_type'
+
     def __str__(self):
         return '{} - {} - {}'.format(self.resolution_date,
                                      self.title,
@@ -153,6 +263,8 @@ class EventDescription(models.Model):
 
 class ScalarEventDescription(EventDescription):
     """Description for the Scalar Event"""
+    subclass_type = 'SCALAR'
+
     unit = models.TextField()  # Example. USD, EUR, ETH
     decimals = models.PositiveIntegerField()  # the unit precision
 
@@ -163,6 +275,8 @@ class ScalarEventDescription(EventDescription):
 
 class CategoricalEventDescription(EventDescription):
     """Description for the Categorical Event"""
+    subclass_type = 'CATEGORICAL'
+
     outcomes = ArrayField(models.TextField())  # List of outcomes
 
     def __str__(self):
@@ -173,6 +287,8 @@ class CategoricalEventDescription(EventDescription):
 # Oracles
 class CentralizedOracle(Oracle):
     """Centralized oracle model"""
+    subclass_type = 'CENTRALIZED'
+
     owner = models.CharField(max_length=ADDRESS_LENGTH, db_index=True)  # owner can be updated
     old_owner = models.CharField(max_length=ADDRESS_LENGTH, default=None, null=True)  # useful for rollback
     event_description = models.ForeignKey(EventDescription,
@@ -196,10 +312,15 @@ class Market(ContractCreatedByFactory):
 
     stages_dict = dict(stages)
 
+    event_types = Event.event_types
+
     event = models.ForeignKey(Event,
                               related_name='markets',
                               db_column='event_address',
                               on_delete=models.CASCADE)
+    # Duplicated from the event and its description, markets are filtered and sorted by them without joins
+    event_type = models.CharField(max_length=11, choices=event_types, null=True)
+    resolution_date = models.DateTimeField(null=True)
     market_maker = models.CharField(max_length=ADDRESS_LENGTH, db_index=True)  # the address of the market maker
     fee = models.PositiveIntegerField()
     funding = models.DecimalField(max_digits=80, decimal_places=0, null=True)
@@ -213,18 +334,58 @@ class Market(ContractCreatedByFactory):
     marginal_prices = ArrayField(models.DecimalField(max_digits=5, decimal_places=4))
     trading_volume = models.DecimalField(max_digits=80, decimal_places=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['resolution_date', 'creation_date_time']),
+            models.Index(fields=['event_type', 'resolution_date']),
+        ]
+
     def __str__(self):
         return 'Market {} - {}'.format(self.address,
                                        self.stages_dict.get(self.stage, 'INVALID STAGE'))
 
+    @staticmethod
+    def get_event_fields(event: Event) -> dict:
+        """
+        :param event: event of the market
+        :return: dictionary with the values of the fields duplicated from the event
+        """
+        if event.is_categorical():
+            event_type = 'CATEGORICAL'
+        elif event.is_scalar():
+            event_type = 'SCALAR'
+        else:
+            event_type = None
+
+        try:
+            event_description = event.oracle.centralizedoracle.event_description
+        except CentralizedOracle.DoesNotExist:
+            event_description = None
+
+        return {
+            'event_type': event_type,
+            'resolution_date': event_description.resolution_date if event_description else None,
+        }
+
+
+class Order(SubclassTypeMixin, BlockTimeStamped):
+    """
+    Market related order. Orders of every type are stored in this table, the fields that don't apply to the
+    `order_type` are null. `BuyOrder`, `SellOrder` and `ShortSellOrder` are proxies returning only their type
+    """
+    order_types = (
+        ('BUY', 'Buy'),
+        ('SELL', 'Sell'),
+        ('SHORT SELL', 'Short sell'),
+    )
 
-class Order(BlockTimeStamped):
-    """Parent class defining a market related order"""
+    order_type = models.CharField(max_length=10, choices=order_types)  # see SubclassTypeMixin
     market = models.ForeignKey(Market,
                                related_name='orders',
                                db_column='market_address',
+                               db_index=False,  # see Meta.indexes
                                on_delete=models.CASCADE)
-    sender = models.CharField(max_length=ADDRESS_LENGTH, db_index=True)
+    sender = models.CharField(max_length=ADDRESS_LENGTH)
     outcome_token = models.ForeignKey(OutcomeToken,
                                       to_field='address',
                                       db_column='outcome_token_address',
@@ -237,15 +398,48 @@ class Order(BlockTimeStamped):
     # represents the marginal price of each outcome at the time of the market order
     marginal_prices = ArrayField(models.DecimalField(max_digits=5, decimal_places=4))
     transaction_hash = models.CharField(max_length=TRANSACTION_LENGTH, default='')
+    # BUY and SHORT SELL
+    cost = models.DecimalField(max_digits=80, decimal_places=0, null=True)
+    # BUY
+    outcome_token_cost = models.DecimalField(max_digits=80, decimal_places=0, null=True)
+    # SELL
+    profit = models.DecimalField(max_digits=80, decimal_places=0, null=True)
+    outcome_token_profit = models.DecimalField(max_digits=80, decimal_places=0, null=True)
+    # BUY and SELL
+    fees = models.DecimalField(max_digits=80, decimal_places=0, null=True)
+
+    subclass_type_field = 'order_type'
+
+    class Meta:
+        indexes = [
+            # Trades of a market and trades of an account
+            models.Index(fields=['market', 'creation_block']),
+            models.Index(fields=['sender', 'creation_block']),
+        ]
 
     def __str__(self):
         return 'Sender {} - Market {}'.format(self.sender, self.market_id)
 
+    def get_subclass_instance(self):
+        # Every order has the fields of its type, there are no tables to query
+        return self
+
+
+class OrderTypeManager(models.Manager):
+    """
+    Manager of the `Order` proxies, filters the orders by the `subclass_type` of the proxy
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(order_type=self.model.subclass_type)
+
 
 class BuyOrder(Order):
-    cost = models.DecimalField(max_digits=80, decimal_places=0)
-    outcome_token_cost = models.DecimalField(max_digits=80, decimal_places=0)
-    fees = models.DecimalField(max_digits=80, decimal_places=0)
+    subclass_type = 'BUY'
+
+    objects = OrderTypeManager()
+
+    class Meta:
+        proxy = True
 
     def __str__(self):
         base = super().__str__()
@@ -255,9 +449,12 @@ class BuyOrder(Order):
 
 
 class SellOrder(Order):
-    profit = models.DecimalField(max_digits=80, decimal_places=0)
-    outcome_token_profit = models.DecimalField(max_digits=80, decimal_places=0)
-    fees = models.DecimalField(max_digits=80, decimal_places=0)
+    subclass_type = 'SELL'
+
+    objects = OrderTypeManager()
+
+    class Meta:
+        proxy = True
 
     def __str__(self):
         base = super().__str__()
@@ -267,7 +464,12 @@ class SellOrder(Order):
 
 
 class ShortSellOrder(Order):
-    cost = models.DecimalField(max_digits=80, decimal_places=0)
+    subclass_type = 'SHORT SELL'
+
+    objects = OrderTypeManager()
+
+    class Meta:
+        proxy = True
 
     def __str__(self):
         base = super().__str__()
@@ -287,6 +489,8 @@ class TournamentParticipant(Contract, TimeStampedModel, BlockTimeStamped):
     predictions = models.IntegerField(default=0)  # number of events the user is participating in
     tokens_issued = models.BooleanField(default=False)  # True if the user already issued tokens
     mainnet_address = models.CharField(max_length=ADDRESS_LENGTH, default=None, null=True)
+    # Last time the data the score depends on changed, None if the score is up to date. See `scoreboard.py`
+    scoreboard_touched = models.DateTimeField(default=timezone.now, null=True, db_index=True)
 
     def __str__(self):
         return '{} - {} - {}'.format(self.current_rank,
@@ -294,6 +498,18 @@ class TournamentParticipant(Contract, TimeStampedModel, BlockTimeStamped):
                                      self.score)
 
 
+class ScoreboardTouch(models.Model):
+    """
+    Touch of a participant deferred by a transaction that must not lock the participant rows (partitioned ingestion
+    workers). Rows are only inserted, and moved to `TournamentParticipant.scoreboard_touched` by
+    `scoreboard.apply_deferred_touches`
+    """
+    address = models.CharField(max_length=ADDRESS_LENGTH)
+
+    def __str__(self):
+        return 'Touch of {}'.format(self.address)
+
+
 class TournamentParticipantBalance(models.Model):
     """Defines the participant's balance"""
     balance = models.DecimalField(max_digits=80, decimal_places=0, default=0)
@@ -315,3 +531,19 @@ class TournamentWhitelistedCreator(models.Model):
     def __str__(self):
         return '{} - {}'.format(self.address,
                                 self.enabled)
+
+
+class PartitionedLog(models.Model):
+    """
+    Log committed by the partitioned ingestion of a block range that is not finished yet (`save_events_partitioned`
+    with `record_logs`). Rows are inserted in the transaction saving their log, and deleted when their logs are
+    reverted or the block range is finished
+    """
+    block_number = models.PositiveIntegerField()
+    log_index = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('block_number', 'log_index')
+
+    def __str__(self):
+        return 'Log {} of block {}'.format(self.log_index, self.block_number)
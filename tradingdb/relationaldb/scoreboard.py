@@ -0,0 +1,117 @@
+"""
+Tracks the tournament participants whose score must be recalculated. Every change of the data the score depends on
+(outcome token balances, orders, event outcomes, tournament token balances and whitelisted creators) sets
+`TournamentParticipant.scoreboard_touched`, so the incremental `calculate_scoreboard` only recalculates them.
+Touches are done in the same transaction as the change, so they are rolled back with it. Touches lock the rows of
+the participants until the end of the transaction, concurrent transactions touching the same participants would wait
+for each other: they can collect the touches (`collect_touches()`) and save them to the touch table in their
+transaction (`defer_touches`), without locking the participants. Deferred touches are moved to the participants by
+`apply_deferred_touches`, after the concurrent transactions and before every scoreboard run.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Optional, Set
+
+from django.db import connection, transaction
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save
+
+from .models import (Event, Order, OutcomeTokenBalance, ScoreboardTouch,
+                     TournamentParticipant, TournamentParticipantBalance,
+                     TournamentWhitelistedCreator)
+from .signals import model_receiver
+
+# Fields of an event changing the value of its outcome tokens
+OUTCOME_FIELDS = frozenset(('is_winning_outcome_set', 'outcome'))
+
+# Models whose saves and deletions change the score. Events are only tracked on save, the balances of a deleted
+# event are deleted (and tracked) before it
+TRACKED_MODELS = (OutcomeTokenBalance, Order, TournamentParticipantBalance, TournamentWhitelistedCreator)
+
+# Deferred touches are consumed by the statement deleting them, touches deferred meanwhile are kept
+CONSUME_DEFERRED_TOUCHES = """
+DELETE FROM relationaldb_scoreboardtouch
+RETURNING address
+"""
+
+_local = threading.local()
+
+
+def get_collected_touches() -> Optional[Set[str]]:
+    return getattr(_local, 'collected_touches', None)
+
+
+@contextmanager
+def collect_touches():
+    """
+    Collects the addresses touched by the current thread instead of touching them, nested contexts share the
+    outermost set. The collected addresses must be touched (`touch_participants`) after the context
+    """
+    current = get_collected_touches()
+    if current is not None:
+        yield current
+        return
+
+    _local.collected_touches = set()
+    try:
+        yield _local.collected_touches
+    finally:
+        _local.collected_touches = None
+
+
+def touch_participants(addresses: Iterable[str]):
+    """
+    Marks participants to be recalculated by the next scoreboard run. Addresses not belonging to a participant are
+    ignored
+    :param addresses: iterable of addresses or a queryset of addresses
+    """
+    collected = get_collected_touches()
+    if collected is not None:
+        collected.update(addresses)
+    else:
+        TournamentParticipant.objects.filter(address__in=addresses).update(scoreboard_touched=Now())
+
+
+def defer_touches(addresses: Iterable[str]):
+    """
+    Saves the touches of the participants in the touch table, in the current transaction. Unlike
+    `touch_participants` the rows of the participants are not locked
+    """
+    addresses = TournamentParticipant.objects.filter(address__in=addresses).values_list('address', flat=True)
+    ScoreboardTouch.objects.bulk_create([ScoreboardTouch(address=address) for address in addresses])
+
+
+def apply_deferred_touches() -> int:
+    """
+    Touches the participants of the touch table and deletes the touches, in one transaction
+    :return: number of participants touched
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(CONSUME_DEFERRED_TOUCHES)
+            addresses = {address for address, in cursor.fetchall()}
+        if addresses:
+            touch_participants(addresses)
+    return len(addresses)
+
+
+def get_outcome_token_owners(**outcome_token_filters):
+    balance_filters = {'outcome_token__' + key: value for key, value in outcome_token_filters.items()}
+    return OutcomeTokenBalance.objects.filter(**balance_filters).values_list('owner', flat=True)
+
+
+@model_receiver(post_save, TRACKED_MODELS + (Event,), dispatch_uid='scoreboard_post_save')
+@model_receiver(post_delete, TRACKED_MODELS, dispatch_uid='scoreboard_post_delete')
+def touch_changed_participants(sender, instance, created=False, update_fields=None, **kwargs):
+    if isinstance(instance, OutcomeTokenBalance):
+        touch_participants([instance.owner])
+    elif isinstance(instance, Order):
+        touch_participants([instance.sender])
+    elif isinstance(instance, TournamentParticipantBalance):
+        touch_participants([instance.participant_id])
+    elif isinstance(instance, Event):
+        # Outcome set or reverted, new events don't have holders. Saves of other fields don't change the score
+        if not created and (update_fields is None or OUTCOME_FIELDS & update_fields):
+            touch_participants(get_outcome_token_owners(event=instance))
+    elif isinstance(instance, TournamentWhitelistedCreator):
+        touch_participants(get_outcome_token_owners(event__creator=instance.address))
@@ -4,6 +4,7 @@ from decimal import Decimal
 
 from celery.utils.log import get_task_logger
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django_eth_events.utils import normalize_address_without_0x
 from django_eth_events.web3_service import Web3ServiceProvider
 from ipfsapi.exceptions import ErrorResponse
@@ -13,10 +14,13 @@ from rest_framework.fields import CharField
 from web3 import Web3
 
 from chainevents.abis import abi_file_path, load_json_file
-from gnosis.utils import calc_lmsr_marginal_price
+from gnosis.utils import calc_lmsr_marginal_prices
 from ipfs.ipfs import Ipfs
 
 from . import models
+from .balance_journal import add_balance_deltas, revert_balance_deltas
+from .identity_map import get_contract
+from .increments import increment_fields
 
 # Ethereum addresses have 40 chars (without 0x)
 ADDRESS_LENGTH = 40
@@ -91,6 +95,39 @@ class ContractSerializer(BaseEventSerializer):
         return parsed_event_data
 
 
+class BalanceDeltaSerializer(ContractSerializer):
+    """
+    Serializes an event changing outcome token balances, with the block number and log index identifying the
+    changes in the balance journal. The block is required, reorgs revert the changes by block number. The log index
+    is optional: logs decoded before the listener kept it (stored in the blocks of the event listener) are reverted
+    by their block number and balance, see revert_balance_deltas
+    """
+    class Meta:
+        fields = ContractSerializer.Meta.fields + ('block_number', 'log_index',)
+
+    block_number = serializers.IntegerField(min_value=0)
+    log_index = serializers.IntegerField(min_value=0, allow_null=True)
+
+    def parse_event_data(self, event_data):
+        parsed_event_data = super().parse_event_data(event_data)
+        block = getattr(self, 'block', None)
+        parsed_event_data.update({
+            'block_number': block.get('number') if block else None,
+            'log_index': event_data.get('log_index')
+        })
+        return parsed_event_data
+
+    def get_balance_delta(self, owner, delta):
+        """
+        :return: unsaved journal delta of the balance of the owner
+        """
+        return models.OutcomeTokenBalanceDelta(owner=owner,
+                                               outcome_token_id=self.validated_data.get('outcome_token'),
+                                               delta=delta,
+                                               block_number=self.validated_data.get('block_number'),
+                                               log_index=self.validated_data.get('log_index'))
+
+
 class BlockTimestampedSerializer(BaseEventSerializer):
     """
     Serializes the block informations
@@ -183,7 +220,8 @@ class IpfsHashField(CharField):
                     'outcomes': event_description_json['outcomes']
                 }
                 # categorical
-                event_description = models.CategoricalEventDescription.objects.create(**categorical_json)
+                event_description_model = models.CategoricalEventDescription
+                event_description_json = categorical_json
 
             elif 'decimals' in event_description_json and 'unit' in event_description_json:
                 scalar_json = {
@@ -195,11 +233,17 @@ class IpfsHashField(CharField):
                     'unit': event_description_json['unit']
                 }
                 # scalar
-                event_description = models.ScalarEventDescription.objects.create(**scalar_json)
+                event_description_model = models.ScalarEventDescription
+                event_description_json = scalar_json
             else:
                 raise serializers.ValidationError('Event must be categorical or scalar')
 
-            return event_description
+            try:
+                with transaction.atomic():
+                    return event_description_model.objects.create(**event_description_json)
+            except IntegrityError:
+                # Saved meanwhile by the event description resolution (`chainevents.event_descriptions`)
+                return models.EventDescription.objects.get(ipfs_hash=data)
 
 
 class OracleField(CharField):
@@ -217,7 +261,7 @@ class OracleField(CharField):
         else:
             # Check oracle exists or save Null
             try:
-                oracle = models.Oracle.objects.get(address=data)
+                oracle = get_contract(models.Oracle, data)
                 return oracle
             except models.Oracle.DoesNotExist:
                 raise serializers.ValidationError('Unknown Oracle address')
@@ -229,7 +273,7 @@ class EventField(CharField):
 
     def to_internal_value(self, data):
         try:
-            event = models.Event.objects.get(address=data)
+            event = get_contract(models.Event, data)
             return event
         except models.Event.DoesNotExist:
             raise serializers.ValidationError('eventContract address must exist')
@@ -299,8 +343,10 @@ class ScalarEventSerializer(EventSerializerTimestamped, serializers.ModelSeriali
         # if so, check its event_description is a ScalarEventDescription
         attrs = super().validate(attrs=attrs)
         try:
-            centralized_oracle = models.CentralizedOracle.objects.get(address=attrs['oracle'].address)
-            models.ScalarEventDescription.objects.get(ipfs_hash=centralized_oracle.event_description.ipfs_hash)
+            centralized_oracle = get_contract(models.CentralizedOracle, attrs['oracle'].address,
+                                              select_related=('event_description__scalareventdescription',))
+            # Raises ScalarEventDescription.DoesNotExist if the description is not scalar
+            centralized_oracle.event_description.scalareventdescription
         except models.ScalarEventDescription.DoesNotExist:
             raise serializers.ValidationError("Not existing ScalarEventDescription with oracle {}".format(attrs['oracle'].address))
         except models.CentralizedOracle.DoesNotExist:
@@ -328,8 +374,9 @@ class CategoricalEventSerializer(EventSerializerTimestamped, serializers.ModelSe
         # if so, check its event_description is a CategoricalEventDescription
         attrs = super().validate(attrs=attrs)
         try:
-            centralized_oracle = models.CentralizedOracle.objects.get(address=attrs['oracle'].address)
-            description = models.CategoricalEventDescription.objects.get(ipfs_hash=centralized_oracle.event_description.ipfs_hash)
+            centralized_oracle = get_contract(models.CentralizedOracle, attrs['oracle'].address,
+                                              select_related=('event_description__categoricaleventdescription',))
+            description = centralized_oracle.event_description.categoricaleventdescription
             if len(description.outcomes) != attrs['outcomeCount']:
                 raise serializers.ValidationError("Field outcomeCount does not match number of outcomes specified "
                                                   "in the event description.")
@@ -377,12 +424,16 @@ class MarketSerializerTimestamped(ContractCreatedByFactorySerializerTimestamped,
     def create(self, validated_data):
         # Check event type (Categorical or Scalar)
         try:
-            categorical_event = models.CategoricalEvent.objects.get(address=validated_data.get('event').address)
+            event = categorical_event = get_contract(
+                models.CategoricalEvent, validated_data.get('event').address,
+                select_related=('oracle__centralizedoracle__event_description__categoricaleventdescription',)
+            )
             n_outcome_tokens = len(categorical_event.oracle.centralizedoracle.event_description.categoricaleventdescription.outcomes)
             net_outcome_tokens_sold = [0] * n_outcome_tokens
             marginal_prices = [str(1.0 / n_outcome_tokens) for _ in range(0, n_outcome_tokens)]
         except models.CategoricalEvent.DoesNotExist:
-            scalar_event = models.ScalarEvent.objects.get(address=validated_data.get('event').address)
+            event = get_contract(models.ScalarEvent, validated_data.get('event').address,
+                                 select_related=('oracle__centralizedoracle__event_description',))
             # scalar, creating an array of size 2
             net_outcome_tokens_sold = [0, 0]
             marginal_prices = ['0.5', '0.5']
@@ -394,6 +445,7 @@ class MarketSerializerTimestamped(ContractCreatedByFactorySerializerTimestamped,
                 'trading_volume': 0
             }
         )
+        validated_data.update(models.Market.get_event_fields(event))
         market = models.Market.objects.create(**validated_data)
         return market
 
@@ -490,67 +542,46 @@ class OutcomeTokenInstanceSerializer(ContractSerializer, serializers.ModelSerial
         self.instance.delete()
 
 
-class OutcomeTokenIssuanceSerializer(ContractSerializer, serializers.ModelSerializer):
+class OutcomeTokenIssuanceSerializer(BalanceDeltaSerializer, serializers.ModelSerializer):
     """
     Serializes the Outcome Token issuance event
     """
     class Meta:
         model = models.OutcomeToken
-        fields = ('owner', 'amount', 'address',)
+        fields = BalanceDeltaSerializer.Meta.fields + ('owner', 'amount',)
 
     owner = serializers.CharField(max_length=ADDRESS_LENGTH)
     amount = serializers.IntegerField()
     address = serializers.CharField(max_length=ADDRESS_LENGTH, source='outcome_token')
+    block_number = serializers.IntegerField(min_value=0)
+    log_index = serializers.IntegerField(min_value=0, allow_null=True)
 
     def create(self, validated_data):
-        # Creates or updates an outcome token balance for the given outcome_token.
-        # Returns the outcome_token
-        try:
-            outcome_token_balance = models.OutcomeTokenBalance.objects.get(owner=validated_data.get('owner'),
-                                                                           outcome_token__address=validated_data.get('outcome_token'))
-            outcome_token_balance.balance += validated_data.get('amount')
-            outcome_token_balance.outcome_token.total_supply += validated_data.get('amount')
-            outcome_token_balance.outcome_token.save()
-            outcome_token_balance.save()
-            return outcome_token_balance.outcome_token
-        except models.OutcomeTokenBalance.DoesNotExist:
-            outcome_token = models.OutcomeToken.objects.get(address=validated_data.get('outcome_token'))
-            outcome_token.total_supply += validated_data.get('amount')
-            outcome_token.save()
-
-            outcome_token_balance = models.OutcomeTokenBalance()
-            outcome_token_balance.balance = validated_data.get('amount')
-            outcome_token_balance.owner = validated_data.get('owner')
-            outcome_token_balance.outcome_token = outcome_token
-            outcome_token_balance.save()
-            return outcome_token
+        # Adds the amount to the outcome token balance of the owner, returns the outcome_token
+        outcome_token = get_contract(models.OutcomeToken, validated_data.get('outcome_token'))
+        increment_fields(outcome_token, total_supply=validated_data.get('amount'))
+        add_balance_deltas([self.get_balance_delta(validated_data.get('owner'), validated_data.get('amount'))])
+        return outcome_token
 
     def rollback(self):
-        try:
-            outcome_token_balance = models.OutcomeTokenBalance.objects.get(
-                owner=self.validated_data.get('owner'),
-                outcome_token__address=self.validated_data.get('outcome_token')
-            )
-            outcome_token_balance.balance -= self.validated_data.get('amount')
-            outcome_token_balance.save()
-            self.instance.total_supply -= self.validated_data.get('amount')
-            self.instance.save()
-        except models.OutcomeTokenBalance.DoesNotExist:
-            self.instance.total_supply -= self.validated_data.get('amount')
-            self.instance.save()
+        revert_balance_deltas([self.get_balance_delta(self.validated_data.get('owner'),
+                                                      self.validated_data.get('amount'))])
+        increment_fields(self.instance, total_supply=-self.validated_data.get('amount'))
 
 
-class OutcomeTokenRevocationSerializer(ContractSerializer, serializers.ModelSerializer):
+class OutcomeTokenRevocationSerializer(BalanceDeltaSerializer, serializers.ModelSerializer):
     """
     Serializes the Outcome Token revocation event
     """
     class Meta:
         model = models.OutcomeToken
-        fields = ('owner', 'amount', 'address',)
+        fields = BalanceDeltaSerializer.Meta.fields + ('owner', 'amount',)
 
     owner = serializers.CharField(max_length=ADDRESS_LENGTH)
     amount = serializers.IntegerField()
     address = serializers.CharField(max_length=ADDRESS_LENGTH, source='outcome_token')
+    block_number = serializers.IntegerField(min_value=0)
+    log_index = serializers.IntegerField(min_value=0, allow_null=True)
 
     def validate(self, attrs):
         try:
@@ -564,25 +595,15 @@ class OutcomeTokenRevocationSerializer(ContractSerializer, serializers.ModelSeri
             ))
 
     def create(self, validated_data):
-        outcome_token_balance = models.OutcomeTokenBalance.objects.get(owner=validated_data.get('owner'),
-                                                                       outcome_token__address=validated_data.get('outcome_token'))
-        outcome_token_balance.balance -= validated_data.get('amount')
-        outcome_token_balance.outcome_token.total_supply -= validated_data.get('amount')
-        # save the outcome_token
-        outcome_token_balance.outcome_token.save()
-        # save the outcome_token_balance
-        outcome_token_balance.save()
-        return outcome_token_balance.outcome_token
+        outcome_token = get_contract(models.OutcomeToken, validated_data.get('outcome_token'))
+        increment_fields(outcome_token, total_supply=-validated_data.get('amount'))
+        add_balance_deltas([self.get_balance_delta(validated_data.get('owner'), -validated_data.get('amount'))])
+        return outcome_token
 
     def rollback(self):
-        outcome_token_balance = models.OutcomeTokenBalance.objects.get(
-            owner=self.validated_data.get('owner'),
-            outcome_token__address=self.validated_data.get('outcome_token')
-        )
-        outcome_token_balance.balance += self.validated_data.get('amount')
-        outcome_token_balance.save()
-        self.instance.total_supply += self.validated_data.get('amount')
-        self.instance.save()
+        revert_balance_deltas([self.get_balance_delta(self.validated_data.get('owner'),
+                                                      -self.validated_data.get('amount'))])
+        increment_fields(self.instance, total_supply=self.validated_data.get('amount'))
 
 
 class OutcomeAssignmentEventSerializer(ContractSerializer, serializers.ModelSerializer):
@@ -600,10 +621,10 @@ class OutcomeAssignmentEventSerializer(ContractSerializer, serializers.ModelSeri
         # Updates the event outcome
         event = None
         try:
-            event = models.Event.objects.get(address=validated_data.get('address'))
+            event = get_contract(models.Event, validated_data.get('address'))
             event.is_winning_outcome_set = True
             event.outcome = validated_data.get('outcome')
-            event.save()
+            event.save(update_fields=['is_winning_outcome_set', 'outcome'])
             return event
         except event.DoesNotExist:
             raise serializers.ValidationError('Event {} does not exist'.format(validated_data.get('address')))
@@ -611,16 +632,16 @@ class OutcomeAssignmentEventSerializer(ContractSerializer, serializers.ModelSeri
     def rollback(self):
         self.instance.is_winning_outcome_set = False
         self.instance.outcome = None
-        self.instance.save()
+        self.instance.save(update_fields=['is_winning_outcome_set', 'outcome'])
 
 
-class OutcomeTokenTransferSerializer(ContractSerializer, serializers.ModelSerializer):
+class OutcomeTokenTransferSerializer(BalanceDeltaSerializer, serializers.ModelSerializer):
     """
     Serializes the Outcome Token transfer event
     """
     class Meta:
         model = models.OutcomeTokenBalance
-        fields = ('from_address', 'to', 'value', 'address',)
+        fields = BalanceDeltaSerializer.Meta.fields + ('from_address', 'to', 'value',)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -630,48 +651,37 @@ class OutcomeTokenTransferSerializer(ContractSerializer, serializers.ModelSerial
     address = serializers.CharField(max_length=ADDRESS_LENGTH, source="outcome_token")
     from_address = serializers.CharField(max_length=ADDRESS_LENGTH)
     to = serializers.CharField(max_length=ADDRESS_LENGTH)
+    block_number = serializers.IntegerField(min_value=0)
+    log_index = serializers.IntegerField(min_value=0, allow_null=True)
 
     def create(self, validated_data):
-        # Subtract balance from Outcome Token Balance
-        from_balance = models.OutcomeTokenBalance.objects.get(owner=validated_data.get('from_address'),
-                                                              outcome_token__address=validated_data.get('outcome_token'))
-        from_balance.balance -= validated_data.get('value')
-        from_balance.save()
-
-        # Add balance to receiver
-        try:
-            to_balance = models.OutcomeTokenBalance.objects.get(owner=validated_data.get('to'),
-                                                                outcome_token__address=validated_data.get('outcome_token'))
-        except models.OutcomeTokenBalance.DoesNotExist:
-            to_balance = models.OutcomeTokenBalance.objects.create(owner=validated_data.get('to'),
-                                                                   outcome_token=from_balance.outcome_token)
-        to_balance.balance += validated_data.get('value')
-        to_balance.save()
-
-        return to_balance
+        # The sender must have a balance
+        if not models.OutcomeTokenBalance.objects.filter(owner=validated_data.get('from_address'),
+                                                         outcome_token=validated_data.get('outcome_token')).exists():
+            raise models.OutcomeTokenBalance.DoesNotExist('OutcomeTokenBalance {} for owner {} doesn\'t exist'.format(
+                validated_data.get('outcome_token'), validated_data.get('from_address')))
+
+        # Moves the value from the sender balance to the receiver balance, returns the receiver balance
+        balances = add_balance_deltas(self.get_transfer_deltas())
+        if not balances:
+            return models.OutcomeTokenBalance.objects.get(owner=validated_data.get('to'),
+                                                          outcome_token=validated_data.get('outcome_token'))
+        return balances[(validated_data.get('to'), validated_data.get('outcome_token'))]
 
     def rollback(self):
-        # got OutcomeTokenBalance by using 'From' property
-        self.instance.balance += self.validated_data.get('value')
-        self.instance.save()
-
-        # Add balance to receiver
-        try:
-            to_balance = models.OutcomeTokenBalance.objects.get(
-                owner=self.validated_data.get('to'),
-                outcome_token__address=self.validated_data.get('outcome_token')
-            )
-        except models.OutcomeTokenBalance.DoesNotExist:
-            to_balance = models.OutcomeTokenBalance.objects.create(
-                owner=self.validated_data.get('to'),
-                outcome_token=self.from_balance.outcome_token
-            )
+        revert_balance_deltas(self.get_transfer_deltas())
 
-        if to_balance.balance - self.validated_data.get('value') == 0:
-            to_balance.delete()
-        else:
-            to_balance.balance -= self.validated_data.get('value')
-            to_balance.save()
+    def get_transfer_deltas(self):
+        """
+        :return: journal deltas of the sender and the receiver, none for a transfer to the sender: the balance
+        doesn't change and a log has one delta per balance
+        """
+        if self.validated_data.get('from_address') == self.validated_data.get('to'):
+            return []
+        return [
+            self.get_balance_delta(self.validated_data.get('from_address'), -self.validated_data.get('value')),
+            self.get_balance_delta(self.validated_data.get('to'), self.validated_data.get('value')),
+        ]
 
 
 class WinningsRedemptionSerializer(ContractSerializer, serializers.ModelSerializer):
@@ -689,16 +699,14 @@ class WinningsRedemptionSerializer(ContractSerializer, serializers.ModelSerializ
     def create(self, validated_data):
         # Sums the given winnings to the event redeemed_winnings
         try:
-            event = models.Event.objects.get(address=validated_data.get('address'))
-            event.redeemed_winnings += validated_data.get('winnings')
-            event.save()
+            event = get_contract(models.Event, validated_data.get('address'))
+            increment_fields(event, redeemed_winnings=validated_data.get('winnings'))
             return event
-        except event.DoesNotExist:
+        except models.Event.DoesNotExist:
             raise serializers.ValidationError('Event {} does not exist'.format(validated_data.get('address')))
 
     def rollback(self):
-        self.instance.redeemed_winnings -= self.validated_data.get('winnings')
-        self.instance.save()
+        increment_fields(self.instance, redeemed_winnings=-self.validated_data.get('winnings'))
 
 
 class CentralizedOracleInstanceSerializer(CentralizedOracleSerializer):
@@ -719,17 +727,17 @@ class OwnerReplacementSerializer(ContractSerializer, serializers.ModelSerializer
     def create(self, validated_data):
         # Replaces the centralized oracle's owner if existing
         try:
-            centralized_oracle = models.CentralizedOracle.objects.get(address=validated_data.get('address'))
+            centralized_oracle = get_contract(models.CentralizedOracle, validated_data.get('address'))
             centralized_oracle.old_owner = centralized_oracle.owner
             centralized_oracle.owner = validated_data.get('newOwner')
-            centralized_oracle.save()
+            centralized_oracle.save(update_fields=['old_owner', 'owner'])
             return centralized_oracle
         except models.CentralizedOracle.DoesNotExist:
             raise serializers.ValidationError('CentralizedOracle {} does not exist'.format(validated_data.get('address')))
 
     def rollback(self):
         self.instance.owner = self.instance.old_owner
-        self.instance.save()
+        self.instance.save(update_fields=['owner'])
         return self.instance
 
 
@@ -747,10 +755,10 @@ class OutcomeAssignmentOracleSerializer(ContractSerializer, serializers.ModelSer
     def create(self, validated_data):
         # Updates the centralized_oracle outcome
         try:
-            centralized_oracle = models.CentralizedOracle.objects.get(address=validated_data.get('address'))
+            centralized_oracle = get_contract(models.CentralizedOracle, validated_data.get('address'))
             centralized_oracle.is_outcome_set = True
             centralized_oracle.outcome = validated_data.get('outcome')
-            centralized_oracle.save()
+            centralized_oracle.save(update_fields=['is_outcome_set', 'outcome'])
             return centralized_oracle
         except centralized_oracle.DoesNotExist:
             raise serializers.ValidationError('CentralizedOracle {} does not exist'.format(validated_data.get('address')))
@@ -758,7 +766,7 @@ class OutcomeAssignmentOracleSerializer(ContractSerializer, serializers.ModelSer
     def rollback(self):
         self.instance.is_outcome_set = False
         self.instance.outcome = None
-        self.instance.save()
+        self.instance.save(update_fields=['is_outcome_set', 'outcome'])
         return self.instance
 
 
@@ -781,12 +789,9 @@ class OutcomeTokenPurchaseSerializerTimestamped(ContractSerializerTimestamped, s
 
     def create(self, validated_data):
         try:
-            market = models.Market.objects.get(address=validated_data.get('address'))
+            market = get_contract(models.Market, validated_data.get('address'))
             token_index = validated_data.get('outcomeTokenIndex')
             token_count = validated_data.get('outcomeTokenCount')
-            market.net_outcome_tokens_sold[token_index] += token_count
-            market.collected_fees += validated_data.get('marketFees')
-
             outcome_token = market.event.outcome_tokens.get(index=token_index)
 
             # Create Order
@@ -800,23 +805,21 @@ class OutcomeTokenPurchaseSerializerTimestamped(ContractSerializerTimestamped, s
             order.cost = validated_data.get('outcomeTokenCost') + validated_data.get('marketFees')
             order.outcome_token_cost = validated_data.get('outcomeTokenCost')
             order.fees = validated_data.get('marketFees')
-            order.net_outcome_tokens_sold = market.net_outcome_tokens_sold
             order.transaction_hash = validated_data.get('transaction_hash')
 
-            # Calculate current marginal price
-            order.marginal_prices = list(map(
-                lambda index_: Decimal(calc_lmsr_marginal_price(int(index_[0]),
-                                                                [int(x) for x in market.net_outcome_tokens_sold],
-                                                                int(market.funding))
-                                       ),
-                enumerate(market.net_outcome_tokens_sold)
-            ))
+            # Add the trade to the market, the marginal prices are calculated from the tokens sold it returns
+            increment_fields(market, returning=('funding',), net_outcome_tokens_sold={token_index: token_count},
+                             collected_fees=order.fees, trading_volume=order.cost)
+            order.net_outcome_tokens_sold = market.net_outcome_tokens_sold
+            order.marginal_prices = [
+                Decimal(marginal_price)
+                for marginal_price in calc_lmsr_marginal_prices(market.net_outcome_tokens_sold, market.funding)
+            ]
 
-            # Save order successfully, save market changes, then save the share entry
+            # Save order successfully, then the market marginal prices
             order.save()
-            market.trading_volume += order.cost
             market.marginal_prices = order.marginal_prices
-            market.save()
+            market.save(update_fields=['marginal_prices'])
             return order
         except models.Market.DoesNotExist:
             raise serializers.ValidationError('Market with address {} does not exist.'.format(validated_data.get('address')))
@@ -824,21 +827,17 @@ class OutcomeTokenPurchaseSerializerTimestamped(ContractSerializerTimestamped, s
     def rollback(self):
         token_index = self.validated_data.get('outcomeTokenIndex')
         token_count = self.validated_data.get('outcomeTokenCount')
-        market = models.Market.objects.get(address=self.validated_data.get('address'))
-        market.net_outcome_tokens_sold[token_index] -= token_count
-        market.collected_fees -= self.validated_data.get('marketFees')
-        market.trading_volume -= self.instance.cost
-        market.marginal_prices = list(map(
-            lambda index_: Decimal(calc_lmsr_marginal_price(int(index_[0]),
-                                                            [int(x) for x in market.net_outcome_tokens_sold],
-                                                            int(market.funding))
-                                   ),
-            enumerate(market.net_outcome_tokens_sold)
-        ))
+        market = get_contract(models.Market, self.validated_data.get('address'))
+        increment_fields(market, returning=('funding',), net_outcome_tokens_sold={token_index: -token_count},
+                         collected_fees=-self.validated_data.get('marketFees'), trading_volume=-self.instance.cost)
+        market.marginal_prices = [
+            Decimal(marginal_price)
+            for marginal_price in calc_lmsr_marginal_prices(market.net_outcome_tokens_sold, market.funding)
+        ]
 
         # Remove order
         self.instance.delete()
-        market.save()
+        market.save(update_fields=['marginal_prices'])
 
 
 class OutcomeTokenSaleSerializerTimestamped(ContractSerializerTimestamped, serializers.ModelSerializer):
@@ -860,11 +859,9 @@ class OutcomeTokenSaleSerializerTimestamped(ContractSerializerTimestamped, seria
 
     def create(self, validated_data):
         try:
-            market = models.Market.objects.get(address=validated_data.get('address'))
+            market = get_contract(models.Market, validated_data.get('address'))
             token_index = validated_data.get('outcomeTokenIndex')
             token_count = validated_data.get('outcomeTokenCount')
-            market.net_outcome_tokens_sold[token_index] -= token_count
-            market.collected_fees += validated_data.get('marketFees')
 
             # Get outcome token
             outcome_token = market.event.outcome_tokens.get(index=token_index)
@@ -880,19 +877,20 @@ class OutcomeTokenSaleSerializerTimestamped(ContractSerializerTimestamped, seria
             order.profit = validated_data.get('outcomeTokenProfit') - validated_data.get('marketFees')
             order.outcome_token_profit = validated_data.get('outcomeTokenProfit')
             order.fees = validated_data.get('marketFees')
-            order.net_outcome_tokens_sold = market.net_outcome_tokens_sold
             order.transaction_hash = validated_data.get('transaction_hash')
-            order.marginal_prices = list(map(
-                lambda index_: Decimal(calc_lmsr_marginal_price(int(index_[0]),
-                                                                [int(x) for x in market.net_outcome_tokens_sold],
-                                                                int(market.funding))
-                                       ),
-                enumerate(market.net_outcome_tokens_sold)
-            ))
-            # Save order successfully, save market changes, then save the share entry
+
+            # Add the trade to the market, the marginal prices are calculated from the tokens sold it returns
+            increment_fields(market, returning=('funding',), net_outcome_tokens_sold={token_index: -token_count},
+                             collected_fees=order.fees)
+            order.net_outcome_tokens_sold = market.net_outcome_tokens_sold
+            order.marginal_prices = [
+                Decimal(marginal_price)
+                for marginal_price in calc_lmsr_marginal_prices(market.net_outcome_tokens_sold, market.funding)
+            ]
+            # Save order successfully, then the market marginal prices
             order.save()
             market.marginal_prices = order.marginal_prices
-            market.save()
+            market.save(update_fields=['marginal_prices'])
             return order
         except models.Market.DoesNotExist:
             raise serializers.ValidationError('Market with address {} does not exist.' % validated_data.get('address'))
@@ -900,21 +898,18 @@ class OutcomeTokenSaleSerializerTimestamped(ContractSerializerTimestamped, seria
     def rollback(self):
         token_index = self.validated_data.get('outcomeTokenIndex')
         token_count = self.validated_data.get('outcomeTokenCount')
-        market = models.Market.objects.get(address=self.validated_data.get('address'))
-        market.net_outcome_tokens_sold[token_index] += token_count
-        market.collected_fees -= self.validated_data.get('marketFees')
-
-        market.marginal_prices = list(map(
-            lambda index_: Decimal(calc_lmsr_marginal_price(int(index_[0]),
-                                                            [int(x) for x in market.net_outcome_tokens_sold],
-                                                            int(market.funding))
-                                   ),
-            enumerate(market.net_outcome_tokens_sold)
-        ))
+        market = get_contract(models.Market, self.validated_data.get('address'))
+        increment_fields(market, returning=('funding',), net_outcome_tokens_sold={token_index: token_count},
+                         collected_fees=-self.validated_data.get('marketFees'))
+
+        market.marginal_prices = [
+            Decimal(marginal_price)
+            for marginal_price in calc_lmsr_marginal_prices(market.net_outcome_tokens_sold, market.funding)
+        ]
 
         # Remove order
         self.instance.delete()
-        market.save()
+        market.save(update_fields=['marginal_prices'])
 
 
 class OutcomeTokenShortSaleOrderSerializerTimestamped(ContractSerializerTimestamped, serializers.ModelSerializer):
@@ -933,7 +928,7 @@ class OutcomeTokenShortSaleOrderSerializerTimestamped(ContractSerializerTimestam
 
     def create(self, validated_data):
         try:
-            market = models.Market.objects.get(address=validated_data.get('address'))
+            market = get_contract(models.Market, validated_data.get('address'))
             try:
                 # get outcome token
                 outcome_token = models.OutcomeToken.objects.get(index=validated_data.get('outcomeTokenIndex'))
@@ -974,7 +969,7 @@ class MarketFundingSerializer(ContractSerializer, serializers.ModelSerializer):
 
     def create(self, validated_data):
         try:
-            market = models.Market.objects.get(address=validated_data.get('address'))
+            market = get_contract(models.Market, validated_data.get('address'))
             market.funding = validated_data.get('funding')
             market.stage = market.stages[1][0] # MarketFunded
             market.save()
@@ -1001,7 +996,7 @@ class MarketClosingSerializer(ContractSerializer, serializers.ModelSerializer):
 
     def create(self, validated_data):
         try:
-            market = models.Market.objects.get(address=validated_data.get('address'))
+            market = get_contract(models.Market, validated_data.get('address'))
             market.stage = market.stages[2][0] # MarketClosed
             market.save()
             return market
@@ -1027,16 +1022,14 @@ class FeeWithdrawalSerializer(ContractSerializer, serializers.ModelSerializer):
 
     def create(self, validated_data):
         try:
-            market = models.Market.objects.get(address=validated_data.get('address'))
-            market.withdrawn_fees += validated_data.get('fees')
-            market.save()
+            market = get_contract(models.Market, validated_data.get('address'))
+            increment_fields(market, withdrawn_fees=validated_data.get('fees'))
             return market
         except models.Market.DoesNotExist:
             raise serializers.ValidationError('Market with address {} does not exist.' % validated_data.get('address'))
 
     def rollback(self):
-        self.instance.withdrawn_fees -= self.validated_data.get('fees')
-        self.instance.save()
+        increment_fields(self.instance, withdrawn_fees=-self.validated_data.get('fees'))
         return self.instance
 
 
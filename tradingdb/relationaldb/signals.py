@@ -0,0 +1,40 @@
+"""
+Model signal receivers restricted to some models. Receivers connected without a sender run on every save and delete
+of every model, and any `post_delete` receiver disables the fast delete of cascades for every model. Signals are sent
+with the class of the saved or deleted instance, so the children of a multi-table inheritance and the proxies of a
+model are connected too.
+"""
+from typing import Iterable, List, Type
+
+from django.db.models import Model
+from django.dispatch import Signal
+
+
+def get_senders(models: Iterable[Type[Model]]) -> List[Type[Model]]:
+    """
+    :return: the models and all their subclasses
+    """
+    senders = []
+    pending = list(models)
+    while pending:
+        model = pending.pop(0)
+        if model not in senders:
+            senders.append(model)
+            pending.extend(model.__subclasses__())
+    return senders
+
+
+def connect_receiver(signal: Signal, receiver, senders: Iterable[Type[Model]], dispatch_uid: str):
+    for sender in get_senders(senders):
+        signal.connect(receiver, sender=sender, dispatch_uid=dispatch_uid)
+
+
+def model_receiver(signal: Signal, senders: Iterable[Type[Model]], dispatch_uid: str):
+    """
+    Like `django.dispatch.receiver`, connects the decorated function to the signal sent by `senders` and their
+    subclasses only
+    """
+    def _decorator(receiver):
+        connect_receiver(signal, receiver, senders, dispatch_uid)
+        return receiver
+    return _decorator
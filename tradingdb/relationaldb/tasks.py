@@ -8,6 +8,9 @@ from django.core.management import call_command, settings
 from django.db import transaction
 from django.utils import timezone
 
+from tradingdb.chainevents.event_listener import (LogIndexEventListener,
+                                                  listener_lock)
+
 from .models import TournamentParticipant
 
 logger = get_task_logger(__name__)
@@ -49,13 +52,51 @@ def clear_issued_tokens_flag():
     logger.info("Cleared issued tokens flag for tournament participants")
 
 
+@shared_task
+def event_listener():
+    """
+    The task processes the next blocks with the event listener, keeping the log index of every log (see
+    `chainevents.event_listener`). It's skipped if the listener lock is held: the previous run didn't finish, the
+    task of django_eth_events, db_dump or catch_up are running
+    """
+    with listener_lock() as acquired:
+        if not acquired:
+            logger.info('Event listener is already running')
+            return
+        LogIndexEventListener().execute()
+
+
 @shared_task
 def calculate_scoreboard():
     """
-    The task executes the calculation of the scoreboard
+    The task executes the calculation of the scoreboard, only for the participants touched since the last run
+    """
+    try:
+        call_command('calculate_scoreboard', incremental=True)
+    except Exception as err:
+        logger.error(str(err))
+        send_email(traceback.format_exc())
+
+
+@shared_task
+def compact_balance_journal():
+    """
+    The task compacts the outcome token balance journal up to the blocks that can be reverted
+    """
+    try:
+        call_command('compact_balance_journal')
+    except Exception as err:
+        logger.error(str(err))
+        send_email(traceback.format_exc())
+
+
+@shared_task
+def resolve_event_descriptions():
+    """
+    The task saves the IPFS event descriptions of the next blocks before the event listener processes them
     """
     try:
-        call_command('calculate_scoreboard')
+        call_command('resolve_event_descriptions')
     except Exception as err:
         logger.error(str(err))
         send_email(traceback.format_exc())
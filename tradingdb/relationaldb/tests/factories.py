@@ -164,6 +164,10 @@ class MarketFactory(ContractCreatedByFactory):
         model = models.Market
 
     event = factory_boy.SubFactory(CategoricalEventFactory)
+    event_type = factory_boy.LazyAttribute(lambda market: models.Market.get_event_fields(market.event)['event_type'])
+    resolution_date = factory_boy.LazyAttribute(
+        lambda market: models.Market.get_event_fields(market.event)['resolution_date']
+    )
     market_maker = factory_boy.LazyFunction(lambda: generate_eth_account(only_address=True))
     fee = factory_boy.Sequence(lambda n: n)
     funding = factory_boy.Sequence(lambda n: (n+1)*1e18)
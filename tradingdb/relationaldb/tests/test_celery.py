@@ -1,10 +1,18 @@
 # -*- coding: utf-8 -*-
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps
 from django.core import mail
 from django.test import TestCase
 from django.test.utils import override_settings
+from django_celery_beat.models import IntervalSchedule, PeriodicTask
 from django_eth_events.factories import DaemonFactory
+from django_eth_events.models import Daemon
+
+from tradingdb.chainevents.event_listener import LogIndexEventListener
 
-from ..tasks import db_dump
+from ..tasks import db_dump, event_listener
 
 
 @override_settings(
@@ -19,3 +27,30 @@ class TestCelery(TestCase):
         self.assertEqual(len(mail.outbox), 0)
         db_dump()
         self.assertEqual(len(mail.outbox), 1)
+
+    def test_event_listener(self):
+        with mock.patch.object(LogIndexEventListener, 'execute') as execute:
+            # Held by db_dump or the task of django_eth_events
+            Daemon.objects.filter(pk=self.daemon.pk).update(listener_lock=True)
+            event_listener()
+            execute.assert_not_called()
+
+            Daemon.objects.filter(pk=self.daemon.pk).update(listener_lock=False)
+            event_listener()
+            execute.assert_called_once_with()
+            self.assertFalse(Daemon.objects.get(pk=self.daemon.pk).listener_lock)
+
+            # Released if the listener fails
+            execute.side_effect = ValueError
+            with self.assertRaises(ValueError):
+                event_listener()
+            self.assertFalse(Daemon.objects.get(pk=self.daemon.pk).listener_lock)
+
+    def test_event_listener_task_migration(self):
+        migration = import_module('tradingdb.relationaldb.migrations.0018_event_listener_task')
+        interval = IntervalSchedule.objects.create(every=5, period='seconds')
+        PeriodicTask.objects.create(name='Event Listener', task=migration.DJANGO_ETH_EVENTS_TASK, interval=interval)
+
+        migration.rename_event_listener_task(migration.DJANGO_ETH_EVENTS_TASK, migration.EVENT_LISTENER_TASK)(apps,
+                                                                                                              None)
+        self.assertEqual(PeriodicTask.objects.get(name='Event Listener').task, migration.EVENT_LISTENER_TASK)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from time import mktime
+
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django_eth_events.utils import normalize_address_without_0x
+
+from ..identity_map import (IdentityMap, get_contract, identity_map,
+                            invalidate_identity_map)
+from ..models import CategoricalEvent, CentralizedOracle, Event, Market
+from ..serializers import MarketSerializerTimestamped
+from .factories import (CategoricalEventFactory, CentralizedOracleFactory,
+                        MarketFactory, generate_eth_account)
+
+
+class TestIdentityMap(TestCase):
+
+    def test_get_contract(self):
+        oracle = CentralizedOracleFactory()
+        with self.assertNumQueries(2):
+            self.assertIsNot(get_contract(CentralizedOracle, oracle.address),
+                             get_contract(CentralizedOracle, oracle.address))
+
+        with identity_map() as current:
+            with self.assertNumQueries(1):
+                cached_oracle = get_contract(CentralizedOracle, oracle.address)
+                self.assertIs(get_contract(CentralizedOracle, oracle.address), cached_oracle)
+            # Nested contexts share the map
+            with identity_map() as nested:
+                self.assertIs(nested, current)
+
+            # The saved instance is kept, the rest of instances of the contract are dropped
+            cached_oracle.owner = generate_eth_account(only_address=True)
+            cached_oracle.save()
+            with self.assertNumQueries(0):
+                self.assertIs(get_contract(CentralizedOracle, oracle.address), cached_oracle)
+            CentralizedOracle.objects.get(address=oracle.address).save()
+            with self.assertNumQueries(1):
+                self.assertEqual(get_contract(CentralizedOracle, oracle.address).owner, cached_oracle.owner)
+
+            invalidate_identity_map()
+            self.assertFalse(current.instances)
+
+            get_contract(CentralizedOracle, oracle.address).delete()
+            with self.assertRaises(CentralizedOracle.DoesNotExist):
+                get_contract(CentralizedOracle, oracle.address)
+
+    def test_subclass_eviction(self):
+        event = CategoricalEventFactory()
+        with identity_map():
+            cached_event = get_contract(Event, event.address)
+            # Signals are sent with the subclass of the cached model
+            CategoricalEvent.objects.get(address=event.address).save()
+            with self.assertNumQueries(1):
+                self.assertIsNot(get_contract(Event, event.address), cached_event)
+
+    def test_max_size(self):
+        markets = [MarketFactory() for _ in range(3)]
+        current = IdentityMap(max_size=2)
+        with self.assertNumQueries(1):
+            self.assertEqual(set(current.get_many(Market, [market.address for market in markets[:2]])),
+                             {market.address for market in markets[:2]})
+        current.get(Market, markets[0].address)
+        current.get(Market, markets[2].address)
+        # Least recently used is dropped
+        self.assertEqual({key[1] for key in current.instances}, {markets[0].address, markets[2].address})
+        self.assertEqual(set(current.keys_by_address), {markets[0].address, markets[2].address})
+
+    def test_market_creation(self):
+        oracle = CentralizedOracleFactory()
+        event = CategoricalEventFactory(oracle=oracle)
+        market = MarketFactory.build()
+        block = {
+            'number': market.creation_block,
+            'timestamp': mktime(market.creation_date_time.timetuple())
+        }
+
+        def create_market():
+            market_dict = {
+                'address': market.factory,
+                'params': [
+                    {'name': 'creator', 'value': market.creator},
+                    {'name': 'centralizedOracle', 'value': oracle.address},
+                    {'name': 'marketMaker', 'value': normalize_address_without_0x(settings.LMSR_MARKET_MAKER)},
+                    {'name': 'fee', 'value': market.fee},
+                    {'name': 'market', 'value': generate_eth_account(only_address=True)},
+                    {'name': 'eventContract', 'value': event.address},
+                ]
+            }
+            with CaptureQueriesContext(connection) as context:
+                serializer = MarketSerializerTimestamped(data=market_dict, block=block)
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+                instance = serializer.save()
+            self.assertEqual(instance.net_outcome_tokens_sold, [0] * len(oracle.event_description.outcomes))
+            self.assertEqual(instance.event_type, 'CATEGORICAL')
+            return len(context.captured_queries)
+
+        uncached_queries = create_market()
+        self.assertGreater(uncached_queries, 1)
+        self.assertEqual(create_market(), uncached_queries)
+        with identity_map():
+            self.assertEqual(create_market(), uncached_queries)
+            # The event is loaded once, only the unique address validation and the insert are left
+            self.assertEqual(create_market(), 2)
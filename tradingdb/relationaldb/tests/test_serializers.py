@@ -1,7 +1,11 @@
+from datetime import timedelta
+from decimal import Decimal
 from time import mktime
 
 from django.conf import settings
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django_eth_events.utils import normalize_address_without_0x
 from django_eth_events.web3_service import Web3Service, Web3ServiceProvider
 from eth_tester import EthereumTester
@@ -9,31 +13,42 @@ from rest_framework.serializers import ValidationError
 from web3.providers.eth_tester import EthereumTesterProvider
 
 from chainevents.abis import abi_file_path, load_json_file
+from gnosis.utils import calc_lmsr_marginal_prices
 from ipfs.ipfs import Ipfs
 
-from ..models import (OutcomeToken, OutcomeTokenBalance,
-                      ScalarEventDescription, TournamentParticipant,
+from ..balance_journal import compact_balance_journal, rollback_balance_journal
+from ..identity_map import get_contract, identity_map
+from ..models import (Event, EventDescription, Market, Oracle, Order,
+                      OutcomeToken, OutcomeTokenBalance,
+                      OutcomeTokenBalanceDelta, ScalarEventDescription,
+                      SellOrder, TournamentParticipant,
                       TournamentParticipantBalance)
 from ..serializers import (CategoricalEventSerializer,
                            CentralizedOracleInstanceSerializer,
                            CentralizedOracleSerializer,
+                           FeeWithdrawalSerializer,
                            GenericTournamentParticipantEventSerializerTimestamped,
                            IPFSEventDescriptionDeserializer,
                            MarketSerializerTimestamped,
                            OutcomeTokenInstanceSerializer,
                            OutcomeTokenIssuanceSerializer,
+                           OutcomeTokenPurchaseSerializerTimestamped,
                            OutcomeTokenRevocationSerializer,
+                           OutcomeTokenSaleSerializerTimestamped,
                            OutcomeTokenTransferSerializer,
                            ScalarEventSerializer,
                            TournamentTokenIssuanceSerializer,
                            TournamentTokenTransferSerializer,
-                           UportTournamentParticipantSerializerEventSerializerTimestamped)
-from .factories import (CategoricalEventDescriptionFactory,
+                           UportTournamentParticipantSerializerEventSerializerTimestamped,
+                           WinningsRedemptionSerializer)
+from .factories import (BuyOrderFactory, CategoricalEventDescriptionFactory,
                         CategoricalEventFactory, CentralizedOracleFactory,
                         EventFactory, MarketFactory,
                         OutcomeTokenBalanceFactory, OutcomeTokenFactory,
                         ScalarEventDescriptionFactory, ScalarEventFactory,
-                        TournamentParticipantBalanceFactory, generate_eth_account)
+                        SellOrderFactory,
+                        TournamentParticipantBalanceFactory, generate_eth_account,
+                        generate_transaction_hash)
 from .utils import tournament_token_bytecode
 
 
@@ -404,6 +419,25 @@ class TestSerializers(TestCase):
         self.assertTrue(s.is_valid(), s.errors)
         instance = s.save()
         self.assertIsNotNone(instance)
+        self.assertEqual(instance.event_type, 'CATEGORICAL')
+        self.assertEqual(instance.resolution_date, oracle.event_description.resolution_date)
+
+        # Description changes are copied to the market
+        oracle.event_description.resolution_date -= timedelta(days=1)
+        oracle.event_description.save()
+        instance.refresh_from_db()
+        self.assertEqual(instance.resolution_date, oracle.event_description.resolution_date)
+
+        # Oracle events don't update the market
+        with CaptureQueriesContext(connection) as context:
+            oracle.old_owner = oracle.owner
+            oracle.owner = generate_eth_account(only_address=True)
+            oracle.save(update_fields=['old_owner', 'owner'])
+            oracle.is_outcome_set = True
+            oracle.outcome = 1
+            oracle.save(update_fields=['is_outcome_set', 'outcome'])
+        self.assertFalse([query for query in context.captured_queries
+                          if query['sql'].startswith('UPDATE "relationaldb_market"')])
 
     def test_create_market_with_multiple_addresses(self):
         oracle = CentralizedOracleFactory()
@@ -492,6 +526,32 @@ class TestSerializers(TestCase):
         self.assertTrue(serializer.is_valid(), serializer.errors)
         self.assertIsNotNone(serializer.save())
 
+    def test_subclass_types(self):
+        scalar_oracle = CentralizedOracleFactory(event_description=ScalarEventDescriptionFactory())
+        scalar_event = ScalarEventFactory(oracle=scalar_oracle)
+        categorical_event = CategoricalEventFactory()
+        buy_order = BuyOrderFactory()
+        sell_order = SellOrderFactory()
+
+        self.assertEqual(Event.objects.get(address=scalar_event.address).event_type, 'SCALAR')
+        self.assertEqual(Event.objects.get(address=categorical_event.address).event_type, 'CATEGORICAL')
+        self.assertEqual(EventDescription.objects.get(pk=scalar_oracle.event_description.pk).description_type,
+                         'SCALAR')
+        self.assertEqual(Oracle.objects.get(address=scalar_oracle.address).oracle_type, 'CENTRALIZED')
+        self.assertEqual(Order.objects.get(pk=buy_order.pk).order_type, 'BUY')
+        self.assertEqual(Order.objects.get(pk=sell_order.pk).order_type, 'SELL')
+
+        # Only the table of the subclass is queried
+        event = Event.objects.get(address=categorical_event.address)
+        with self.assertNumQueries(1):
+            self.assertEqual(event.get_subclass_instance(), categorical_event)
+        # Orders of every type are in the same table
+        order = Order.objects.get(pk=sell_order.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(order.get_subclass_instance().profit, sell_order.profit)
+            self.assertIsNone(order.cost)
+        self.assertEqual(list(SellOrder.objects.values_list('pk', flat=True)), [sell_order.pk])
+
     def test_create_centralized_oracle_instance(self):
         oracle = CentralizedOracleFactory()
         oracle.delete()
@@ -574,7 +634,7 @@ class TestSerializers(TestCase):
             ]
         }
 
-        s = OutcomeTokenIssuanceSerializer(data=issuance_event)
+        s = OutcomeTokenIssuanceSerializer(data=issuance_event, block={'number': 1, 'timestamp': 0})
         self.assertTrue(s.is_valid(), s.errors)
         instance = s.save()
 
@@ -605,7 +665,7 @@ class TestSerializers(TestCase):
             ]
         }
 
-        s = OutcomeTokenRevocationSerializer(data=issuance_event)
+        s = OutcomeTokenRevocationSerializer(data=issuance_event, block={'number': 1, 'timestamp': 0})
         self.assertTrue(s.is_valid(), s.errors)
         instance = s.save()
 
@@ -640,7 +700,7 @@ class TestSerializers(TestCase):
             ]
         }
 
-        s = OutcomeTokenTransferSerializer(data=transfer_event)
+        s = OutcomeTokenTransferSerializer(data=transfer_event, block={'number': 1, 'timestamp': 0})
         self.assertTrue(s.is_valid(), s.errors)
         instance = s.save()
 
@@ -649,6 +709,162 @@ class TestSerializers(TestCase):
         self.assertEqual(instance.owner, event.address)
         self.assertEqual(instance.balance, 20)
 
+    def test_balance_journal(self):
+        outcome_token = OutcomeTokenFactory()
+        owner = generate_eth_account(only_address=True)
+        receiver = generate_eth_account(only_address=True)
+
+        def save(name, params, block_number, log_index):
+            serializer_class = {
+                'Issuance': OutcomeTokenIssuanceSerializer,
+                'Transfer': OutcomeTokenTransferSerializer,
+            }[name]
+            event = {
+                'name': name,
+                'address': outcome_token.address,
+                'log_index': log_index,
+                'params': [{'name': key, 'value': value} for key, value in params.items()]
+            }
+            s = serializer_class(data=event, block={'number': block_number, 'timestamp': 0})
+            self.assertTrue(s.is_valid(), s.errors)
+            return s.save()
+
+        save('Issuance', {'owner': owner, 'amount': 100}, 10, 0)
+        save('Transfer', {'from': owner, 'to': receiver, 'value': 30}, 11, 2)
+        save('Transfer', {'from': receiver, 'to': owner, 'value': 10}, 12, 0)
+
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=owner).balance, 80)
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=receiver).balance, 20)
+        self.assertListEqual(
+            list(OutcomeTokenBalanceDelta.objects.order_by('id').values_list('owner', 'delta', 'block_number',
+                                                                             'log_index')),
+            [(owner, 100, 10, 0), (owner, -30, 11, 2), (receiver, 30, 11, 2), (receiver, -10, 12, 0),
+             (owner, 10, 12, 0)]
+        )
+
+        # Reorg, blocks after 10 are reverted and the receiver balance didn't exist before
+        self.assertEqual(rollback_balance_journal(10), 2)
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=owner).balance, 100)
+        self.assertFalse(OutcomeTokenBalance.objects.filter(owner=receiver).exists())
+        self.assertEqual(OutcomeTokenBalanceDelta.objects.count(), 1)
+
+        # Compaction doesn't change the balances
+        save('Transfer', {'from': owner, 'to': receiver, 'value': 30}, 11, 1)
+        self.assertEqual(compact_balance_journal(12), 1)
+        self.assertEqual(OutcomeTokenBalanceDelta.objects.filter(owner=owner).count(), 1)
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=owner).balance, 70)
+        self.assertEqual(OutcomeTokenBalance.objects.get(owner=receiver).balance, 30)
+
+    @staticmethod
+    def get_updates(context, table):
+        return [query['sql'].strip() for query in context.captured_queries
+                if query['sql'].strip().startswith('UPDATE "{}"'.format(table))]
+
+    def test_aggregate_increments(self):
+        event = CategoricalEventFactory(redeemed_winnings=100)
+        market = MarketFactory(withdrawn_fees=5)
+        outcome_token = OutcomeTokenFactory(total_supply=10)
+        owner = generate_eth_account(only_address=True)
+
+        def save(serializer_class, address, params):
+            s = serializer_class(data={'address': address,
+                                       'params': [{'name': key, 'value': value} for key, value in params.items()]})
+            self.assertTrue(s.is_valid(), s.errors)
+            return s.save(), s
+
+        with identity_map(), CaptureQueriesContext(connection) as context:
+            cached_event = get_contract(Event, event.address)
+            cached_token = get_contract(OutcomeToken, outcome_token.address)
+            winnings_event, winnings_serializer = save(WinningsRedemptionSerializer, event.address,
+                                                       {'receiver': owner, 'winnings': 10})
+            withdrawal_market, withdrawal_serializer = save(FeeWithdrawalSerializer, market.address, {'fees': 3})
+            issued_token, _ = save(OutcomeTokenIssuanceSerializer, outcome_token.address,
+                                   {'owner': owner, 'amount': 20})
+
+            # Only the changed column is written, added by the database
+            self.assertEqual(len(self.get_updates(context, 'relationaldb_event')), 1)
+            self.assertRegex(self.get_updates(context, 'relationaldb_event')[0],
+                             r'^UPDATE "relationaldb_event"\s+SET "redeemed_winnings" = "redeemed_winnings" \+ 10\s+'
+                             r'WHERE "address" = \'{}\'\s+RETURNING "redeemed_winnings"$'.format(event.address))
+            self.assertRegex(self.get_updates(context, 'relationaldb_market')[0],
+                             r'^UPDATE "relationaldb_market"\s+SET "withdrawn_fees" = "withdrawn_fees" \+ 3\s+WHERE')
+            self.assertRegex(self.get_updates(context, 'relationaldb_outcometoken')[0],
+                             r'^UPDATE "relationaldb_outcometoken"\s+SET "total_supply" = "total_supply" \+ 20\s+WHERE')
+
+            # The instance of the identity map gets the new value
+            self.assertIs(winnings_event, cached_event)
+            self.assertIs(issued_token, cached_token)
+            self.assertEqual(cached_event.redeemed_winnings, 110)
+            self.assertEqual(withdrawal_market.withdrawn_fees, 8)
+            self.assertEqual(issued_token.total_supply, 30)
+
+            winnings_serializer.rollback()
+            withdrawal_serializer.rollback()
+
+        self.assertEqual(Event.objects.get(address=event.address).redeemed_winnings, 100)
+        self.assertEqual(Market.objects.get(address=market.address).withdrawn_fees, 5)
+        self.assertEqual(OutcomeToken.objects.get(address=outcome_token.address).total_supply, 30)
+
+    @staticmethod
+    def get_marginal_prices(net_outcome_tokens_sold, funding):
+        return [Decimal(marginal_price).quantize(Decimal('0.0001'))
+                for marginal_price in calc_lmsr_marginal_prices(net_outcome_tokens_sold, funding)]
+
+    def test_trade_increments(self):
+        market = MarketFactory()
+        OutcomeTokenFactory(event=market.event, index=0)
+        buyer = generate_eth_account(only_address=True)
+        block = {
+            'number': market.creation_block,
+            'timestamp': mktime(market.creation_date_time.timetuple())
+        }
+
+        def save(serializer_class, params):
+            s = serializer_class(data={'address': market.address, 'transaction_hash': generate_transaction_hash(),
+                                       'params': [{'name': key, 'value': value} for key, value in params.items()]},
+                                 block=block)
+            self.assertTrue(s.is_valid(), s.errors)
+            return s.save(), s
+
+        with CaptureQueriesContext(connection) as context:
+            buy_order, _ = save(OutcomeTokenPurchaseSerializerTimestamped,
+                                {'buyer': buyer, 'outcomeTokenIndex': 0, 'outcomeTokenCount': 10,
+                                 'outcomeTokenCost': 10, 'marketFees': 1})
+            sell_order, sale_serializer = save(OutcomeTokenSaleSerializerTimestamped,
+                                               {'seller': buyer, 'outcomeTokenIndex': 0, 'outcomeTokenCount': 4,
+                                                'outcomeTokenProfit': 3, 'marketFees': 1})
+
+        # Counters are added by the database, then the marginal prices are written alone
+        purchase_update, purchase_prices_update, sale_update, sale_prices_update = self.get_updates(
+            context, 'relationaldb_market')
+        self.assertRegex(purchase_update,
+                         r'^UPDATE "relationaldb_market"\s+SET "net_outcome_tokens_sold"\[1\] = '
+                         r'"net_outcome_tokens_sold"\[1\] \+ 10, "collected_fees" = "collected_fees" \+ 1, '
+                         r'"trading_volume" = "trading_volume" \+ 11\s+WHERE "address" = \'{}\'\s+'
+                         r'RETURNING "net_outcome_tokens_sold", "collected_fees", "trading_volume", '
+                         r'"funding"$'.format(market.address))
+        self.assertRegex(sale_update,
+                         r'^UPDATE "relationaldb_market"\s+SET "net_outcome_tokens_sold"\[1\] = '
+                         r'"net_outcome_tokens_sold"\[1\] \+\s+-4, "collected_fees" = "collected_fees" \+ 1\s+WHERE')
+        for prices_update in (purchase_prices_update, sale_prices_update):
+            self.assertRegex(prices_update, r'^UPDATE "relationaldb_market" SET "marginal_prices" = ARRAY\[[^\]]*\]'
+                                            r'::numeric\(5, 4\)\[\] WHERE')
+
+        self.assertListEqual(buy_order.net_outcome_tokens_sold, [10, 0])
+        self.assertListEqual(sell_order.net_outcome_tokens_sold, [6, 0])
+        saved_market = Market.objects.get(address=market.address)
+        self.assertListEqual(saved_market.net_outcome_tokens_sold, [6, 0])
+        self.assertEqual(saved_market.collected_fees, 2)
+        self.assertEqual(saved_market.trading_volume, 11)
+        self.assertListEqual(saved_market.marginal_prices, self.get_marginal_prices([6, 0], market.funding))
+
+        sale_serializer.rollback()
+        saved_market = Market.objects.get(address=market.address)
+        self.assertListEqual(saved_market.net_outcome_tokens_sold, [10, 0])
+        self.assertEqual(saved_market.collected_fees, 1)
+        self.assertListEqual(saved_market.marginal_prices, self.get_marginal_prices([10, 0], market.funding))
+        self.assertFalse(SellOrder.objects.exists())
+
     def test_save_generic_tournament_participant(self):
         oracle = CentralizedOracleFactory()
         block = {
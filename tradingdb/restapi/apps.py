@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class RestApiConfig(AppConfig):
     name = 'tradingdb.restapi'
+
+    def ready(self):
+        # Register signal receivers
+        # Same module path as the views and event receivers, the cache versions are module state
+        import tradingdb.restapi.cache  # noqa: F401
@@ -0,0 +1,135 @@
+"""
+Response cache of the market, event and centralized oracle list endpoints. Responses are stored by view and normalized
+query params under a version, every change of the listed models (saved or rolled back by the event receivers) bumps
+the version, so previous responses are not used anymore and expire by themselves.
+
+The version has two parts:
+ - Shared version, stored in the cache and bumped when the transaction that changed the models is committed, so
+   processes serving the API see the changes ingested by the event listener.
+ - Local version, bumped right away, so the process that changed the models never gets a response cached before the
+   change, even inside a transaction.
+"""
+import hashlib
+import json
+import threading
+import time
+import weakref
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework import status
+from rest_framework.response import Response
+
+from tradingdb.relationaldb.models import (Event, EventDescription, Market,
+                                           Oracle)
+from tradingdb.relationaldb.signals import model_receiver
+
+RESPONSE_CACHE_ALIAS = 'restapi'
+SHARED_VERSION_KEY = 'restapi:version'
+
+hits = Counter()
+misses = Counter()
+_local_version = 0
+# Shared version bump scheduled by the current transaction of the thread
+_local = threading.local()
+
+
+def get_response_cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def get_response_cache_stats():
+    return {
+        'hits': sum(hits.values()),
+        'misses': sum(misses.values()),
+        'views': {view_name: {'hits': hits[view_name], 'misses': misses[view_name]}
+                  for view_name in sorted(set(hits) | set(misses))},
+    }
+
+
+def get_cache_version() -> str:
+    cache = get_response_cache()
+    shared_version = cache.get(SHARED_VERSION_KEY)
+    if shared_version is None:
+        # Start from the current time, so an evicted version is not reused with responses cached before
+        cache.add(SHARED_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        shared_version = cache.get(SHARED_VERSION_KEY, 0)
+    return '{}.{}'.format(shared_version, _local_version)
+
+
+def _bump_shared_version():
+    cache = get_response_cache()
+    try:
+        cache.incr(SHARED_VERSION_KEY)
+    except ValueError:
+        # Version evicted, next `get_cache_version` sets a new one
+        pass
+
+
+def invalidate_response_cache():
+    """
+    Discards the cached responses. Can be called for every saved instance, the shared version is bumped only once
+    per transaction
+    """
+    global _local_version
+    _local_version += 1
+
+    # Only a weak reference is kept: if the transaction is rolled back, the callback is discarded by the connection
+    # and a new bump is scheduled by the next call
+    scheduled_bump = getattr(_local, 'scheduled_bump', None)
+    if scheduled_bump is None or scheduled_bump() is None:
+        def bump():
+            _local.scheduled_bump = None
+            _bump_shared_version()
+        _local.scheduled_bump = weakref.ref(bump)
+        transaction.on_commit(bump)
+
+
+def get_cache_key(request, view_name: str) -> str:
+    # Empty params are ignored by the filters, the order of the params or their values doesn't matter
+    params = sorted((key, sorted(value for value in values if value))
+                    for key, values in request.query_params.lists()
+                    if any(values))
+    # Pagination links are absolute
+    normalized = json.dumps([request.scheme, request.get_host(), params])
+    return 'restapi:response:{}:{}'.format(view_name, hashlib.sha1(normalized.encode()).hexdigest())
+
+
+class CachedListMixin:
+    """
+    Caches the data of the successful responses of a list view. Data is cached before rendering, so every renderer
+    can use it
+    """
+
+    def list(self, request, *args, **kwargs):
+        cache = get_response_cache()
+        view_name = self.__class__.__name__
+        key = get_cache_key(request, view_name)
+        version = get_cache_version()
+
+        data = cache.get(key, version=version)
+        if data is not None:
+            hits[view_name] += 1
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        misses[view_name] += 1
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, timeout=settings.RESTAPI_CACHE_TIMEOUT, version=version)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+# Models of the cached lists and their nested fields
+CACHED_MODELS = (Oracle, EventDescription, Event, Market)
+
+
+@model_receiver(post_save, CACHED_MODELS, dispatch_uid='response_cache_post_save')
+@model_receiver(post_delete, CACHED_MODELS, dispatch_uid='response_cache_post_delete')
+def invalidate_changed_responses(sender, instance, **kwargs):
+    invalidate_response_cache()
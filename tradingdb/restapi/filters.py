@@ -1,9 +1,16 @@
+import base64
+import json
+from collections import OrderedDict
 from datetime import timedelta
 
+from django.db.models import Q
 from django.utils import timezone
 from django_eth_events.utils import normalize_address_without_0x
 from django_filters import rest_framework as filters
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from tradingdb.relationaldb.models import (CentralizedOracle, Event, Market,
                                            Order, OutcomeTokenBalance)
@@ -25,6 +32,122 @@ class DefaultPagination(LimitOffsetPagination):
     default_limit = 100
 
 
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique key of two fields. Pages are fetched with `WHERE key > cursor ORDER BY key LIMIT n`,
+    so every page takes the same time regardless of its position, and no total count is calculated.
+    The cursor is the key of the last row of the previous page.
+    """
+    keyset_fields = ()
+    keyset_types = ()  # JSON type of the value of every keyset field in the cursor
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    max_limit = DefaultPagination.max_limit
+    default_limit = DefaultPagination.default_limit
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        cursor = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.keyset_fields)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_cursor_filter(cursor))
+
+        results = list(queryset[:self.limit + 1])
+        self.has_next = len(results) > self.limit
+        self.results = results[:self.limit]
+        return self.results
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return min(limit, self.max_limit) if limit > 0 else self.default_limit
+
+    def get_cursor_filter(self, cursor):
+        first_field, second_field = self.keyset_fields
+        first_value, second_value = cursor
+        # The redundant `first >= value` lets the database use the index range on the first field
+        return Q(**{first_field + '__gte': first_value}) & (
+            Q(**{first_field + '__gt': first_value}) |
+            Q(**{first_field: first_value, second_field + '__gt': second_value})
+        )
+
+    def get_key(self, instance):
+        return [getattr(instance, instance._meta.get_field(field).attname) for field in self.keyset_fields]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # Values of other types would reach the database filter, `bool` values are `int` too
+        if not isinstance(cursor, list) or len(cursor) != len(self.keyset_fields) or \
+                any(type(value) is not value_type for value, value_type in zip(cursor, self.keyset_types)):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, key):
+        return base64.urlsafe_b64encode(json.dumps(key).encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.get_key(self.results[-1])))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+
+class KeysetOrDefaultPagination(DefaultPagination):
+    """
+    Limit/offset pagination, or keyset pagination when the `cursor` query param is present (empty for the first page).
+    Clients syncing the full list should use the cursor, deep offsets get slower with every page.
+    """
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_pagination_class.cursor_query_param in request.query_params:
+            self.keyset_pagination = self.keyset_pagination_class()
+            return self.keyset_pagination.paginate_queryset(queryset, request, view=view)
+        self.keyset_pagination = None
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_pagination:
+            return self.keyset_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class OrderKeysetPagination(KeysetPagination):
+    keyset_fields = ('creation_block', 'id')
+    keyset_types = (int, int)
+
+
+class OrderPagination(KeysetOrDefaultPagination):
+    keyset_pagination_class = OrderKeysetPagination
+
+
+class OutcomeTokenBalanceKeysetPagination(KeysetPagination):
+    keyset_fields = ('outcome_token', 'owner')
+    keyset_types = (str, str)  # Addresses
+
+
+class OutcomeTokenBalancePagination(KeysetOrDefaultPagination):
+    keyset_pagination_class = OutcomeTokenBalanceKeysetPagination
+
+
 class CentralizedOracleFilter(filters.FilterSet):
     creator = filters.AllValuesMultipleFilter()
     creation_date_time = filters.DateTimeFromToRangeFilter()
@@ -79,8 +202,8 @@ class MarketFilter(filters.FilterSet):
     event_oracle_factory = filters.AllValuesMultipleFilter(field_name='event__oracle__factory')
     event_oracle_creator = filters.AllValuesMultipleFilter(field_name='event__oracle__creator')
     event_oracle_creation_date_time = filters.DateTimeFromToRangeFilter(field_name='event__oracle__creation_date_time')
-    # TODO refactor, maybe duplicate resolution_date from event_description to market
-    resolution_date_time = filters.DateTimeFromToRangeFilter(field_name='event__oracle__centralizedoracle__event_description__resolution_date')
+    resolution_date_time = filters.DateTimeFromToRangeFilter(field_name='resolution_date')
+    event_type = filters.ChoiceFilter(choices=Market.event_types)
     event_oracle_is_outcome_set = filters.BooleanFilter(field_name='event__oracle__is_outcome_set')
     collateral_token = filters.CharFilter(field_name='event__collateral_token', method='filter_collateral_token')
 
@@ -88,7 +211,7 @@ class MarketFilter(filters.FilterSet):
         fields=(
             ('creation_date_time', 'creation_date_order'),
             ('event__oracle__creation_date_time', 'event_oracle_creation_date_order'),
-            ('resolution_date_time', 'resolution_date_order'),
+            ('resolution_date', 'resolution_date_order'),
         )
     )
 
@@ -96,7 +219,7 @@ class MarketFilter(filters.FilterSet):
         model = Market
         fields = ('creator', 'creation_date_time', 'market_maker', 'event_oracle_factory', 'event_oracle_creator',
                   'event_oracle_creation_date_time', 'event_oracle_is_outcome_set',
-                  'resolution_date_time', 'collateral_token',)
+                  'resolution_date_time', 'event_type', 'collateral_token',)
 
     def filter_creator(self, queryset, name, value):
         creators = [normalize_address_or_raise(creator) for creator in value.split(',')]
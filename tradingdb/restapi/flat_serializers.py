@@ -0,0 +1,206 @@
+"""
+Flat serializers for the read path of the list endpoints. They build the same JSON as the nested serializers in
+`serializers.py` from the rows of `QuerySet.values()`, without instances or DRF fields, so a list is fetched with one
+query and serialized with plain dictionary lookups.
+
+Every serializer knows the lookups it needs (`get_fields`), relative to the model it serializes, and takes a
+`prefix` to be nested in the serializer of a related model, e.g. `FlatEventSerializer(prefix='event__')`.
+"""
+from decimal import ROUND_HALF_EVEN, Context, Decimal
+from typing import Any, Dict, Iterable, List
+
+from gnosis.utils import add_0x_prefix
+
+Row = Dict[str, Any]
+
+_decimal_contexts = {}
+
+
+def decimal_to_string(value, max_digits: int, decimal_places: int) -> str:
+    """
+    Same as `serializers.DecimalField(max_digits=max_digits, decimal_places=decimal_places).to_representation`
+    """
+    context = _decimal_contexts.get(max_digits)
+    if context is None:
+        context = _decimal_contexts[max_digits] = Context(prec=max_digits, rounding=ROUND_HALF_EVEN)
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value).strip())
+    return '{:f}'.format(value.quantize(Decimal('.1') ** decimal_places, context=context))
+
+
+def uint_to_string(value):
+    return None if value is None else decimal_to_string(value, 80, 0)
+
+
+def set_not_null(result: dict, key: str, value):
+    # `remove_null_values` of the nested serializers
+    if value is not None:
+        result[key] = value
+
+
+class FlatSerializer:
+    fields = ()
+
+    def __init__(self, prefix: str = ''):
+        self.prefix = prefix
+
+    def get_fields(self) -> List[str]:
+        return [self.prefix + field for field in self.fields]
+
+    def to_representation(self, row: Row) -> dict:
+        raise NotImplementedError
+
+    def to_representation_many(self, rows: Iterable[Row]) -> List[dict]:
+        return [self.to_representation(row) for row in rows]
+
+
+class FlatContractSerializer(FlatSerializer):
+    """
+    `ContractSerializer` of a contract created by a factory
+    """
+    fields = ('address', 'creation_date_time', 'creation_block', 'factory', 'creator')
+
+    def to_representation(self, row: Row) -> dict:
+        prefix = self.prefix
+        result = {}
+        set_not_null(result, 'address', add_0x_prefix(row[prefix + 'address']))
+        set_not_null(result, 'creation_date', row[prefix + 'creation_date_time'])
+        set_not_null(result, 'creation_block', row[prefix + 'creation_block'])
+        set_not_null(result, 'factory_address', add_0x_prefix(row[prefix + 'factory']))
+        set_not_null(result, 'creator', add_0x_prefix(row[prefix + 'creator']))
+        return result
+
+
+class FlatEventDescriptionSerializer(FlatSerializer):
+    fields = ('title', 'description', 'resolution_date', 'ipfs_hash', 'description_type',
+              'scalareventdescription__unit', 'scalareventdescription__decimals',
+              'categoricaleventdescription__outcomes')
+
+    def to_representation(self, row: Row) -> dict:
+        prefix = self.prefix
+        result = {}
+        set_not_null(result, 'title', row[prefix + 'title'])
+        set_not_null(result, 'description', row[prefix + 'description'])
+        set_not_null(result, 'resolution_date', row[prefix + 'resolution_date'])
+        set_not_null(result, 'ipfs_hash', row[prefix + 'ipfs_hash'])
+        if row[prefix + 'description_type'] == 'SCALAR':
+            set_not_null(result, 'unit', row[prefix + 'scalareventdescription__unit'])
+            set_not_null(result, 'decimals', row[prefix + 'scalareventdescription__decimals'])
+        elif row[prefix + 'description_type'] == 'CATEGORICAL':
+            set_not_null(result, 'outcomes', row[prefix + 'categoricaleventdescription__outcomes'])
+        return result
+
+
+class FlatCentralizedOracleSerializer(FlatSerializer):
+    """
+    `CentralizedOracleSerializer`. `centralized_prefix` is the lookup from the oracle to the centralized oracle, empty
+    when the rows are centralized oracles
+    """
+    oracle_fields = ('is_outcome_set', 'outcome')
+    centralized_oracle_fields = ('owner', 'event_description')
+
+    def __init__(self, prefix: str = '', centralized_prefix: str = ''):
+        super().__init__(prefix=prefix)
+        self.centralized_prefix = prefix + centralized_prefix
+        self.contract_serializer = FlatContractSerializer(prefix=prefix)
+        self.event_description_serializer = FlatEventDescriptionSerializer(
+            prefix=self.centralized_prefix + 'event_description__'
+        )
+
+    def get_fields(self) -> List[str]:
+        return (self.contract_serializer.get_fields()
+                + [self.prefix + field for field in self.oracle_fields]
+                + [self.centralized_prefix + field for field in self.centralized_oracle_fields]
+                + self.event_description_serializer.get_fields())
+
+    def to_representation(self, row: Row) -> dict:
+        outcome = row[self.prefix + 'outcome']
+        owner = row[self.centralized_prefix + 'owner']
+        result = {
+            'contract': self.contract_serializer.to_representation(row),
+            'is_outcome_set': row[self.prefix + 'is_outcome_set'],
+        }
+        set_not_null(result, 'outcome', int(outcome) if outcome is not None else None)
+        set_not_null(result, 'owner', add_0x_prefix(owner) if owner is not None else None)
+        if row[self.centralized_prefix + 'event_description'] is not None:
+            result['event_description'] = self.event_description_serializer.to_representation(row)
+        result['type'] = 'CENTRALIZED'
+        return result
+
+
+class FlatEventSerializer(FlatSerializer):
+    """
+    `EventSerializer`, categorical or scalar event
+    """
+    fields = ('collateral_token', 'is_winning_outcome_set', 'outcome', 'event_type', 'scalarevent__lower_bound',
+              'scalarevent__upper_bound')
+
+    def __init__(self, prefix: str = ''):
+        super().__init__(prefix=prefix)
+        self.contract_serializer = FlatContractSerializer(prefix=prefix)
+        self.oracle_serializer = FlatCentralizedOracleSerializer(prefix=prefix + 'oracle__',
+                                                                 centralized_prefix='centralizedoracle__')
+
+    def get_fields(self) -> List[str]:
+        return (self.contract_serializer.get_fields()
+                + super().get_fields()
+                + self.oracle_serializer.get_fields())
+
+    def to_representation(self, row: Row) -> dict:
+        prefix = self.prefix
+        result = {
+            'contract': self.contract_serializer.to_representation(row),
+        }
+        set_not_null(result, 'collateral_token', row[prefix + 'collateral_token'])
+        result['oracle'] = self.oracle_serializer.to_representation(row)
+        set_not_null(result, 'is_winning_outcome_set', row[prefix + 'is_winning_outcome_set'])
+        set_not_null(result, 'outcome', uint_to_string(row[prefix + 'outcome']))
+        if row[prefix + 'event_type'] == 'CATEGORICAL':
+            result['type'] = 'CATEGORICAL'
+        else:
+            set_not_null(result, 'lower_bound', uint_to_string(row[prefix + 'scalarevent__lower_bound']))
+            set_not_null(result, 'upper_bound', uint_to_string(row[prefix + 'scalarevent__upper_bound']))
+            result['type'] = 'SCALAR'
+        return result
+
+
+class FlatMarketSerializer(FlatSerializer):
+    """
+    `MarketSerializer`
+    """
+    fields = ('market_maker', 'fee', 'funding', 'net_outcome_tokens_sold', 'stage', 'trading_volume',
+              'withdrawn_fees', 'collected_fees', 'marginal_prices')
+
+    def __init__(self, prefix: str = ''):
+        super().__init__(prefix=prefix)
+        self.contract_serializer = FlatContractSerializer(prefix=prefix)
+        self.event_serializer = FlatEventSerializer(prefix=prefix + 'event__')
+
+    def get_fields(self) -> List[str]:
+        return (self.contract_serializer.get_fields()
+                + super().get_fields()
+                + self.event_serializer.get_fields())
+
+    def to_representation(self, row: Row) -> dict:
+        prefix = self.prefix
+        net_outcome_tokens_sold = row[prefix + 'net_outcome_tokens_sold']
+        marginal_prices = row[prefix + 'marginal_prices']
+        fee = row[prefix + 'fee']
+        stage = row[prefix + 'stage']
+        result = {
+            'contract': self.contract_serializer.to_representation(row),
+            'event': self.event_serializer.to_representation(row),
+        }
+        set_not_null(result, 'market_maker', row[prefix + 'market_maker'])
+        set_not_null(result, 'fee', int(fee) if fee is not None else None)
+        set_not_null(result, 'funding', uint_to_string(row[prefix + 'funding']))
+        if net_outcome_tokens_sold is not None:
+            result['net_outcome_tokens_sold'] = [uint_to_string(value) for value in net_outcome_tokens_sold]
+        set_not_null(result, 'stage', int(stage) if stage is not None else None)
+        set_not_null(result, 'trading_volume', uint_to_string(row[prefix + 'trading_volume']))
+        set_not_null(result, 'withdrawn_fees', uint_to_string(row[prefix + 'withdrawn_fees']))
+        set_not_null(result, 'collected_fees', uint_to_string(row[prefix + 'collected_fees']))
+        if marginal_prices is not None:
+            result['marginal_prices'] = [None if value is None else decimal_to_string(value, 5, 4)
+                                         for value in marginal_prices]
+        return result
@@ -34,22 +34,12 @@ class EventDescriptionSerializer(serializers.BaseSerializer):
             'resolution_date': instance.resolution_date,
             'ipfs_hash': instance.ipfs_hash
         }
-        if isinstance(instance, ScalarEventDescription):
-            scalar_event = instance
-            result['unit'] = scalar_event.unit
-            result['decimals'] = scalar_event.decimals
-            return remove_null_values(result)
-        elif isinstance(instance, CategoricalEventDescription):
-            categorical_event = instance
-            result['outcomes'] = categorical_event.outcomes
-            return remove_null_values(result)
-        try:
-            scalar_event = instance.scalareventdescription
-            result['unit'] = scalar_event.unit
-            result['decimals'] = scalar_event.decimals
-        except:
-            categorical_event = instance.categoricaleventdescription
-            result['outcomes'] = categorical_event.outcomes
+        event_description = instance.get_subclass_instance()
+        if isinstance(event_description, ScalarEventDescription):
+            result['unit'] = event_description.unit
+            result['decimals'] = event_description.decimals
+        elif isinstance(event_description, CategoricalEventDescription):
+            result['outcomes'] = event_description.outcomes
 
         return remove_null_values(result)
 
@@ -57,10 +47,7 @@ class EventDescriptionSerializer(serializers.BaseSerializer):
 class OracleSerializer(serializers.Serializer):
 
     def to_representation(self, instance):
-        if isinstance(instance, CentralizedOracle):
-            centralized_oracle = instance
-        else:
-            centralized_oracle = instance.centralizedoracle
+        centralized_oracle = instance.get_subclass_instance()
         response = CentralizedOracleSerializer(centralized_oracle).to_representation(centralized_oracle)
         return remove_null_values(response)
 
@@ -122,14 +109,12 @@ class ScalarEventSerializer(serializers.ModelSerializer):
 class EventSerializer(serializers.Serializer):
 
     def to_representation(self, instance):
-        try:
-            categorical_event = instance.categoricalevent
-            result = CategoricalEventSerializer(categorical_event).to_representation(categorical_event)
-            return remove_null_values(result)
-        except:
-            scalar_event = instance.scalarevent
-            result = ScalarEventSerializer(scalar_event).to_representation(scalar_event)
-            return remove_null_values(result)
+        event = instance.get_subclass_instance()
+        if isinstance(event, CategoricalEvent):
+            result = CategoricalEventSerializer(event).to_representation(event)
+        else:
+            result = ScalarEventSerializer(event).to_representation(event)
+        return remove_null_values(result)
 
 
 class MarketSerializer(serializers.ModelSerializer):
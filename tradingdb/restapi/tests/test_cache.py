@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from tradingdb.relationaldb.models import Market
+from tradingdb.relationaldb.tests.factories import (CentralizedOracleFactory,
+                                                    MarketFactory)
+from tradingdb.restapi.cache import (SHARED_VERSION_KEY, get_cache_version,
+                                     get_response_cache,
+                                     get_response_cache_stats,
+                                     invalidate_response_cache)
+
+
+class TestResponseCache(APITestCase):
+
+    def setUp(self):
+        get_response_cache().clear()
+
+    def test_list_responses_cached(self):
+        stats = get_response_cache_stats()
+        MarketFactory()
+        url = reverse('api:markets')
+        response = self.client.get(url + '?creator=&ordering=creation_date_order&limit=10')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['results']), 1)
+
+        # Same normalized params
+        cached_response = self.client.get(url + '?limit=10&ordering=creation_date_order')
+        self.assertEqual(cached_response['X-Cache'], 'HIT')
+        self.assertEqual(cached_response.json(), response.json())
+        self.assertEqual(self.client.get(url + '?limit=20')['X-Cache'], 'MISS')
+
+        new_stats = get_response_cache_stats()
+        self.assertEqual(new_stats['hits'] - stats['hits'], 1)
+        self.assertEqual(new_stats['misses'] - stats['misses'], 2)
+        self.assertIn('MarketListView', new_stats['views'])
+
+        # Every change of the listed models invalidates the responses
+        MarketFactory()
+        response = self.client.get(url + '?limit=10&ordering=creation_date_order')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['results']), 2)
+
+        self.assertEqual(self.client.get(reverse('api:centralized-oracles'))['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(reverse('api:centralized-oracles'))['X-Cache'], 'HIT')
+        CentralizedOracleFactory()
+        response = self.client.get(reverse('api:centralized-oracles'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['results']), 3)
+
+        Market.objects.all().delete()
+        response = self.client.get(url + '?limit=10&ordering=creation_date_order')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['results']), 0)
+
+
+class TestResponseCacheInvalidation(TransactionTestCase):
+
+    def setUp(self):
+        get_response_cache().clear()
+
+    def get_shared_version(self):
+        get_cache_version()
+        return get_response_cache().get(SHARED_VERSION_KEY)
+
+    def test_invalidate_response_cache(self):
+        shared_version = self.get_shared_version()
+        version = get_cache_version()
+        with transaction.atomic():
+            for _ in range(3):
+                invalidate_response_cache()
+                self.assertNotEqual(get_cache_version(), version)
+                version = get_cache_version()
+            self.assertEqual(self.get_shared_version(), shared_version)
+        # Shared version is bumped once, when the transaction is committed
+        self.assertEqual(self.get_shared_version(), shared_version + 1)
+
+        # The bump of a rolled back transaction is discarded, the next transaction schedules its own
+        with self.assertRaises(ValueError), transaction.atomic():
+            invalidate_response_cache()
+            raise ValueError
+        self.assertEqual(self.get_shared_version(), shared_version + 1)
+        with transaction.atomic():
+            invalidate_response_cache()
+        self.assertEqual(self.get_shared_version(), shared_version + 2)
+
+        # Without a transaction it's bumped right away
+        invalidate_response_cache()
+        self.assertEqual(self.get_shared_version(), shared_version + 3)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from tradingdb.relationaldb.models import CentralizedOracle, Event, Market
+from tradingdb.relationaldb.tests.factories import (
+    CategoricalEventFactory, CentralizedOracleFactory, MarketFactory,
+    ScalarEventDescriptionFactory, ScalarEventFactory)
+from tradingdb.restapi.flat_serializers import (
+    FlatCentralizedOracleSerializer, FlatEventSerializer, FlatMarketSerializer)
+from tradingdb.restapi.serializers import (CentralizedOracleSerializer,
+                                           EventSerializer, MarketSerializer)
+
+
+class TestFlatSerializers(TestCase):
+
+    def assertSameJson(self, queryset, serializer_class, flat_serializer_class):
+        renderer = JSONRenderer()
+        queryset = queryset.order_by('address')
+        flat_serializer = flat_serializer_class()
+        self.assertEqual(renderer.render(serializer_class(queryset, many=True).data),
+                         renderer.render(flat_serializer.to_representation_many(
+                             queryset.values(*flat_serializer.get_fields()))))
+
+    def test_flat_serializers(self):
+        MarketFactory(event=CategoricalEventFactory(), funding=None, marginal_prices=['0.3333', '0.6667'],
+                      net_outcome_tokens_sold=[10 ** 30, 0])
+        scalar_oracle = CentralizedOracleFactory(event_description=ScalarEventDescriptionFactory(), outcome=None)
+        MarketFactory(event=ScalarEventFactory(oracle=scalar_oracle, outcome=None, upper_bound=10 ** 40))
+        CentralizedOracleFactory(event_description=None)
+
+        self.assertSameJson(Market.objects.all(), MarketSerializer, FlatMarketSerializer)
+        self.assertSameJson(Event.objects.all(), EventSerializer, FlatEventSerializer)
+        self.assertSameJson(CentralizedOracle.objects.all(), CentralizedOracleSerializer,
+                            FlatCentralizedOracleSerializer)
@@ -9,10 +9,14 @@ from tradingdb.relationaldb.tests.factories import (CategoricalEventFactory,
                                                     CentralizedOracleFactory,
                                                     ScalarEventFactory,
                                                     TournamentParticipantBalanceFactory)
+from tradingdb.restapi.cache import get_response_cache
 
 
 class TestSerializers(APITestCase):
 
+    def setUp(self):
+        get_response_cache().clear()
+
     def test_scalar_event_serializer(self):
         oracle = CentralizedOracleFactory()
         event = ScalarEventFactory(oracle=oracle)
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
+import base64
+import json
 from datetime import timedelta
+from urllib.parse import urlencode
 
 from django.urls import reverse
 from django.utils import timezone
@@ -7,8 +10,8 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 
 from gnosis.utils import add_0x_prefix
-from tradingdb.relationaldb.models import (CentralizedOracle, Market,
-                                           ShortSellOrder,
+from tradingdb.relationaldb.models import (BuyOrder, CentralizedOracle,
+                                           Market, ShortSellOrder,
                                            TournamentParticipant)
 from tradingdb.relationaldb.tests.factories import (BuyOrderFactory,
                                                     CategoricalEventFactory,
@@ -16,11 +19,16 @@ from tradingdb.relationaldb.tests.factories import (BuyOrderFactory,
                                                     MarketFactory,
                                                     OutcomeTokenBalanceFactory,
                                                     OutcomeTokenFactory,
+                                                    ScalarEventFactory,
                                                     TournamentParticipantBalanceFactory)
+from tradingdb.restapi.cache import get_response_cache
 
 
 class TestViews(APITestCase):
 
+    def setUp(self):
+        get_response_cache().clear()
+
     def test_centralized_oracle(self):
         # test empty centralized-oracles response
         empty_centralized_response = self.client.get(reverse('api:centralized-oracles'), content_type='application/json')
@@ -88,6 +96,21 @@ class TestViews(APITestCase):
         self.assertEqual(market_search_response.status_code, status.HTTP_200_OK)
         self.assertEqual(market_search_response.json().get('contract').get('address'), add_0x_prefix(markets[0].address))
 
+    def test_fetch_views_related_fields(self):
+        market = MarketFactory()
+        event = market.event
+        oracle = event.oracle
+
+        # Related models are loaded with the object
+        for name, kwargs, address in (('api:markets-by-name', {'market_address': market.address}, market.address),
+                                      ('api:events-by-address', {'event_address': event.address}, event.address),
+                                      ('api:centralized-oracles-by-address', {'oracle_address': oracle.address},
+                                       oracle.address)):
+            with self.assertNumQueries(1):
+                response = self.client.get(reverse(name, kwargs=kwargs), content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()['contract']['address'], add_0x_prefix(address))
+
     def test_markets_by_creator(self):
         oracle = CentralizedOracleFactory()
         event = CategoricalEventFactory(oracle=oracle)
@@ -124,6 +147,27 @@ class TestViews(APITestCase):
         empty_date_time_range_response = self.client.get(url, content_type='application/json')
         self.assertEqual(len(empty_date_time_range_response.json().get('results')), 0)
 
+    def test_markets_by_event_type(self):
+        categorical_market = MarketFactory(event=CategoricalEventFactory())
+        scalar_market = MarketFactory(event=ScalarEventFactory())
+
+        for event_type, market in (('CATEGORICAL', categorical_market), ('SCALAR', scalar_market)):
+            url = reverse('api:markets') + '?event_type=' + event_type
+            response = self.client.get(url, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results = response.json().get('results')
+            self.assertEqual(len(results), 1)
+            self.assertEqual(results[0].get('contract').get('address'), add_0x_prefix(market.address))
+
+        # Latest resolution date first
+        event_description = scalar_market.event.oracle.event_description
+        event_description.resolution_date = categorical_market.resolution_date + timedelta(days=1)
+        event_description.save()
+        url = reverse('api:markets') + '?ordering=-resolution_date_order'
+        response = self.client.get(url, content_type='application/json')
+        self.assertListEqual([result.get('contract').get('address') for result in response.json().get('results')],
+                             [add_0x_prefix(scalar_market.address), add_0x_prefix(categorical_market.address)])
+
     def test_markets_by_collateral_token(self):
         oracle = CentralizedOracleFactory()
         event = CategoricalEventFactory(oracle=oracle)
@@ -365,6 +409,67 @@ class TestViews(APITestCase):
         trades_response = self.client.get(url, content_type='application/json')
         self.assertEqual(len(trades_response.json().get('results')), 0)
 
+    def test_trades_keyset_pagination(self):
+        market = MarketFactory()
+        # Orders in the same block are sorted by id
+        orders = [BuyOrderFactory(market=market, creation_block=block) for block in (3, 1, 1, 2, 3)]
+        expected_ids = [order.id for order in sorted(orders, key=lambda order: (order.creation_block, order.id))]
+
+        url = reverse('api:trades-by-market', kwargs={'market_address': market.address}) + '?cursor=&limit=2'
+        results = []
+        while url:
+            response = self.client.get(url, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response_data = response.json()
+            self.assertNotIn('count', response_data)
+            self.assertLessEqual(len(response_data['results']), 2)
+            results.extend(response_data['results'])
+            url = response_data['next']
+        self.assertEqual(len(results), len(orders))
+        self.assertListEqual([result['outcomeTokenCount'] for result in results],
+                             [str(BuyOrder.objects.get(id=order_id).outcome_token_count) for order_id in expected_ids])
+
+        # Limit/offset pagination is still the default
+        url = reverse('api:trades-by-account', kwargs={'account_address': orders[0].sender})
+        response_data = self.client.get(url, content_type='application/json').json()
+        self.assertEqual(response_data['count'], 1)
+
+        url = reverse('api:trades-by-account', kwargs={'account_address': orders[0].sender}) + '?cursor=invalid'
+        response = self.client.get(url, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Values of the wrong type are rejected before querying
+        for key in (['x', {}], [1, '2'], [True, 1], [1.5, 1], [1, None]):
+            url = reverse('api:trades-by-market', kwargs={'market_address': market.address}) + '?' + urlencode({
+                'cursor': base64.urlsafe_b64encode(json.dumps(key).encode('ascii')).decode('ascii')
+            })
+            response = self.client.get(url, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, key)
+
+        # Invalid limits use the default one
+        url = reverse('api:trades-by-market', kwargs={'market_address': market.address}) + '?cursor=&limit=0'
+        self.assertEqual(len(self.client.get(url, content_type='application/json').json()['results']), len(orders))
+        url = reverse('api:trades-by-market', kwargs={'market_address': market.address}) + '?cursor=&limit=-1'
+        self.assertEqual(len(self.client.get(url, content_type='application/json').json()['results']), len(orders))
+
+    def test_all_shares_keyset_pagination(self):
+        market = MarketFactory()
+        outcome_tokens = [OutcomeTokenFactory(event=market.event) for _ in range(2)]
+        balances = [OutcomeTokenBalanceFactory(outcome_token=outcome_token, owner='{:040x}'.format(owner))
+                    for owner in (2, 1, 3) for outcome_token in outcome_tokens]
+
+        url = reverse('api:all-shares', kwargs={'market_address': market.address}) + '?cursor=&limit=4'
+        response_data = self.client.get(url, content_type='application/json').json()
+        self.assertEqual(len(response_data['results']), 4)
+        self.assertIsNotNone(response_data['next'])
+        response_data_next = self.client.get(response_data['next'], content_type='application/json').json()
+        self.assertEqual(len(response_data_next['results']), 2)
+        self.assertIsNone(response_data_next['next'])
+
+        keys = [(result['outcomeToken']['address'], result['owner'])
+                for result in response_data['results'] + response_data_next['results']]
+        self.assertListEqual(keys, sorted((balance.outcome_token.address, balance.owner) for balance in balances))
+
     def test_shares_by_account(self):
         account1 = '{:040d}'.format(13)
         account2 = '{:040d}'.format(14)
@@ -13,16 +13,77 @@ from tradingdb.relationaldb.models import (CentralizedOracle, Event, Market,
                                            Order, OutcomeTokenBalance,
                                            TournamentParticipant,
                                            TournamentWhitelistedCreator)
+# Absolute import, urls load this module as `restapi.views` and the cache versions are module state
+from tradingdb.restapi.cache import CachedListMixin, get_response_cache_stats
 from tradingdb.version import __git_info__, __version__
 
 from .filters import (CentralizedOracleFilter, DefaultPagination, EventFilter,
-                      MarketFilter, MarketSharesFilter, MarketTradesFilter)
+                      MarketFilter, MarketSharesFilter, MarketTradesFilter,
+                      OrderPagination, OutcomeTokenBalancePagination)
+from .flat_serializers import (FlatCentralizedOracleSerializer,
+                               FlatEventSerializer, FlatMarketSerializer)
 from .serializers import (CentralizedOracleSerializer, EventSerializer,
                           MarketSerializer, MarketTradesSerializer,
                           OlympiaScoreboardSerializer,
                           OutcomeTokenBalanceSerializer)
 
 
+CENTRALIZED_ORACLE_RELATED_FIELDS = (
+    'event_description',
+    'event_description__scalareventdescription',
+    'event_description__categoricaleventdescription',
+)
+
+EVENT_RELATED_FIELDS = (
+    'oracle',
+    'scalarevent',
+    'scalarevent__oracle',
+    'scalarevent__oracle__centralizedoracle',
+    'scalarevent__oracle__centralizedoracle__event_description',
+    'scalarevent__oracle__centralizedoracle__event_description__categoricaleventdescription',
+    'scalarevent__oracle__centralizedoracle__event_description__scalareventdescription',
+    'categoricalevent',
+    'categoricalevent__oracle',
+    'categoricalevent__oracle__centralizedoracle',
+    'categoricalevent__oracle__centralizedoracle__event_description',
+    'categoricalevent__oracle__centralizedoracle__event_description__categoricaleventdescription',
+    'categoricalevent__oracle__centralizedoracle__event_description__scalareventdescription',
+    'oracle__centralizedoracle',
+    'oracle__centralizedoracle__event_description',
+    'oracle__centralizedoracle__event_description__categoricaleventdescription',
+    'oracle__centralizedoracle__event_description__scalareventdescription',
+)
+
+MARKET_RELATED_FIELDS = ('event',) + tuple('event__' + field for field in EVENT_RELATED_FIELDS)
+
+
+class FlatListMixin:
+    """
+    Lists the objects with `flat_serializer_class` if it's set. Rows are fetched with `QuerySet.values()` using
+    the lookups of the flat serializer, instead of instances and `serializer_class`
+    """
+    flat_serializer_class = None
+    # Related models loaded with the instances for `serializer_class`, the flat rows join the ones they need
+    related_fields = ()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.flat_serializer_class is None:
+            queryset = queryset.select_related(*self.related_fields)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if self.flat_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.flat_serializer_class()
+        queryset = self.filter_queryset(self.get_queryset()).values(*serializer.get_fields())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation_many(page))
+        return Response(serializer.to_representation_many(queryset))
+
+
 class AboutView(APIView):
     renderer_classes = (JSONRenderer,)
 
@@ -44,6 +105,7 @@ class AboutView(APIView):
                 'ipfs': {
                     'IPFS_HOST': settings.IPFS_HOST,
                     'IPFS_PORT': settings.IPFS_PORT,
+                    'IPFS_MAX_WORKERS': settings.IPFS_MAX_WORKERS,
                 },
                 'addresses': {
                     'CENTRALIZED_ORACLE_FACTORY': os.environ['CENTRALIZED_ORACLE_FACTORY'],
@@ -56,107 +118,68 @@ class AboutView(APIView):
                 },
                 'issuance': {
                     'ETHEREUM_DEFAULT_ACCOUNT_PUBLIC_KEY': ethereum_default_account_public_key,
-                }
-            }
+                },
+                'response_cache': {
+                    'RESTAPI_CACHE_TIMEOUT': settings.RESTAPI_CACHE_TIMEOUT,
+                },
+            },
+            'response_cache': get_response_cache_stats(),
         }
         return Response(content)
 
 
-class CentralizedOracleListView(generics.ListAPIView):
+class CentralizedOracleListView(CachedListMixin, FlatListMixin, generics.ListAPIView):
+    queryset = CentralizedOracle.objects.all()
+    related_fields = CENTRALIZED_ORACLE_RELATED_FIELDS
     serializer_class = CentralizedOracleSerializer
+    flat_serializer_class = FlatCentralizedOracleSerializer
     filterset_class = CentralizedOracleFilter
     pagination_class = DefaultPagination
 
-    def get_queryset(self):
-        queryset = CentralizedOracle.objects.all().select_related(
-            'event_description',
-            'event_description__scalareventdescription',
-            'event_description__categoricaleventdescription'
-        )
-        return queryset
-
 
 class CentralizedOracleFetchView(generics.RetrieveAPIView):
     queryset = CentralizedOracle.objects.all()
     serializer_class = CentralizedOracleSerializer
 
     def get_object(self):
-        return get_object_or_404(CentralizedOracle, address=self.kwargs['oracle_address'])
+        return get_object_or_404(self.get_queryset().select_related(*CENTRALIZED_ORACLE_RELATED_FIELDS),
+                                 address=self.kwargs['oracle_address'])
 
 
-class EventListView(generics.ListAPIView):
+class EventListView(CachedListMixin, FlatListMixin, generics.ListAPIView):
+    queryset = Event.objects.all()
+    related_fields = EVENT_RELATED_FIELDS
     serializer_class = EventSerializer
+    flat_serializer_class = FlatEventSerializer
     filterset_class = EventFilter
     pagination_class = DefaultPagination
 
-    def get_queryset(self):
-        queryset = Event.objects.all().select_related(
-            'oracle',
-            'scalarevent',
-            'scalarevent__oracle',
-            'scalarevent__oracle__centralizedoracle',
-            'scalarevent__oracle__centralizedoracle__event_description',
-            'scalarevent__oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'scalarevent__oracle__centralizedoracle__event_description__scalareventdescription',
-            'categoricalevent',
-            'categoricalevent__oracle',
-            'categoricalevent__oracle__centralizedoracle',
-            'categoricalevent__oracle__centralizedoracle__event_description',
-            'categoricalevent__oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'categoricalevent__oracle__centralizedoracle__event_description__scalareventdescription',
-            'oracle__centralizedoracle',
-            'oracle__centralizedoracle__event_description',
-            'oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'oracle__centralizedoracle__event_description__scalareventdescription',
-        )
-        return queryset
-
 
 class EventFetchView(generics.RetrieveAPIView):
     queryset = Event.objects.all()
     serializer_class = EventSerializer
 
     def get_object(self):
-        return get_object_or_404(Event, address=self.kwargs['event_address'])
+        return get_object_or_404(self.get_queryset().select_related(*EVENT_RELATED_FIELDS),
+                                 address=self.kwargs['event_address'])
 
 
-class MarketListView(generics.ListAPIView):
+class MarketListView(CachedListMixin, FlatListMixin, generics.ListAPIView):
+    queryset = Market.objects.all()
+    related_fields = MARKET_RELATED_FIELDS
     serializer_class = MarketSerializer
+    flat_serializer_class = FlatMarketSerializer
     filterset_class = MarketFilter
     pagination_class = DefaultPagination
 
-    def get_queryset(self):
-        # Eager loading of related models
-        queryset = Market.objects.all()
-        queryset = queryset.select_related(
-            'event',
-            'event__oracle',
-            'event__scalarevent',
-            'event__scalarevent__oracle',
-            'event__scalarevent__oracle__centralizedoracle',
-            'event__scalarevent__oracle__centralizedoracle__event_description',
-            'event__scalarevent__oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'event__scalarevent__oracle__centralizedoracle__event_description__scalareventdescription',
-            'event__categoricalevent',
-            'event__categoricalevent__oracle',
-            'event__categoricalevent__oracle__centralizedoracle',
-            'event__categoricalevent__oracle__centralizedoracle__event_description',
-            'event__categoricalevent__oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'event__categoricalevent__oracle__centralizedoracle__event_description__scalareventdescription',
-            'event__oracle__centralizedoracle',
-            'event__oracle__centralizedoracle__event_description',
-            'event__oracle__centralizedoracle__event_description__categoricaleventdescription',
-            'event__oracle__centralizedoracle__event_description__scalareventdescription',
-        )
-        return queryset
-
 
 class MarketFetchView(generics.RetrieveAPIView):
     queryset = Market.objects.all()
     serializer_class = MarketSerializer
 
     def get_object(self):
-        return get_object_or_404(Market, address=self.kwargs['market_address'])
+        return get_object_or_404(self.get_queryset().select_related(*MARKET_RELATED_FIELDS),
+                                 address=self.kwargs['market_address'])
 
 
 @api_view(['GET'])
@@ -205,7 +228,7 @@ class AllMarketSharesView(generics.ListAPIView):
     Returns all outcome token balances (market shares) for all users in a market
     """
     serializer_class = OutcomeTokenBalanceSerializer
-    pagination_class = DefaultPagination
+    pagination_class = OutcomeTokenBalancePagination
 
     def get_queryset(self):
         return OutcomeTokenBalance.objects.filter(
@@ -250,7 +273,7 @@ class MarketTradesView(generics.ListAPIView):
     Returns the orders (trades) for the given market address
     """
     serializer_class = MarketTradesSerializer
-    pagination_class = DefaultPagination
+    pagination_class = OrderPagination
     filterset_class = MarketTradesFilter
 
     def get_queryset(self):
@@ -276,7 +299,7 @@ class AccountTradesView(generics.ListAPIView):
     Returns the orders (trades) for the given account address
     """
     serializer_class = MarketTradesSerializer
-    pagination_class = DefaultPagination
+    pagination_class = OrderPagination
     filterset_class = MarketTradesFilter
 
     def get_queryset(self):